@@ -1,32 +1,79 @@
 import sys, os, logging, socket, pdb, json, pickle, dotenv, datetime, re
-import base64, re, httpx
+import base64, re, importlib, importlib.util, functools, shlex, fnmatch
 from datetime import timedelta
 
 from telegram import Bot, Chat, Message, User
-from telegram.ext import JobQueue      
+from telegram.ext import JobQueue, Defaults, PreCheckoutQueryHandler, ShippingQueryHandler, TypeHandler
 
 from handlers import *
 import translations as translations
 from typing import List
 
-from cryptography.fernet import Fernet
-
-from util.util_stripe import *
-import util.util_paypal_receive as paypal
-
 import datetime
 import translations.translations as translations
 
-import plugin_system.main as plugin_system_main
-
-from plugin_system.plugin_manager import PluginManager
-
-import requests, inspect
+import inspect
 
 import os, platform, time, asyncio
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext
 
+# ---- Lazy imports -----------------------
+# Heavy subsystems (payments, plugins, HTTP clients, crypto) are imported on first use,
+# so bots that never use them do not pay for them at startup
+
+def lazy_import(module_name: str):
+    """Return a module that is only executed when one of its attributes is first used
+
+    Args:
+        module_name (str): module to import, e.g. 'requests'
+
+    Returns:
+        module: the lazy module, or None if it is not installed
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    
+    spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        return None
+    
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    return module
+
+paypal = lazy_import('util.util_paypal_receive')
+plugin_system_main = lazy_import('plugin_system.main')
+requests = lazy_import('requests')
+httpx = lazy_import('httpx')
+
+# Names of heavy modules available as attributes of this package, resolved by __getattr__
+LAZY_ATTRIBUTES = {
+    'Fernet': 'cryptography.fernet',
+    'PluginManager': 'plugin_system.plugin_manager',
+    'bot_user_admin': 'util.util_stripe',
+    'DEFAULT_LANGUAGE': 'util.util_stripe',
+    'DEFAULT_STRIPE_LIVE_TOKEN': 'util.util_stripe',
+    'DEFAULT_STRIPE_TEST_TOKEN': 'util.util_stripe',
+    'DEFAULT_STRIPE_CURRENCY': 'util.util_stripe',
+    'DEFAULT_STRIPE_TITLE': 'util.util_stripe',
+    'DEFAULT_STRIPE_DESCRIPTION': 'util.util_stripe',
+    'DEFAULT_STRIPE_MODE': 'util.util_stripe',
+    'DEFAULT_STRIPE_PRICE': 'util.util_stripe',
+    'DEFAULT_STRIPE_PAYLOAD': 'util.util_stripe',
+    'DEFAULT_STRIPE_START_PARAMETER': 'util.util_stripe',
+}
+
+def __getattr__(name: str):
+    if name in LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # ------------------------------------------
 
 # Construct the URL for the sendMessage endpoint
@@ -87,8 +134,6 @@ def handle_exception(exc_type, exc_value, exc_traceback):
     if debug_mode.lower() == 'd':
         pdb.post_mortem(exc_traceback)
 
-# Set the custom exception handler
-sys.excepthook = handle_exception
 
 class TelegramObjectEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -109,28 +154,61 @@ script_name = os.path.basename(sys.argv[0]).replace('.py', '')
 # ---- Logging ----------------------------
 log_folder = f'{script_path}{os.sep}log'
 
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-    
-logging.basicConfig(
-    format="%(asctime)s:%(levelname)s:%(message)s",
-    level=logging.DEBUG,
-    handlers=[
-        logging.FileHandler(f'{log_folder}{os.sep}{script_name}.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# set up logging error messages to red color
-logging.addLevelName(logging.ERROR, "\033[1;31m%s\033[1;0m" % logging.getLevelName(logging.ERROR))
-
 logger = logging.getLogger(__name__)
-logger.debug(f"Log folder: {log_folder}")
+
+_setup_done = False
+
+def setup(log_level = logging.DEBUG, log_to_file: bool = True, debug_excepthook: bool = True):
+    """Process-wide side effects of the framework, run once by TlgBotFwk instead of at import time
+
+    Args:
+        log_level (int, optional): root logging level. Defaults to logging.DEBUG.
+        log_to_file (bool, optional): also log to log/<script name>.log. Defaults to True.
+        debug_excepthook (bool, optional): offer the debugger on unhandled exceptions. Defaults to True.
+    """
+    global _setup_done
+    if _setup_done:
+        return
+    _setup_done = True
+    
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_to_file:
+        if not os.path.exists(log_folder):
+            os.makedirs(log_folder)
+        handlers.insert(0, logging.FileHandler(f'{log_folder}{os.sep}{script_name}.log'))
+    
+    logging.basicConfig(
+        format="%(asctime)s:%(levelname)s:%(message)s",
+        level=log_level,
+        handlers=handlers
+    )
+    
+    # set up logging error messages to red color
+    logging.addLevelName(logging.ERROR, "\033[1;31m%s\033[1;0m" % logging.getLevelName(logging.ERROR))
+    
+    logger.debug(f"Log folder: {log_folder}")
+    
+    if debug_excepthook:
+        # Set the custom exception handler
+        sys.excepthook = handle_exception
 
 # ------------------------------------------
 
 from util.util_decorators import *
 from util.util_telegram import *
 from util.util_console import *
+from util.util_auth import *
+from util.util_audit import *
+from util.util_presence import *
+from util.util_pickle_inspect import *
+from util.util_dispatch import *
+from util.util_webhook_shard import *
+from util.util_update_processor import *
+from util.util_command_runner import *
+from util.util_fanout import *
+from util.util_dns_cache import *
+from util.util_fleet_status import *
+from util.util_tracing import *
+from util.util_sqlite_persistence import *
 
 from handlers import *
\ No newline at end of file
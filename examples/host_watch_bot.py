@@ -25,13 +25,14 @@ Pagination
 __todo__ = """ """
 
 import __init__
-import subprocess
 
 from tlgfwk import *
 import traceback
 import util.util_watch as watch
 from util.util_watch import check_port
 import paramiko
+from telegram.error import BadRequest
+from telegram.ext import CallbackQueryHandler
 
 class HostWatchBot(TlgBotFwk):
     
@@ -91,8 +92,14 @@ class HostWatchBot(TlgBotFwk):
             host_name = context.args[0]
             port_number = int(context.args[1])
             
+            try:
+                resolution = await self.dns_cache.resolve(host_name)
+            except DNSResolutionError as e:
+                await update.message.reply_text(f"{e}", parse_mode=None)
+                return
+            
             # Ping the host and port
-            is_open = await watch.check_port(host_name, port_number)
+            is_open = await watch.check_port(resolution.address, port_number)
             
             # Send the result back to the user
             if is_open:
@@ -218,12 +225,34 @@ class HostWatchBot(TlgBotFwk):
         dotenv_path = os.path.join(os.path.dirname(__file__), 'my.env')     
     
         # TODO: hotfix remove addjob and deletejob from the list of commands    
-        super().__init__(env_file=dotenv_path, token=token, disable_commands_list=['paypal', 'payment','p','showbalance','addjob', 'deletejob', 'listjobs','listalljobs','togglesuccess']) 
+        super().__init__(env_file=dotenv_path, token=token, disable_commands_list=['paypal', 'payment','p','showbalance','addjob', 'deletejob', 'listjobs','listalljobs','togglesuccess'],
+                         # a fan-out is bounded by its timeout per host instead, and /cancel stops it
+                         handler_timeouts={'fanout': None}, unordered_commands={'fanout'}, **kwargs) 
         
         self.jobs = {}
         
+        # Next run time of each job by name, for the host listings
+        self.schedule_index = JobScheduleIndex()
+        self.schedule_index.attach(self.application.job_queue.scheduler)
+        self.ping_list_page_size = int(os.environ.get('PING_LIST_PAGE_SIZE', 25))
+        
+        # Host checks probe the cached address of the monitored name
+        self.dns_cache = DNSCache(
+            ttl=float(os.environ.get('DNS_CACHE_TTL', 300)),
+            negative_ttl=float(os.environ.get('DNS_NEGATIVE_TTL', 30))
+        )
+        
+        # /fanout: hosts contacted at the same time and seconds allowed per host
+        self.fanout_concurrency = int(os.environ.get('FANOUT_CONCURRENCY', 16))
+        self.fanout_timeout = float(os.environ.get('FANOUT_TIMEOUT', 30))
+        
         self.external_post_init = self.load_all_user_data
 
+    async def teardown_process(self, application: Application) -> None:
+        # close the SSH connections this process keeps open for /fanout
+        ssh_pool.close()
+        await super().teardown_process(application)
+
     async def job_event_handler(self, callback_context: CallbackContext):
         
         try:     
@@ -239,12 +268,28 @@ class HostWatchBot(TlgBotFwk):
             if show_success:
                 self.send_message_by_api(user_id, f"Pinging {host_address}...") if show_success else None
                 
-            ping_result = await self.ping_host(host_address, show_success=show_success, user_id=user_id)
+            job_name = f"ping_{host_address}"  
             
-            https_ping_result = False # await self.http_ping(host_address, debug_status=show_success, user_id=user_id)
-            http_ping_result = False # await self.http_ping(host_address, debug_status=show_success, user_id=user_id, http_type='http')
+            # Resolve once for all the checks, the resolution time is kept apart from the check results
+            try:
+                resolution = await self.dns_cache.resolve(host_address)
+            except DNSResolutionError as e:
+                callback_context.user_data[job_name]['last_status'] = False
+                callback_context.user_data[job_name]['port_status'] = False
+                callback_context.user_data[job_name]['resolve_error'] = str(e)
+                callback_context.user_data[job_name]['last_fail_date'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.send_message_by_api(user_id, f"{e}")
+                return
+            
+            callback_context.user_data[job_name]['resolved_address'] = resolution.address
+            callback_context.user_data[job_name]['resolve_ms'] = round(resolution.elapsed * 1000, 2)
+            callback_context.user_data[job_name].pop('resolve_error', None)
+            
+            ping_result = await self.ping_host(host_address, show_success=show_success, user_id=user_id, address=resolution.address)
+            
+            https_ping_result = False # await self.http_ping(host_address, debug_status=show_success, user_id=user_id, address=resolution.address)
+            http_ping_result = False # await self.http_ping(host_address, debug_status=show_success, user_id=user_id, http_type='http', address=resolution.address)
             
-            job_name = f"ping_{host_address}"  
             callback_context.user_data[job_name]['last_status'] = ping_result # and http_ping_result
             callback_context.user_data[job_name]['http_status'] = http_ping_result     
             callback_context.user_data[job_name]['https_status'] = https_ping_result     
@@ -254,9 +299,12 @@ class HostWatchBot(TlgBotFwk):
             
             # TODO: execute a check for a specific port
             port = callback_context.user_data[job_name]['port'] if 'port' in callback_context.user_data[job_name] else 80
-            port_result = await watch.check_port(host_address, port)
+            started = time.monotonic()
+            port_result = await watch.check_port(resolution.address, port)
             
             callback_context.user_data[job_name]['port_status'] = port_result
+            # TCP connect time, for the latency ordering of /pinglist
+            callback_context.user_data[job_name]['latency_ms'] = round((time.monotonic() - started) * 1000, 1) if port_result else None
             if not port_result:
                 callback_context.user_data[job_name]['last_fail_date'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")                
                 self.send_message_by_api(callback_context.job.user_id, f"{host_address}:{port} is down!")
@@ -267,7 +315,7 @@ class HostWatchBot(TlgBotFwk):
         except Exception as e:
             self.send_message_by_api(self.bot_owner, f"An error occurred: {e}") 
     
-    async def http_ping(self, ip_address, debug_status=True, user_id=None, http_type='https'):
+    async def http_ping(self, ip_address, debug_status=True, user_id=None, http_type='https', address=None):
         
         http_result = False
         url = f'{http_type}://{ip_address}'
@@ -278,7 +326,12 @@ class HostWatchBot(TlgBotFwk):
                 response = None
                 
                 try:
-                    response = await client.get(url)
+                    if address is None:
+                        address = (await self.dns_cache.resolve(ip_address)).address
+                    # Connect to the cached address, with the host name for the Host header and TLS
+                    response = await client.get(
+                        f'{http_type}://{address}', headers={'Host': ip_address}, extensions={'sni_hostname': ip_address}
+                    )
                 # except httpx.RequestError as exc:
                 except Exception as e:
                     # logger.error(f"An error occurred while requesting {exc.request.url!r}.")
@@ -321,13 +374,21 @@ class HostWatchBot(TlgBotFwk):
         
         return http_result
 
-    async def ping_host(self, ip_address, show_success=True, user_id=None):
+    async def ping_host(self, ip_address, show_success=True, user_id=None, address=None):
         ping_result = False
         
         try:
+            # Ping the cached address of the host
+            if address is None:
+                try:
+                    address = (await self.dns_cache.resolve(ip_address)).address
+                except DNSResolutionError as e:
+                    self.send_message_by_api(user_id, f"{e}")
+                    return ping_result
+            
             # Ping logic here
             param = "-n 1" if platform.system().lower() == "windows" else "-c 1"
-            response = os.system(f"ping {param} {ip_address}") # Returns 0 if the host is up, 1 if the host is down
+            response = os.system(f"ping {param} {address}") # Returns 0 if the host is up, 1 if the host is down
             
             # send message just to the job owner user
             if response == 0:
@@ -487,7 +548,9 @@ class HostWatchBot(TlgBotFwk):
             await update.message.reply_text(f"An error occurred: {e}", parse_mode=None)
 
     async def ping_list(self, update: Update, context: CallbackContext) -> None:
-        """List the hosts being monitored by the bot.
+        """List the hosts being monitored by the bot, down hosts and slowest first.
+
+        Usage: /pinglist [all] [down], all (bot owner only) for the hosts of every user, down for failing hosts only
 
         Args:
             update (Update): _description_
@@ -495,100 +558,74 @@ class HostWatchBot(TlgBotFwk):
         """
         
         try:
-            command_scope = context.args[0] if context.args else None
-        
-            # no param list all jobs, with param list jobs by name
-            jobs = context.job_queue.jobs()
-            effective_user_id = update.effective_user.id
-            
-            # Header of monitored hosts list in case of common user
-            message = f"_Active monitored host:_{os.linesep}`pi p     interv next last host`{os.linesep}"
-            
-            # header of monitored hosts list in case of bot owner
-            if effective_user_id == self.bot_owner:
-                # message = f"_Active monitored host:_{os.linesep}`pi hs ht p     user-id   interv next last host`{os.linesep}"
-                message = f"_Active monitored host:_{os.linesep}`pi p     user-id   interv next last host`{os.linesep}"
-                
-            all_user_data = await self.application.persistence.get_user_data() if self.application.persistence else {}
-            
-            has_jobs = False
+            args = [arg.lower() for arg in context.args] if context.args else []
+            scope = 'all' if 'all' in args and update.effective_user.id == self.bot_owner else 'me'
+            host_filter = 'down' if 'down' in args else 'any'
             
-            hosts_counter = 0
-            max_listed_hosts = 50
-            for job_owner_id, user_data in all_user_data.items():
-                
-                try:
-                    # User allowed in these 2 cases:
-                    # -The command scope is to list all jobs and the current user is the bot owner
-                    # -The current user is the owner of the job
-                    is_allowed = (command_scope and command_scope.lower()=='all' 
-                                  and effective_user_id == self.bot_owner) or (effective_user_id == job_owner_id)
+            message, keyboard = self.render_ping_list(update.effective_user.id, scope, host_filter, 0)
+            await update.message.reply_text(text=message, reply_markup=keyboard)
                     
-                    if not is_allowed:
-                        continue
-                    
-                    for job_name, job_params in user_data.items():
-                        try:
-                            if not job_name.startswith('ping_'):
-                                continue
-                            
-                            # limit the number of jobs to be listed
-                            hosts_counter = hosts_counter + 1
-                            if hosts_counter > max_listed_hosts:
-                                break
-                            
-                            next_time = ""
-                            try:
-                                job = self.application.job_queue.get_jobs_by_name(job_name)[0]                        
-                                next_time = (job.next_t - datetime.timedelta(hours=3)).strftime("%H:%M") if job.next_t else ""
-                            except IndexError:
-                                logger.error(f"No job found with name {job_name}")
-                            
-                            interval = user_data[job_name]['interval'] if job_name in user_data else None
-                            ip_address = user_data[job_name]['ip_address'] if job_name in user_data else None
-                            job_owner = job_owner_id
-                            
-                            ping_status='✅' if job_name in user_data and 'last_status' in user_data[job_name] and user_data[job_name]['last_status'] else "🔴"
-                            https_status='✅' if job_name in user_data and 'https_status' in user_data[job_name] and user_data[job_name]['https_status'] else "🔴"
-                            http_status='✅' if job_name in user_data and 'http_status' in user_data[job_name] and user_data[job_name]['http_status'] else "🔴"
-                            check_port_status = '✅' if job_name in user_data and 'port_status' in user_data[job_name] and user_data[job_name]['port_status'] else "🔴"
-                            
-                            checked_port = user_data[job_name]['port'] if job_name in user_data and 'port' in user_data[job_name] else 80
-                            
-                            url = f'https://{ip_address}' 
-                            markdown_link = f"[{ip_address}]({url})" 
-                            
-                            http_ping_time = user_data[job_name]['http_ping_time'] if job_name in user_data and  'http_ping_time' in user_data[job_name] else None
-                            
-                            last_fail_date = user_data[job_name]['last_fail_date'] if job_name in user_data and 'last_fail_date' in user_data[job_name] else None
-                            
-                            interval = f"{interval}s" if interval else None
-                            if effective_user_id == self.bot_owner:
-                                message += f"{ping_status}{check_port_status}`{checked_port:<5}``{job_owner:<10}` `{interval:<6}` `{next_time}` `{http_ping_time}` {markdown_link}{os.linesep}"
-                            else:
-                                message += f"{ping_status}{check_port_status}`{checked_port:<5}``{interval:<6}` `{next_time}` `{http_ping_time}` {markdown_link}{os.linesep}"
-                            
-                            has_jobs = True
-                            
-                        except Exception as e:
-                            tb = traceback.format_exc()
-                            logger.error(f"An error occurred while listing job {job_name} for user {job_owner_id}: {e}{os.linesep}{tb}")
-                            
-                except Exception as e:
-                    logger.error(f"An error occurred while processing user data for user {job_owner_id}: {e}")
-                     
-            if not has_jobs:
-                message = f"_No hosts monitored._{os.linesep}{os.linesep}_Usage: /pinglist <ip_address> <interval-in-seconds>_{os.linesep}_Example: `/pinglist`"
-                logger.info(message)  
+        except Exception as e:
+            await update.message.reply_text(f"An error occurred: {e}", parse_mode=None)
+    
+    def render_ping_list(self, user_id, scope, host_filter, page):
+        """Render one page of the monitored hosts from a snapshot of the user data.
+
+        Args:
+            user_id (int): user requesting the list
+            scope (str): 'all' for the hosts of every user, 'me' for the hosts of the user
+            host_filter (str): 'down' for failing hosts only, 'any' for all hosts
+            page (int): page number
+
+        Returns:
+            tuple: (markdown message, page buttons or None)
+        """
+        show_all = scope == 'all' and user_id == self.bot_owner
+        
+        table = FleetStatusTable.from_user_data(self.application.user_data, owners=None if show_all else [user_id])
+        rows = table.select(down_only=host_filter == 'down', order='status')
+        
+        if not rows:
+            if host_filter == 'down' and len(table):
+                return f"_All {len(table)} monitored hosts are up._", None
+            return f"_No hosts monitored._{os.linesep}{os.linesep}_Usage: /pingadd <ip_address> <interval-in-seconds>_{os.linesep}_Example: `/pinglist`", None
+        
+        page_rows, page, pages = paginate_rows(rows, page, self.ping_list_page_size)
+        
+        # header of monitored hosts list, with the owner column for the bot owner
+        header = "`pi p     user-id   interv next  last    ms host`" if show_all else "`pi p     interv next  last    ms host`"
+        lines = ["_Active monitored host:_", header]
+        lines.extend(table.render(page_rows, self.schedule_index.next_run, show_owner=show_all))
+        lines.append('')
+        lines.append(f"_Total of monitored hosts: {len(rows)}_")
+        
+        return os.linesep.join(lines), page_keyboard(f"pinglist:{'all' if show_all else 'me'}:{host_filter}", page, pages)
+    
+    async def ping_list_page(self, update: Update, context: CallbackContext) -> None:
+        """Show another page of /pinglist or /listfailures from its inline buttons.
+
+        Args:
+            update (Update): The update object.
+            context (CallbackContext): The callback context.
+        """
+        
+        query = update.callback_query
+        try:
+            await query.answer()
             
+            fields = query.data.split(':')
+            if fields[0] == 'pinglist':
+                message, keyboard = self.render_ping_list(query.from_user.id, fields[1], fields[2], int(fields[3]))
             else:
-                logger.info(message)
-                message += f"{os.linesep}_Total of monitored hosts: {len(jobs)}_"        
-                            
-            await update.message.reply_text(text=message) 
-                    
+                message, keyboard = self.render_failures(query.from_user.id, int(fields[1]))
+            
+            await query.edit_message_text(text=message, reply_markup=keyboard)
+        
+        except BadRequest as e:
+            # Same page pressed again: the message is not modified
+            logger.debug(f"Host list page not changed: {e}")
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {e}", parse_mode=None)
+            logger.error(f"Error in ping_list_page: {e}")
 
     async def ping_log(self, update: Update, context: CallbackContext):
         
@@ -736,15 +773,14 @@ class HostWatchBot(TlgBotFwk):
                 await update.message.reply_text("Please provide a command to execute.")
                 return
             
-            # Execute the command on the host operating system
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            
-            # Send the result back to the user
-            if result.returncode == 0:
-                await update.message.reply_text(await self.escape_markdown(result.stdout))
-            else:
-                await update.message.reply_text(await self.escape_markdown(f"Command execution failed:\n{result.stderr}"))
+            # Execute the command on the host operating system, without blocking the bot,
+            # and show its output as it comes
+            stream = await ChatOutputStream.start(update.message, f"$ {command}")
+            result = await self.command_runner.run_shell(command, owner_id=update.effective_user.id, on_output=stream.write)
+            await stream.close(result.status_text)
         
+        except CommandLimitError as e:
+            await update.message.reply_text(f"{e}", parse_mode=None)
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
             fname = os.path.split(exc_tb.tb.frame.f_code.co.filename())[1]
@@ -789,18 +825,29 @@ class HostWatchBot(TlgBotFwk):
                 await update.message.reply_text(f"No credentials found for {host_name}.")
                 return
             
-            # Execute the SSH command
+            # Execute the SSH command in the command runner's thread pool, paramiko calls block
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(hostname=host_name, port=port, username=username, password=password)
             
-            stdin, stdout, stderr = ssh.exec_command(command)
-            result = stdout.read().decode('utf-8') + stderr.read().decode('utf-8')
-            ssh.close()
+            def run_ssh_command():
+                try:
+                    ssh.connect(hostname=host_name, port=port, username=username, password=password, timeout=30)
+                    stdin, stdout, stderr = ssh.exec_command(command)
+                    return stdout.read().decode('utf-8') + stderr.read().decode('utf-8')
+                finally:
+                    ssh.close()
+            
+            result = await self.command_runner.run_blocking(
+                f"ssh {host_name} {command}", run_ssh_command,
+                owner_id=user_id, on_cancel=ssh.close
+            )
+            output = result.value if result.status == 'finished' else f"{result.output}{os.linesep}{result.status_text}".strip()
             
             # Send the result back to the user
-            await update.message.reply_text(await self.escape_markdown(result))
+            await update.message.reply_text(await self.escape_markdown(output or '(no output)'))
         
+        except CommandLimitError as e:
+            await update.message.reply_text(f"{e}", parse_mode=None)
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
             fname = os.path.split(exc_tb.tb.frame.f_code.co.filename())[1]
@@ -808,8 +855,10 @@ class HostWatchBot(TlgBotFwk):
             
             await update.message.reply_text(f"An error occurred: {e}", parse_mode=None)
  
-    async def list_failures(self, update: Update, context: CallbackContext) -> None:
-        """List each host and its last failure date.
+    async def fanout_command(self, update: Update, context: CallbackContext) -> None:
+        """Run a command over SSH on many monitored hosts at once and report the grouped results.
+
+        Usage: /fanout <all|host[,host...]|pattern> <command>, e.g. /fanout all df -h or /fanout 10.0.* uptime
 
         Args:
             update (Update): The update object.
@@ -817,45 +866,89 @@ class HostWatchBot(TlgBotFwk):
         """
         
         try:
+            if len(context.args) < 2:
+                await update.message.reply_text("Usage: /fanout <all|host[,host...]|pattern> <command>", parse_mode=None)
+                return
+            
+            selector = context.args[0]
+            command = ' '.join(context.args[1:])
             user_id = update.effective_user.id
-            user_data = await self.application.persistence.get_user_data() if self.application.persistence else {}
-            user_hosts = user_data[user_id] if user_id in user_data else {}
-
-            if not user_hosts:
-                await update.message.reply_text("No hosts found.")
+            
+            # Monitored hosts of the user matching the selector, with their stored credentials
+            patterns = None if selector == 'all' else selector.split(',')
+            targets = [
+                FanoutTarget(params['ip_address'], params.get('username'), params.get('password'), int(params.get('connection_port', 22)))
+                for job_name, params in context.user_data.items()
+                if job_name.startswith('ping_') and isinstance(params, dict) and params.get('ip_address')
+                and (patterns is None or any(fnmatch.fnmatch(params['ip_address'], pattern) for pattern in patterns))
+            ]
+            
+            if not targets:
+                await update.message.reply_text(f"No monitored hosts match {selector}.", parse_mode=None)
                 return
             
-            message = f"_Hosts and their last failure dates:_{os.linesep}"
+            # One message shows the progress, then the summary
+            stream = await ChatOutputStream.start(update.message, f"$ {command} on {len(targets)} hosts", interval=2.0)
             
-            for job_name, job_params in user_hosts.items():
-                if not job_name.startswith('ping_'):
-                    continue
-                
-                try:
-                    host_name = job_params.get('ip_address', 'Unknown')
-                    last_fail_date = job_params.get('last_fail_date', 'No failures')
-                    
-                    last_fail_date = context.user_data[job_name]['last_fail_date'] if job_name in context.user_data and 'last_fail_date' in context.user_data[job_name] else last_fail_date
-                    
-                    # url = f'https://{ip_address}' 
-                    # markdown_link = f"[{ip_address}]({url})"                     
-                    last_fail_date = str(last_fail_date) if last_fail_date else 'No failures'
-                    last_fail_date = f'{str(last_fail_date):<19}' 
-                    message += f"`{last_fail_date}` - `{host_name}` {os.linesep}"
-                    
-                except Exception as e:
-                    exc_type, exc_obj, exc_tb = sys.exc_info()
-                    fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-                    logger.error(f"Error getting user data in {fname} at line {exc_tb.tb_lineno}: {e}")                    
-                    continue
+            async def show_progress(done, total, failed):
+                await stream.set(f"{done}/{total} hosts done, {failed} failed")
             
-            await update.message.reply_text(message)
+            result = await self.command_runner.run_coroutine(
+                f"fanout {selector} {command}",
+                run_fanout(targets, command, concurrency=self.fanout_concurrency, timeout=self.fanout_timeout, on_progress=show_progress),
+                owner_id=user_id, timeout=0
+            )
+            
+            if result.status != 'finished':
+                await stream.close(result.status_text)
+                return
+            
+            await stream.message.edit_text(format_fanout_summary(command, result.value), parse_mode=ParseMode.HTML)
+            
+            report = format_fanout_report(command, result.value)
+            file_name = f"fanout-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+            await update.message.reply_document(document=InputFile(report.encode('utf-8'), filename=file_name))
+        
+        except CommandLimitError as e:
+            await update.message.reply_text(f"{e}", parse_mode=None)
+        except Exception as e:
+            logger.error(f"Error in fanout_command: {e}")
+            await update.message.reply_text(f"An error occurred: {e}", parse_mode=None)
+
+    async def list_failures(self, update: Update, context: CallbackContext) -> None:
+        """List each host and its last failure date, latest failures first.
+
+        Args:
+            update (Update): The update object.
+            context (CallbackContext): The callback context.
+        """
+        
+        try:
+            message, keyboard = self.render_failures(update.effective_user.id, 0)
+            await update.message.reply_text(message, reply_markup=keyboard)
         
         except Exception as e:
             await update.message.reply_text(f"An error occurred: {e}")
             logger.error(f"Error in list_failures: {e}")
+    
+    def render_failures(self, user_id, page):
+        """Render one page of the last failure dates of the hosts of a user.
 
-    def run(self):
+        Returns:
+            tuple: (markdown message, page buttons or None)
+        """
+        table = FleetStatusTable.from_user_data(self.application.user_data, owners=[user_id])
+        if not len(table):
+            return "No hosts found.", None
+        
+        page_rows, page, pages = paginate_rows(table.select(order='failures'), page, self.ping_list_page_size)
+        
+        lines = ["_Hosts and their last failure dates:_"]
+        lines.extend(table.render_failures(page_rows))
+        return os.linesep.join(lines), page_keyboard('listfailures', page, pages)
+
+    def prepare_run(self):
+        # Called by run() and by each sharded webhook worker, that never calls run()
         
         try:
             self.application.add_handler(CommandHandler("pingadd", self.ping_add), group=-1)
@@ -867,15 +960,27 @@ class HostWatchBot(TlgBotFwk):
             self.application.add_handler(CommandHandler("pinghostport", self.ping_host_port_command), group=-1)  # Register the new command handler
             self.application.add_handler(CommandHandler("changepingport", self.change_ping_port_command), group=-1)  # Register the new command handler
             self.application.add_handler(CommandHandler("storecredentials", self.store_credentials), group=-1)  # Register the new command handler
-            self.application.add_handler(CommandHandler("exec", self.execute_command, filters=filters.User(user_id=self.admins_owner)), group=-1)  # Register the new command handler
-            self.application.add_handler(CommandHandler("ssh", self.execute_ssh_command, filters=filters.User(user_id=self.admins_owner)), group=-1)  # Register the new command handler
+            self.application.add_handler(CommandHandler("exec", self.execute_command, filters=self.auth.admin_filter), group=-1)  # Register the new command handler
+            self.application.add_handler(CommandHandler("ssh", self.execute_ssh_command, filters=self.auth.admin_filter), group=-1)  # Register the new command handler
             self.application.add_handler(CommandHandler("listfailures", self.list_failures), group=-1)  # Register the new command handler
+            self.application.add_handler(CallbackQueryHandler(self.ping_list_page, pattern=r'^(pinglist|listfailures):'), group=-1)
+            self.application.add_handler(CommandHandler("fanout", self.fanout_command, filters=self.auth.admin_filter), group=-1)
             
+        except Exception as e:
+            logger.error(f"An error occurred while adding handlers: {e}")
+            self.send_message_by_api(self.bot_owner, f"An error occurred while adding handlers: {e}")
+        
+        # tracing and fast dispatch of all the handlers, these included
+        super().prepare_run()
+
+    def run(self):
+        
+        try:
             super().run()
             
         except Exception as e:
-            logger.error(f"An error occurred while adding handlers or running the bot: {e}")
-            self.send_message_by_api(self.bot_owner, f"An error occurred while adding handlers or running the bot: {e}")
+            logger.error(f"An error occurred while running the bot: {e}")
+            self.send_message_by_api(self.bot_owner, f"An error occurred while running the bot: {e}")
 
 def main():
 
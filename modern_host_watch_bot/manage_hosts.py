@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Import and export the monitored hosts of a user from the command line.
+
+Imports are validated in full, then saved in one transaction. They write the
+database directly: a running bot schedules the imported hosts on its next
+start, use /pingimport to add hosts to a running bot. The per user host limit
+does not apply here.
+
+Usage:
+    python manage_hosts.py import hosts.csv --user 123456789 [--dry-run]
+    python manage_hosts.py export --user 123456789 [--format json] [--output hosts.json]
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.models.host import HostJob, HostStatus
+from src.services.persistence import db_manager
+from src.utils.host_documents import (
+    SUPPORTED_FORMATS, HostDocumentError, detect_format, export_host_document, parse_host_document, plan_import
+)
+
+
+async def import_hosts(args) -> int:
+    """Import a document, returning the exit status."""
+    data = Path(args.document).read_bytes()
+    records = parse_host_document(data, args.format or detect_format(args.document, data))
+
+    jobs = await db_manager.get_host_jobs(args.user)
+    plan = plan_import(
+        records,
+        existing={job.host_config.host_address for job in jobs},
+        existing_parents={job.host_config.host_address: job.host_config.parent for job in jobs if job.host_config.parent}
+    )
+
+    for error in plan.errors:
+        where = f"row {error.row}" if error.row else "document"
+        print(f"{where}{f' ({error.host})' if error.host else ''}: {error.message}", file=sys.stderr)
+    if plan.errors:
+        print(f"❌ {len(plan.errors)} errors, no host added", file=sys.stderr)
+        return 1
+
+    if plan.skipped:
+        print(f"{len(plan.skipped)} hosts already monitored, skipped")
+    if args.dry_run:
+        print(f"✅ {len(plan.configs)} hosts would be added")
+        return 0
+
+    new_jobs = [
+        HostJob(
+            job_id=str(uuid.uuid4()),
+            user_id=args.user,
+            host_config=config,
+            host_status=HostStatus(host_address=config.host_address)
+        )
+        for config in plan.configs
+    ]
+    if not await db_manager.save_host_jobs(new_jobs):
+        print("❌ Failed to save the hosts, no host added", file=sys.stderr)
+        return 1
+
+    print(f"✅ {len(new_jobs)} hosts added, monitored from the next bot start")
+    return 0
+
+
+async def export_hosts(args) -> int:
+    """Export the hosts of a user, returning the exit status."""
+    jobs = await db_manager.get_host_jobs(args.user)
+    jobs.sort(key=lambda job: job.host_config.host_address)
+    data = export_host_document([job.host_config for job in jobs], args.format or "csv")
+
+    if args.output:
+        Path(args.output).write_bytes(data)
+        print(f"✅ {len(jobs)} hosts exported to {args.output}")
+    else:
+        sys.stdout.write(data.decode())
+    return 0
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="add the hosts of a CSV, JSON or YAML document")
+    import_parser.add_argument("document", help="host document")
+    import_parser.add_argument("--user", type=int, required=True, help="Telegram user ID owning the hosts")
+    import_parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="document format, else from its name")
+    import_parser.add_argument("--dry-run", action="store_true", help="validate only")
+    import_parser.set_defaults(run=import_hosts)
+
+    export_parser = commands.add_parser("export", help="write the hosts of a user as a document")
+    export_parser.add_argument("--user", type=int, required=True, help="Telegram user ID owning the hosts")
+    export_parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="document format, default csv")
+    export_parser.add_argument("--output", help="output file, default standard output")
+    export_parser.set_defaults(run=export_hosts)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(args.run(args)))
+    except (HostDocumentError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Host check types and their executor.
+"""
+
+from .base import BaseCheck, CHECK_TYPES, register_check
+from . import builtin
+from .executor import CheckExecutor, check_executor, summarize
+
+__all__ = [
+    "BaseCheck",
+    "CHECK_TYPES",
+    "register_check",
+    "CheckExecutor",
+    "check_executor",
+    "summarize"
+]
@@ -0,0 +1,49 @@
+"""
+Check type registry.
+
+A check type probes one protocol of a host. Check types register themselves
+with register_check under one or more type names, the names CheckConfig
+accepts, so new protocols are added without touching the executor.
+"""
+from typing import Dict, Optional, Tuple
+
+from ..models.host import CheckConfig
+
+
+class BaseCheck:
+    """A check type, stateless and shared by all hosts."""
+
+    # Names of the type in CheckConfig.type
+    type_names: Tuple[str, ...] = ()
+    # Whether the check connects to the resolved address (else it resolves the name itself)
+    needs_address: bool = True
+    # Concurrent checks of this type when the settings do not set it
+    default_concurrency: int = 16
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        """
+        Run the check once.
+
+        The executor applies the timeout and turns exceptions into failures.
+
+        Args:
+            host: Host name as configured, for Host headers, SNI and DNS queries
+            address: Resolved address of the host, None when needs_address is False
+            config: Options of the check
+            executor: CheckExecutor running the check, sharing HTTP clients and SSL contexts
+
+        Returns:
+            Tuple of (passed, detail)
+        """
+        raise NotImplementedError
+
+
+CHECK_TYPES: Dict[str, BaseCheck] = {}
+
+
+def register_check(check_class):
+    """Class decorator registering a check type under its type names."""
+    check = check_class()
+    for type_name in check_class.type_names:
+        CHECK_TYPES[type_name] = check
+    return check_class
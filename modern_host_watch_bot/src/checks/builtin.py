@@ -0,0 +1,180 @@
+"""
+Built-in check types: ICMP, TCP, HTTP(S), TLS certificate expiry, DNS and UDP.
+"""
+import asyncio
+import re
+import socket
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from cryptography import x509
+
+from ..models.host import CheckConfig
+from ..utils.network import network_checker
+from .base import BaseCheck, register_check
+
+try:
+    import dns.asyncresolver
+except ImportError:
+    dns = None
+
+# Bytes of an HTTP body searched by body_regex
+MAX_BODY_BYTES = 65536
+
+
+def _url_host(address: str) -> str:
+    """Address as written in a URL."""
+    return f"[{address}]" if ":" in address else address
+
+
+@register_check
+class ICMPCheck(BaseCheck):
+    """Ping the host once."""
+
+    type_names = ("icmp",)
+    default_concurrency = 32
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        is_online, response_time_ms = await network_checker.ping_host(address)
+        return is_online, f"{response_time_ms}ms" if is_online else "no reply"
+
+
+@register_check
+class TCPCheck(BaseCheck):
+    """Open a TCP connection to the port."""
+
+    type_names = ("tcp",)
+    default_concurrency = 64
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        _, writer = await asyncio.open_connection(address, config.port)
+        writer.close()
+        await writer.wait_closed()
+        return True, "open"
+
+
+@register_check
+class HTTPCheck(BaseCheck):
+    """Request a URL, checking the status code and optionally the body."""
+
+    type_names = ("http", "https")
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        default_port = 443 if config.type == "https" else 80
+        port = config.port or default_port
+        url = f"{config.type}://{_url_host(address)}:{port}{config.path}"
+        # Connect to the resolved address, but name the host in the request and the TLS handshake
+        headers = {"Host": host if port == default_port else f"{host}:{port}"}
+        extensions = {"sni_hostname": host} if config.type == "https" else {}
+
+        client = executor.http_client(config.verify)
+        async with client.stream("GET", url, headers=headers, extensions=extensions) as response:
+            detail = f"HTTP {response.status_code}"
+            if response.status_code not in config.expected_status:
+                return False, detail
+            if config.body_regex:
+                body = b""
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) >= MAX_BODY_BYTES:
+                        break
+                text = body[:MAX_BODY_BYTES].decode(response.encoding or "utf-8", errors="replace")
+                if not re.search(config.body_regex, text):
+                    return False, f"{detail}, body does not match"
+            return True, detail
+
+
+@register_check
+class TLSCheck(BaseCheck):
+    """Check that the TLS certificate does not expire within min_days."""
+
+    type_names = ("tls",)
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        _, writer = await asyncio.open_connection(
+            address, config.port or 443, ssl=executor.ssl_context(config.verify), server_hostname=host
+        )
+        try:
+            der = writer.get_extra_info("ssl_object").getpeercert(binary_form=True)
+        finally:
+            writer.close()
+
+        certificate = x509.load_der_x509_certificate(der)
+        expires = getattr(certificate, "not_valid_after_utc", None)
+        if expires is None:
+            # cryptography < 42
+            expires = certificate.not_valid_after.replace(tzinfo=timezone.utc)
+        days = (expires - datetime.now(timezone.utc)).total_seconds() / 86400
+        if days < 0:
+            return False, f"expired {expires:%Y-%m-%d}"
+        return days >= config.min_days, f"expires in {int(days)} days ({expires:%Y-%m-%d})"
+
+
+@register_check
+class DNSCheck(BaseCheck):
+    """Query a record of the host name, optionally matching an answer."""
+
+    type_names = ("dns",)
+    needs_address = False
+    default_concurrency = 32
+
+    async def _answers(self, host: str, record_type: str, timeout: float) -> List[str]:
+        if dns is not None:
+            answer = await dns.asyncresolver.resolve(host, record_type, lifetime=timeout)
+            return [record.to_text() for record in answer]
+
+        if record_type not in ("A", "AAAA"):
+            raise RuntimeError(f"{record_type} records need dnspython")
+        family = socket.AF_INET6 if record_type == "AAAA" else socket.AF_INET
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        answers = await self._answers(host, config.record_type, config.timeout or executor.timeout)
+        detail = ", ".join(answers)[:200]
+        if not answers:
+            return False, "no answer"
+        if config.expected_value and not any(re.search(config.expected_value, answer) for answer in answers):
+            return False, f"no match in {detail}"
+        return True, detail
+
+
+class _DatagramReply(asyncio.DatagramProtocol):
+    """Resolves a future with the first datagram received."""
+
+    def __init__(self, reply: asyncio.Future):
+        self.reply = reply
+
+    def datagram_received(self, data, addr):
+        if not self.reply.done():
+            self.reply.set_result(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+
+@register_check
+class UDPCheck(BaseCheck):
+    """Send a datagram and wait for a reply, optionally matching it."""
+
+    type_names = ("udp",)
+    default_concurrency = 32
+
+    async def run(self, host: str, address: Optional[str], config: CheckConfig, executor) -> Tuple[bool, str]:
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramReply(reply), remote_addr=(address, config.port)
+        )
+        try:
+            transport.sendto(config.payload.encode())
+            data = await reply
+        finally:
+            transport.close()
+
+        text = data.decode(errors="replace")
+        if config.expected_value and not re.search(config.expected_value, text):
+            return False, f"unexpected reply {text[:50]!r}"
+        return True, f"{len(data)} bytes"
@@ -0,0 +1,158 @@
+"""
+Shared executor of host checks.
+
+All the checks of all hosts run on the event loop, bounded per check type so
+that, say, a burst of slow HTTPS checks cannot hold every socket while the
+pings wait. A host is resolved once per probe through the DNS cache and its
+checks then run concurrently against that address.
+"""
+import asyncio
+import logging
+import ssl
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from ..config.settings import settings
+from ..models.host import CheckConfig, CheckOutcome
+from ..utils.dns_cache import DNSCache, DNSResolutionError, Resolution, dns_cache
+from .base import CHECK_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+class CheckExecutor:
+    """Runs host checks with a concurrency budget per check type."""
+
+    def __init__(
+        self,
+        concurrency: Optional[Dict[str, int]] = None,
+        timeout: float = 5.0,
+        resolver: Optional[DNSCache] = None
+    ):
+        """
+        Create the executor.
+
+        Args:
+            concurrency: Check type -> checks of that type run at once, else the type's default
+            timeout: Seconds a check may take when its configuration does not set it
+            resolver: DNS cache resolving the hosts
+        """
+        self.concurrency = concurrency or {}
+        self.timeout = timeout
+        self.resolver = resolver or dns_cache
+
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._ssl_contexts: Dict[bool, ssl.SSLContext] = {}
+        self._http_clients: Dict[bool, httpx.AsyncClient] = {}
+
+    def _semaphore(self, check_type: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(check_type)
+        if semaphore is None:
+            limit = self.concurrency.get(check_type, CHECK_TYPES[check_type].default_concurrency)
+            semaphore = self._semaphores[check_type] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def ssl_context(self, verify: bool) -> ssl.SSLContext:
+        """SSL context shared by the checks, loading the CA certificates once."""
+        context = self._ssl_contexts.get(verify)
+        if context is None:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self._ssl_contexts[verify] = context
+        return context
+
+    def http_client(self, verify: bool) -> httpx.AsyncClient:
+        """HTTP client shared by the checks."""
+        client = self._http_clients.get(verify)
+        if client is None:
+            # No keep-alive: a pooled connection to an address would be reused with the SNI of another host
+            client = httpx.AsyncClient(
+                verify=self.ssl_context(verify),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=0)
+            )
+            self._http_clients[verify] = client
+        return client
+
+    async def _run_check(self, host: str, address: Optional[str], config: CheckConfig) -> CheckOutcome:
+        check = CHECK_TYPES[config.type]
+        async with self._semaphore(config.type):
+            started = time.monotonic()
+            try:
+                ok, detail = await asyncio.wait_for(
+                    check.run(host, address, config, self), timeout=config.timeout or self.timeout
+                )
+            except asyncio.TimeoutError:
+                ok, detail = False, "timed out"
+            except Exception as e:
+                ok, detail = False, str(e) or type(e).__name__
+            latency_ms = (time.monotonic() - started) * 1000
+
+        logger.debug(f"Check {config.name} of {host}: {'ok' if ok else 'failed'}, {detail}")
+        return CheckOutcome(name=config.name, type=config.type, ok=ok, latency_ms=round(latency_ms, 1), detail=detail)
+
+    async def run(self, host: str, checks: List[CheckConfig]) -> Tuple[Optional[Resolution], List[CheckOutcome]]:
+        """
+        Resolve a host and run its checks concurrently.
+
+        Args:
+            host: Host name or IP address
+            checks: Checks to run
+
+        Returns:
+            Tuple of (resolution, outcomes in the order of checks), resolution None
+            if the host cannot be resolved, which fails the checks needing an address
+        """
+        try:
+            resolution = await self.resolver.resolve(host)
+        except DNSResolutionError as e:
+            logger.warning(str(e))
+            resolution, error = None, str(e)
+
+        tasks = []
+        for config in checks:
+            if resolution is None and CHECK_TYPES[config.type].needs_address:
+                tasks.append(self._unresolved(config, error))
+            else:
+                tasks.append(self._run_check(host, resolution.address if resolution else None, config))
+        return resolution, list(await asyncio.gather(*tasks))
+
+    @staticmethod
+    async def _unresolved(config: CheckConfig, error: str) -> CheckOutcome:
+        return CheckOutcome(name=config.name, type=config.type, ok=False, detail=error)
+
+    async def close(self) -> None:
+        """Close the HTTP clients."""
+        for client in self._http_clients.values():
+            await client.aclose()
+        self._http_clients.clear()
+
+
+def summarize(outcomes: List[CheckOutcome]) -> Tuple[bool, bool, Optional[int]]:
+    """
+    Reduce check outcomes to the online and port status of a host.
+
+    Args:
+        outcomes: Outcomes of the checks of one probe
+
+    Returns:
+        Tuple of (is_online, port_open, response_time_ms): online from the ICMP
+        checks, port from the TCP checks, each from all the checks when there is
+        none of that type; response time of the ICMP check, else of the first check passed
+    """
+    icmp = [outcome for outcome in outcomes if outcome.type == "icmp"]
+    tcp = [outcome for outcome in outcomes if outcome.type == "tcp"]
+    is_online = all(outcome.ok for outcome in icmp or outcomes)
+    port_open = all(outcome.ok for outcome in tcp or outcomes)
+
+    timed = [outcome for outcome in icmp + outcomes if outcome.ok and outcome.latency_ms is not None]
+    response_time_ms = int(timed[0].latency_ms) if timed else None
+    return is_online, port_open, response_time_ms
+
+
+# Global instance
+check_executor = CheckExecutor(concurrency=settings.check_concurrency, timeout=settings.check_timeout)
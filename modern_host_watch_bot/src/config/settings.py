@@ -1,7 +1,7 @@
 """
 Configuration settings for the Modern Host Watch Bot.
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -22,7 +22,22 @@ class Settings(BaseSettings):
     max_interval_seconds: int = Field(default=2400, description="Maximum interval between checks")
     default_port: int = Field(default=80, description="Default TCP port to check")
     default_ssh_port: int = Field(default=22, description="Default SSH port")
+    adaptive_confirm_interval: float = Field(default=15.0, description="Seconds between re-checks of a suspected failure")
+    adaptive_confirm_failures: int = Field(default=3, description="Failed checks in a row that confirm a failure")
+    adaptive_backoff_factor: float = Field(default=2.0, description="Interval growth per check of a confirmed failure")
+    adaptive_jitter: float = Field(default=0.1, description="Random fraction added to or taken from adaptive intervals")
     port_check_timeout: float = Field(default=1.0, description="Port check timeout in seconds")
+    dns_cache_ttl: float = Field(default=300.0, description="Seconds a resolved host address is cached")
+    dns_negative_ttl: float = Field(default=30.0, description="Seconds a failed host name lookup is cached")
+    dns_timeout: float = Field(default=5.0, description="Host name lookup timeout in seconds")
+    check_timeout: float = Field(default=5.0, description="Timeout of a host check in seconds")
+    check_concurrency: Dict[str, int] = Field(default={}, description="Check type -> checks of that type run at once")
+    dependency_recheck_seconds: float = Field(default=60.0, description="Age of a parent's last check after which a failing child re-checks it before alerting")
+    ssh_worker_threads: int = Field(default=8, description="Threads running blocking SSH sessions")
+    ssh_max_connections: int = Field(default=32, description="Pooled SSH connections kept open")
+    ssh_max_sessions_per_host: int = Field(default=4, description="Concurrent SSH commands per connection")
+    ssh_idle_timeout: float = Field(default=300.0, description="Seconds before an idle SSH connection is closed")
+    ssh_keepalive_interval: int = Field(default=30, description="Seconds between SSH keepalive packets")
     max_hosts_per_user: int = Field(default=50, description="Maximum hosts per user")
     max_hosts_per_listing: int = Field(default=50, description="Maximum hosts to show in listing")
     
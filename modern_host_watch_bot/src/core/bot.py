@@ -6,7 +6,7 @@ import asyncio
 from typing import Optional
 
 from telegram import Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
 from telegram.constants import ParseMode
 
 from ..config.settings import settings
@@ -14,6 +14,8 @@ from ..services.monitoring import MonitoringService
 from ..services.persistence import db_manager
 from ..handlers.command_handlers import CommandHandlers
 from ..handlers.admin_handlers import AdminHandlers
+from ..utils.ssh import ssh_manager
+from ..checks import check_executor
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +111,21 @@ class ModernHostWatchBot:
         self.application.add_handler(
             CommandHandler("pinglog", self.command_handlers.pinglog_command)
         )
+        self.application.add_handler(
+            CommandHandler("pingimport", self.command_handlers.pingimport_command)
+        )
+        self.application.add_handler(
+            MessageHandler(
+                filters.Document.ALL & filters.CaptionRegex(r"^/pingimport\b"),
+                self.command_handlers.pingimport_command
+            )
+        )
+        self.application.add_handler(
+            CommandHandler("pingexport", self.command_handlers.pingexport_command)
+        )
+        self.application.add_handler(
+            CallbackQueryHandler(self.command_handlers.listing_page_callback, pattern=r"^(pinglist|listfailures):")
+        )
         
         # Configuration commands
         self.application.add_handler(
@@ -117,6 +134,18 @@ class ModernHostWatchBot:
         self.application.add_handler(
             CommandHandler("changepingport", self.admin_handlers.changepingport_command)
         )
+        self.application.add_handler(
+            CommandHandler("pingadaptive", self.command_handlers.pingadaptive_command)
+        )
+        self.application.add_handler(
+            CommandHandler("pingcheck", self.command_handlers.pingcheck_command)
+        )
+        self.application.add_handler(
+            CommandHandler("pingtag", self.command_handlers.pingtag_command)
+        )
+        self.application.add_handler(
+            CommandHandler("pingparent", self.command_handlers.pingparent_command)
+        )
         self.application.add_handler(
             CommandHandler("storecredentials", self.admin_handlers.storecredentials_command)
         )
@@ -198,6 +227,12 @@ Bot is now monitoring your hosts! 🎉
                 await self.application.stop()
                 await self.application.shutdown()
             
+            # Close pooled SSH connections
+            await ssh_manager.close()
+            
+            # Close the HTTP clients of the checks
+            await check_executor.close()
+            
             logger.info("Bot stopped successfully")
             
         except Exception as e:
@@ -57,10 +57,16 @@ class AdminHandlers:
                 stderr=asyncio.subprocess.PIPE
             )
             
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=30
-            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(),
+                    timeout=30
+                )
+            except asyncio.TimeoutError:
+                # Do not leave the command running in the background
+                process.kill()
+                await process.wait()
+                raise
             
             # Format output
             if process.returncode == 0:
@@ -4,19 +4,26 @@ Command handlers for the Modern Host Watch Bot.
 import logging
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 
-from ..models.host import HostJob, HostConfig, HostStatus
+from pydantic import ValidationError
+
+from ..models.host import CheckConfig, HostJob, HostConfig, HostStatus, normalize_tags
 from ..models.user import User, UserPreferences
 from ..services.monitoring import MonitoringService
 from ..services.persistence import db_manager
 from ..utils.network import network_checker
 from ..utils.ssh import ssh_manager
 from ..utils.formatters import formatter
+from ..utils.host_documents import (
+    MAX_DOCUMENT_BYTES, SUPPORTED_FORMATS, HostDocumentError,
+    detect_format, export_host_document, parse_host_document, plan_import
+)
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -180,7 +187,7 @@ I can help you monitor your servers and hosts. Use /help to see all available co
         args = context.args
         if len(args) != 1:
             await update.message.reply_text(
-                "❌ *Usage:* `/pingdelete <host>`\n\n"
+                "❌ *Usage:* `/pingdelete <host|tag:name>`\n\n"
                 "*Example:* `/pingdelete google.com`",
                 parse_mode=ParseMode.MARKDOWN
             )
@@ -189,19 +196,18 @@ I can help you monitor your servers and hosts. Use /help to see all available co
         host_address = args[0]
         
         try:
-            # Find job
-            job = await self.monitoring_service.get_job_by_host(user.id, host_address)
-            if not job:
-                await update.message.reply_text(
-                    f"❌ *Error:* Host `{host_address}` is not being monitored"
-                )
+            # Find jobs
+            jobs = await self._target_jobs(update, user.id, host_address)
+            if not jobs:
                 return
             
-            # Remove job
-            if await self.monitoring_service.remove_host_job(job.job_id):
+            # Remove jobs
+            removed = [job for job in jobs if await self.monitoring_service.remove_host_job(job.job_id)]
+            if removed:
                 await update.message.reply_text(
                     f"✅ *Host Removed Successfully!*\n\n"
                     f"*Host:* `{host_address}`\n"
+                    f"{self._target_count(removed, jobs)}"
                     f"*Status:* Monitoring stopped",
                     parse_mode=ParseMode.MARKDOWN
                 )
@@ -216,8 +222,405 @@ I can help you monitor your servers and hosts. Use /help to see all available co
                 "❌ *Error:* An unexpected error occurred"
             )
     
+    async def pingadaptive_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingadaptive command."""
+        user = update.effective_user
+        if not user:
+            return
+        
+        args = context.args
+        if len(args) != 2 or args[1].lower() not in ("on", "off"):
+            await update.message.reply_text(
+                "❌ *Usage:* `/pingadaptive <host|tag:name> <on|off>`\n\n"
+                "*Example:* `/pingadaptive google.com on`",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        host_address = args[0]
+        enabled = args[1].lower() == "on"
+        
+        try:
+            # Find jobs
+            jobs = await self._target_jobs(update, user.id, host_address)
+            if not jobs:
+                return
+            
+            updated = [job for job in jobs if await self.monitoring_service.set_adaptive(job.job_id, enabled)]
+            if not updated:
+                await update.message.reply_text(
+                    "❌ *Error:* Failed to update host monitoring"
+                )
+                return
+            job = updated[0]
+            
+            policy = self.monitoring_service.policy
+            if enabled:
+                details = (
+                    f"*Failures:* re-checked every `{policy.confirm_interval:.0f}s`, "
+                    f"alerted after {policy.confirm_failures} failed checks\n"
+                    f"*While down:* interval grows up to `{policy.max_interval:.0f}s`"
+                )
+            else:
+                details = "*Interval:* " + ", ".join(
+                    sorted({f"`{job.host_config.interval_seconds}s`" for job in updated})
+                )
+            
+            await update.message.reply_text(
+                f"✅ *Adaptive Interval {'Enabled' if enabled else 'Disabled'}*\n\n"
+                f"*Host:* `{host_address}`\n"
+                f"{self._target_count(updated, jobs)}"
+                f"{details}",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in pingadaptive command: {e}")
+            await update.message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
+    async def _target_jobs(self, update: Update, user_id: int, target: str) -> List[HostJob]:
+        """Jobs named by a host address or `tag:<name>`, replying the error when there are none."""
+        jobs = await self.monitoring_service.get_jobs_by_target(user_id, target)
+        if not jobs:
+            if target.lower().startswith("tag:"):
+                await update.message.reply_text(
+                    f"❌ *Error:* No monitored host is tagged `{target[4:].lower()}`"
+                )
+            else:
+                await update.message.reply_text(
+                    f"❌ *Error:* Host `{target}` is not being monitored"
+                )
+        return jobs
+    
+    @staticmethod
+    def _target_count(done: List[HostJob], jobs: List[HostJob]) -> str:
+        """Line counting the hosts of a tag target that were updated, empty for one host."""
+        if len(jobs) == 1:
+            return ""
+        failed = len(jobs) - len(done)
+        return f"*Hosts:* {len(done)}{f' ({failed} failed)' if failed else ''}\n"
+    
+    async def pingtag_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingtag command: `/pingtag <host|tag:name> [+tag] [-tag]`."""
+        user = update.effective_user
+        if not user:
+            return
+        
+        args = context.args
+        if not args or any(arg[:1] not in ("+", "-") for arg in args[1:]):
+            await update.message.reply_text(
+                "❌ *Usage:* `/pingtag <host|tag:name> [+tag] [-tag]`\n\n"
+                "*Examples:*\n"
+                "`/pingtag example.com +prod +web`\n"
+                "`/pingtag tag:staging -web`",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        target = args[0]
+        
+        try:
+            added = normalize_tags([arg[1:] for arg in args[1:] if arg.startswith("+")])
+            removed = set(normalize_tags([arg[1:] for arg in args[1:] if arg.startswith("-")]))
+            
+            jobs = await self._target_jobs(update, user.id, target)
+            if not jobs:
+                return
+            
+            if added or removed:
+                for job in jobs:
+                    tags = [tag for tag in job.host_config.tags if tag not in removed] + added
+                    if not await self.monitoring_service.set_tags(job.job_id, tags):
+                        await update.message.reply_text(
+                            "❌ *Error:* Failed to update host monitoring"
+                        )
+                        return
+            
+            lines = ["🏷 *Tags*\n"]
+            for job in sorted(jobs, key=lambda job: job.host_config.host_address)[:settings.max_hosts_per_listing]:
+                tags = ", ".join(f"`{tag}`" for tag in job.host_config.tags) or "_none_"
+                lines.append(f"`{job.host_config.host_address}`: {tags}")
+            if len(jobs) > settings.max_hosts_per_listing:
+                lines.append(f"_and {len(jobs) - settings.max_hosts_per_listing} more_")
+            
+            await update.message.reply_text(
+                "\n".join(lines),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+        except ValueError as e:
+            await update.message.reply_text(
+                f"❌ *Error:* {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error in pingtag command: {e}")
+            await update.message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
+    async def pingparent_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingparent command: `/pingparent <host|tag:name> <parent|none>`."""
+        user = update.effective_user
+        if not user:
+            return
+        
+        args = context.args
+        if len(args) != 2:
+            await update.message.reply_text(
+                "❌ *Usage:* `/pingparent <host|tag:name> <parent|none>`\n\n"
+                "Hosts behind a parent that is down are not checked or alerted on.\n\n"
+                "*Examples:*\n"
+                "`/pingparent 10.0.0.20 10.0.0.1`\n"
+                "`/pingparent tag:office none`",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        target = args[0]
+        parent = None if args[1].lower() == "none" else args[1]
+        
+        try:
+            jobs = await self._target_jobs(update, user.id, target)
+            if not jobs:
+                return
+            
+            if parent is not None:
+                if not await self.monitoring_service.get_job_by_host(user.id, parent):
+                    await update.message.reply_text(
+                        f"❌ *Error:* Parent `{parent}` is not being monitored"
+                    )
+                    return
+                # Check every host before changing any
+                graph = self.monitoring_service.dependencies
+                for job in jobs:
+                    if graph.creates_cycle((user.id, job.host_config.host_address), (user.id, parent)):
+                        await update.message.reply_text(
+                            f"❌ *Error:* `{parent}` depends on `{job.host_config.host_address}`"
+                        )
+                        return
+            
+            updated = [job for job in jobs if await self.monitoring_service.set_parent(job.job_id, parent)]
+            if not updated:
+                await update.message.reply_text(
+                    "❌ *Error:* Failed to update host monitoring"
+                )
+                return
+            
+            await update.message.reply_text(
+                f"✅ *Parent {'Set' if parent else 'Removed'}*\n\n"
+                f"*Host:* `{target}`\n"
+                f"{self._target_count(updated, jobs)}"
+                f"*Parent:* {f'`{parent}`' if parent else '_none_'}",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in pingparent command: {e}")
+            await update.message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
+    @staticmethod
+    def _parse_check(check_type: str, options: List[str]) -> CheckConfig:
+        """Build a check from a type and `key=value` options, raising ValueError on bad input."""
+        fields = {"type": check_type}
+        for option in options:
+            key, separator, value = option.partition("=")
+            if not separator or key not in CheckConfig.__fields__ or key == "type":
+                raise ValueError(f"Unknown option `{option}`")
+            fields[key] = value.split(",") if key == "expected_status" else value
+        try:
+            return CheckConfig(**fields)
+        except ValidationError as e:
+            raise ValueError(e.errors()[0]["msg"])
+    
+    async def pingcheck_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingcheck command: `/pingcheck <host> [add <type> key=value... | remove <n|all>]`."""
+        user = update.effective_user
+        if not user:
+            return
+        
+        args = context.args
+        action = args[1].lower() if len(args) > 1 else "list"
+        if (not args or action not in ("list", "add", "remove")
+                or (action == "add" and len(args) < 3) or (action == "remove" and len(args) != 3)):
+            await update.message.reply_text(
+                "❌ *Usage:* `/pingcheck <host> [add <type> key=value... | remove <n|all>]`\n\n"
+                "*Types:* `icmp`, `tcp`, `http`, `https`, `tls`, `dns`, `udp`\n"
+                "*Options:* `port`, `path`, `expected_status`, `body_regex`, `verify`, `min_days`, "
+                "`record_type`, `expected_value`, `payload`, `timeout`\n\n"
+                "*Examples:*\n"
+                "`/pingcheck example.com add https path=/health body_regex=ok`\n"
+                "`/pingcheck example.com add dns record_type=MX expected_value=mail`\n"
+                "`/pingcheck example.com remove 2`",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        host_address = args[0]
+        
+        try:
+            # Find job
+            job = await self.monitoring_service.get_job_by_host(user.id, host_address)
+            if not job:
+                await update.message.reply_text(
+                    f"❌ *Error:* Host `{host_address}` is not being monitored"
+                )
+                return
+            
+            if action != "list":
+                # Editing starts from the checks in effect, the defaults included
+                checks = list(job.host_config.effective_checks())
+                if action == "add":
+                    checks.append(self._parse_check(args[2], args[3:]))
+                elif args[2].lower() == "all":
+                    checks = []
+                elif args[2].isdigit() and 1 <= int(args[2]) <= len(checks):
+                    del checks[int(args[2]) - 1]
+                else:
+                    raise ValueError(f"No check number `{args[2]}`")
+                
+                if not await self.monitoring_service.update_checks(job.job_id, checks):
+                    await update.message.reply_text(
+                        "❌ *Error:* Failed to update host monitoring"
+                    )
+                    return
+            
+            await update.message.reply_text(
+                formatter.format_checks(
+                    job.host_config.effective_checks(), job.host_status, default=not job.host_config.checks
+                ),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+        except ValueError as e:
+            await update.message.reply_text(
+                f"❌ *Error:* {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error in pingcheck command: {e}")
+            await update.message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
+    async def pingimport_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingimport: as the caption of a host document, or in reply to one."""
+        user = update.effective_user
+        message = update.message
+        if not user or not message:
+            return
+        
+        document = message.document
+        if document is None and message.reply_to_message:
+            document = message.reply_to_message.document
+        if document is None:
+            await message.reply_text(
+                "❌ *Usage:* send a CSV, JSON or YAML document with the caption `/pingimport`, "
+                "or reply `/pingimport` to one\n\n"
+                "*CSV:* `host_address,interval_seconds,port,adaptive,checks`\n"
+                "*JSON/YAML:* a list of hosts with these fields, or an object with a `hosts` list\n\n"
+                "Export your hosts with `/pingexport` for an example.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        if document.file_size and document.file_size > MAX_DOCUMENT_BYTES:
+            await message.reply_text(
+                f"❌ *Error:* Document is larger than {MAX_DOCUMENT_BYTES // (1024 * 1024)} MB"
+            )
+            return
+        
+        try:
+            data = bytes(await (await document.get_file()).download_as_bytearray())
+            records = parse_host_document(data, detect_format(document.file_name, data))
+            
+            # Validate every row before adding anything
+            user_jobs = await self.monitoring_service.get_user_jobs(user.id)
+            plan = plan_import(
+                records,
+                existing={job.host_config.host_address for job in user_jobs},
+                limit=settings.max_hosts_per_user - len(user_jobs),
+                existing_parents={
+                    job.host_config.host_address: job.host_config.parent
+                    for job in user_jobs if job.host_config.parent
+                }
+            )
+            
+            imported = False
+            if not plan.errors and plan.configs:
+                jobs = [
+                    HostJob(
+                        job_id=str(uuid.uuid4()),
+                        user_id=user.id,
+                        host_config=config,
+                        host_status=HostStatus(host_address=config.host_address)
+                    )
+                    for config in plan.configs
+                ]
+                imported = await self.monitoring_service.add_host_jobs(jobs)
+            elif not plan.errors:
+                imported = True
+            
+            await message.reply_text(
+                formatter.format_import_report(plan, imported),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+        except HostDocumentError as e:
+            await message.reply_text(
+                f"❌ *Error:* {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error in pingimport command: {e}")
+            await message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
+    async def pingexport_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /pingexport command: `/pingexport [csv|json|yaml]`."""
+        user = update.effective_user
+        if not user:
+            return
+        
+        args = context.args
+        fmt = args[0].lower() if args else "csv"
+        if fmt == "yml":
+            fmt = "yaml"
+        if fmt not in SUPPORTED_FORMATS:
+            await update.message.reply_text(
+                "❌ *Usage:* `/pingexport [csv|json|yaml]`",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        try:
+            jobs = await self.monitoring_service.get_user_jobs(user.id)
+            if not jobs:
+                await update.message.reply_text("_No hosts monitored._", parse_mode=ParseMode.MARKDOWN)
+                return
+            
+            jobs.sort(key=lambda job: job.host_config.host_address)
+            data = export_host_document([job.host_config for job in jobs], fmt)
+            await update.message.reply_document(
+                document=data,
+                filename=f"hosts.{fmt}",
+                caption=f"{len(jobs)} hosts"
+            )
+            
+        except HostDocumentError as e:
+            await update.message.reply_text(
+                f"❌ *Error:* {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error in pingexport command: {e}")
+            await update.message.reply_text(
+                "❌ *Error:* An unexpected error occurred"
+            )
+    
     async def pinglist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle /pinglist command."""
+        """Handle /pinglist command: `/pinglist [all] [down] [tag:<name>]`."""
         user = update.effective_user
         if not user:
             return
@@ -230,8 +633,10 @@ I can help you monitor your servers and hosts. Use /help to see all available co
                 )
                 return
             
+            args = [arg.lower() for arg in context.args]
+            
             # Check if user wants to see all jobs (admin only)
-            show_all = len(context.args) > 0 and context.args[0].lower() == 'all'
+            show_all = "all" in args
             
             if show_all and not db_user.has_permission('admin'):
                 await update.message.reply_text(
@@ -239,27 +644,17 @@ I can help you monitor your servers and hosts. Use /help to see all available co
                 )
                 return
             
-            # Get jobs
-            if show_all:
-                jobs = list(self.monitoring_service.active_jobs.values())
-            else:
-                jobs = await self.monitoring_service.get_user_jobs(user.id)
-            
-            if not jobs:
-                await update.message.reply_text(
-                    "_No hosts monitored._\n\n"
-                    "Use `/pingadd <host> <interval>` to start monitoring",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
+            tag = next((arg[4:] for arg in args if arg.startswith("tag:")), "")
             
-            # Format listing
-            listing_text = formatter.format_host_listing(jobs, show_all)
+            listing_text, keyboard = self._render_host_listing(
+                user.id, "all" if show_all else "me", "down" if "down" in args else "any", 0, tag
+            )
             
             await update.message.reply_text(
                 listing_text,
                 parse_mode=ParseMode.MARKDOWN,
-                disable_web_page_preview=True
+                disable_web_page_preview=True,
+                reply_markup=keyboard
             )
             
         except Exception as e:
@@ -268,6 +663,88 @@ I can help you monitor your servers and hosts. Use /help to see all available co
                 "❌ *Error:* An unexpected error occurred"
             )
     
+    def _render_host_listing(
+        self, user_id: int, scope: str, host_filter: str, page: int, tag: str = ""
+    ) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """
+        Render one page of /pinglist.
+        
+        Args:
+            user_id: User requesting the listing
+            scope: "all" for every user's hosts (admin checked by the caller), "me" for the user's hosts
+            host_filter: "down" for failing hosts only, "any" for all hosts
+            page: Page number
+            tag: Only the hosts with this tag, empty for all
+            
+        Returns:
+            Markdown text and the page buttons, None for a single page
+        """
+        if scope == "all":
+            jobs = list(self.monitoring_service.active_jobs.values())
+        else:
+            jobs = [job for job in self.monitoring_service.active_jobs.values() if job.user_id == user_id]
+        
+        if not jobs:
+            return "_No hosts monitored._\n\nUse `/pingadd <host> <interval>` to start monitoring", None
+        
+        listed = formatter.order_host_listing(jobs, down_only=host_filter == "down", tag=tag or None)
+        if not listed:
+            if tag and not formatter.order_host_listing(jobs, tag=tag):
+                return f"_No monitored host is tagged_ `{tag}`", None
+            return f"_All {len(jobs)} monitored hosts are up._ 🎉", None
+        
+        page_jobs, page, pages = formatter.paginate(listed, page, settings.max_hosts_per_listing)
+        listing_text = formatter.format_host_listing(
+            page_jobs, scope == "all", self.monitoring_service.next_check, total=len(listed)
+        )
+        return listing_text, self._page_keyboard(f"pinglist:{scope}:{host_filter}:{tag}", page, pages)
+    
+    @staticmethod
+    def _page_keyboard(prefix: str, page: int, pages: int) -> Optional[InlineKeyboardMarkup]:
+        """Previous and next buttons sending `<prefix>:<page>`, None for a single page."""
+        if pages <= 1:
+            return None
+        buttons: List[InlineKeyboardButton] = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"{prefix}:{page - 1}"))
+        buttons.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"{prefix}:{page}"))
+        if page < pages - 1:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"{prefix}:{page + 1}"))
+        return InlineKeyboardMarkup([buttons])
+    
+    async def listing_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle the page buttons of /pinglist and /listfailures."""
+        query = update.callback_query
+        
+        try:
+            await query.answer()
+            
+            fields = query.data.split(":")
+            if fields[0] == "pinglist":
+                scope = fields[1]
+                if scope == "all":
+                    db_user = await db_manager.get_user(query.from_user.id)
+                    if not db_user or not db_user.has_permission('admin'):
+                        return
+                # Buttons sent before tags have no tag field
+                tag = fields[3] if len(fields) > 4 else ""
+                text, keyboard = self._render_host_listing(query.from_user.id, scope, fields[2], int(fields[-1]), tag)
+            else:
+                text, keyboard = self._render_failures(query.from_user.id, int(fields[1]))
+            
+            await query.edit_message_text(
+                text,
+                parse_mode=ParseMode.MARKDOWN,
+                disable_web_page_preview=True,
+                reply_markup=keyboard
+            )
+            
+        except BadRequest as e:
+            # Current page pressed: the message is not modified
+            logger.debug(f"Listing page not changed: {e}")
+        except Exception as e:
+            logger.error(f"Error in listing page callback: {e}")
+    
     async def pinghost_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /pinghost command."""
         user = update.effective_user
@@ -372,27 +849,13 @@ I can help you monitor your servers and hosts. Use /help to see all available co
             return
         
         try:
-            # Get user jobs
-            jobs = await self.monitoring_service.get_user_jobs(user.id)
-            
-            # Filter jobs with failures
-            failed_jobs = [job for job in jobs if job.host_status.last_failure]
-            
-            if not failed_jobs:
-                await update.message.reply_text(
-                    "_No recent failures._\n\n"
-                    "All your monitored hosts are working properly! 🎉",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
-            
-            # Format failures list
-            failures_text = formatter.format_failures_list(failed_jobs)
+            failures_text, keyboard = self._render_failures(user.id, 0)
             
             await update.message.reply_text(
                 failures_text,
                 parse_mode=ParseMode.MARKDOWN,
-                disable_web_page_preview=True
+                disable_web_page_preview=True,
+                reply_markup=keyboard
             )
             
         except Exception as e:
@@ -401,6 +864,23 @@ I can help you monitor your servers and hosts. Use /help to see all available co
                 "❌ *Error:* An unexpected error occurred"
             )
     
+    def _render_failures(self, user_id: int, page: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """Render one page of /listfailures, latest failures first."""
+        failed_jobs = sorted(
+            (
+                job for job in self.monitoring_service.active_jobs.values()
+                if job.user_id == user_id and job.host_status.last_failure
+            ),
+            key=lambda job: job.host_status.last_failure,
+            reverse=True
+        )
+        
+        if not failed_jobs:
+            return "_No recent failures._\n\nAll your monitored hosts are working properly! 🎉", None
+        
+        page_jobs, page, pages = formatter.paginate(failed_jobs, page, settings.max_hosts_per_listing)
+        return formatter.format_failures_list(page_jobs), self._page_keyboard("listfailures", page, pages)
+    
     async def pinglog_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /pinglog command."""
         user = update.effective_user
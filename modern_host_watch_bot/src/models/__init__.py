@@ -2,10 +2,12 @@
 Data models for Modern Host Watch Bot.
 """
 
-from .host import HostConfig, HostStatus, HostJob
+from .host import CheckConfig, CheckOutcome, HostConfig, HostStatus, HostJob
 from .user import User, UserPreferences
 
 __all__ = [
+    "CheckConfig",
+    "CheckOutcome",
     "HostConfig",
     "HostStatus", 
     "HostJob",
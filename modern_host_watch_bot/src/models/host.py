@@ -2,9 +2,98 @@
 Data models for host monitoring.
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 import ipaddress
+import re
+
+TAG_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,31}$")
+
+
+def normalize_tags(tags) -> List[str]:
+    """Lowercase and deduplicate tags, from a list or a comma separated string."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    normalized = []
+    for tag in tags or []:
+        tag = str(tag).strip().lower()
+        if not TAG_PATTERN.match(tag):
+            raise ValueError(f"Invalid tag {tag!r}: letters, digits, '_', '.' and '-', up to 32 characters")
+        if tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+class CheckConfig(BaseModel):
+    """One check of a monitored host, options used by its type only."""
+    
+    type: str = Field(..., description="Check type: icmp, tcp, http, https, tls, dns or udp")
+    port: Optional[int] = Field(default=None, description="Port, defaults to the type's usual port")
+    path: str = Field(default="/", description="HTTP path")
+    expected_status: List[int] = Field(default=[200, 301, 302], description="Accepted HTTP status codes")
+    body_regex: Optional[str] = Field(default=None, description="Regex the HTTP body must match")
+    verify: bool = Field(default=True, description="Verify TLS certificates")
+    min_days: int = Field(default=14, description="Fewest days before the TLS certificate expires")
+    record_type: str = Field(default="A", description="DNS record type")
+    expected_value: Optional[str] = Field(default=None, description="Regex a DNS answer or the UDP reply must match")
+    payload: str = Field(default="ping", description="UDP datagram sent")
+    timeout: Optional[float] = Field(default=None, description="Timeout in seconds, defaults to the check timeout")
+    
+    @validator('type')
+    def validate_type(cls, v):
+        """Validate check type against the registered checks."""
+        from ..checks.base import CHECK_TYPES
+        v = v.lower()
+        if v not in CHECK_TYPES:
+            raise ValueError(f"Check type must be one of: {', '.join(sorted(CHECK_TYPES))}")
+        return v
+    
+    @validator('port', always=True)
+    def validate_port(cls, v, values):
+        """Validate port number, required by TCP and UDP checks."""
+        if v is None and values.get('type') in ("tcp", "udp"):
+            raise ValueError(f"{values['type'].upper()} checks need a port")
+        if v is not None and (v < 1 or v > 65535):
+            raise ValueError("Port must be between 1 and 65535")
+        return v
+    
+    @validator('body_regex', 'expected_value')
+    def validate_regex(cls, v):
+        """Validate regular expressions."""
+        if v is not None:
+            try:
+                re.compile(v)
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression: {e}")
+        return v
+    
+    @validator('record_type')
+    def validate_record_type(cls, v):
+        """Validate DNS record type."""
+        v = v.upper()
+        if v not in ("A", "AAAA", "CNAME", "MX", "NS", "TXT"):
+            raise ValueError("Record type must be one of: A, AAAA, CNAME, MX, NS, TXT")
+        return v
+    
+    @property
+    def name(self) -> str:
+        """Short label of the check, e.g. https:443/health or dns:MX."""
+        if self.type == "dns":
+            return f"dns:{self.record_type}"
+        name = f"{self.type}:{self.port}" if self.port else self.type
+        if self.type in ("http", "https") and self.path != "/":
+            name += self.path
+        return name
+
+
+class CheckOutcome(BaseModel):
+    """Result of one check of a host."""
+    
+    name: str = Field(..., description="Check label")
+    type: str = Field(..., description="Check type")
+    ok: bool = Field(..., description="Whether the check passed")
+    latency_ms: Optional[float] = Field(default=None, description="Time the check took in milliseconds")
+    detail: str = Field(default="", description="Status code, certificate expiry, answers or error")
 
 
 class HostConfig(BaseModel):
@@ -16,6 +105,10 @@ class HostConfig(BaseModel):
     ssh_port: int = Field(default=22, description="SSH port")
     ssh_username: Optional[str] = Field(default=None, description="SSH username")
     ssh_password: Optional[str] = Field(default=None, description="Encrypted SSH password")
+    adaptive: bool = Field(default=False, description="Back off while down and re-check quickly before alerting")
+    checks: List[CheckConfig] = Field(default=[], description="Checks run on each probe, ping and TCP port when empty")
+    tags: List[str] = Field(default=[], description="Tags grouping hosts, e.g. prod")
+    parent: Optional[str] = Field(default=None, description="Host this host is reached through, e.g. its router")
     
     @validator('host_address')
     def validate_host_address(cls, v):
@@ -29,6 +122,18 @@ class HostConfig(BaseModel):
                 raise ValueError("Invalid host address")
         return v
     
+    @validator('tags', pre=True)
+    def validate_tags(cls, v):
+        """Validate tags, lowercased, from a list or a comma separated string."""
+        return normalize_tags(v)
+    
+    @validator('parent')
+    def validate_parent(cls, v, values):
+        """Validate that a host is not its own parent."""
+        if v is not None and v == values.get('host_address'):
+            raise ValueError("A host cannot be its own parent")
+        return v or None
+    
     @validator('interval_seconds')
     def validate_interval(cls, v):
         """Validate check interval."""
@@ -43,6 +148,10 @@ class HostConfig(BaseModel):
         if v < 1 or v > 65535:
             raise ValueError("Port must be between 1 and 65535")
         return v
+    
+    def effective_checks(self) -> List[CheckConfig]:
+        """Checks to run: the configured ones, else ping and the TCP port."""
+        return self.checks or [CheckConfig(type="icmp"), CheckConfig(type="tcp", port=self.port)]
 
 
 class HostStatus(BaseModel):
@@ -54,12 +163,31 @@ class HostStatus(BaseModel):
     last_check: Optional[datetime] = Field(default=None, description="Last check timestamp")
     last_failure: Optional[datetime] = Field(default=None, description="Last failure timestamp")
     response_time_ms: Optional[int] = Field(default=None, description="Response time in milliseconds")
+    resolved_address: Optional[str] = Field(default=None, description="Address the checks targeted")
+    resolve_time_ms: Optional[float] = Field(default=None, description="Name resolution time in milliseconds, near 0 when cached")
     consecutive_failures: int = Field(default=0, description="Consecutive failure count")
+    check_results: List[CheckOutcome] = Field(default=[], description="Result of each check of the last probe")
+    unreachable_via: Optional[str] = Field(default=None, description="Down host this host is behind, not probed meanwhile")
     
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat() if v else None
         }
+    
+    @property
+    def failed_checks(self) -> List[str]:
+        """Labels of the checks that failed."""
+        return [result.name for result in self.check_results if not result.ok]
+    
+    @property
+    def unreachable(self) -> bool:
+        """Whether the host is unreachable due to a down parent."""
+        return self.unreachable_via is not None
+    
+    @property
+    def healthy(self) -> bool:
+        """Whether the host is up and passed all its checks."""
+        return self.is_online and self.port_open and not self.failed_checks
 
 
 class HostJob(BaseModel):
@@ -4,12 +4,17 @@ Host monitoring service.
 import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.base import STATE_RUNNING
 from telegram import Bot
-from telegram.ext import JobQueue
+from telegram.ext import Job, JobQueue
 
-from ..models.host import HostJob, HostStatus
-from ..utils.network import network_checker
+from ..models.host import CheckConfig, HostJob, HostStatus, normalize_tags
+from ..checks import check_executor, summarize
+from ..utils.dependencies import DependencyGraph
+from ..utils.formatters import formatter
+from ..utils.scheduling import AdaptivePolicy
 from ..services.persistence import db_manager
 from ..config.settings import settings
 
@@ -23,6 +28,103 @@ class MonitoringService:
         self.bot = bot
         self.job_queue = job_queue
         self.active_jobs: Dict[str, HostJob] = {}
+        # Job name -> queued check, for next check times without scanning the job queue
+        self.scheduled: Dict[str, Job] = {}
+        # (user ID, host address) -> job ID, the nodes of the dependency graph
+        self.nodes: Dict[Tuple[int, str], str] = {}
+        self.dependencies = DependencyGraph()
+        # Parent job ID -> running re-check, shared by the children failing at once
+        self._parent_probes: Dict[str, asyncio.Task] = {}
+        self.policy = AdaptivePolicy(
+            confirm_interval=settings.adaptive_confirm_interval,
+            confirm_failures=settings.adaptive_confirm_failures,
+            backoff_factor=settings.adaptive_backoff_factor,
+            max_interval=settings.max_interval_seconds,
+            jitter=settings.adaptive_jitter
+        )
+    
+    def _schedule_job(self, job: HostJob, first: Optional[float] = None) -> None:
+        """
+        Queue the checks of a job: repeating, or one at a time with the adaptive policy.
+        
+        Args:
+            job: Job to schedule
+            first: Seconds until the first check, else the job's interval
+        """
+        if job.host_config.adaptive:
+            # No quick re-checks behind a down parent
+            failures = 0 if job.host_status.unreachable else job.host_status.consecutive_failures
+            queued = self.job_queue.run_once(
+                self._monitor_host_job,
+                when=first or self.policy.next_interval(job.host_config.interval_seconds, failures),
+                name=job.job_name,
+                data=job.job_id
+            )
+        else:
+            queued = self.job_queue.run_repeating(
+                self._monitor_host_job,
+                interval=job.host_config.interval_seconds,
+                first=first or job.host_config.interval_seconds,
+                name=job.job_name,
+                data=job.job_id
+            )
+        self.scheduled[job.job_name] = queued
+    
+    def _schedule_jobs(self, jobs: List[HostJob]) -> None:
+        """Queue many jobs, their first checks spread over their intervals instead of all at once."""
+        scheduler = self.job_queue.scheduler
+        # A paused scheduler is not woken up by every added job, only once on resume
+        running = scheduler.state == STATE_RUNNING
+        if running:
+            scheduler.pause()
+        try:
+            for index, job in enumerate(jobs, 1):
+                self._schedule_job(job, first=job.host_config.interval_seconds * index / len(jobs))
+        finally:
+            if running:
+                scheduler.resume()
+    
+    def _unschedule_job(self, job: HostJob) -> bool:
+        """Remove the queued checks of a job."""
+        queued = self.scheduled.pop(job.job_name, None)
+        if queued is None:
+            return False
+        try:
+            queued.schedule_removal()
+        except JobLookupError:
+            # A single adaptive check that already ran
+            pass
+        return True
+    
+    @staticmethod
+    def _node(job: HostJob) -> Tuple[int, str]:
+        return job.user_id, job.host_config.host_address
+    
+    @staticmethod
+    def _is_down(status: HostStatus) -> bool:
+        """Whether a host counts as down for the hosts behind it: its last probe ran and failed."""
+        return status.last_check is not None and not status.healthy and not status.unreachable
+    
+    def _track(self, job: HostJob) -> None:
+        """Add a job to the host index and the dependency graph."""
+        node = self._node(job)
+        self.nodes[node] = job.job_id
+        parent = job.host_config.parent
+        try:
+            self.dependencies.set_parent(node, (job.user_id, parent) if parent else None)
+        except ValueError as e:
+            logger.warning(f"Ignoring the parent of {job.host_config.host_address}: {e}")
+        self.dependencies.set_down(node, self._is_down(job.host_status))
+    
+    def _untrack(self, job: HostJob) -> None:
+        node = self._node(job)
+        self.nodes.pop(node, None)
+        self.dependencies.remove(node)
+    
+    def next_check(self, job_name: str) -> Optional[datetime]:
+        """Time of the next check of a job, None if none is queued."""
+        queued = self.scheduled.get(job_name)
+        return queued.next_t if queued is not None else None
     
     async def add_host_job(self, job: HostJob) -> bool:
         """Add a new host monitoring job."""
@@ -38,16 +140,11 @@ class MonitoringService:
                 return False
             
             # Add to job queue
-            self.job_queue.run_repeating(
-                self._monitor_host_job,
-                interval=job.host_config.interval_seconds,
-                first=job.host_config.interval_seconds,
-                name=job.job_name,
-                data=job.job_id
-            )
+            self._schedule_job(job)
             
             # Add to active jobs
             self.active_jobs[job.job_id] = job
+            self._track(job)
             
             logger.info(f"Added monitoring job for {job.host_config.host_address}")
             return True
@@ -56,6 +153,32 @@ class MonitoringService:
             logger.error(f"Error adding host job {job.job_id}: {e}")
             return False
     
+    async def add_host_jobs(self, jobs: List[HostJob]) -> bool:
+        """Add many new host monitoring jobs, saved in one transaction: all of them or none."""
+        try:
+            duplicates = [job.job_id for job in jobs if job.job_id in self.active_jobs]
+            if duplicates:
+                logger.warning(f"Jobs {', '.join(duplicates)} already exist")
+                return False
+            
+            # Save to database
+            if not await db_manager.save_host_jobs(jobs):
+                logger.error(f"Failed to save {len(jobs)} jobs to database")
+                return False
+            
+            # Add to job queue and active jobs
+            self._schedule_jobs(jobs)
+            for job in jobs:
+                self.active_jobs[job.job_id] = job
+                self._track(job)
+            
+            logger.info(f"Added {len(jobs)} monitoring jobs")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error adding {len(jobs)} host jobs: {e}")
+            return False
+    
     async def remove_host_job(self, job_id: str) -> bool:
         """Remove a host monitoring job."""
         try:
@@ -66,9 +189,7 @@ class MonitoringService:
             job = self.active_jobs[job_id]
             
             # Remove from job queue
-            try:
-                self.job_queue.get_jobs_by_name(job.job_name)[0].schedule_removal()
-            except (IndexError, KeyError):
+            if not self._unschedule_job(job):
                 logger.warning(f"Job {job_id} not found in job queue")
             
             # Mark as inactive in database
@@ -78,6 +199,7 @@ class MonitoringService:
             
             # Remove from active jobs
             del self.active_jobs[job_id]
+            self._untrack(job)
             
             logger.info(f"Removed monitoring job for {job.host_config.host_address}")
             return True
@@ -109,6 +231,90 @@ class MonitoringService:
             logger.error(f"Error updating job interval for {job_id}: {e}")
             return False
     
+    async def set_adaptive(self, job_id: str, enabled: bool) -> bool:
+        """Turn the adaptive check interval of a job on or off."""
+        try:
+            if job_id not in self.active_jobs:
+                logger.warning(f"Job {job_id} not found in active jobs")
+                return False
+            
+            job = self.active_jobs[job_id]
+            job.host_config.adaptive = enabled
+            job.updated_at = datetime.utcnow()
+            
+            if not await db_manager.save_host_job(job):
+                logger.error(f"Failed to save job {job_id} to database")
+                return False
+            
+            self._unschedule_job(job)
+            self._schedule_job(job)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating adaptive interval for {job_id}: {e}")
+            return False
+    
+    async def update_checks(self, job_id: str, checks: List[CheckConfig]) -> bool:
+        """Replace the checks of a job, used from its next probe."""
+        try:
+            if job_id not in self.active_jobs:
+                logger.warning(f"Job {job_id} not found in active jobs")
+                return False
+            
+            job = self.active_jobs[job_id]
+            job.host_config.checks = checks
+            job.updated_at = datetime.utcnow()
+            
+            if not await db_manager.save_host_job(job):
+                logger.error(f"Failed to save job {job_id} to database")
+                return False
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating checks for {job_id}: {e}")
+            return False
+    
+    async def set_tags(self, job_id: str, tags: List[str]) -> bool:
+        """Replace the tags of a job."""
+        try:
+            if job_id not in self.active_jobs:
+                logger.warning(f"Job {job_id} not found in active jobs")
+                return False
+            
+            job = self.active_jobs[job_id]
+            job.host_config.tags = normalize_tags(tags)
+            job.updated_at = datetime.utcnow()
+            
+            if not await db_manager.save_host_job(job):
+                logger.error(f"Failed to save job {job_id} to database")
+                return False
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating tags for {job_id}: {e}")
+            return False
+    
+    async def set_parent(self, job_id: str, parent: Optional[str]) -> bool:
+        """Set the host a job depends on, None for none; see dependencies.creates_cycle."""
+        try:
+            if job_id not in self.active_jobs:
+                logger.warning(f"Job {job_id} not found in active jobs")
+                return False
+            
+            job = self.active_jobs[job_id]
+            self.dependencies.set_parent(self._node(job), (job.user_id, parent) if parent else None)
+            job.host_config.parent = parent
+            job.updated_at = datetime.utcnow()
+            
+            if not await db_manager.save_host_job(job):
+                logger.error(f"Failed to save job {job_id} to database")
+                return False
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating parent for {job_id}: {e}")
+            return False
+    
     async def _monitor_host_job(self, context) -> None:
         """Monitor a single host job."""
         job_id = context.job.data
@@ -118,16 +324,31 @@ class MonitoringService:
                 logger.warning(f"Job {job_id} not found in active jobs")
                 return
             
-            job = self.active_jobs[job_id]
-            host_address = job.host_config.host_address
-            port = job.host_config.port
+            await self._probe_job(self.active_jobs[job_id])
             
-            logger.debug(f"Monitoring host {host_address}:{port}")
+        except Exception as e:
+            logger.error(f"Error monitoring host job {job_id}: {e}")
+        
+        finally:
+            # Adaptive jobs run once, queue the next check unless the job was removed or rescheduled meanwhile
+            job = self.active_jobs.get(job_id)
+            if job and job.host_config.adaptive and self.scheduled.get(job.job_name) is context.job:
+                self._schedule_job(job)
+    
+    async def _probe_job(self, job: HostJob) -> HostStatus:
+        """Check a host, or skip it while a host it depends on is down, then save and notify."""
+        node = self._node(job)
+        host_address = job.host_config.host_address
+        cause = self.dependencies.blocked_by(node)
+        
+        if cause is None:
+            checks = job.host_config.effective_checks()
             
-            # Perform comprehensive check
-            ping_success, port_open, response_time = await network_checker.check_host_comprehensive(
-                host_address, port
-            )
+            logger.debug(f"Monitoring host {host_address}: {', '.join(check.name for check in checks)}")
+            
+            # Resolve once and run the checks concurrently
+            resolution, outcomes = await check_executor.run(host_address, checks)
+            ping_success, port_open, response_time = summarize(outcomes)
             
             # Update status
             new_status = HostStatus(
@@ -135,29 +356,68 @@ class MonitoringService:
                 is_online=ping_success,
                 port_open=port_open,
                 last_check=datetime.utcnow(),
-                response_time_ms=response_time
+                response_time_ms=response_time,
+                resolved_address=resolution.address if resolution else None,
+                resolve_time_ms=round(resolution.elapsed_ms, 2) if resolution else None,
+                check_results=outcomes
             )
             
-            # Update consecutive failures
-            if ping_success and port_open:
-                new_status.consecutive_failures = 0
-            else:
-                new_status.consecutive_failures = job.host_status.consecutive_failures + 1
-                new_status.last_failure = datetime.utcnow()
-            
-            # Update job status
-            job.update_status(new_status)
-            
-            # Save to database
-            await db_manager.update_host_status(job_id, new_status)
-            
-            # Send notifications if needed
+            if not new_status.healthy and job.host_config.parent:
+                # The parent may have gone down since its last check: check it before blaming this host
+                await self._recheck_parent(job)
+                cause = self.dependencies.blocked_by(node)
+        
+        if cause is not None:
+            # Not probed, or failed behind a down parent: keep the failure count, no alert
+            new_status = HostStatus(
+                host_address=host_address,
+                last_check=datetime.utcnow(),
+                last_failure=job.host_status.last_failure,
+                consecutive_failures=job.host_status.consecutive_failures,
+                unreachable_via=cause[1]
+            )
+        elif new_status.healthy:
+            new_status.consecutive_failures = 0
+        else:
+            new_status.consecutive_failures = job.host_status.consecutive_failures + 1
+            new_status.last_failure = datetime.utcnow()
+        
+        # Update job status and the hosts behind it
+        job.update_status(new_status)
+        self.dependencies.set_down(node, self._is_down(new_status))
+        
+        # Save to database
+        await db_manager.update_host_status(job.job_id, new_status)
+        
+        # Send notifications if needed
+        if cause is None:
             await self._handle_notifications(job, new_status)
-            
-            logger.debug(f"Host {host_address} check completed: ping={ping_success}, port={port_open}")
-            
+        
+        logger.debug(
+            f"Host {host_address} check completed: ping={new_status.is_online}, port={new_status.port_open}, "
+            f"failed={new_status.failed_checks}, unreachable via={new_status.unreachable_via}"
+        )
+        return new_status
+    
+    async def _recheck_parent(self, job: HostJob) -> None:
+        """Check the parent of a job now, unless it was checked recently."""
+        parent = await self.get_job_by_host(job.user_id, job.host_config.parent)
+        if parent is None:
+            return
+        last_check = parent.host_status.last_check
+        if last_check and (datetime.utcnow() - last_check).total_seconds() < settings.dependency_recheck_seconds:
+            return
+        
+        task = self._parent_probes.get(parent.job_id)
+        if task is None:
+            task = asyncio.create_task(self._probe_job(parent))
+            self._parent_probes[parent.job_id] = task
+            task.add_done_callback(lambda _: self._parent_probes.pop(parent.job_id, None))
+        try:
+            # shield: the children waiting do not cancel the check of their parent
+            await asyncio.shield(task)
         except Exception as e:
-            logger.error(f"Error monitoring host job {job_id}: {e}")
+            logger.error(f"Error re-checking {parent.host_config.host_address}: {e}")
     
     async def _handle_notifications(self, job: HostJob, status: HostStatus) -> None:
         """Handle notifications for host status changes."""
@@ -170,10 +430,12 @@ class MonitoringService:
             # Check if we should send notification
             should_notify = False
             
-            if not status.is_online or not status.port_open:
-                # Send notification on failure
-                should_notify = True
-            elif user.preferences.show_success_logs and (status.is_online and status.port_open):
+            if not status.healthy:
+                # Send notification on failure, once confirmed by the re-checks of adaptive jobs
+                should_notify = (
+                    not job.host_config.adaptive or self.policy.is_confirmed(status.consecutive_failures)
+                )
+            elif user.preferences.show_success_logs:
                 # Send success notification if enabled
                 should_notify = True
             
@@ -193,7 +455,7 @@ class MonitoringService:
         host_address = job.host_config.host_address
         port = job.host_config.port
         
-        if status.is_online and status.port_open:
+        if status.healthy:
             status_icon = "🟢"
             status_text = "Online"
             response_time = f" ({status.response_time_ms}ms)" if status.response_time_ms else ""
@@ -201,14 +463,24 @@ class MonitoringService:
             status_icon = "🔴"
             if not status.is_online:
                 status_text = "Offline"
-            else:
+            elif not status.port_open and not job.host_config.checks:
                 status_text = f"Port {port} Closed"
+            else:
+                status_text = f"Failed `{', '.join(status.failed_checks)}`"
             response_time = ""
         
         message = f"{status_icon} *Host Status Update*\n\n"
         message += f"*Host:* `{host_address}`\n"
         message += f"*Status:* {status_text}{response_time}\n"
-        message += f"*Port:* {port}\n"
+        if job.host_config.checks:
+            for result in status.check_results:
+                message += f"{formatter.format_check_result(result)}\n"
+        else:
+            message += f"*Port:* {port}\n"
+        if not status.healthy:
+            dependents = sum(1 for node in self.dependencies.descendants(self._node(job)) if node in self.nodes)
+            if dependents:
+                message += f"*Dependent hosts:* {dependents}, not alerted on while it is down\n"
         message += f"*Time:* {status.last_check.strftime('%Y-%m-%d %H:%M:%S')}"
         
         return message
@@ -221,16 +493,11 @@ class MonitoringService:
             for job in jobs:
                 if job.is_active:
                     # Add to job queue
-                    self.job_queue.run_repeating(
-                        self._monitor_host_job,
-                        interval=job.host_config.interval_seconds,
-                        first=job.host_config.interval_seconds,
-                        name=job.job_name,
-                        data=job.job_id
-                    )
+                    self._schedule_job(job)
                     
                     # Add to active jobs
                     self.active_jobs[job.job_id] = job
+                    self._track(job)
             
             logger.info(f"Loaded {len(jobs)} monitoring jobs from database")
             
@@ -243,7 +510,15 @@ class MonitoringService:
     
     async def get_job_by_host(self, user_id: int, host_address: str) -> Optional[HostJob]:
         """Get job by host address for a specific user."""
-        for job in self.active_jobs.values():
-            if job.user_id == user_id and job.host_config.host_address == host_address:
-                return job
-        return None 
\ No newline at end of file
+        job_id = self.nodes.get((user_id, host_address))
+        return self.active_jobs.get(job_id) if job_id else None
+    
+    async def get_jobs_by_target(self, user_id: int, target: str) -> List[HostJob]:
+        """Jobs of a user named by a command target: a host address, or `tag:<name>` for the hosts with that tag."""
+        if target.lower().startswith("tag:"):
+            tag = target[4:].lower()
+            return [
+                job for job in self.active_jobs.values() if job.user_id == user_id and tag in job.host_config.tags
+            ]
+        job = await self.get_job_by_host(user_id, target)
+        return [job] if job else [] 
\ No newline at end of file
@@ -203,6 +203,37 @@ class DatabaseManager:
             logger.error(f"Error saving host job {job.job_id}: {e}")
             return False
     
+    async def save_host_jobs(self, jobs: List[HostJob]) -> bool:
+        """Insert new host jobs in one transaction, none of them if any fails."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                
+                cursor.executemany("""
+                    INSERT INTO host_jobs 
+                    (job_id, user_id, host_config, host_status, created_at, updated_at, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        job.job_id,
+                        job.user_id,
+                        json.dumps(job.host_config.dict()),
+                        json.dumps(job.host_status.dict()),
+                        job.created_at.isoformat(),
+                        job.updated_at.isoformat(),
+                        job.is_active
+                    )
+                    for job in jobs
+                ])
+                
+                conn.commit()
+                logger.debug(f"{len(jobs)} host jobs saved to database")
+                return True
+                
+        except Exception as e:
+            logger.error(f"Error saving {len(jobs)} host jobs: {e}")
+            return False
+    
     async def get_host_jobs(self, user_id: Optional[int] = None) -> List[HostJob]:
         """Get host jobs from database."""
         try:
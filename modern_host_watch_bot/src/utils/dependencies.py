@@ -0,0 +1,113 @@
+"""
+Dependencies between monitored hosts.
+
+A host may name a parent, e.g. the router it is reached through. When a host
+is down, the hosts behind it are unreachable: they are not probed and not
+alerted on, so one outage raises one alert instead of one per host.
+
+The graph keeps, for every host, the number of its ancestors that are down.
+A host going down or coming back only updates the hosts below it, and only
+when its state changes, so checks never walk the graph: whether a host is
+unreachable is a dict lookup.
+"""
+from collections import defaultdict
+from typing import Dict, Hashable, Iterator, Optional, Set
+
+
+class DependencyGraph:
+    """Parent links between hosts and the hosts behind a down host."""
+
+    def __init__(self):
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._children: Dict[Hashable, Set[Hashable]] = defaultdict(set)
+        self._down: Set[Hashable] = set()
+        # Host -> ancestors down
+        self._down_ancestors: Dict[Hashable, int] = defaultdict(int)
+
+    def descendants(self, node: Hashable) -> Iterator[Hashable]:
+        """Hosts behind a host, directly or not."""
+        stack = list(self._children.get(node, ()))
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(self._children.get(child, ()))
+
+    def _down_above(self, node: Optional[Hashable]) -> int:
+        """Down hosts among node and its ancestors."""
+        if node is None:
+            return 0
+        return (node in self._down) + self._down_ancestors.get(node, 0)
+
+    def creates_cycle(self, node: Hashable, parent: Optional[Hashable]) -> bool:
+        """Whether making parent the parent of node would loop."""
+        return parent is not None and (parent == node or any(parent == other for other in self.descendants(node)))
+
+    def set_parent(self, node: Hashable, parent: Optional[Hashable]) -> None:
+        """
+        Link a host to its parent, or unlink it with None.
+
+        The parent does not need to be known yet: the link counts once the
+        parent goes down.
+
+        Raises:
+            ValueError: The link would make a cycle
+        """
+        old = self._parent.get(node)
+        if old == parent:
+            return
+        if self.creates_cycle(node, parent):
+            raise ValueError(f"{parent} depends on {node}")
+
+        delta = self._down_above(parent) - self._down_above(old)
+        if old is not None:
+            self._children[old].discard(node)
+            if not self._children[old]:
+                del self._children[old]
+            del self._parent[node]
+        if parent is not None:
+            self._parent[node] = parent
+            self._children[parent].add(node)
+
+        if delta:
+            for other in [node, *self.descendants(node)]:
+                self._down_ancestors[other] += delta
+
+    def set_down(self, node: Hashable, down: bool) -> bool:
+        """
+        Record whether a host is down.
+
+        Returns:
+            True if its state changed
+        """
+        if (node in self._down) == down:
+            return False
+        if down:
+            self._down.add(node)
+        else:
+            self._down.discard(node)
+        delta = 1 if down else -1
+        for other in self.descendants(node):
+            self._down_ancestors[other] += delta
+        return True
+
+    def remove(self, node: Hashable) -> None:
+        """Forget a host; the hosts naming it as parent keep the link."""
+        self.set_down(node, False)
+        self.set_parent(node, None)
+        self._down_ancestors.pop(node, None)
+
+    def is_unreachable(self, node: Hashable) -> bool:
+        """Whether a host is behind a down host."""
+        return self._down_ancestors.get(node, 0) > 0
+
+    def blocked_by(self, node: Hashable) -> Optional[Hashable]:
+        """The top-most down host above a host: the cause of its outage, None if it is reachable."""
+        if not self.is_unreachable(node):
+            return None
+        cause = None
+        parent = self._parent.get(node)
+        while parent is not None:
+            if parent in self._down:
+                cause = parent
+            parent = self._parent.get(parent)
+        return cause
@@ -0,0 +1,221 @@
+"""
+Cached DNS resolution for host checks.
+
+Every probe of a host used to resolve its name again through the system
+resolver. Resolved addresses are now cached for their TTL and failures for a
+short negative TTL, concurrent lookups of the same name share one query, and
+an entry that is still used is refreshed in the background before it expires,
+so probes target a cached IP and a slow resolver does not delay them.
+
+The system resolver does not report TTLs: when dnspython is installed the
+record TTL is used (clamped between min_ttl and ttl), otherwise every address
+is kept for ttl seconds. Names dnspython cannot resolve (e.g. from /etc/hosts)
+fall back to the system resolver.
+
+util/util_dns_cache.py at the repository root is the same cache for the
+HostWatchBot of the tlgfwk framework. This bot is installed on its own from
+src/ and does not depend on that framework, whose modules are imported from
+the repository root, so neither package can import the other. The tests of
+this cache (tests/test_dns_cache.py) also run against that copy.
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..config.settings import settings
+
+try:
+    import dns.asyncresolver
+except ImportError:
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+
+class DNSResolutionError(Exception):
+    """A host name could not be resolved."""
+
+
+@dataclass
+class Resolution:
+    """Address of a host and the time spent getting it."""
+
+    host: str
+    address: str
+    elapsed_ms: float
+    cached: bool
+
+
+@dataclass
+class _Entry:
+    """Cached lookup result: an address, or the error of a failed lookup."""
+
+    address: Optional[str]
+    error: Optional[str]
+    resolved_at: float
+    ttl: float
+
+    @property
+    def expires(self) -> float:
+        return self.resolved_at + self.ttl
+
+
+class DNSCache:
+    """Async resolver cache shared by all host checks."""
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        negative_ttl: float = 30.0,
+        min_ttl: float = 5.0,
+        prefetch_ratio: float = 0.8,
+        timeout: float = 5.0,
+        max_entries: int = 4096,
+        family: int = socket.AF_INET
+    ):
+        """
+        Create the cache.
+
+        Args:
+            ttl: Seconds an address is kept, the maximum when record TTLs are known
+            negative_ttl: Seconds a failed lookup is kept
+            min_ttl: Shortest time an address is kept, whatever its record TTL
+            prefetch_ratio: Fraction of the TTL after which a used entry is refreshed in the background
+            timeout: Seconds a lookup may take
+            max_entries: Host names kept in the cache
+            family: Address family looked up
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min(min_ttl, ttl)
+        self.prefetch_ratio = prefetch_ratio
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.family = family
+
+        self._entries: Dict[str, _Entry] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+        self.counters = {"hits": 0, "negative_hits": 0, "misses": 0, "lookups": 0, "failures": 0, "prefetches": 0}
+
+    # ---------- lookups ----------
+
+    async def _query(self, host: str) -> Tuple[str, float]:
+        """Resolve host, returning an address and its TTL."""
+        if dns is not None:
+            record_type = "AAAA" if self.family == socket.AF_INET6 else "A"
+            try:
+                answer = await dns.asyncresolver.resolve(host, record_type, lifetime=self.timeout)
+                return answer[0].to_text(), max(self.min_ttl, min(self.ttl, answer.rrset.ttl))
+            except Exception as e:
+                logger.debug(f"dnspython could not resolve {host}, using the system resolver: {e}")
+
+        loop = asyncio.get_running_loop()
+        infos = await asyncio.wait_for(
+            loop.getaddrinfo(host, None, family=self.family, type=socket.SOCK_STREAM),
+            timeout=self.timeout
+        )
+        return infos[0][4][0], self.ttl
+
+    async def _lookup(self, host: str) -> _Entry:
+        """Query host and store the result."""
+        self.counters["lookups"] += 1
+        try:
+            address, ttl = await self._query(host)
+            entry = _Entry(address, None, time.monotonic(), ttl)
+        except Exception as e:
+            self.counters["failures"] += 1
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            previous = self._entries.get(host)
+            if previous is not None and previous.address and time.monotonic() < previous.expires:
+                # A failed prefetch keeps the current address until it expires
+                logger.debug(f"Refreshing {host} failed, keeping {previous.address}: {error}")
+                return previous
+            entry = _Entry(None, error, time.monotonic(), self.negative_ttl)
+
+        self._store(host, entry)
+        return entry
+
+    def _store(self, host: str, entry: _Entry) -> None:
+        self._entries.pop(host, None)
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            expired = [name for name, cached in self._entries.items() if cached.expires <= now]
+            # Else drop the least recently stored name
+            for name in expired or [next(iter(self._entries))]:
+                del self._entries[name]
+        self._entries[host] = entry
+
+    def _start_lookup(self, host: str) -> asyncio.Task:
+        """Start a lookup of host, or join the one already running."""
+        task = self._pending.get(host)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._lookup(host))
+            self._pending[host] = task
+            task.add_done_callback(lambda _: self._pending.pop(host, None))
+        return task
+
+    async def resolve(self, host: str) -> Resolution:
+        """
+        Get the address of a host, from the cache when possible.
+
+        Args:
+            host: Host name or IP address
+
+        Returns:
+            Resolution with the address and the time spent resolving
+
+        Raises:
+            DNSResolutionError: The name does not resolve, possibly a cached failure
+        """
+        started = time.monotonic()
+        try:
+            ipaddress.ip_address(host)
+            return Resolution(host, host, 0.0, True)
+        except ValueError:
+            pass
+
+        name = host.lower().rstrip(".")
+        entry = self._entries.get(name)
+        cached = entry is not None and started < entry.expires
+
+        if cached:
+            if entry.address is None:
+                self.counters["negative_hits"] += 1
+            else:
+                self.counters["hits"] += 1
+                if started >= entry.resolved_at + entry.ttl * self.prefetch_ratio and name not in self._pending:
+                    self.counters["prefetches"] += 1
+                    self._start_lookup(name)
+        else:
+            self.counters["misses"] += 1
+            # shield: a cancelled probe must not cancel the lookup other probes wait for
+            entry = await asyncio.shield(self._start_lookup(name))
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        if entry.address is None:
+            raise DNSResolutionError(f"Cannot resolve {host}: {entry.error}")
+        return Resolution(host, entry.address, elapsed_ms, cached)
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        """Forget one host name, or all of them."""
+        if host is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(host.lower().rstrip("."), None)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache usage counters."""
+        return {"entries": len(self._entries), "pending": len(self._pending), **self.counters}
+
+
+# Global instance
+dns_cache = DNSCache(
+    ttl=settings.dns_cache_ttl,
+    negative_ttl=settings.dns_negative_ttl,
+    timeout=settings.dns_timeout
+)
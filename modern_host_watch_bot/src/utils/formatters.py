@@ -2,9 +2,10 @@
 Message formatting utilities.
 """
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from datetime import datetime
-from ..models.host import HostJob, HostStatus
+from ..models.host import CheckConfig, CheckOutcome, HostJob, HostStatus
+from .host_documents import ImportPlan
 
 
 class MessageFormatter:
@@ -27,6 +28,9 @@ class MessageFormatter:
     @staticmethod
     def format_host_status(status: HostStatus) -> str:
         """Format host status for display."""
+        if status.unreachable:
+            return f"⚪ Unreachable, behind `{status.unreachable_via}` which is down"
+        
         status_icon = "🟢" if status.is_online else "🔴"
         port_icon = "✅" if status.port_open else "❌"
         
@@ -34,50 +38,122 @@ class MessageFormatter:
         port_text = f"{port_icon} Port {status.port_open}"
         
         response_time = f" ({status.response_time_ms}ms)" if status.response_time_ms else ""
+        if status.resolve_time_ms and status.resolve_time_ms >= 1:
+            response_time += f" (DNS {status.resolve_time_ms:.0f}ms)"
         
-        return f"{status_text}{response_time} | {port_text}"
+        text = f"{status_text}{response_time} | {port_text}"
+        if status.failed_checks:
+            text += f" | ❌ `{', '.join(status.failed_checks)}`"
+        return text
+    
+    @staticmethod
+    def format_check_result(result: CheckOutcome) -> str:
+        """Format the outcome of one check as a line."""
+        # One code span: details are free text (errors, DNS answers) that would break the markdown
+        text = f"{result.name} {result.detail}".strip().replace("`", "'")
+        latency = f" {result.latency_ms:.0f}ms" if result.ok and result.latency_ms is not None else ""
+        return f"{'✅' if result.ok else '❌'} `{text}`{latency}"
+    
+    @staticmethod
+    def format_checks(checks: List[CheckConfig], status: HostStatus, default: bool = False) -> str:
+        """
+        Format the checks of a host with their last outcomes.
+        
+        Args:
+            checks: Checks of the host
+            status: Last status of the host
+            default: Whether the checks are the default ping and TCP port
+        """
+        results = {result.name: result for result in status.check_results}
+        parts = [f"_Checks of {status.host_address}{' (default)' if default else ''}:_"]
+        for number, check in enumerate(checks, 1):
+            result = results.get(check.name)
+            line = MessageFormatter.format_check_result(result) if result else f"⚪ `{check.name}`"
+            parts.append(f"{number}. {line}")
+        return "\n".join(parts)
     
     @staticmethod
-    def format_host_listing(jobs: List[HostJob], show_all: bool = False) -> str:
-        """Format host listing for display."""
+    def is_down(status: HostStatus) -> bool:
+        """Whether the last check of a host failed."""
+        return not status.healthy
+    
+    @staticmethod
+    def order_host_listing(jobs: List[HostJob], down_only: bool = False, tag: Optional[str] = None) -> List[HostJob]:
+        """Hosts to list: down hosts first, those behind a down host next, then the slowest first."""
+        if tag:
+            jobs = [job for job in jobs if tag in job.host_config.tags]
+        if down_only:
+            jobs = [job for job in jobs if MessageFormatter.is_down(job.host_status)]
+        return sorted(
+            jobs,
+            key=lambda job: (
+                not MessageFormatter.is_down(job.host_status),
+                job.host_status.unreachable,
+                job.host_status.response_time_ms is None,
+                -(job.host_status.response_time_ms or 0),
+            )
+        )
+    
+    @staticmethod
+    def paginate(items: List[Any], page: int, page_size: int) -> Tuple[List[Any], int, int]:
+        """Items of one page, the page number within range and the number of pages."""
+        pages = max(1, -(-len(items) // page_size))
+        page = min(max(page, 0), pages - 1)
+        return items[page * page_size:(page + 1) * page_size], page, pages
+    
+    @staticmethod
+    def format_host_listing(
+        jobs: List[HostJob],
+        show_all: bool = False,
+        next_check: Optional[Callable[[str], Optional[datetime]]] = None,
+        total: Optional[int] = None
+    ) -> str:
+        """
+        Format host listing for display.
+        
+        Args:
+            jobs: Hosts of the page, in display order
+            show_all: Add the user ID column
+            next_check: Job name -> next check time
+            total: Number of listed hosts over all pages
+        """
         if not jobs:
             return "_No hosts monitored._"
         
-        # Header
         if show_all:
-            header = "_Monitored Hosts (All Users):_\n"
-            header += "`Status | Port | User ID | Interval | Next Check | Host`\n"
+            parts = ["_Monitored Hosts (All Users):_", "`Status | Port | User ID | Interval | Next Check | Host`"]
         else:
-            header = "_Your Monitored Hosts:_\n"
-            header += "`Status | Port | Interval | Next Check | Host`\n"
+            parts = ["_Your Monitored Hosts:_", "`Status | Port | Interval | Next Check | Host`"]
         
-        # Format each job
-        lines = []
         for job in jobs:
             status = job.host_status
             config = job.host_config
             
-            # Status icons
-            status_icon = "🟢" if status.is_online else "🔴"
-            port_icon = "✅" if status.port_open else "❌"
-            
-            # Format interval
+            if status.unreachable:
+                # Not probed while a host it depends on is down
+                status_icon, port_icon = "⚪", "⚪"
+            else:
+                status_icon = "🟢" if status.is_online else "🔴"
+                # Port or, for hosts with their own checks, all of them
+                port_icon = "✅" if status.port_open and not status.failed_checks else "❌"
             interval_text = f"{config.interval_seconds}s"
             
-            # Format next check (placeholder for now)
-            next_check = "Now"  # TODO: Calculate from job schedule
+            next_time = next_check(job.job_name) if next_check else None
+            next_text = next_time.strftime("%H:%M") if next_time else "-"
             
             # Create clickable link
             host_link = f"[{config.host_address}](https://{config.host_address})"
+            response_time = f" {status.response_time_ms}ms" if status.response_time_ms else ""
             
             if show_all:
-                line = f"{status_icon}{port_icon} `{config.port:<4}` `{job.user_id:<8}` `{interval_text:<8}` `{next_check}` {host_link}"
+                parts.append(f"{status_icon}{port_icon} `{config.port:<4}` `{job.user_id:<8}` `{interval_text:<8}` `{next_text:<5}` {host_link}{response_time}")
             else:
-                line = f"{status_icon}{port_icon} `{config.port:<4}` `{interval_text:<8}` `{next_check}` {host_link}"
-            
-            lines.append(line)
+                parts.append(f"{status_icon}{port_icon} `{config.port:<4}` `{interval_text:<8}` `{next_text:<5}` {host_link}{response_time}")
         
-        return header + "\n".join(lines)
+        if total is not None:
+            parts.append(f"\n_Total: {total} hosts_")
+        
+        return "\n".join(parts)
     
     @staticmethod
     def format_failures_list(jobs: List[HostJob]) -> str:
@@ -95,7 +171,14 @@ class MessageFormatter:
             
             if status.last_failure:
                 failure_time = status.last_failure.strftime("%Y-%m-%d %H:%M")
-                status_text = "Offline" if not status.is_online else "Port Closed"
+                if status.unreachable:
+                    status_text = f"Unreachable via `{status.unreachable_via}`"
+                elif not status.is_online:
+                    status_text = "Offline"
+                elif status.failed_checks:
+                    status_text = f"Failed `{', '.join(status.failed_checks)}`"
+                else:
+                    status_text = "Port Closed"
                 host_link = f"[{config.host_address}](https://{config.host_address})"
                 
                 line = f"`{failure_time}` {host_link} - {status_text}"
@@ -106,6 +189,36 @@ class MessageFormatter:
         
         return header + "\n".join(lines)
     
+    @staticmethod
+    def format_import_report(plan: ImportPlan, imported: bool, max_errors: int = 20) -> str:
+        """
+        Format the outcome of a bulk import.
+        
+        Args:
+            plan: Validated document
+            imported: Whether the hosts were added
+            max_errors: Row errors shown, the others counted
+        """
+        if plan.errors:
+            parts = [f"❌ *Import Failed:* {len(plan.errors)} errors, no host added\n"]
+            for error in plan.errors[:max_errors]:
+                where = f"Row {error.row}" if error.row else "Document"
+                host = f" `{error.host}`" if error.host else ""
+                # Messages quote user input, keep them in a code span
+                message = error.message.replace("`", "'")
+                parts.append(f"{where}{host}: `{message}`")
+            if len(plan.errors) > max_errors:
+                parts.append(f"_...and {len(plan.errors) - max_errors} more_")
+            return "\n".join(parts)
+        
+        if not imported:
+            return "❌ *Error:* Failed to add the hosts, no host added"
+        
+        text = f"✅ *Import Complete:* {len(plan.configs)} hosts added"
+        if plan.skipped:
+            text += f"\n_{len(plan.skipped)} hosts already monitored were skipped_"
+        return text
+    
     @staticmethod
     def format_ssh_result(success: bool, stdout: str, stderr: str) -> str:
         """Format SSH command result."""
@@ -129,7 +242,11 @@ class MessageFormatter:
 *Basic Commands:*
 • `/pingadd <host> <interval>` - Add host to monitoring
 • `/pingdelete <host>` - Remove host from monitoring  
-• `/pinglist` - List your monitored hosts
+• `/pinglist [down] [tag:<name>]` - List your monitored hosts, down first
+• `/pingimport` - Add the hosts of a CSV, JSON or YAML document (as caption or reply)
+• `/pingexport [csv|json|yaml]` - Download your hosts as a document
+
+_Commands taking a host also take `tag:<name>` for all the hosts with that tag._
 • `/pinghost <host>` - Manual ping check
 • `/pinghostport <host> <port>` - Check specific port
 • `/listfailures` - Show recent failures
@@ -137,6 +254,10 @@ class MessageFormatter:
 *Configuration:*
 • `/pinginterval <host> <seconds>` - Change check interval
 • `/changepingport <host> <port>` - Change monitored port
+• `/pingadaptive <host> <on|off>` - Back off while down, confirm failures quickly
+• `/pingtag <host|tag:name> [+tag] [-tag]` - Show or change the tags of hosts
+• `/pingparent <host|tag:name> <parent|none>` - Don't probe or alert on hosts while their parent is down
+• `/pingcheck <host> [add <type> key=value... | remove <n|all>]` - List or change the checks (icmp, tcp, http, https, tls, dns, udp)
 • `/storecredentials <host> <user> <pass> [port]` - Store SSH credentials
 • `/pinglog` - Toggle success notifications
 
@@ -147,6 +268,9 @@ class MessageFormatter:
 *Examples:*
 • `/pingadd google.com 300` - Monitor Google every 5 minutes
 • `/pinghostport example.com 443` - Check HTTPS port
+• `/pingcheck example.com add https path=/health body_regex=ok` - Check a health page
+• `/pingcheck example.com add tls min_days=21` - Warn 3 weeks before the certificate expires
+• `/pingparent tag:office 10.0.0.1` - Hosts tagged office are behind router 10.0.0.1
 • `/ssh myserver uptime` - Check server uptime
         """
         
@@ -0,0 +1,255 @@
+"""
+Bulk import and export documents of monitored hosts.
+
+A document lists hosts as CSV (one row per host, the checks as a JSON cell),
+JSON or YAML (a list of objects, or an object with a "hosts" list), the tags
+of a CSV row as a comma separated cell. Every row
+is validated before anything is applied, so an import either adds all its
+hosts or reports the errors of each bad row and adds none. Hosts already
+monitored are skipped, which makes importing the same document twice harmless.
+
+YAML needs PyYAML, which is optional.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import ValidationError
+
+from ..models.host import HostConfig
+from .dependencies import DependencyGraph
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+SUPPORTED_FORMATS = ("csv", "json", "yaml")
+
+# Fields of a host in a document, in export order; SSH credentials are never exported
+EXPORT_FIELDS = ("host_address", "interval_seconds", "port", "adaptive", "tags", "parent", "checks")
+
+# Largest document accepted
+MAX_DOCUMENT_BYTES = 5 * 1024 * 1024
+
+# Shorter column names accepted on import
+FIELD_ALIASES = {"host": "host_address", "interval": "interval_seconds"}
+
+
+class HostDocumentError(ValueError):
+    """A host document that cannot be read at all."""
+
+
+@dataclass
+class RowError:
+    """Validation error of one row of a document."""
+
+    row: int
+    host: Optional[str]
+    message: str
+
+
+@dataclass
+class ImportPlan:
+    """Validated outcome of a document, applied only without errors."""
+
+    configs: List[HostConfig] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+
+
+def detect_format(filename: Optional[str], data: bytes = b"") -> str:
+    """
+    Format of a document from its file name, else from its content.
+
+    Args:
+        filename: Document file name
+        data: Document content
+
+    Returns:
+        One of SUPPORTED_FORMATS
+    """
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "yml":
+        return "yaml"
+    if extension in SUPPORTED_FORMATS:
+        return extension
+    return "json" if data.lstrip()[:1] in (b"[", b"{") else "csv"
+
+
+def parse_host_document(data: bytes, fmt: str) -> List[Dict[str, Any]]:
+    """
+    Read the host records of a document.
+
+    Args:
+        data: Document content, UTF-8
+        fmt: One of SUPPORTED_FORMATS
+
+    Returns:
+        One dict per host, with the row number of each host under "_row"
+
+    Raises:
+        HostDocumentError: The document cannot be decoded or has no host list
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise HostDocumentError(f"Document is not UTF-8: {e}")
+
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        records = []
+        for record in reader:
+            # Empty cells take the defaults; the header is line 1
+            record = {key.strip(): value.strip() for key, value in record.items() if key and value and value.strip()}
+            if record:
+                records.append({**record, "_row": reader.line_num})
+        return records
+
+    if fmt == "json":
+        try:
+            document = json.loads(text)
+        except ValueError as e:
+            raise HostDocumentError(f"Invalid JSON: {e}")
+    elif fmt == "yaml":
+        if yaml is None:
+            raise HostDocumentError("YAML documents need PyYAML, send CSV or JSON")
+        try:
+            document = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise HostDocumentError(f"Invalid YAML: {e}")
+    else:
+        raise HostDocumentError(f"Unsupported format {fmt}, use one of: {', '.join(SUPPORTED_FORMATS)}")
+
+    if isinstance(document, dict):
+        document = document.get("hosts")
+    if not isinstance(document, list):
+        raise HostDocumentError("Document must be a list of hosts or have a \"hosts\" list")
+    return [
+        {**record, "_row": row} if isinstance(record, dict) else {"_row": row, "_invalid": record}
+        for row, record in enumerate(document, 1)
+    ]
+
+
+def _host_config(record: Dict[str, Any]) -> HostConfig:
+    """Validate one record, raising ValueError with a readable message."""
+    if "_invalid" in record:
+        raise ValueError("Host must be an object")
+
+    values = {}
+    for key, value in record.items():
+        if key == "_row":
+            continue
+        key = FIELD_ALIASES.get(key, key)
+        if key not in EXPORT_FIELDS:
+            raise ValueError(f"Unknown field {key}")
+        values[key] = value
+
+    if isinstance(values.get("checks"), str):
+        try:
+            values["checks"] = json.loads(values["checks"])
+        except ValueError as e:
+            raise ValueError(f"checks is not JSON: {e}")
+
+    try:
+        return HostConfig(**values)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        ))
+
+
+def plan_import(records: Iterable[Dict[str, Any]], existing: Set[str], limit: Optional[int] = None,
+                existing_parents: Optional[Dict[str, str]] = None) -> ImportPlan:
+    """
+    Validate the records of a document.
+
+    The parent of a host must be in the document or already monitored, and
+    must not depend on the host.
+
+    Args:
+        records: Records from parse_host_document
+        existing: Host addresses already monitored, skipped
+        limit: Most hosts that may be added, None for no limit
+        existing_parents: Parent of each monitored host that has one
+
+    Returns:
+        ImportPlan with the hosts to add, the skipped ones and the row errors
+    """
+    plan = ImportPlan()
+    seen: Dict[str, int] = {}
+    for record in records:
+        row = record.get("_row", 0)
+        host = record.get("host_address", record.get("host"))
+        host = str(host) if host is not None else None
+        try:
+            config = _host_config(record)
+        except ValueError as e:
+            plan.errors.append(RowError(row, host, str(e)))
+            continue
+
+        if config.host_address in seen:
+            plan.errors.append(RowError(row, host, f"Duplicate of row {seen[config.host_address]}"))
+        elif config.host_address in existing:
+            plan.skipped.append(config.host_address)
+        else:
+            seen[config.host_address] = row
+            plan.configs.append(config)
+
+    graph = DependencyGraph()
+    for host, parent in (existing_parents or {}).items():
+        graph.set_parent(host, parent)
+    for config in plan.configs:
+        if config.parent is None:
+            continue
+        row = seen[config.host_address]
+        if config.parent not in seen and config.parent not in existing:
+            plan.errors.append(RowError(row, config.host_address, f"Unknown parent {config.parent}"))
+        elif graph.creates_cycle(config.host_address, config.parent):
+            plan.errors.append(RowError(row, config.host_address, f"Parent {config.parent} depends on this host"))
+        else:
+            graph.set_parent(config.host_address, config.parent)
+
+    if limit is not None and len(plan.configs) > limit:
+        plan.errors.append(RowError(0, None, f"{len(plan.configs)} new hosts, only {max(limit, 0)} more allowed"))
+    return plan
+
+
+def export_host_document(configs: List[HostConfig], fmt: str) -> bytes:
+    """
+    Write hosts as a document that plan_import reads back.
+
+    Args:
+        configs: Hosts to export
+        fmt: One of SUPPORTED_FORMATS
+
+    Returns:
+        Document content, UTF-8
+    """
+    records = []
+    for config in configs:
+        record = config.model_dump(include=set(EXPORT_FIELDS))
+        # Only the options of each check that differ from the defaults
+        record["checks"] = [check.model_dump(exclude_defaults=True) for check in config.checks]
+        records.append({name: record[name] for name in EXPORT_FIELDS})
+
+    if fmt == "csv":
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        for record in records:
+            writer.writerow({
+                **record,
+                "tags": ",".join(record["tags"]),
+                "checks": json.dumps(record["checks"]) if record["checks"] else "",
+            })
+        return output.getvalue().encode()
+    if fmt == "json":
+        return json.dumps({"hosts": records}, indent=2).encode()
+    if fmt == "yaml":
+        if yaml is None:
+            raise HostDocumentError("YAML documents need PyYAML, use CSV or JSON")
+        return yaml.safe_dump({"hosts": records}, sort_keys=False).encode()
+    raise HostDocumentError(f"Unsupported format {fmt}, use one of: {', '.join(SUPPORTED_FORMATS)}")
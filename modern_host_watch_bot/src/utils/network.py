@@ -9,14 +9,33 @@ from typing import Tuple, Optional
 import time
 import logging
 
+from .dns_cache import DNSCache, DNSResolutionError, Resolution, dns_cache
+
 logger = logging.getLogger(__name__)
 
 
 class NetworkChecker:
     """Network connectivity checker."""
     
-    def __init__(self, timeout: float = 1.0):
+    def __init__(self, timeout: float = 1.0, resolver: Optional[DNSCache] = None):
         self.timeout = timeout
+        self.resolver = resolver or dns_cache
+    
+    async def resolve(self, host: str) -> Optional[Resolution]:
+        """
+        Resolve a host through the shared DNS cache.
+        
+        Args:
+            host: Host name or IP address
+            
+        Returns:
+            Resolution, or None if the host cannot be resolved
+        """
+        try:
+            return await self.resolver.resolve(host)
+        except DNSResolutionError as e:
+            logger.warning(str(e))
+            return None
     
     async def ping_host(self, host: str) -> Tuple[bool, Optional[int]]:
         """
@@ -26,16 +45,21 @@ class NetworkChecker:
             host: Host address to ping
             
         Returns:
-            Tuple of (is_online, response_time_ms)
+            Tuple of (is_online, response_time_ms), response time excluding name resolution
         """
         try:
+            resolution = await self.resolve(host)
+            if resolution is None:
+                return False, None
+            address = resolution.address
+            
             start_time = time.time()
             
             # Use different ping command based on OS
             if platform.system().lower() == "windows":
-                cmd = ["ping", "-n", "1", "-w", str(int(self.timeout * 1000)), host]
+                cmd = ["ping", "-n", "1", "-w", str(int(self.timeout * 1000)), address]
             else:
-                cmd = ["ping", "-c", "1", "-W", str(int(self.timeout)), host]
+                cmd = ["ping", "-c", "1", "-W", str(int(self.timeout)), address]
             
             # Run ping command
             process = await asyncio.create_subprocess_exec(
@@ -80,12 +104,16 @@ class NetworkChecker:
             True if port is open, False otherwise
         """
         try:
+            resolution = await self.resolve(host)
+            if resolution is None:
+                return False
+            
             # Create socket with timeout
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
             
             # Try to connect
-            result = sock.connect_ex((host, port))
+            result = sock.connect_ex((resolution.address, port))
             sock.close()
             
             is_open = result == 0
@@ -101,20 +129,29 @@ class NetworkChecker:
             logger.error(f"Error checking port {port} on {host}: {e}")
             return False
     
-    async def check_host_comprehensive(self, host: str, port: int) -> Tuple[bool, bool, Optional[int]]:
+    async def check_host_comprehensive(
+        self, host: str, port: int
+    ) -> Tuple[bool, bool, Optional[int], Optional[Resolution]]:
         """
         Perform comprehensive host check including ping and port check.
         
+        The host is resolved once, then both checks target the resolved address.
+        
         Args:
             host: Host address
             port: Port to check
             
         Returns:
-            Tuple of (ping_success, port_open, response_time_ms)
+            Tuple of (ping_success, port_open, response_time_ms, resolution),
+            resolution None if the host cannot be resolved
         """
+        resolution = await self.resolve(host)
+        if resolution is None:
+            return False, False, None, None
+        
         # Run ping and port check concurrently
-        ping_task = asyncio.create_task(self.ping_host(host))
-        port_task = asyncio.create_task(self.check_port(host, port))
+        ping_task = asyncio.create_task(self.ping_host(resolution.address))
+        port_task = asyncio.create_task(self.check_port(resolution.address, port))
         
         try:
             ping_result, port_result = await asyncio.gather(
@@ -135,11 +172,11 @@ class NetworkChecker:
             else:
                 port_open = port_result
             
-            return ping_success, port_open, response_time
+            return ping_success, port_open, response_time, resolution
             
         except Exception as e:
             logger.error(f"Error in comprehensive check for {host}: {e}")
-            return False, False, None
+            return False, False, None, resolution
 
 
 # Global instance
@@ -0,0 +1,52 @@
+"""
+Adaptive check intervals for monitored hosts.
+
+A host checked with the adaptive policy is re-checked quickly after a failed
+check, so a failure is confirmed (and alerted on) after a few fast checks
+instead of waiting whole intervals. Once confirmed, the interval doubles with
+every further failed check up to the maximum interval, and it is back to the
+configured interval on the first successful check. Every delay gets random
+jitter so hosts added together do not stay in lockstep.
+"""
+import random
+from dataclasses import dataclass
+
+
+@dataclass
+class AdaptivePolicy:
+    """Delay before the next check of a host, from its recent results."""
+
+    confirm_interval: float = 15.0
+    confirm_failures: int = 3
+    backoff_factor: float = 2.0
+    max_interval: float = 2400.0
+    jitter: float = 0.1
+
+    def is_confirmed(self, consecutive_failures: int) -> bool:
+        """Whether that many failed checks in a row make a confirmed failure."""
+        return consecutive_failures >= self.confirm_failures
+
+    def next_interval(self, base_interval: float, consecutive_failures: int, rng: random.Random = None) -> float:
+        """
+        Seconds until the next check.
+
+        Args:
+            base_interval: Interval configured for the host
+            consecutive_failures: Failed checks in a row, 0 after a successful check
+            rng: Random generator for the jitter
+
+        Returns:
+            Delay in seconds, jitter included
+        """
+        longest = max(self.max_interval, base_interval)
+        if consecutive_failures == 0:
+            delay = base_interval
+        elif not self.is_confirmed(consecutive_failures):
+            # Suspected failure: confirm it quickly
+            delay = min(self.confirm_interval, base_interval)
+        else:
+            backoff = self.backoff_factor ** (consecutive_failures - self.confirm_failures + 1)
+            delay = min(base_interval * backoff, longest)
+
+        delay *= 1 + (rng or random).uniform(-self.jitter, self.jitter)
+        return max(1.0, min(delay, longest))
@@ -3,19 +3,54 @@ SSH utilities for remote command execution.
 """
 import asyncio
 import paramiko
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import logging
 from cryptography.fernet import Fernet
 from ..config.settings import settings
+from .ssh_pool import SSHConnectionPool, SSHResult, SSHTarget
 
 logger = logging.getLogger(__name__)
 
 
 class SSHManager:
-    """SSH connection and command execution manager."""
+    """SSH connection and command execution manager.
+    
+    Commands run over pooled keep-alive connections (see SSHConnectionPool).
+    Passwords are decrypted once and held in memory only while the pool is
+    open; close() forgets them together with the connections.
+    """
     
     def __init__(self):
         self.encryption_key = Fernet(settings.encryption_key.encode())
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ssh_worker_threads,
+            thread_name_prefix="ssh"
+        )
+        self.pool = SSHConnectionPool(
+            max_connections=settings.ssh_max_connections,
+            max_sessions_per_connection=settings.ssh_max_sessions_per_host,
+            idle_timeout=settings.ssh_idle_timeout,
+            keepalive_interval=settings.ssh_keepalive_interval,
+            executor=self.executor
+        )
+        self._passwords: Dict[str, str] = {}
+    
+    async def _run_blocking(self, ssh: paramiko.SSHClient, timeout: float, func, *args):
+        """Run a blocking paramiko call in the SSH thread pool.
+        
+        On timeout or cancellation the client is closed, which aborts the call
+        in its thread.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.executor, func, *args),
+                timeout=timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            ssh.close()
+            raise
     
     def encrypt_password(self, password: str) -> str:
         """Encrypt SSH password."""
@@ -25,6 +60,13 @@ class SSHManager:
         """Decrypt SSH password."""
         return self.encryption_key.decrypt(encrypted_password.encode()).decode()
     
+    def _password(self, encrypted_password: str) -> str:
+        """Decrypted password, decrypted once per pool lifetime."""
+        password = self._passwords.get(encrypted_password)
+        if password is None:
+            password = self._passwords[encrypted_password] = self.decrypt_password(encrypted_password)
+        return password
+    
     async def execute_ssh_command(
         self, 
         host: str, 
@@ -43,60 +85,74 @@ class SSHManager:
             encrypted_password: Encrypted SSH password
             command: Command to execute
             port: SSH port
-            timeout: Connection timeout
+            timeout: Command timeout
             
         Returns:
             Tuple of (success, stdout, stderr)
         """
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
         try:
-            # Decrypt password
-            password = self.decrypt_password(encrypted_password)
-            
-            # Connect to host
-            ssh.connect(
-                hostname=host,
-                port=port,
-                username=username,
-                password=password,
-                timeout=timeout
-            )
-            
-            # Execute command
-            stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout)
-            
-            # Get output
-            stdout_str = stdout.read().decode('utf-8')
-            stderr_str = stderr.read().decode('utf-8')
-            
-            # Wait for command to complete
-            exit_code = stdout.channel.recv_exit_status()
-            
-            success = exit_code == 0
-            
-            if success:
-                logger.info(f"SSH command executed successfully on {host}")
-            else:
-                logger.warning(f"SSH command failed on {host} with exit code {exit_code}")
-            
-            return success, stdout_str, stderr_str
-            
-        except paramiko.AuthenticationException:
-            error_msg = f"Authentication failed for {username}@{host}"
-            logger.error(error_msg)
-            return False, "", error_msg
-        except paramiko.SSHException as e:
-            error_msg = f"SSH error on {host}: {e}"
-            logger.error(error_msg)
-            return False, "", error_msg
+            password = self._password(encrypted_password)
         except Exception as e:
             error_msg = f"Error executing SSH command on {host}: {e}"
             logger.error(error_msg)
             return False, "", error_msg
-        finally:
-            ssh.close()
+        
+        result = await self.pool.run(host, username, password, command, port=port, timeout=timeout)
+        
+        if result.error:
+            error_msg = (
+                f"Authentication failed for {username}@{host}"
+                if result.error == "Authentication failed"
+                else f"SSH error on {host}: {result.error}"
+            )
+            logger.error(error_msg)
+            return False, "", error_msg
+        
+        if result.success:
+            logger.info(f"SSH command executed successfully on {host} in {result.elapsed:.2f}s")
+        else:
+            logger.warning(f"SSH command failed on {host} with exit code {result.exit_code}")
+        
+        return result.success, result.stdout, result.stderr
+    
+    async def fan_out(
+        self,
+        targets: List[Tuple[str, str, str, int]],
+        command: str,
+        timeout: int = 30
+    ) -> List[SSHResult]:
+        """
+        Execute one command on many hosts concurrently.
+        
+        Args:
+            targets: (host, username, encrypted_password, port) of each host
+            command: Command to execute
+            timeout: Command timeout on each host
+            
+        Returns:
+            One SSHResult per target, in the same order
+        """
+        ssh_targets = []
+        for host, username, encrypted_password, port in targets:
+            try:
+                password = self._password(encrypted_password)
+            except Exception as e:
+                logger.error(f"Cannot decrypt SSH password for {username}@{host}: {e}")
+                password = None
+            ssh_targets.append(SSHTarget(host, username, password, port))
+        
+        runnable = [target for target in ssh_targets if target.password is not None]
+        results = iter(await self.pool.fan_out(runnable, command, timeout=timeout))
+        return [
+            next(results) if target.password is not None
+            else SSHResult(target.host, None, error="Cannot decrypt the stored password")
+            for target in ssh_targets
+        ]
+    
+    async def close(self) -> None:
+        """Close pooled connections and forget decrypted passwords."""
+        await self.pool.close()
+        self._passwords.clear()
     
     async def test_ssh_connection(
         self, 
@@ -121,14 +177,18 @@ class SSHManager:
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         
         try:
-            password = self.decrypt_password(encrypted_password)
+            password = self._password(encrypted_password)
             
-            ssh.connect(
-                hostname=host,
-                port=port,
-                username=username,
-                password=password,
-                timeout=10
+            await self._run_blocking(
+                ssh,
+                15,
+                lambda: ssh.connect(
+                    hostname=host,
+                    port=port,
+                    username=username,
+                    password=password,
+                    timeout=10
+                )
             )
             
             logger.info(f"SSH connection test successful for {username}@{host}")
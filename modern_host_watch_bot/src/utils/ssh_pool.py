@@ -0,0 +1,358 @@
+"""
+Pooled SSH sessions.
+
+Connections are kept open per (host, port, username, password) with SSH
+keepalives and reused for later commands: each command runs on a new channel
+of the existing transport instead of paying for a TCP connect, key exchange
+and authentication every time. Idle connections are closed after a timeout, and both the number
+of connections and the number of concurrent channels per connection are
+capped. paramiko is blocking, so all of its calls run in a thread pool.
+"""
+import asyncio
+import hashlib
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# host, port, username and password digest: a connection is only reused with the credentials that opened it
+PoolKey = Tuple[str, int, str, str]
+
+
+@dataclass
+class SSHResult:
+    """Outcome of a command run over SSH."""
+
+    host: str
+    exit_code: Optional[int]
+    stdout: str = ""
+    stderr: str = ""
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.exit_code == 0
+
+
+@dataclass
+class SSHTarget:
+    """Host and plain-text credentials of a fan-out command."""
+
+    host: str
+    username: str
+    password: str
+    port: int = 22
+
+
+class _PooledConnection:
+    """An open SSH client and its usage counters."""
+
+    def __init__(self, key: PoolKey, client: paramiko.SSHClient, max_sessions: int):
+        self.key = key
+        self.client = client
+        self.sessions = asyncio.Semaphore(max_sessions)
+        self.active = 0
+        self.commands = 0
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+    @property
+    def alive(self) -> bool:
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def close(self) -> None:
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.debug(f"Error closing SSH connection to {self.key[0]}: {e}")
+
+
+class SSHConnectionPool:
+    """Pool of keep-alive SSH connections."""
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        max_sessions_per_connection: int = 4,
+        idle_timeout: float = 300.0,
+        keepalive_interval: int = 30,
+        connect_timeout: float = 10.0,
+        threads: int = 8,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        """
+        Create the pool.
+
+        Args:
+            max_connections: Connections kept open at the same time
+            max_sessions_per_connection: Commands running at the same time on one connection
+            idle_timeout: Seconds before an unused connection is closed
+            keepalive_interval: Seconds between SSH keepalive packets
+            connect_timeout: TCP connect, handshake and authentication timeout
+            threads: Threads running paramiko calls, when no executor is given
+            executor: Thread pool to run paramiko calls in
+        """
+        self.max_connections = max_connections
+        self.max_sessions_per_connection = max_sessions_per_connection
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.connect_timeout = connect_timeout
+        self.executor = executor or ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ssh")
+
+        self._connections: Dict[PoolKey, _PooledConnection] = {}
+        self._connecting: Dict[PoolKey, asyncio.Lock] = {}
+        self._released: Optional[asyncio.Condition] = None
+        self._reaper: Optional[asyncio.Task] = None
+
+        self.connections_opened = 0
+
+    # ---------- connections ----------
+
+    def _connect(self, host: str, port: int, username: str, password: str) -> paramiko.SSHClient:
+        """Open and authenticate a connection (runs in the thread pool)."""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(
+                hostname=host,
+                port=port,
+                username=username,
+                password=password,
+                timeout=self.connect_timeout,
+                banner_timeout=self.connect_timeout,
+                auth_timeout=self.connect_timeout,
+                allow_agent=False,
+                look_for_keys=False
+            )
+            client.get_transport().set_keepalive(self.keepalive_interval)
+        except Exception:
+            client.close()
+            raise
+        return client
+
+    async def _run_in_thread(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _evict_idle(self, expired_only: bool) -> int:
+        """Close idle connections: the expired ones, or else the least recently used one."""
+        now = time.monotonic()
+        idle = [conn for conn in self._connections.values() if conn.active == 0]
+        if expired_only:
+            victims = [conn for conn in idle if now - conn.last_used >= self.idle_timeout]
+        else:
+            victims = sorted(idle, key=lambda conn: conn.last_used)[:1]
+        for conn in victims:
+            del self._connections[conn.key]
+            conn.close()
+        return len(victims)
+
+    async def _acquire(self, key: PoolKey, password: str) -> _PooledConnection:
+        """Get an open connection for key, connecting when needed."""
+        if self._released is None:
+            self._released = asyncio.Condition()
+        self._start_reaper()
+
+        lock = self._connecting.setdefault(key, asyncio.Lock())
+        async with lock:
+            while True:
+                conn = self._connections.get(key)
+                if conn is not None:
+                    if conn.alive and time.monotonic() - conn.last_used < self.idle_timeout:
+                        conn.active += 1
+                        return conn
+                    if conn.active == 0:
+                        del self._connections[key]
+                        conn.close()
+                        continue
+                    # Still used by running commands, which will fail if the transport is down
+                    conn.active += 1
+                    return conn
+
+                if len(self._connections) < self.max_connections or self._evict_idle(expired_only=False):
+                    break
+
+                # Every connection is busy, wait for a command to finish
+                async with self._released:
+                    await self._released.wait()
+
+            host, port, username, _ = key
+            client = await self._run_in_thread(self._connect, host, port, username, password)
+            conn = _PooledConnection(key, client, self.max_sessions_per_connection)
+            conn.active += 1
+            self._connections[key] = conn
+            self.connections_opened += 1
+            logger.info(f"SSH connection opened to {username}@{host}:{port}")
+            return conn
+
+    async def _release(self, conn: _PooledConnection) -> None:
+        conn.active -= 1
+        conn.last_used = time.monotonic()
+        if self._released is not None:
+            async with self._released:
+                self._released.notify_all()
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        """Drop a broken connection from the pool."""
+        if self._connections.get(conn.key) is conn:
+            del self._connections[conn.key]
+        conn.close()
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self) -> None:
+        """Close expired idle connections in the background."""
+        while self._connections:
+            await asyncio.sleep(max(1.0, min(self.idle_timeout, 60.0)))
+            self._evict_idle(expired_only=True)
+
+    # ---------- commands ----------
+
+    @staticmethod
+    def _exec(transport: paramiko.Transport, command: str, timeout: float) -> Tuple[int, str, str]:
+        """Run a command on a new channel of the transport (runs in the thread pool)."""
+        deadline = time.monotonic() + timeout
+        channel = transport.open_session(timeout=timeout)
+        try:
+            channel.settimeout(timeout)
+            channel.exec_command(command)
+
+            # Read both streams as data arrives, so a full stderr window never blocks stdout
+            stdout: List[bytes] = []
+            stderr: List[bytes] = []
+            while not channel.exit_status_ready() or channel.recv_ready() or channel.recv_stderr_ready():
+                if channel.recv_ready():
+                    stdout.append(channel.recv(32768))
+                elif channel.recv_stderr_ready():
+                    stderr.append(channel.recv_stderr(32768))
+                elif time.monotonic() > deadline:
+                    raise socket.timeout(f"command did not finish in {timeout} s")
+                else:
+                    time.sleep(0.005)
+
+            return (
+                channel.recv_exit_status(),
+                b"".join(stdout).decode("utf-8", errors="replace"),
+                b"".join(stderr).decode("utf-8", errors="replace")
+            )
+        finally:
+            channel.close()
+
+    async def run(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+        port: int = 22,
+        timeout: float = 30.0
+    ) -> SSHResult:
+        """
+        Run a command over a pooled connection.
+
+        A reused connection that turns out to be broken is replaced once.
+
+        Args:
+            host: Host address
+            username: SSH username
+            password: Plain-text SSH password
+            command: Command to execute
+            port: SSH port
+            timeout: Seconds the command may run
+
+        Returns:
+            SSHResult, with error set when the command could not be run
+        """
+        key = (host, port, username, hashlib.sha256(password.encode()).hexdigest())
+        started = time.monotonic()
+
+        for attempt in range(2):
+            try:
+                conn = await asyncio.wait_for(self._acquire(key, password), timeout=self.connect_timeout + timeout)
+            except Exception as e:
+                return SSHResult(host, None, error=self._describe(e), elapsed=time.monotonic() - started)
+
+            reused = conn.commands > 0
+            try:
+                async with conn.sessions:
+                    exit_code, stdout, stderr = await asyncio.wait_for(
+                        self._run_in_thread(self._exec, conn.client.get_transport(), command, timeout),
+                        timeout=timeout + 1
+                    )
+                conn.commands += 1
+                return SSHResult(host, exit_code, stdout, stderr, elapsed=time.monotonic() - started)
+            except (paramiko.SSHException, EOFError, OSError, AttributeError) as e:
+                # AttributeError: the transport was closed and get_transport() returned None
+                self._discard(conn)
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    logger.info(f"SSH connection to {host} was broken, reconnecting: {e}")
+                    continue
+                return SSHResult(host, None, error=self._describe(e), elapsed=time.monotonic() - started)
+            except asyncio.TimeoutError as e:
+                self._discard(conn)
+                return SSHResult(host, None, error=self._describe(e), elapsed=time.monotonic() - started)
+            finally:
+                await self._release(conn)
+
+        return SSHResult(host, None, error="SSH connection failed", elapsed=time.monotonic() - started)
+
+    async def fan_out(
+        self,
+        targets: List[SSHTarget],
+        command: str,
+        timeout: float = 30.0,
+        concurrency: int = 16
+    ) -> List[SSHResult]:
+        """
+        Run one command on many hosts concurrently.
+
+        Args:
+            targets: Hosts and credentials
+            command: Command to execute on every host
+            timeout: Seconds the command may run on each host
+            concurrency: Hosts contacted at the same time
+
+        Returns:
+            One SSHResult per target, in the same order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(target: SSHTarget) -> SSHResult:
+            async with semaphore:
+                return await self.run(target.host, target.username, target.password, command, target.port, timeout)
+
+        return list(await asyncio.gather(*(run_one(target) for target in targets)))
+
+    @staticmethod
+    def _describe(error: BaseException) -> str:
+        if isinstance(error, paramiko.AuthenticationException):
+            return "Authentication failed"
+        if isinstance(error, (asyncio.TimeoutError, socket.timeout)):
+            return "Timed out"
+        return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+    def stats(self) -> Dict[str, int]:
+        """Pool usage counters."""
+        return {
+            "connections": len(self._connections),
+            "active_commands": sum(conn.active for conn in self._connections.values()),
+            "connections_opened": self.connections_opened,
+        }
+
+    async def close(self) -> None:
+        """Close every connection."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for conn in list(self._connections.values()):
+            conn.close()
+        self._connections.clear()
@@ -0,0 +1,36 @@
+"""
+Shared test configuration.
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+from cryptography.fernet import Fernet
+
+# Settings are loaded when src.utils is imported, give them test values
+os.environ.setdefault("BOT_TOKEN", "123456:test-token")
+os.environ.setdefault("BOT_OWNER_ID", "1")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+# The tlgfwk framework at the repository root, which keeps its own copies of some of our utils
+REPOSITORY_ROOT = Path(__file__).resolve().parents[2]
+
+_framework_modules = {}
+
+
+@pytest.fixture(scope="session")
+def framework_module():
+    """Load a module of the tlgfwk framework by its path from the repository root."""
+    def load(relative_path):
+        if relative_path not in _framework_modules:
+            path = REPOSITORY_ROOT / relative_path
+            if not path.exists():
+                pytest.skip(f"{relative_path} is only in a checkout of the repository")
+            spec = importlib.util.spec_from_file_location(f"tlgfwk_{path.stem}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _framework_modules[relative_path] = module
+        return _framework_modules[relative_path]
+
+    return load
@@ -0,0 +1,328 @@
+"""
+Tests for the host check types and their executor, against local servers.
+"""
+import asyncio
+import datetime
+import ipaddress
+import shutil
+import socket
+import ssl
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from src.checks import CHECK_TYPES, BaseCheck, CheckExecutor, register_check, summarize
+from src.models.host import CheckConfig, CheckOutcome, HostConfig, HostStatus
+from src.utils.dns_cache import DNSCache
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def check(host, address, **fields):
+    """Run one check with a fresh executor."""
+    async def scenario():
+        executor = CheckExecutor(timeout=2.0)
+        try:
+            return await executor._run_check(host, address, CheckConfig(**fields))
+        finally:
+            await executor.close()
+
+    return run(scenario())
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    """A local port nothing listens on."""
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    """Self-signed certificate for localhost, valid for 10 days."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=10, hours=1))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))
+            ]),
+            critical=False
+        )
+        .sign(key, hashes.SHA256())
+    )
+    directory = tmp_path_factory.mktemp("tls")
+    cert_file, key_file = directory / "cert.pem", directory / "key.pem"
+    cert_file.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_file.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_file, key_file)
+    return context
+
+
+async def http_server(requests, ssl_context=None):
+    """HTTP server answering /health with 'status: ok', other paths with 404, recording the requests."""
+    async def handle(reader, writer):
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        requests.append(head)
+        path = head.split(" ")[1]
+        body = b"status: ok" if path == "/health" else b"not found"
+        status = "200 OK" if path == "/health" else "404 Not Found"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl_context)
+
+
+def check_with_server(server_factory, **fields):
+    """Run one check against a server started on the test loop, on its port."""
+    async def scenario():
+        server = await server_factory()
+        port = server.sockets[0].getsockname()[1]
+        executor = CheckExecutor(timeout=2.0)
+        try:
+            return await executor._run_check(
+                fields.pop("host", "localhost"), "127.0.0.1", CheckConfig(port=port, **fields)
+            )
+        finally:
+            await executor.close()
+            server.close()
+            await server.wait_closed()
+
+    return run(scenario())
+
+
+class TestCheckConfig:
+    """Test CheckConfig validation and HostConfig defaults."""
+
+    def test_unknown_type(self):
+        """Test that only registered check types are accepted."""
+        with pytest.raises(ValueError):
+            CheckConfig(type="gopher")
+
+    def test_port_required(self):
+        """Test that TCP and UDP checks need a port."""
+        with pytest.raises(ValueError):
+            CheckConfig(type="udp")
+
+    def test_invalid_regex(self):
+        """Test that regular expressions are validated."""
+        with pytest.raises(ValueError):
+            CheckConfig(type="https", body_regex="(")
+
+    def test_names(self):
+        """Test the check labels."""
+        assert CheckConfig(type="HTTPS", path="/health").name == "https/health"
+        assert CheckConfig(type="tcp", port=22).name == "tcp:22"
+        assert CheckConfig(type="dns", record_type="mx").name == "dns:MX"
+
+    def test_default_checks(self):
+        """Test that hosts without checks are pinged and their port checked."""
+        config = HostConfig(host_address="example.com", interval_seconds=300, port=8080)
+
+        assert [check.name for check in config.effective_checks()] == ["icmp", "tcp:8080"]
+
+
+class TestChecks:
+    """Test each check type against a local server."""
+
+    def test_tcp(self):
+        """Test open and closed TCP ports."""
+        async def server():
+            return await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+
+        assert check_with_server(server, type="tcp").ok
+        assert not check("localhost", "127.0.0.1", type="tcp", port=free_port()).ok
+
+    def test_http_status_and_body(self):
+        """Test the status code and body checks, with the host name in the Host header."""
+        requests = []
+
+        passed = check_with_server(
+            lambda: http_server(requests), host="web.example", type="http", path="/health", body_regex=r"status: ok"
+        )
+        wrong_body = check_with_server(
+            lambda: http_server(requests), type="http", path="/health", body_regex=r"status: down"
+        )
+        missing = check_with_server(lambda: http_server(requests), type="http", path="/missing")
+
+        assert passed.ok and passed.detail == "HTTP 200"
+        assert "Host: web.example:" in requests[0]
+        assert not wrong_body.ok and "body does not match" in wrong_body.detail
+        assert not missing.ok and missing.detail == "HTTP 404"
+
+    def test_https(self, certificate):
+        """Test HTTPS, the self-signed certificate failing unless verification is off."""
+        passed = check_with_server(
+            lambda: http_server([], certificate), type="https", path="/health", verify=False
+        )
+        untrusted = check_with_server(lambda: http_server([], certificate), type="https", path="/health")
+
+        assert passed.ok
+        assert not untrusted.ok
+
+    def test_tls_expiry(self, certificate):
+        """Test the certificate expiry against min_days."""
+        async def server():
+            return await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0, ssl=certificate)
+
+        soon = check_with_server(server, type="tls", verify=False, min_days=14)
+        enough = check_with_server(server, type="tls", verify=False, min_days=7)
+
+        assert not soon.ok and soon.detail.startswith("expires in 10 days")
+        assert enough.ok
+
+    def test_udp(self):
+        """Test a UDP echo server, a reply mismatch and a closed port."""
+        class Echo(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                self.transport.sendto(data, addr)
+
+        async def scenario():
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                Echo, local_addr=("127.0.0.1", 0)
+            )
+            port = transport.get_extra_info("sockname")[1]
+            executor = CheckExecutor(timeout=1.0)
+            try:
+                return await asyncio.gather(
+                    executor._run_check("localhost", "127.0.0.1", CheckConfig(
+                        type="udp", port=port, payload="hello", expected_value="^hello$"
+                    )),
+                    executor._run_check("localhost", "127.0.0.1", CheckConfig(
+                        type="udp", port=port, payload="hello", expected_value="^bye$"
+                    )),
+                    executor._run_check("localhost", "127.0.0.1", CheckConfig(
+                        type="udp", port=free_port(socket.SOCK_DGRAM)
+                    ))
+                )
+            finally:
+                transport.close()
+
+        echoed, mismatch, closed = run(scenario())
+
+        assert echoed.ok and echoed.detail == "5 bytes"
+        assert not mismatch.ok
+        assert not closed.ok
+
+    def test_dns(self):
+        """Test an A record query of localhost and its expected value."""
+        passed = check("localhost", None, type="dns", expected_value=r"^127\.")
+        mismatch = check("localhost", None, type="dns", expected_value=r"^10\.")
+
+        assert passed.ok and "127.0.0.1" in passed.detail
+        assert not mismatch.ok
+
+    @pytest.mark.skipif(shutil.which("ping") is None, reason="no ping command")
+    def test_icmp(self):
+        """Test a ping of the loopback address."""
+        assert check("localhost", "127.0.0.1", type="icmp").ok
+
+
+class SlowCheck(BaseCheck):
+    """Check sleeping a while, recording how many run at once."""
+
+    type_names = ("slow",)
+    running = 0
+    peak = 0
+
+    async def run(self, host, address, config, executor):
+        SlowCheck.running += 1
+        SlowCheck.peak = max(SlowCheck.peak, SlowCheck.running)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            SlowCheck.running -= 1
+        return True, "done"
+
+
+@pytest.fixture
+def slow_check():
+    register_check(SlowCheck)
+    SlowCheck.peak = 0
+    yield
+    CHECK_TYPES.pop("slow", None)
+
+
+class UnresolvableCache(DNSCache):
+    """DNS cache failing every lookup."""
+
+    async def _query(self, host):
+        raise socket.gaierror(f"Name or service not known: {host}")
+
+
+class TestCheckExecutor:
+    """Test CheckExecutor and summarize."""
+
+    def test_concurrency_budget(self, slow_check):
+        """Test that checks of a type never exceed its concurrency."""
+        executor = CheckExecutor(concurrency={"slow": 2})
+
+        _, outcomes = run(executor.run("127.0.0.1", [CheckConfig(type="slow") for _ in range(6)]))
+
+        assert all(outcome.ok for outcome in outcomes)
+        assert SlowCheck.peak == 2
+
+    def test_timeout(self, slow_check):
+        """Test that a check over its timeout fails."""
+        executor = CheckExecutor()
+
+        _, outcomes = run(executor.run("127.0.0.1", [CheckConfig(type="slow", timeout=0.01)]))
+
+        assert not outcomes[0].ok and outcomes[0].detail == "timed out"
+
+    def test_unresolved_host(self):
+        """Test that checks needing an address fail when the host does not resolve."""
+        executor = CheckExecutor(resolver=UnresolvableCache())
+
+        resolution, outcomes = run(executor.run("nowhere.invalid", [
+            CheckConfig(type="tcp", port=80), CheckConfig(type="https")
+        ]))
+
+        assert resolution is None
+        assert [outcome.ok for outcome in outcomes] == [False, False]
+        assert "Cannot resolve" in outcomes[0].detail
+
+    def test_summarize(self):
+        """Test the online and port status derived from the outcomes."""
+        outcomes = [
+            CheckOutcome(name="icmp", type="icmp", ok=True, latency_ms=12.3),
+            CheckOutcome(name="tcp:80", type="tcp", ok=True, latency_ms=1.0),
+            CheckOutcome(name="https/health", type="https", ok=False, detail="HTTP 500"),
+        ]
+
+        is_online, port_open, response_time_ms = summarize(outcomes)
+        status = HostStatus(
+            host_address="example.com", is_online=is_online, port_open=port_open, check_results=outcomes
+        )
+
+        assert (is_online, port_open, response_time_ms) == (True, True, 12)
+        assert status.failed_checks == ["https/health"]
+        assert not status.healthy
+
+    def test_summarize_without_icmp(self):
+        """Test that hosts without ping or port checks are up when all their checks pass."""
+        outcomes = [CheckOutcome(name="https", type="https", ok=True, latency_ms=80.0)]
+
+        assert summarize(outcomes) == (True, True, 80)
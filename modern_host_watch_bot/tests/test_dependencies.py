@@ -0,0 +1,116 @@
+"""
+Tests for host tags and the dependencies between hosts.
+"""
+import pytest
+
+from src.models.host import HostConfig, normalize_tags
+from src.utils.dependencies import DependencyGraph
+from src.utils.host_documents import parse_host_document, plan_import
+
+
+def chain() -> DependencyGraph:
+    """router <- switch <- server, and router <- printer."""
+    graph = DependencyGraph()
+    graph.set_parent("switch", "router")
+    graph.set_parent("server", "switch")
+    graph.set_parent("printer", "router")
+    return graph
+
+
+class TestDependencyGraph:
+    """Test the parent links and the unreachable hosts."""
+
+    def test_down_parent(self):
+        """Test that the hosts below a down host are unreachable, blamed on the top-most down host."""
+        graph = chain()
+
+        assert graph.set_down("switch", True)
+        assert not graph.set_down("switch", True)
+        assert [graph.is_unreachable(host) for host in ("router", "switch", "server", "printer")] == [
+            False, False, True, False
+        ]
+        assert graph.blocked_by("server") == "switch"
+
+        graph.set_down("router", True)
+        assert graph.blocked_by("server") == "router"
+        assert graph.is_unreachable("switch") and graph.is_unreachable("printer")
+
+        graph.set_down("router", False)
+        assert graph.blocked_by("server") == "switch"
+        assert not graph.is_unreachable("printer")
+
+        graph.set_down("switch", False)
+        assert graph.blocked_by("server") is None
+
+    def test_set_parent_moves_subtree(self):
+        """Test that relinking a host updates the hosts below it."""
+        graph = chain()
+        graph.set_down("router", True)
+        graph.set_parent("gateway", None)
+
+        graph.set_parent("switch", "gateway")
+
+        assert not graph.is_unreachable("switch") and not graph.is_unreachable("server")
+        graph.set_down("gateway", True)
+        assert graph.blocked_by("server") == "gateway"
+
+        graph.set_parent("switch", None)
+        assert not graph.is_unreachable("server")
+
+    def test_cycles(self):
+        """Test that links making a cycle are refused."""
+        graph = chain()
+
+        assert graph.creates_cycle("router", "server")
+        assert graph.creates_cycle("router", "router")
+        assert not graph.creates_cycle("server", "printer")
+        with pytest.raises(ValueError):
+            graph.set_parent("router", "server")
+
+    def test_remove(self):
+        """Test that removing a down host makes the hosts below it reachable."""
+        graph = chain()
+        graph.set_down("switch", True)
+
+        graph.remove("switch")
+
+        assert not graph.is_unreachable("server")
+        assert list(graph.descendants("router")) == ["printer"]
+
+
+class TestTags:
+    """Test tag validation."""
+
+    def test_normalize(self):
+        """Test lowercased, deduplicated tags from a list or a comma separated string."""
+        assert normalize_tags("Prod, web,prod") == ["prod", "web"]
+        assert HostConfig(host_address="a.example", interval_seconds=300, tags=["DB"]).tags == ["db"]
+        with pytest.raises(ValueError):
+            normalize_tags(["no spaces"])
+
+    def test_own_parent(self):
+        """Test that a host cannot be its own parent."""
+        with pytest.raises(ValueError):
+            HostConfig(host_address="a.example", interval_seconds=300, parent="a.example")
+
+
+class TestImportParents:
+    """Test the parents of imported hosts."""
+
+    def test_parents(self):
+        """Test unknown parents and cycles, within the document and with the monitored hosts."""
+        records = parse_host_document(
+            b"host,interval,parent\n"
+            b"router,300,\n"
+            b"switch,300,router\n"
+            b"lost,300,nowhere\n"
+            b"a,300,b\n"
+            b"b,300,a\n"
+            b"vpn,300,office\n",
+            "csv"
+        )
+
+        plan = plan_import(records, existing={"office", "desk"}, existing_parents={"office": "desk", "desk": "vpn"})
+
+        assert [(error.row, error.host) for error in plan.errors] == [(4, "lost"), (6, "b"), (7, "vpn")]
+        assert "Unknown parent nowhere" in plan.errors[0].message
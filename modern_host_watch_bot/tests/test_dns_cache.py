@@ -0,0 +1,169 @@
+"""
+Tests for the DNS resolution cache.
+
+They also run against util/util_dns_cache.py, the copy of the cache in the
+tlgfwk framework at the repository root, so the two cannot drift apart.
+"""
+import asyncio
+import socket
+
+import pytest
+
+from src.utils import dns_cache
+
+
+@pytest.fixture(params=["bot", "framework"])
+def dns_module(request, framework_module):
+    """The cache module of this bot, or its copy in the framework."""
+    if request.param == "bot":
+        return dns_cache
+    return framework_module("util/util_dns_cache.py")
+
+
+@pytest.fixture
+def fake_cache(dns_module):
+    class FakeResolverCache(dns_module.DNSCache):
+        """DNS cache answering from a dict instead of a resolver, counting queries."""
+
+        def __init__(self, records, delay=0.0, **kwargs):
+            super().__init__(**kwargs)
+            self.records = records
+            self.delay = delay
+            self.queries = []
+
+        async def _query(self, host):
+            self.queries.append(host)
+            await asyncio.sleep(self.delay)
+            if host not in self.records:
+                raise socket.gaierror(f"Name or service not known: {host}")
+            return self.records[host], self.ttl
+
+    return FakeResolverCache
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestDNSCache:
+    """Test DNSCache."""
+
+    def test_caches_addresses(self, fake_cache):
+        """Test that a name is resolved once within its TTL."""
+        cache = fake_cache({"example.com": "10.0.0.1"})
+
+        async def scenario():
+            first = await cache.resolve("example.com")
+            second = await cache.resolve("Example.COM.")
+            return first, second
+
+        first, second = run(scenario())
+
+        assert first.address == second.address == "10.0.0.1"
+        assert not first.cached and second.cached
+        assert cache.queries == ["example.com"]
+
+    def test_ip_addresses_are_not_resolved(self, fake_cache):
+        """Test that IP addresses are returned as is."""
+        cache = fake_cache({})
+
+        resolution = run(cache.resolve("192.168.1.1"))
+
+        assert resolution.address == "192.168.1.1"
+        assert cache.queries == []
+
+    def test_negative_caching(self, fake_cache, dns_module):
+        """Test that failed lookups are cached for the negative TTL."""
+        cache = fake_cache({}, negative_ttl=60)
+
+        async def scenario():
+            for _ in range(2):
+                with pytest.raises(dns_module.DNSResolutionError):
+                    await cache.resolve("missing.example")
+
+        run(scenario())
+
+        assert cache.queries == ["missing.example"]
+        assert cache.stats()["negative_hits"] == 1
+
+    def test_expired_entries_are_resolved_again(self, fake_cache):
+        """Test that addresses are not used after their TTL."""
+        cache = fake_cache({"example.com": "10.0.0.1"}, ttl=0, min_ttl=0)
+
+        async def scenario():
+            await cache.resolve("example.com")
+            cache.records["example.com"] = "10.0.0.2"
+            return await cache.resolve("example.com")
+
+        resolution = run(scenario())
+
+        assert resolution.address == "10.0.0.2"
+        assert len(cache.queries) == 2
+
+    def test_concurrent_lookups_are_shared(self, fake_cache):
+        """Test that probes resolving the same name at once share one query."""
+        cache = fake_cache({"example.com": "10.0.0.1"}, delay=0.05)
+
+        async def scenario():
+            return await asyncio.gather(*(cache.resolve("example.com") for _ in range(10)))
+
+        resolutions = run(scenario())
+
+        assert {resolution.address for resolution in resolutions} == {"10.0.0.1"}
+        assert cache.queries == ["example.com"]
+
+    def test_prefetch_before_expiry(self, fake_cache):
+        """Test that a used entry is refreshed in the background near its expiry."""
+        cache = fake_cache({"example.com": "10.0.0.1"}, ttl=0.2, min_ttl=0, prefetch_ratio=0.5)
+
+        async def scenario():
+            await cache.resolve("example.com")
+            await asyncio.sleep(0.12)
+            cache.records["example.com"] = "10.0.0.2"
+            # Served from the cache while the refresh runs
+            during = await cache.resolve("example.com")
+            await asyncio.sleep(0.01)
+            after = await cache.resolve("example.com")
+            return during, after
+
+        during, after = run(scenario())
+
+        assert during.address == "10.0.0.1" and during.cached
+        assert after.address == "10.0.0.2" and after.cached
+        assert cache.stats()["prefetches"] == 1
+
+    def test_failed_prefetch_keeps_address(self, fake_cache):
+        """Test that a failed refresh does not drop an address that has not expired."""
+        cache = fake_cache({"example.com": "10.0.0.1"}, ttl=0.2, min_ttl=0, prefetch_ratio=0.5)
+
+        async def scenario():
+            await cache.resolve("example.com")
+            await asyncio.sleep(0.12)
+            del cache.records["example.com"]
+            await cache.resolve("example.com")
+            await asyncio.sleep(0.01)
+            return await cache.resolve("example.com")
+
+        resolution = run(scenario())
+
+        assert resolution.address == "10.0.0.1"
+
+    def test_max_entries(self, fake_cache):
+        """Test that the oldest names are dropped when the cache is full."""
+        cache = fake_cache({f"host{i}.example": f"10.0.0.{i}" for i in range(5)}, max_entries=3)
+
+        async def scenario():
+            for i in range(5):
+                await cache.resolve(f"host{i}.example")
+
+        run(scenario())
+
+        assert cache.stats()["entries"] == 3
+
+    def test_system_resolver(self, dns_module):
+        """Test a lookup through the system resolver."""
+        cache = dns_module.DNSCache()
+
+        resolution = run(cache.resolve("localhost"))
+
+        assert resolution.address.startswith("127.")
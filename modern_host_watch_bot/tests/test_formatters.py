@@ -0,0 +1,65 @@
+"""
+Tests for the host listing formatting.
+"""
+from datetime import datetime
+
+from src.models.host import HostConfig, HostJob, HostStatus
+from src.utils.formatters import MessageFormatter
+
+
+def make_job(host: str, is_online: bool = True, port_open: bool = True, response_time_ms: int = None) -> HostJob:
+    return HostJob(
+        job_id=host,
+        user_id=1,
+        host_config=HostConfig(host_address=host, interval_seconds=300),
+        host_status=HostStatus(
+            host_address=host, is_online=is_online, port_open=port_open, response_time_ms=response_time_ms
+        )
+    )
+
+
+class TestHostListing:
+    """Test the ordering, paging and formatting of /pinglist."""
+
+    def test_down_first_then_slowest(self):
+        """Test that down hosts come first, then hosts by decreasing response time."""
+        jobs = [
+            make_job("fast.example", response_time_ms=10),
+            make_job("unknown.example"),
+            make_job("down.example", is_online=False),
+            make_job("slow.example", response_time_ms=300),
+            make_job("closed.example", port_open=False, response_time_ms=20),
+        ]
+
+        ordered = [job.host_config.host_address for job in MessageFormatter.order_host_listing(jobs)]
+
+        assert ordered == ["closed.example", "down.example", "slow.example", "fast.example", "unknown.example"]
+
+    def test_down_only(self):
+        """Test the filter of hosts that are down."""
+        jobs = [make_job("up.example"), make_job("down.example", is_online=False)]
+
+        ordered = MessageFormatter.order_host_listing(jobs, down_only=True)
+
+        assert [job.host_config.host_address for job in ordered] == ["down.example"]
+
+    def test_paginate(self):
+        """Test pages and out of range page numbers."""
+        items = list(range(7))
+
+        assert MessageFormatter.paginate(items, 0, 3) == ([0, 1, 2], 0, 3)
+        assert MessageFormatter.paginate(items, 2, 3) == ([6], 2, 3)
+        assert MessageFormatter.paginate(items, 9, 3) == ([6], 2, 3)
+        assert MessageFormatter.paginate([], 0, 3) == ([], 0, 1)
+
+    def test_next_check_column(self):
+        """Test that the next check time comes from the given lookup."""
+        jobs = [make_job("a.example", response_time_ms=12), make_job("b.example")]
+        next_checks = {jobs[0].job_name: datetime(2024, 1, 15, 14, 30)}
+
+        text = MessageFormatter.format_host_listing(jobs, next_check=next_checks.get, total=2)
+
+        lines = text.split("\n")
+        assert "`14:30`" in lines[2] and lines[2].endswith("12ms")
+        assert "`-    `" in lines[3]
+        assert lines[-1] == "_Total: 2 hosts_"
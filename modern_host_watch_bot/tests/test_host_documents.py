@@ -0,0 +1,118 @@
+"""
+Tests for the bulk import and export documents.
+"""
+import json
+
+import pytest
+
+from src.models.host import CheckConfig, HostConfig
+from src.utils.host_documents import (
+    HostDocumentError, detect_format, export_host_document, parse_host_document, plan_import
+)
+
+CSV_DOCUMENT = b"""host_address,interval_seconds,port,adaptive,checks
+web.example,300,443,true,"[{""type"": ""https"", ""path"": ""/health""}]"
+db.example,600,,,
+"""
+
+
+class TestParse:
+    """Test reading documents."""
+
+    def test_csv(self):
+        """Test CSV rows, with empty cells left to the defaults and the line of each row."""
+        records = parse_host_document(CSV_DOCUMENT, "csv")
+
+        assert records[1] == {"host_address": "db.example", "interval_seconds": "600", "_row": 3}
+        plan = plan_import(records, existing=set())
+        assert not plan.errors
+        web, db = plan.configs
+        assert (web.port, web.adaptive, web.checks[0].path) == (443, True, "/health")
+        assert (db.port, db.adaptive, db.checks) == (80, False, [])
+
+    def test_json_and_yaml(self):
+        """Test a JSON list and a YAML hosts object with the short field names."""
+        json_records = parse_host_document(b'[{"host": "a.example", "interval": 300}]', "json")
+        yaml_records = parse_host_document(b"hosts:\n  - host: a.example\n    interval: 300\n", "yaml")
+
+        for records in (json_records, yaml_records):
+            plan = plan_import(records, existing=set())
+            assert [config.host_address for config in plan.configs] == ["a.example"]
+
+    def test_unreadable_documents(self):
+        """Test documents without a host list."""
+        with pytest.raises(HostDocumentError):
+            parse_host_document(b"{not json", "json")
+        with pytest.raises(HostDocumentError):
+            parse_host_document(b'{"servers": []}', "json")
+
+    def test_detect_format(self):
+        """Test the format from the file name, else the content."""
+        assert detect_format("hosts.YML") == "yaml"
+        assert detect_format("hosts", b' [{"host": "a"}]') == "json"
+        assert detect_format(None, b"host,interval\n") == "csv"
+
+
+class TestPlanImport:
+    """Test the validation of documents."""
+
+    def test_errors_per_row(self):
+        """Test that every bad row is reported with its number."""
+        records = parse_host_document(json.dumps([
+            {"host": "ok.example", "interval": 300},
+            {"host": "fast.example", "interval": 1},
+            {"host": "typo.example", "interval": 300, "prot": 22},
+            {"host": "check.example", "interval": 300, "checks": [{"type": "gopher"}]},
+            "not a host",
+            {"host": "ok.example", "interval": 600},
+        ]).encode(), "json")
+
+        plan = plan_import(records, existing=set())
+
+        assert [(error.row, error.host) for error in plan.errors] == [
+            (2, "fast.example"), (3, "typo.example"), (4, "check.example"), (5, None), (6, "ok.example")
+        ]
+        assert "interval_seconds" in plan.errors[0].message
+        assert "Unknown field prot" in plan.errors[1].message
+        assert "Duplicate of row 1" in plan.errors[4].message
+
+    def test_existing_hosts_skipped(self):
+        """Test that hosts already monitored are skipped, not errors."""
+        records = parse_host_document(b"host,interval\na.example,300\nb.example,300\n", "csv")
+
+        plan = plan_import(records, existing={"a.example"})
+
+        assert [config.host_address for config in plan.configs] == ["b.example"]
+        assert plan.skipped == ["a.example"]
+        assert not plan.errors
+
+    def test_limit(self):
+        """Test the document error when the new hosts exceed the limit."""
+        records = parse_host_document(b"host,interval\na.example,300\nb.example,300\n", "csv")
+
+        plan = plan_import(records, existing=set(), limit=1)
+
+        assert [(error.row, error.host) for error in plan.errors] == [(0, None)]
+
+
+class TestExport:
+    """Test writing documents."""
+
+    @pytest.mark.parametrize("fmt", ["csv", "json", "yaml"])
+    def test_round_trip(self, fmt):
+        """Test that an exported document imports back to the same hosts."""
+        configs = [
+            HostConfig(host_address="a.example", interval_seconds=300, port=8080, adaptive=True,
+                       ssh_username="root", ssh_password="secret", tags=["prod", "web"], parent="b.example",
+                       checks=[CheckConfig(type="tls", min_days=30), CheckConfig(type="tcp", port=22)]),
+            HostConfig(host_address="b.example", interval_seconds=600),
+        ]
+
+        data = export_host_document(configs, fmt)
+        plan = plan_import(parse_host_document(data, fmt), existing=set())
+
+        assert b"secret" not in data and b"root" not in data
+        assert not plan.errors
+        assert [config.model_dump(exclude={"ssh_username", "ssh_password"}) for config in plan.configs] == [
+            config.model_dump(exclude={"ssh_username", "ssh_password"}) for config in configs
+        ]
@@ -0,0 +1,51 @@
+"""
+Tests for the adaptive check interval policy.
+"""
+import random
+
+from src.utils.scheduling import AdaptivePolicy
+
+
+class TestAdaptivePolicy:
+    """Test AdaptivePolicy."""
+
+    def test_healthy_host_uses_interval(self):
+        """Test that a host up is checked at its configured interval."""
+        policy = AdaptivePolicy(jitter=0)
+
+        assert policy.next_interval(300, 0) == 300
+
+    def test_suspected_failure_is_rechecked_quickly(self):
+        """Test the fast re-checks before a failure is confirmed."""
+        policy = AdaptivePolicy(confirm_interval=15, confirm_failures=3, jitter=0)
+
+        assert policy.next_interval(300, 1) == 15
+        assert policy.next_interval(300, 2) == 15
+        assert not policy.is_confirmed(2)
+        assert policy.is_confirmed(3)
+
+    def test_confirm_interval_never_slower_than_interval(self):
+        """Test that re-checks are not slower than the configured interval."""
+        policy = AdaptivePolicy(confirm_interval=60, jitter=0)
+
+        assert policy.next_interval(30, 1) == 30
+
+    def test_backoff_while_down(self):
+        """Test the growing interval of a confirmed failure, bounded by the maximum."""
+        policy = AdaptivePolicy(confirm_failures=3, backoff_factor=2, max_interval=2400, jitter=0)
+
+        delays = [policy.next_interval(300, failures) for failures in range(3, 8)]
+
+        assert delays == [600, 1200, 2400, 2400, 2400]
+
+    def test_jitter_bounds(self):
+        """Test that jitter stays within its fraction and below the maximum."""
+        policy = AdaptivePolicy(max_interval=2400, jitter=0.1)
+        rng = random.Random(1)
+
+        healthy = [policy.next_interval(300, 0, rng) for _ in range(200)]
+        down = [policy.next_interval(300, 10, rng) for _ in range(200)]
+
+        assert all(270 <= delay <= 330 for delay in healthy)
+        assert len(set(healthy)) > 1
+        assert all(2160 <= delay <= 2400 for delay in down)
@@ -0,0 +1,332 @@
+"""
+Tests for the pooled SSH session manager, against an in-process SSH server.
+
+The behaviour both have is also tested on SSHSessionPool of util/util_fanout.py,
+the pool of the tlgfwk framework at the repository root, so the two cannot
+drift apart.
+"""
+import asyncio
+import socket
+import threading
+
+import paramiko
+import pytest
+
+from src.utils.ssh_pool import SSHConnectionPool, SSHTarget
+
+USERNAME = "admin"
+PASSWORD = "secret"
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    """Accepts one user and answers exec requests with canned output."""
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USERNAME, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self._run, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _run(channel, command):
+        # Like a real server, answer the exec request before sending output
+        threading.Event().wait(0.05)
+        # "exit N" fails with code N, "sleep" takes a while, anything else is echoed
+        if command.startswith("exit "):
+            channel.sendall_stderr(b"failed\n")
+            exit_code = int(command.split()[1])
+        else:
+            if command == "sleep":
+                threading.Event().wait(0.5)
+            channel.sendall(f"out:{command}\n".encode())
+            exit_code = 0
+        channel.send_exit_status(exit_code)
+        channel.close()
+
+
+class LocalSSHServer:
+    """SSH server on a random localhost port, counting accepted connections."""
+
+    host_key = None
+
+    def __init__(self):
+        if LocalSSHServer.host_key is None:
+            LocalSSHServer.host_key = paramiko.RSAKey.generate(1024)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.listen(16)
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        self.transports = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.start_server(server=_ServerInterface())
+            self.transports.append(transport)
+
+    def drop_connections(self):
+        for transport in self.transports:
+            transport.close()
+
+    def close(self):
+        self.socket.close()
+        self.drop_connections()
+
+
+@pytest.fixture
+def server():
+    server = LocalSSHServer()
+    yield server
+    server.close()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestSSHConnectionPool:
+    """Test SSHConnectionPool."""
+
+    def test_reuses_connection(self, server):
+        """Test that commands to the same host share one connection."""
+        async def scenario():
+            pool = SSHConnectionPool()
+            results = [
+                await pool.run("127.0.0.1", USERNAME, PASSWORD, f"echo {i}", port=server.port)
+                for i in range(3)
+            ]
+            await pool.close()
+            return results
+
+        results = run(scenario())
+
+        assert [result.stdout for result in results] == ["out:echo 0\n", "out:echo 1\n", "out:echo 2\n"]
+        assert all(result.success for result in results)
+        assert server.connections == 1
+
+    def test_exit_code_and_stderr(self, server):
+        """Test a failing command."""
+        async def scenario():
+            pool = SSHConnectionPool()
+            result = await pool.run("127.0.0.1", USERNAME, PASSWORD, "exit 3", port=server.port)
+            await pool.close()
+            return result
+
+        result = run(scenario())
+
+        assert result.exit_code == 3
+        assert result.stderr == "failed\n"
+        assert not result.success
+
+    def test_authentication_failure(self, server):
+        """Test wrong credentials."""
+        async def scenario():
+            pool = SSHConnectionPool()
+            result = await pool.run("127.0.0.1", USERNAME, "wrong", "uptime", port=server.port)
+            await pool.close()
+            return result
+
+        result = run(scenario())
+
+        assert result.error == "Authentication failed"
+        assert not result.success
+
+    def test_reconnects_broken_connection(self, server):
+        """Test that a connection closed by the server is replaced."""
+        async def scenario():
+            pool = SSHConnectionPool()
+            await pool.run("127.0.0.1", USERNAME, PASSWORD, "first", port=server.port)
+            server.drop_connections()
+            await asyncio.sleep(0.1)
+            result = await pool.run("127.0.0.1", USERNAME, PASSWORD, "second", port=server.port)
+            await pool.close()
+            return result
+
+        result = run(scenario())
+
+        assert result.stdout == "out:second\n"
+        assert server.connections == 2
+
+    def test_idle_timeout(self, server):
+        """Test that idle connections are not reused after the idle timeout."""
+        async def scenario():
+            pool = SSHConnectionPool(idle_timeout=0)
+            await pool.run("127.0.0.1", USERNAME, PASSWORD, "first", port=server.port)
+            await pool.run("127.0.0.1", USERNAME, PASSWORD, "second", port=server.port)
+            await pool.close()
+
+        run(scenario())
+
+        assert server.connections == 2
+
+    def test_concurrent_sessions_share_connection(self, server):
+        """Test that concurrent commands run as channels of one connection."""
+        async def scenario():
+            pool = SSHConnectionPool(max_sessions_per_connection=4)
+            started = asyncio.get_running_loop().time()
+            results = await asyncio.gather(*(
+                pool.run("127.0.0.1", USERNAME, PASSWORD, "sleep", port=server.port)
+                for _ in range(4)
+            ))
+            elapsed = asyncio.get_running_loop().time() - started
+            await pool.close()
+            return results, elapsed
+
+        results, elapsed = run(scenario())
+
+        assert all(result.success for result in results)
+        assert server.connections == 1
+        assert elapsed < 1.5
+
+    def test_fan_out(self):
+        """Test one command on several hosts, with one failing host."""
+        servers = [LocalSSHServer() for _ in range(3)]
+        try:
+            targets = [SSHTarget("127.0.0.1", USERNAME, PASSWORD, server.port) for server in servers]
+            targets.append(SSHTarget("127.0.0.1", USERNAME, "wrong", servers[0].port))
+
+            async def scenario():
+                pool = SSHConnectionPool()
+                results = await pool.fan_out(targets, "uptime")
+                await pool.close()
+                return results
+
+            results = run(scenario())
+
+            assert [result.success for result in results] == [True, True, True, False]
+            # Not served by the connection opened with the right password
+            assert results[3].error == "Authentication failed"
+            assert all(result.stdout == "out:uptime\n" for result in results[:3])
+        finally:
+            for server in servers:
+                server.close()
+
+
+class BotPool:
+    """SSHConnectionPool of this bot."""
+
+    def __init__(self):
+        self.pool = SSHConnectionPool()
+
+    async def run(self, password, command, port):
+        """Exit code, stdout and stderr, and error of a command."""
+        result = await self.pool.run("127.0.0.1", USERNAME, password, command, port=port)
+        return result.exit_code, result.stdout + result.stderr, result.error
+
+    def stats(self):
+        return self.pool.stats()
+
+    async def close(self):
+        await self.pool.close()
+
+
+class FrameworkPool:
+    """SSHSessionPool of the framework: blocking, raising errors, stderr merged into stdout."""
+
+    def __init__(self, fanout):
+        self.fanout = fanout
+        self.pool = fanout.SSHSessionPool()
+
+    async def run(self, password, command, port):
+        target = self.fanout.FanoutTarget("127.0.0.1", USERNAME, password, port)
+        try:
+            exit_code, output = await asyncio.to_thread(self.pool.run, target, command, 5)
+        except paramiko.AuthenticationException:
+            return None, "", "Authentication failed"
+        return exit_code, output, None
+
+    def stats(self):
+        return self.pool.stats()
+
+    async def close(self):
+        self.pool.close()
+
+
+@pytest.fixture(params=["bot", "framework"])
+def make_pool(request, framework_module):
+    """Factory of pools of this bot, or of the framework, with a common interface."""
+    if request.param == "bot":
+        return BotPool
+    fanout = framework_module("util/util_fanout.py")
+    return lambda: FrameworkPool(fanout)
+
+
+class TestPoolCopies:
+    """Test the behaviour shared by the pools of this bot and of the framework."""
+
+    def test_reuses_connection_per_credentials(self, server, make_pool):
+        """Test that commands share a connection, not used for other credentials."""
+        async def scenario():
+            pool = make_pool()
+            results = [await pool.run(PASSWORD, f"echo {i}", server.port) for i in range(2)]
+            results.append(await pool.run("wrong", "uptime", server.port))
+            results.append(await pool.run(PASSWORD, "uptime", server.port))
+            stats = pool.stats()
+            await pool.close()
+            return results, stats
+
+        results, stats = run(scenario())
+
+        assert results == [
+            (0, "out:echo 0\n", None),
+            (0, "out:echo 1\n", None),
+            (None, "", "Authentication failed"),
+            (0, "out:uptime\n", None),
+        ]
+        assert server.connections == 2
+        assert stats == {"connections": 1, "active_commands": 0, "connections_opened": 1}
+
+    def test_exit_code_and_output(self, server, make_pool):
+        """Test that a failing command reports its exit code and error output."""
+        async def scenario():
+            pool = make_pool()
+            result = await pool.run(PASSWORD, "exit 3", server.port)
+            await pool.close()
+            return result
+
+        assert run(scenario()) == (3, "failed\n", None)
+
+    def test_reconnects_broken_connection(self, server, make_pool):
+        """Test that a connection closed by the server is replaced."""
+        async def scenario():
+            pool = make_pool()
+            await pool.run(PASSWORD, "first", server.port)
+            server.drop_connections()
+            await asyncio.sleep(0.1)
+            result = await pool.run(PASSWORD, "second", server.port)
+            await pool.close()
+            return result
+
+        assert run(scenario()) == (0, "out:second\n", None)
+        assert server.connections == 2
+
+    def test_concurrent_commands_share_connection(self, server, make_pool):
+        """Test that concurrent commands to a host open a single connection."""
+        async def scenario():
+            pool = make_pool()
+            results = await asyncio.gather(*(pool.run(PASSWORD, "sleep", server.port) for _ in range(4)))
+            await pool.close()
+            return results
+
+        assert run(scenario()) == [(0, "out:sleep\n", None)] * 4
+        assert server.connections == 1
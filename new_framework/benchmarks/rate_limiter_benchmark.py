@@ -0,0 +1,98 @@
+"""
+Rate limiter microbenchmark.
+
+Compares the GCRA rate limiter with the previous list-per-user sliding window
+at 1M distinct users, reporting time per call and live keys kept in memory.
+
+Usage:
+    python benchmarks/rate_limiter_benchmark.py [--users 1000000] [--sqlite]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tlgfwk.core.rate_limiter import RateLimiter, MemoryRateLimitBackend, SQLiteRateLimitBackend
+
+
+class SimulatedClock:
+    """Clock advancing a fixed step per call, so idle keys expire during the run."""
+    
+    def __init__(self, step: float):
+        self.now = 0.0
+        self.step = step
+    
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def sliding_window(users: int, max_calls: int, window: float, step: float):
+    """The previous implementation: one list of call times per user, never evicted."""
+    call_history = {}
+    now = 0.0
+    for user_id in range(users):
+        now += step
+        history = call_history.setdefault(user_id, [])
+        history[:] = [t for t in history if now - t < window]
+        if len(history) < max_calls:
+            history.append(now)
+    return len(call_history)
+
+
+def gcra(users: int, max_calls: int, window: float, step: float, backend):
+    """GCRA limiter with the given backend."""
+    limiter = RateLimiter(max_calls, window, backend=backend, time_func=SimulatedClock(step))
+    acquire = limiter.acquire
+    for user_id in range(users):
+        acquire(user_id)
+    return len(backend)
+
+
+def measure(name: str, make_args):
+    """Run a benchmark twice: once timed, once under tracemalloc for peak memory."""
+    func, *args = make_args()
+    users = args[0]
+    started = time.perf_counter()
+    keys = func(*args)
+    elapsed = time.perf_counter() - started
+    
+    func, *args = make_args()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<16} {elapsed:7.2f}s  {elapsed / users * 1e9:8.0f} ns/call  "
+        f"peak {peak / 2**20:8.1f} MiB  live keys {keys}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--max-calls', type=int, default=5)
+    parser.add_argument('--window', type=float, default=60.0)
+    parser.add_argument('--rate', type=float, default=2000.0, help="simulated calls per second")
+    parser.add_argument('--sqlite', action='store_true', help="also run the SQLite backend")
+    args = parser.parse_args()
+    
+    step = 1.0 / args.rate
+    print(f"{args.users} distinct users, {args.max_calls} calls/{args.window:g}s, {args.rate:g} calls/s simulated")
+    limits = (args.users, args.max_calls, args.window, step)
+    measure("sliding window", lambda: (sliding_window, *limits))
+    measure("gcra memory", lambda: (gcra, *limits, MemoryRateLimitBackend()))
+    
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = iter(os.path.join(directory, f'limits{i}.db') for i in range(2))
+            measure("gcra sqlite", lambda: (gcra, *limits, SQLiteRateLimitBackend(next(paths))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Bot Metrics
+
+This module provides the metrics kept by the TelegramBotFramework: updates
+received, command handler latency, Telegram Bot API latency and errors,
+requests in flight, update queue depth and persistence flush time.
+"""
+
+import functools
+import time
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+from telegram.request import HTTPXRequest
+
+from ..utils.metrics import Histogram, MetricsRegistry
+from ..utils.tracing import Tracer, tracer as default_tracer
+
+
+# Update fields counted as the update type, most common first
+UPDATE_TYPES = (
+    'message', 'callback_query', 'edited_message', 'inline_query', 'channel_post',
+    'my_chat_member', 'chat_member', 'pre_checkout_query', 'shipping_query', 'poll_answer',
+)
+
+
+def api_method(url: str) -> str:
+    """Bot API method of a request URL, `file` for file downloads."""
+    if '/file/bot' in url:
+        return 'file'
+    return url.rsplit('/', 1)[-1] or 'unknown'
+
+
+class BotMetrics:
+    """
+    Metrics of a bot.
+
+    Applications add their own metrics to `registry`, e.g. the result of
+    every host probe:
+
+        probes = bot.metrics.registry.counter(
+            'probe_results', 'Host probes by result', ('host', 'result'))
+        probes.labels(host, 'up' if ok else 'down').inc()
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """
+        Initialize the metrics.
+
+        Args:
+            registry: Registry to add the metrics to, a new one by default
+        """
+        self.registry = registry or MetricsRegistry()
+        self.started = time.time()
+
+        registry = self.registry
+        self.updates = registry.counter(
+            'tlgfwk_updates', 'Updates received, by type', ('type',))
+        self.update_queue_depth = registry.gauge(
+            'tlgfwk_update_queue_depth', 'Updates received and not yet dispatched')
+        self.handler_seconds = registry.histogram(
+            'tlgfwk_handler_duration_seconds', 'Command handler latency', ('command',))
+        self.handler_errors = registry.counter(
+            'tlgfwk_handler_errors', 'Command handlers that raised', ('command',))
+        self.api_seconds = registry.histogram(
+            'tlgfwk_telegram_api_duration_seconds', 'Telegram Bot API request latency', ('method',))
+        self.api_errors = registry.counter(
+            'tlgfwk_telegram_api_errors', 'Failed Telegram Bot API requests, by HTTP status or exception',
+            ('method', 'reason'))
+        self.api_in_flight = registry.gauge(
+            'tlgfwk_telegram_api_requests_in_flight',
+            'Outbound Telegram Bot API requests sent or waiting for a pool connection')
+        self.persistence_flush_seconds = registry.histogram(
+            'tlgfwk_persistence_flush_seconds', 'Time to write the persistence data')
+
+        self._update_children = {name: self.updates.labels(name) for name in (*UPDATE_TYPES, 'other')}
+
+    def count_update(self, update: Any):
+        """Count an update by its type."""
+        for name in UPDATE_TYPES:
+            if getattr(update, name, None) is not None:
+                self._update_children[name].inc()
+                return
+        self._update_children['other'].inc()
+
+    def instrument_handler(self, command: str, callback: Callable) -> Callable:
+        """Wrap a command callback to record its latency and errors."""
+        seconds = self.handler_seconds.labels(command)
+        errors = self.handler_errors.labels(command)
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return await callback(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                seconds.observe(perf_counter() - started)
+
+        return wrapper
+
+    def instrument_flush(self, flush: Callable) -> Callable:
+        """Wrap a persistence flush coroutine function to record its duration."""
+        histogram: Histogram = self.persistence_flush_seconds
+
+        @functools.wraps(flush)
+        async def wrapper(*args, **kwargs):
+            with histogram.time():
+                return await flush(*args, **kwargs)
+
+        return wrapper
+
+    def summary(self, top: int = 10) -> str:
+        """
+        Plain text summary of the metrics.
+
+        Args:
+            top: Most commands and API methods listed
+        """
+        uptime = max(time.time() - self.started, 1e-9)
+        updates = sum(child.get() for _, child in self.updates.series())
+        lines = [
+            f"Updates: {updates:.0f} ({updates / uptime:.2f}/s since start)",
+            f"Update queue: {self.update_queue_depth.labels().get():.0f}",
+            f"API requests in flight: {self.api_in_flight.labels().get():.0f}",
+        ]
+
+        lines.append("")
+        lines.append("Commands (calls, avg, max bucket, errors):")
+        lines.extend(self._histogram_lines(self.handler_seconds, self.handler_errors, top) or ["  none"])
+
+        lines.append("")
+        lines.append("Telegram API (calls, avg, max bucket, errors):")
+        lines.extend(self._histogram_lines(self.api_seconds, self.api_errors, top) or ["  none"])
+
+        _, flushes, flush_total = self.persistence_flush_seconds.labels().get()
+        if flushes:
+            lines.append("")
+            lines.append(f"Persistence flushes: {flushes:.0f}, avg {flush_total / flushes * 1000:.1f} ms")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _histogram_lines(histogram: Histogram, errors, top: int) -> List[str]:
+        """One line per series of a latency histogram, busiest first."""
+        error_counts: Dict[str, float] = {}
+        for labels, child in errors.series():
+            key = next(iter(labels.values()))
+            error_counts[key] = error_counts.get(key, 0) + child.get()
+
+        rows = []
+        for labels, child in histogram.series():
+            cumulative, count, total = child.get()
+            if not count:
+                continue
+            # Upper bound of the highest bucket with observations
+            index = next(i for i, seen in enumerate(cumulative) if seen == count)
+            bound = histogram.buckets[index] if index < len(histogram.buckets) else None
+            name = next(iter(labels.values()))
+            rows.append((count, name, total / count, bound))
+
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return [
+            f"  {name}: {count:.0f}, {avg * 1000:.0f} ms, "
+            f"{f'<= {bound * 1000:.0f} ms' if bound is not None else f'> {histogram.buckets[-1]:.0f} s'}, "
+            f"{error_counts.get(name, 0):.0f}"
+            for count, name, avg, bound in rows[:top]
+        ]
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """
+    HTTPXRequest recording the latency, errors and requests in flight of the
+    Bot API calls, and tracing each call as an `api:<method>` span.
+    """
+
+    def __init__(self, metrics: Optional[BotMetrics], *args, tracer: Tracer = default_tracer, **kwargs):
+        """
+        Initialize the request.
+
+        Args:
+            metrics: Metrics to record to, None to only trace
+            tracer: Tracer of the spans
+            *args, **kwargs: HTTPXRequest arguments
+        """
+        super().__init__(*args, **kwargs)
+        self._metrics = metrics
+        self._tracer = tracer
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        """Send a request, recording it."""
+        if self._tracer.enabled:
+            with self._tracer.span(f"api:{api_method(url)}"):
+                return await self._do_request(url, method, *args, **kwargs)
+        return await self._do_request(url, method, *args, **kwargs)
+
+    async def _do_request(self, url: str, method: str, *args, **kwargs):
+        metrics = self._metrics
+        if metrics is None:
+            return await super().do_request(url, method, *args, **kwargs)
+
+        endpoint = api_method(url)
+        metrics.api_in_flight.inc()
+        started = perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception as e:
+            metrics.api_errors.labels(endpoint, type(e).__name__).inc()
+            raise
+        finally:
+            metrics.api_in_flight.dec()
+            metrics.api_seconds.labels(endpoint).observe(perf_counter() - started)
+
+        if code >= 400:
+            metrics.api_errors.labels(endpoint, str(code)).inc()
+        return code, payload
@@ -243,7 +243,7 @@ class Config:
         instance_name = os.getenv('INSTANCE_NAME', 'TelegramBot')
         
         # Create and return config instance - don't add owner to admin list automatically
-        return cls(
+        config = cls(
             bot_token=bot_token,
             owner_user_id=owner_user_id,
             admin_user_ids=admin_user_ids,
@@ -254,6 +254,18 @@ class Config:
             max_workers=max_workers,
             instance_name=instance_name
         )
+        
+        # Metrics, served over HTTP only when a port is set
+        config.data['metrics_enabled'] = cls._parse_env_bool('METRICS_ENABLED', default=True)
+        metrics_port = cls._parse_env_int('METRICS_PORT', default=0)
+        if metrics_port:
+            config.data['metrics_port'] = metrics_port
+        config.data['metrics_host'] = os.getenv('METRICS_HOST', '127.0.0.1')
+        
+        # Handler spans, always on or only during /profile windows
+        config.data['tracing_enabled'] = cls._parse_env_bool('TRACING_ENABLED', default=False)
+        config.data['profile_seconds'] = cls._parse_env_int('PROFILE_SECONDS', default=60)
+        return config
     
     @staticmethod
     def _parse_env_bool(key: str, default: bool = False) -> bool:
@@ -407,6 +419,26 @@ class Config:
     def traceback_chat_id(self):
         return self.data.get('traceback_chat_id')
     
+    @property
+    def metrics_enabled(self) -> bool:
+        return self.data.get('metrics_enabled', True)
+    
+    @property
+    def metrics_port(self) -> Optional[int]:
+        return self.data.get('metrics_port')
+    
+    @property
+    def metrics_host(self) -> str:
+        return self.data.get('metrics_host', '127.0.0.1')
+    
+    @property
+    def tracing_enabled(self) -> bool:
+        return self.data.get('tracing_enabled', False)
+    
+    @property
+    def profile_seconds(self) -> int:
+        return self.data.get('profile_seconds', 60)
+    
     # Property setters
     @debug.setter
     def debug(self, value: bool):
@@ -6,11 +6,14 @@ Fornece decoradores para facilitar o registro de comandos e controle de acesso.
 
 import functools
 import inspect
+import math
 import time
 from typing import Callable, Optional, List, Dict, Any, Union
 from telegram import Update
 from telegram.ext import ContextTypes
 from ..utils.logger import get_logger
+from ..utils.tracing import tracer
+from .rate_limiter import RateLimiter, RateLimitScope, get_rate_limiter, rate_limit_key
 
 logger = get_logger(__name__)
 
@@ -269,57 +272,71 @@ def owner_required(func: Callable):
     return wrapper
 
 
-def rate_limit(max_calls: int = 5, window: int = 60):
+def rate_limit(
+    max_calls: int = 5,
+    window: int = 60,
+    scope: Union[str, RateLimitScope] = RateLimitScope.USER,
+    name: Optional[str] = None,
+    backend=None
+):
     """
     Decorador para limitar taxa de chamadas.
     
+    Usa GCRA: memória e tempo O(1) por chave, e chaves ociosas são
+    descartadas automaticamente.
+    
     Args:
         max_calls: Máximo de chamadas permitidas
         window: Janela de tempo em segundos
+        scope: Quem compartilha o limite (user, chat ou global)
+        name: Nome de um limite compartilhado entre comandos
+        backend: Armazenamento do estado (ex.: SQLiteRateLimitBackend para
+            valer entre processos); em memória por padrão
     
     Usage:
         @rate_limit(max_calls=3, window=60)
         async def limited_command(update, context):
             await update.message.reply_text("Comando com rate limit!")
+        
+        @rate_limit(max_calls=30, window=1, scope="global", name="api")
+        async def api_command(update, context):
+            ...
     """
+    if isinstance(scope, str):
+        scope = RateLimitScope(scope.lower())
+    
     def decorator(func: Callable):
-        # Armazenar histórico de chamadas por usuário
-        call_history: Dict[int, List[float]] = {}
+        # Limite compartilhado por nome ou exclusivo do comando
+        if name:
+            limiter = get_rate_limiter(name, max_calls, window, backend=backend)
+        else:
+            limiter = RateLimiter(max_calls, window, backend=backend, name=func.__qualname__ if backend else None)
         
         @functools.wraps(func)
         async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-            import time
-            
-            user_id = update.effective_user.id
-            current_time = time.time()
-            
-            # Inicializar histórico do usuário
-            if user_id not in call_history:
-                call_history[user_id] = []
-            
-            # Remover chamadas antigas
-            call_history[user_id] = [
-                call_time for call_time in call_history[user_id]
-                if current_time - call_time < window
-            ]
+            key = rate_limit_key(update, scope)
             
             # Verificar limite
-            if len(call_history[user_id]) >= max_calls:
+            retry_after = await limiter.acquire_async(key) if key is not None else 0.0
+            if retry_after:
                 if hasattr(update, 'message') and update.message:
                     await update.message.reply_text(
                         f"⚠️ Você está fazendo muitas solicitações. "
-                        f"Tente novamente em {window} segundos."
+                        f"Tente novamente em {math.ceil(retry_after)} segundos."
                     )
-                logger.warning(f"Rate limit atingido para usuário {user_id}")
+                logger.warning(f"Rate limit atingido para {scope.value} {key}")
                 return None
             
-            # Registrar chamada atual
-            call_history[user_id].append(current_time)
-            
             return await func(update, context, *args, **kwargs)
         
         wrapper._rate_limited = True
-        wrapper._rate_limit_config = {"max_calls": max_calls, "window": window}
+        wrapper._rate_limit_config = {
+            "max_calls": max_calls,
+            "window": window,
+            "scope": scope.value,
+            "name": name
+        }
+        wrapper._rate_limiter = limiter
         return wrapper
     
     return decorator
@@ -341,24 +358,25 @@ def typing_action(func: Callable):
         import asyncio
         from telegram.constants import ChatAction
         
-        # Iniciar ação de digitação
-        typing_task = asyncio.create_task(
-            context.bot.send_chat_action(
-                chat_id=update.effective_chat.id,
-                action=ChatAction.TYPING
+        with tracer.span("typing_action"):
+            # Iniciar ação de digitação
+            typing_task = asyncio.create_task(
+                context.bot.send_chat_action(
+                    chat_id=update.effective_chat.id,
+                    action=ChatAction.TYPING
+                )
             )
-        )
-        
-        try:
-            result = await func(self, update, context, *args, **kwargs)
-            return result
-        finally:
-            # Cancelar ação de digitação
-            typing_task.cancel()
+            
             try:
-                await typing_task
-            except asyncio.CancelledError:
-                pass
+                result = await func(self, update, context, *args, **kwargs)
+                return result
+            finally:
+                # Cancelar ação de digitação
+                typing_task.cancel()
+                try:
+                    await typing_task
+                except asyncio.CancelledError:
+                    pass
     
     wrapper._shows_typing = True
     return wrapper
@@ -375,18 +393,19 @@ def log_command_usage(func: Callable):
     """
     @functools.wraps(func)
     async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user = update.effective_user
-        command_name = getattr(func, '_command_name', func.__name__)
-        
-        logger.info(
-            f"Comando executado: {command_name} por {user.full_name} (ID: {user.id})"
-        )
-        
-        # Registrar no histórico se disponível
-        if hasattr(self, 'user_manager'):
-            await self.user_manager.log_command_usage(user.id, command_name)
-        
-        return await func(self, update, context, *args, **kwargs)
+        with tracer.span("log_command_usage"):
+            user = update.effective_user
+            command_name = getattr(func, '_command_name', func.__name__)
+            
+            logger.info(
+                f"Comando executado: {command_name} por {user.full_name} (ID: {user.id})"
+            )
+            
+            # Registrar no histórico se disponível
+            if hasattr(self, 'user_manager'):
+                await self.user_manager.log_command_usage(user.id, command_name)
+            
+            return await func(self, update, context, *args, **kwargs)
     
     wrapper._logs_usage = True
     return wrapper
@@ -15,7 +15,7 @@ from datetime import datetime
 from telegram import Update, BotCommand
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    ContextTypes, filters, CallbackQueryHandler
+    ContextTypes, filters, CallbackQueryHandler, TypeHandler
 )
 from telegram.constants import ParseMode
 
@@ -24,7 +24,10 @@ from .decorators import get_command_registry, command, admin_required, owner_req
 from .user_manager import UserManager
 from .plugin_manager import PluginManager
 from .persistence_manager import PersistenceManager
+from .bot_metrics import BotMetrics, InstrumentedRequest
 from ..utils.logger import setup_logging, get_logger, LoggerMixin
+from ..utils.metrics import MetricsServer
+from ..utils.tracing import Profiler, tracer
 
 
 class TelegramBotFramework(LoggerMixin):
@@ -82,13 +85,24 @@ class TelegramBotFramework(LoggerMixin):
             plugin_dir=self.config.plugins_dir
         )
         self.persistence_manager = None
-        self.scheduler = JobScheduler(self)
+        self.scheduler = JobScheduler(self, {
+            'job_store_path': self.config.get('job_store_path', 'data/jobs.db')
+        })
         
         # Estado interno
         self._running = False
         self._startup_time = None
         self._command_stats = {}
         
+        # Métricas, servidas por HTTP se metrics_port estiver definido
+        self.metrics = BotMetrics() if self.config.metrics_enabled else None
+        self.metrics_server = None
+        
+        # Spans de handlers, decoradores, API e persistência; sempre ativos com
+        # tracing_enabled, senão só durante as janelas do /profile
+        tracer.enabled = self.config.tracing_enabled
+        self.profiler = Profiler(tracer)
+        
         self.log_info(f"Framework inicializado: {self.config.instance_name}")
     
     def setup_logging(self):
@@ -113,10 +127,8 @@ class TelegramBotFramework(LoggerMixin):
         app_builder.token(self.config.bot_token)
         
         # Configurações de rede
-        if not self.config.reuse_connections:
-            app_builder.connection_pool_size(1)
-        else:
-            app_builder.connection_pool_size(self.config.connection_pool_size)
+        pool_size = self.config.connection_pool_size if self.config.reuse_connections else 1
+        app_builder.request(InstrumentedRequest(self.metrics, connection_pool_size=pool_size))
         
         # Configurar persistência
         if self.config.persistence_backend != "none":
@@ -126,6 +138,7 @@ class TelegramBotFramework(LoggerMixin):
                 app_builder.persistence(persistence)
         
         self.application = app_builder.build()
+        self.setup_metrics()
         
         # Inicializar gerenciadores
         self.user_manager = UserManager(self.config, self.persistence_manager)
@@ -146,25 +159,85 @@ class TelegramBotFramework(LoggerMixin):
         # Registrar comandos do menu
         await self.setup_bot_commands()
         
+        # Servidor de métricas
+        if self.metrics and self.config.metrics_port and not self.metrics_server:
+            self.metrics_server = MetricsServer(
+                self.metrics.registry, self.config.metrics_host, self.config.metrics_port
+            )
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                self.log_error(f"Erro ao iniciar servidor de métricas: {e}")
+                self.metrics_server = None
+        
         self.log_info("Framework inicializado com sucesso")
     
+    def setup_metrics(self):
+        """Instrumenta a aplicação: updates recebidos, fila de updates e escrita da persistência."""
+        if not self.application:
+            return
+        
+        application = self.application
+        if application.persistence:
+            application.update_persistence = tracer.wrap("update_persistence", application.update_persistence)
+        
+        metrics = self.metrics
+        if not metrics:
+            return
+        
+        async def count_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            metrics.count_update(update)
+        
+        # Grupo próprio: conta todos os updates sem impedir os demais handlers
+        application.add_handler(TypeHandler(Update, count_update), group=-1)
+        metrics.update_queue_depth.set_function(application.update_queue.qsize)
+        
+        if application.persistence:
+            application.update_persistence = metrics.instrument_flush(application.update_persistence)
+    
+    def _command_handler(self, command_name: str, callback: Callable) -> CommandHandler:
+        """Cria o CommandHandler de um comando, contando suas execuções e medindo sua latência."""
+        if self.metrics:
+            callback = self.metrics.instrument_handler(command_name, callback)
+        callback = tracer.wrap(f"/{command_name}", callback)
+        command_stats = self._command_stats
+        
+        async def counted(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            command_stats[command_name] = command_stats.get(command_name, 0) + 1
+            return await callback(update, context)
+        
+        return CommandHandler(command_name, counted)
+    
+    async def _flush_persistence(self):
+        """Salva a persistência, medindo o tempo de escrita."""
+        if not self.persistence_manager:
+            return
+        with tracer.span("persistence_flush"):
+            if self.metrics:
+                with self.metrics.persistence_flush_seconds.time():
+                    await self.persistence_manager.flush()
+            else:
+                await self.persistence_manager.flush()
+    
     def register_default_handlers(self):
         """Registra handlers padrão do framework."""
         # Comandos básicos
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("help", self.help_command))
+        self.application.add_handler(self._command_handler("start", self.start_command))
+        self.application.add_handler(self._command_handler("help", self.help_command))
         
         # Comandos administrativos
-        self.application.add_handler(CommandHandler("config", self.config_command))
-        self.application.add_handler(CommandHandler("stats", self.stats_command))
-        self.application.add_handler(CommandHandler("users", self.users_command))
-        self.application.add_handler(CommandHandler("restart", self.restart_command))
-        self.application.add_handler(CommandHandler("shutdown", self.shutdown_command))
+        self.application.add_handler(self._command_handler("config", self.config_command))
+        self.application.add_handler(self._command_handler("stats", self.stats_command))
+        self.application.add_handler(self._command_handler("metrics", self.metrics_command))
+        self.application.add_handler(self._command_handler("profile", self.profile_command))
+        self.application.add_handler(self._command_handler("users", self.users_command))
+        self.application.add_handler(self._command_handler("restart", self.restart_command))
+        self.application.add_handler(self._command_handler("shutdown", self.shutdown_command))
         
         # Comandos de plugins
         if self.plugin_manager:
-            self.application.add_handler(CommandHandler("plugins", self.plugins_command))
-            self.application.add_handler(CommandHandler("plugin", self.plugin_command))
+            self.application.add_handler(self._command_handler("plugins", self.plugins_command))
+            self.application.add_handler(self._command_handler("plugin", self.plugin_command))
         
         # Handler para comandos não reconhecidos
         self.application.add_handler(
@@ -204,13 +277,13 @@ class TelegramBotFramework(LoggerMixin):
             
             # Registrar handler
             self.application.add_handler(
-                CommandHandler(command_name, wrapped_handler)
+                self._command_handler(command_name, wrapped_handler)
             )
             
             # Registrar aliases
             for alias in command_info.get("aliases", []):
                 self.application.add_handler(
-                    CommandHandler(alias, wrapped_handler)
+                    self._command_handler(alias, wrapped_handler)
                 )
     
     async def setup_bot_commands(self):
@@ -381,6 +454,80 @@ Use /help para ver os comandos disponíveis.
             parse_mode=ParseMode.MARKDOWN
         )
     
+    @command(name="metrics", description="Métricas do bot", admin_only=True)
+    @admin_required
+    async def metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Mostra as métricas; `/metrics raw` envia o texto OpenMetrics completo."""
+        if not self.metrics:
+            await update.message.reply_text("❌ Métricas desativadas (metrics_enabled)")
+            return
+        
+        if context.args and context.args[0].lower() == "raw":
+            await update.message.reply_document(
+                document=self.metrics.registry.render().encode(),
+                filename="metrics.txt"
+            )
+            return
+        
+        text = self.metrics.summary()
+        if self.metrics_server:
+            text += f"\n\nOpenMetrics: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics"
+        
+        await update.message.reply_text(f"📈 Métricas\n\n{text[:4000]}")
+    
+    @command(name="profile", description="Perfil de desempenho", admin_only=True)
+    @admin_required
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Perfil de desempenho: `/profile start [segundos]`, `/profile stop`, `/profile report [top]`.
+        
+        O relatório lista os spans mais lentos e as funções com mais amostras de
+        pilha; ao fim da janela também é enviado o arquivo de pilhas colapsadas
+        (profile.folded), para flamegraph.pl ou speedscope.
+        """
+        args = context.args or []
+        action = args[0].lower() if args else "report"
+        chat_id = update.effective_chat.id
+        
+        try:
+            if action == "start":
+                if self.profiler.running:
+                    await update.message.reply_text("❌ Perfil já em andamento, encerre com /profile stop")
+                    return
+                seconds = float(args[1]) if len(args) > 1 else self.config.profile_seconds
+                self.profiler.start(seconds, on_timeout=lambda: self.send_profile(chat_id))
+                await update.message.reply_text(
+                    f"⏱️ Perfil iniciado por {min(seconds, self.profiler.max_seconds):g} s, "
+                    f"encerre antes com /profile stop"
+                )
+            elif action == "stop":
+                if not self.profiler.running:
+                    await update.message.reply_text("❌ Nenhum perfil em andamento, inicie com /profile start [segundos]")
+                    return
+                self.profiler.stop()
+                await self.send_profile(chat_id)
+            elif action == "report":
+                top = int(args[1]) if len(args) > 1 else 20
+                await self.send_profile(chat_id, top)
+            else:
+                await update.message.reply_text("Uso: /profile start [segundos] | stop | report [top]")
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Argumento inválido: {e}")
+    
+    async def send_profile(self, chat_id: int, top: int = 20):
+        """Envia o relatório do perfil em andamento ou do último, e suas pilhas colapsadas quando encerrado."""
+        bot = self.application.bot
+        await bot.send_message(chat_id=chat_id, text=f"⏱️ Perfil\n\n{self.profiler.report(top)[:4000]}")
+        
+        profile = self.profiler.profile
+        if not self.profiler.running and profile and profile.samples:
+            await bot.send_document(
+                chat_id=chat_id,
+                document=profile.collapsed().encode(),
+                filename="profile.folded",
+                caption="Pilhas colapsadas: flamegraph.pl profile.folded > profile.svg"
+            )
+    
     @command(name="users", description="Listar usuários", admin_only=True)
     @admin_required
     async def users_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -424,8 +571,7 @@ Use /help para ver os comandos disponíveis.
         await update.message.reply_text("🔄 Reiniciando o bot...")
         
         # Salvar estado se necessário
-        if self.persistence_manager:
-            await self.persistence_manager.flush()
+        await self._flush_persistence()
         
         # Notificar admins
         await self.send_admin_message("🔄 Bot sendo reiniciado...")
@@ -442,8 +588,7 @@ Use /help para ver os comandos disponíveis.
         await update.message.reply_text("🛑 Desligando o bot...")
         
         # Salvar estado
-        if self.persistence_manager:
-            await self.persistence_manager.flush()
+        await self._flush_persistence()
         
         # Notificar admins
         await self.send_admin_message("🛑 Bot desligado")
@@ -692,12 +837,15 @@ Use /help para ver os comandos disponíveis.
         if self.plugin_manager:
             await self.plugin_manager.unload_all_plugins()
         
-        if self.persistence_manager:
-            await self.persistence_manager.flush()
+        await self._flush_persistence()
         
         if self.application:
             await self.application.stop()
         
+        self.profiler.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        
         self.log_info("Bot finalizado")
     
     # Handler methods expected by tests
@@ -770,7 +918,7 @@ Use /help para ver os comandos disponíveis.
     def add_command_handler(self, command: str, handler):
         """Add a command handler."""
         if self.application:
-            self.application.add_handler(CommandHandler(command, handler))
+            self.application.add_handler(self._command_handler(command, handler))
     
     def command(self, command_name: str, **kwargs):
         """Decorator for registering commands."""
@@ -790,6 +938,10 @@ Use /help para ver os comandos disponíveis.
         if self.scheduler:
             await self.scheduler.shutdown()
         
+        self.profiler.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        
         self.log_info("Framework shutdown complete")
     
     async def run_async(self):
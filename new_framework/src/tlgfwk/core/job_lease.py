@@ -0,0 +1,252 @@
+"""
+Distributed Job Leasing
+
+This module lets several bot instances share one scheduling workload. Each job
+(or bucket of jobs, e.g. a group of monitored hosts) is leased by a single
+instance through a shared database; leases are renewed by a heartbeat, taken
+over when they expire and rebalanced when instances join or leave.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from hashlib import blake2b
+from typing import Dict, List, Optional, Any, Callable, Iterable, Set
+
+from sqlalchemy import (
+    Column, Float, MetaData, String, Table, and_, create_engine, delete, insert, or_, select, update
+)
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from ..utils.logger import get_logger
+
+
+def lease_bucket(key: str, buckets: int) -> str:
+    """
+    Map a key (e.g. a host name) to one of a fixed number of lease buckets.
+    
+    Args:
+        key: Key to map
+        buckets: Number of buckets
+    
+    Returns:
+        Bucket resource name
+    """
+    return f"bucket:{zlib.crc32(key.encode()) % buckets}"
+
+
+class LeaseManager:
+    """
+    Lease-based coordination between scheduler instances.
+    
+    Ownership is decided by rendezvous hashing over the live instances, so
+    each instance only moves the resources it gains or loses when membership
+    changes. Leases guarantee that a resource is never owned by two instances
+    at once: a lease is only taken once the previous owner released it or let
+    it expire.
+    """
+    
+    def __init__(
+        self,
+        url: str,
+        instance_id: str = None,
+        lease_ttl: float = 30.0,
+        time_func: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the lease manager.
+        
+        Args:
+            url: SQLAlchemy database URL shared by all instances
+            instance_id: Unique ID of this instance (generated if omitted)
+            lease_ttl: Seconds a lease or heartbeat stays valid without renewal
+            time_func: Clock returning the current time in seconds
+        """
+        self.url = url
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = lease_ttl
+        self.time = time_func
+        self.logger = get_logger(__name__)
+        
+        # Leases held by this instance: resource -> expiry
+        self._held: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        
+        connect_args = {'timeout': 30} if url.startswith('sqlite') else {}
+        self.engine = create_engine(url, connect_args=connect_args)
+        
+        metadata = MetaData()
+        self.instances = Table(
+            'scheduler_instances', metadata,
+            Column('instance_id', String(191), primary_key=True),
+            Column('heartbeat', Float, nullable=False)
+        )
+        self.leases = Table(
+            'scheduler_leases', metadata,
+            Column('resource', String(191), primary_key=True),
+            Column('owner', String(191), nullable=False),
+            Column('expires_at', Float, nullable=False, index=True)
+        )
+        try:
+            metadata.create_all(self.engine)
+        except DBAPIError:
+            # Another instance created the tables concurrently
+            metadata.create_all(self.engine)
+    
+    @staticmethod
+    def _score(resource: str, instance_id: str) -> bytes:
+        """Rendezvous hashing weight of an instance for a resource."""
+        return blake2b(f"{resource}\0{instance_id}".encode(), digest_size=8).digest()
+    
+    def preferred_owner(self, resource: str, instances: Iterable[str]) -> Optional[str]:
+        """
+        Get the instance that should own a resource.
+        
+        Args:
+            resource: Resource name
+            instances: IDs of the live instances
+        
+        Returns:
+            Preferred instance ID, or None if there are no instances
+        """
+        return max(instances, key=lambda instance_id: self._score(resource, instance_id), default=None)
+    
+    def live_instances(self, conn=None) -> List[str]:
+        """Get the IDs of the instances with a recent heartbeat."""
+        query = select(self.instances.c.instance_id).where(
+            self.instances.c.heartbeat >= self.time() - self.lease_ttl
+        )
+        if conn is not None:
+            return [row[0] for row in conn.execute(query)]
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(query)]
+    
+    def heartbeat(self, resources: Iterable[str]) -> Set[str]:
+        """
+        Renew this instance's heartbeat and rebalance leases.
+        
+        Leases preferred by this instance are acquired or renewed (expired
+        leases of other instances are taken over); leases now preferred by
+        another live instance are released so it can take them.
+        
+        Args:
+            resources: All resources to coordinate (job IDs or buckets)
+        
+        Returns:
+            Resources leased by this instance
+        """
+        now = self.time()
+        expires_at = now + self.lease_ttl
+        resources = set(resources)
+        
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(self.instances)
+                .where(self.instances.c.instance_id == self.instance_id)
+                .values(heartbeat=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(self.instances).values(instance_id=self.instance_id, heartbeat=now))
+            
+            # Forget instances that stopped long ago
+            conn.execute(delete(self.instances).where(self.instances.c.heartbeat < now - 10 * self.lease_ttl))
+            
+            instances = self.live_instances(conn)
+            if self.instance_id not in instances:
+                instances.append(self.instance_id)
+            
+            wanted = {r for r in resources if self.preferred_owner(r, instances) == self.instance_id}
+            
+            # Release leases another instance should own, or that are gone
+            with self._lock:
+                held = set(self._held)
+            released = held - wanted
+            if released:
+                conn.execute(delete(self.leases).where(and_(
+                    self.leases.c.owner == self.instance_id,
+                    self.leases.c.resource.in_(list(released))
+                )))
+            
+            # Renew and take over in one statement
+            acquired = set()
+            missing = set()
+            if wanted:
+                conn.execute(
+                    update(self.leases)
+                    .where(and_(
+                        self.leases.c.resource.in_(list(wanted)),
+                        or_(self.leases.c.owner == self.instance_id, self.leases.c.expires_at < now)
+                    ))
+                    .values(owner=self.instance_id, expires_at=expires_at)
+                )
+                existing = {
+                    row.resource: row.owner
+                    for row in conn.execute(
+                        select(self.leases.c.resource, self.leases.c.owner)
+                        .where(self.leases.c.resource.in_(list(wanted)))
+                    )
+                }
+                acquired = {r for r, owner in existing.items() if owner == self.instance_id}
+                
+                missing = wanted - set(existing)
+        
+        # Create missing leases in their own transaction, so a conflicting
+        # insert does not undo the renewals above
+        if missing:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(self.leases), [
+                        {'resource': r, 'owner': self.instance_id, 'expires_at': expires_at}
+                        for r in missing
+                    ])
+                acquired |= missing
+            except IntegrityError:
+                # Another instance created some of them first; retry next heartbeat
+                pass
+        
+        with self._lock:
+            self._held = dict.fromkeys(acquired, expires_at)
+        
+        if released or acquired != held:
+            self.logger.debug(
+                f"Instance {self.instance_id} holds {len(acquired)} leases "
+                f"({len(acquired - held)} acquired, {len(released)} released)"
+            )
+        return acquired
+    
+    def owns(self, resource: str) -> bool:
+        """Check whether this instance holds a valid lease on a resource."""
+        expires_at = self._held.get(resource)
+        return expires_at is not None and expires_at > self.time()
+    
+    @property
+    def held(self) -> Set[str]:
+        """Resources currently leased by this instance."""
+        now = self.time()
+        with self._lock:
+            return {r for r, expires_at in self._held.items() if expires_at > now}
+    
+    def release_all(self):
+        """Release all leases and unregister this instance."""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.leases).where(self.leases.c.owner == self.instance_id))
+            conn.execute(delete(self.instances).where(self.instances.c.instance_id == self.instance_id))
+        
+        with self._lock:
+            self._held = {}
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Get the lease status of this instance."""
+        return {
+            'instance_id': self.instance_id,
+            'instances': self.live_instances(),
+            'held_leases': len(self.held),
+            'lease_ttl': self.lease_ttl
+        }
+    
+    def close(self):
+        """Dispose of the database engine."""
+        self.engine.dispose()
@@ -0,0 +1,214 @@
+"""
+Job Statistics
+
+This module provides the incrementally maintained counters, run history ring
+buffers and latency histograms used by the JobScheduler.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram.
+    
+    Observations are O(log buckets) and memory use is constant, regardless of
+    how many runs are recorded.
+    """
+    
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max')
+    
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize the histogram.
+        
+        Args:
+            buckets: Sorted upper bounds of the buckets, in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        """Record a single observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile from the buckets.
+        
+        Args:
+            q: Quantile between 0 and 1
+        
+        Returns:
+            Upper bound of the bucket holding the quantile, or None if empty
+        """
+        if not self.count:
+            return None
+        
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.buckets):
+                    return min(self.buckets[index], self.max)
+                return self.max
+        return self.max
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a summary of the histogram."""
+        buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'avg': self.total / self.count if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets
+        }
+
+
+class JobRunHistory:
+    """
+    Bounded run history of a single job.
+    
+    The most recent runs are kept in a ring buffer; durations and queue delays
+    of all runs are folded into histograms.
+    """
+    
+    __slots__ = ('runs', 'durations', 'queue_delays')
+    
+    def __init__(self, size: int = 50):
+        """
+        Initialize the run history.
+        
+        Args:
+            size: Number of recent runs to keep
+        """
+        self.runs = deque(maxlen=size)
+        self.durations = LatencyHistogram()
+        self.queue_delays = LatencyHistogram()
+    
+    def record(
+        self,
+        run_time: Optional[datetime],
+        duration: Optional[float],
+        queue_delay: Optional[float],
+        success: bool,
+        error: Optional[str] = None
+    ):
+        """Record a finished run."""
+        self.runs.append((run_time, duration, queue_delay, success, error))
+        if duration is not None:
+            self.durations.observe(duration)
+        if queue_delay is not None:
+            self.queue_delays.observe(queue_delay)
+    
+    def get_runs(self) -> List[Dict[str, Any]]:
+        """Get the recent runs, oldest first."""
+        return [
+            {
+                'run_time': run_time,
+                'duration': duration,
+                'queue_delay': queue_delay,
+                'success': success,
+                'error': error
+            }
+            for run_time, duration, queue_delay, success, error in self.runs
+        ]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the run history with its histograms."""
+        return {
+            'runs': self.get_runs(),
+            'duration': self.durations.to_dict(),
+            'queue_delay': self.queue_delays.to_dict()
+        }
+
+
+class JobStatistics:
+    """
+    Job counters maintained on each state transition.
+    
+    Counts reflect the jobs currently tracked by the scheduler, so reading
+    them is O(1) instead of a scan over all jobs.
+    """
+    
+    def __init__(self):
+        """Initialize the counters."""
+        self._lock = threading.Lock()
+        self.status_counts: Dict[Enum, int] = {}
+        self.total_jobs = 0
+        self.total_runs = 0
+        self.total_errors = 0
+        self.evicted_jobs = 0
+        self.durations = LatencyHistogram()
+        self.queue_delays = LatencyHistogram()
+    
+    def add_job(self, status: Enum, run_count: int = 0, error_count: int = 0):
+        """Count a job that started being tracked."""
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.total_jobs += 1
+            self.total_runs += run_count
+            self.total_errors += error_count
+    
+    def remove_job(self, status: Enum, run_count: int = 0, error_count: int = 0):
+        """Uncount a job that is no longer tracked."""
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) - 1
+            self.total_jobs -= 1
+            self.total_runs -= run_count
+            self.total_errors -= error_count
+    
+    def transition(self, old_status: Enum, new_status: Enum):
+        """Move a job from one status to another."""
+        if old_status == new_status:
+            return
+        with self._lock:
+            self.status_counts[old_status] = self.status_counts.get(old_status, 0) - 1
+            self.status_counts[new_status] = self.status_counts.get(new_status, 0) + 1
+    
+    def record_run(self):
+        """Count a job run."""
+        with self._lock:
+            self.total_runs += 1
+    
+    def record_error(self):
+        """Count a failed job run."""
+        with self._lock:
+            self.total_errors += 1
+    
+    def record_timing(self, duration: Optional[float], queue_delay: Optional[float]):
+        """Add a run's timings to the scheduler-wide histograms."""
+        with self._lock:
+            if duration is not None:
+                self.durations.observe(duration)
+            if queue_delay is not None:
+                self.queue_delays.observe(queue_delay)
+    
+    def count(self, status: Enum) -> int:
+        """Get the number of tracked jobs with a status."""
+        return self.status_counts.get(status, 0)
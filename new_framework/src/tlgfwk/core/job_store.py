@@ -0,0 +1,279 @@
+"""
+Durable Job Storage
+
+This module provides the persistent job store and the function registry used by
+the JobScheduler to restore scheduled jobs across restarts.
+"""
+
+import importlib
+import os
+import pickle
+import sqlite3
+import threading
+from enum import Enum
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from ..utils.logger import get_logger
+
+
+class MisfirePolicy(Enum):
+    """What to do with runs missed while the bot was down."""
+    SKIP = "skip"            # Drop missed runs, continue with the next fire time
+    RUN_ONCE = "run_once"    # Run a single time for all missed runs
+    CATCH_UP = "catch_up"    # Run once for every missed run
+
+
+class FunctionRegistryError(ValueError):
+    """Exception raised when a job function cannot be referenced or resolved."""
+    pass
+
+
+class FunctionRegistry:
+    """
+    Registry of importable job callables.
+    
+    Functions are referenced as ``module:qualname`` strings so they can be
+    stored with a job and re-resolved after a restart.
+    """
+    
+    def __init__(self):
+        """Initialize the function registry."""
+        self._functions: Dict[str, Callable] = {}
+    
+    @staticmethod
+    def reference_for(func: Callable) -> str:
+        """
+        Build the ``module:qualname`` reference of a callable.
+        
+        Args:
+            func: Callable to reference
+        
+        Returns:
+            Reference string
+        
+        Raises:
+            FunctionRegistryError: If the callable has no importable reference
+        """
+        module = getattr(func, '__module__', None)
+        qualname = getattr(func, '__qualname__', None)
+        
+        if not module or not qualname:
+            raise FunctionRegistryError(f"Cannot reference {func!r}: missing __module__ or __qualname__")
+        
+        if '<locals>' in qualname or '<lambda>' in qualname:
+            raise FunctionRegistryError(f"Cannot reference {module}.{qualname}: nested functions and lambdas are not importable")
+        
+        return f"{module}:{qualname}"
+    
+    @staticmethod
+    def _import(reference: str) -> Callable:
+        """Import the callable a reference points to."""
+        module_name, sep, qualname = reference.partition(':')
+        if not sep or not module_name or not qualname:
+            raise FunctionRegistryError(f"Invalid function reference (expected 'module:qualname'): {reference}")
+        
+        try:
+            obj = importlib.import_module(module_name)
+            for attr in qualname.split('.'):
+                obj = getattr(obj, attr)
+        except (ImportError, AttributeError) as e:
+            raise FunctionRegistryError(f"Cannot resolve function reference {reference}: {e}")
+        
+        if not callable(obj):
+            raise FunctionRegistryError(f"Function reference {reference} does not point to a callable")
+        
+        return obj
+    
+    def register(self, func: Callable) -> str:
+        """
+        Register a callable, validating that its reference resolves back to it.
+        
+        Args:
+            func: Callable to register
+        
+        Returns:
+            The ``module:qualname`` reference
+        
+        Raises:
+            FunctionRegistryError: If the callable is not importable
+        """
+        reference = self.reference_for(func)
+        if self._functions.get(reference) is func:
+            return reference
+        
+        resolved = self._import(reference)
+        if resolved is not func and resolved != func:
+            raise FunctionRegistryError(
+                f"Function reference {reference} resolves to a different object; "
+                "bound methods of instances cannot be stored"
+            )
+        
+        self._functions[reference] = func
+        return reference
+    
+    def resolve(self, reference: str) -> Callable:
+        """
+        Resolve a reference to its callable.
+        
+        Args:
+            reference: ``module:qualname`` reference
+        
+        Returns:
+            The callable
+        
+        Raises:
+            FunctionRegistryError: If the reference cannot be resolved
+        """
+        func = self._functions.get(reference)
+        if func is None:
+            func = self._import(reference)
+            self._functions[reference] = func
+        return func
+    
+    def __contains__(self, reference: str) -> bool:
+        return reference in self._functions
+    
+    def __len__(self) -> int:
+        return len(self._functions)
+
+
+class SQLiteJobStore:
+    """
+    SQLite-backed store for job definitions, keyed by stable job ID.
+    
+    Triggers and next run times are kept by APScheduler's SQLAlchemyJobStore
+    in the same database file (see ``url``); this store keeps the
+    framework-level job information and function references next to it.
+    """
+    
+    def __init__(self, path: str, schedule_table: str = "apscheduler_jobs"):
+        """
+        Initialize the job store.
+        
+        Args:
+            path: Path to the SQLite database file
+            schedule_table: Table used by APScheduler's SQLAlchemyJobStore
+        """
+        self.path = path
+        self.schedule_table = schedule_table
+        self.logger = get_logger(__name__)
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                id TEXT PRIMARY KEY,
+                function_ref TEXT NOT NULL,
+                state BLOB NOT NULL
+            )
+            """
+        )
+    
+    @property
+    def url(self) -> str:
+        """SQLAlchemy URL of the database, for APScheduler's job store."""
+        return f"sqlite:///{self.path}"
+    
+    def save_jobs(self, jobs: Iterable[Tuple[str, str, Any]]) -> int:
+        """
+        Insert or update jobs in a single transaction.
+        
+        Args:
+            jobs: Iterable of (job_id, function_ref, state)
+        
+        Returns:
+            Number of jobs written
+        """
+        rows = [
+            (job_id, function_ref, pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+            for job_id, function_ref, state in jobs
+        ]
+        if not rows:
+            return 0
+        
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO scheduled_jobs (id, function_ref, state) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        
+        return len(rows)
+    
+    def delete_jobs(self, job_ids: Iterable[str]) -> int:
+        """
+        Delete jobs by ID.
+        
+        Args:
+            job_ids: IDs of the jobs to delete
+        
+        Returns:
+            Number of IDs processed
+        """
+        rows = [(job_id,) for job_id in job_ids]
+        if not rows:
+            return 0
+        
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("DELETE FROM scheduled_jobs WHERE id = ?", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        
+        return len(rows)
+    
+    def load_jobs(self) -> List[Tuple[str, str, bool, Optional[float], Any]]:
+        """
+        Load all stored jobs together with their scheduling state.
+        
+        Returns:
+            List of (job_id, function_ref, scheduled, next_run_timestamp, state) tuples.
+            ``scheduled`` is False when APScheduler no longer holds the job,
+            i.e. a one-shot job that already ran.
+        """
+        with self._lock:
+            has_schedule = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (self.schedule_table,)
+            ).fetchone()
+            
+            if has_schedule:
+                rows = self._conn.execute(
+                    f"SELECT s.id, s.function_ref, a.id IS NOT NULL, a.next_run_time, s.state "
+                    f"FROM scheduled_jobs s LEFT JOIN {self.schedule_table} a ON a.id = s.id"
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, function_ref, 0, NULL, state FROM scheduled_jobs"
+                ).fetchall()
+        
+        loads = pickle.loads
+        return [
+            (job_id, function_ref, bool(scheduled), next_run, loads(state))
+            for job_id, function_ref, scheduled, next_run, state in rows
+        ]
+    
+    def count(self) -> int:
+        """Return the number of stored jobs."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scheduled_jobs").fetchone()[0]
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
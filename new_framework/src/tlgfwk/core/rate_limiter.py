@@ -0,0 +1,323 @@
+"""
+Rate Limiting
+
+This module provides the GCRA (generic cell rate algorithm) rate limiter used
+by the rate_limit decorator. Each key costs O(1) time and memory: only its
+theoretical arrival time (TAT) is stored, and idle keys are evicted as soon as
+their TAT is in the past, since a fresh key behaves exactly the same.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Dict, Optional, Callable, Hashable
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RateLimitScope(Enum):
+    """Which updates share a rate limit."""
+    USER = "user"        # One limit per user
+    CHAT = "chat"        # One limit per chat
+    GLOBAL = "global"    # One limit for everybody
+
+
+class MemoryRateLimitBackend:
+    """
+    In-process store of theoretical arrival times.
+    
+    Keys are kept in update order, so idle keys are evicted from the front of
+    the order in amortized O(1) time. Updates do not await, so they are atomic
+    for handlers on the event loop; no lock is taken.
+    """
+    
+    # Updates are cheap enough to run on the event loop
+    blocking = False
+    
+    def __init__(self, evict_every: int = 256):
+        """
+        Initialize the backend.
+        
+        Args:
+            evict_every: Number of updates between evictions of idle keys
+        """
+        self._tat: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._updates = 0
+        self.evict_every = evict_every
+    
+    def update(self, key: Hashable, now: float, interval: float, tolerance: float) -> float:
+        """
+        Apply one GCRA step to a key.
+        
+        Args:
+            key: Rate limit key
+            now: Current time in seconds
+            interval: Emission interval (window / max_calls)
+            tolerance: Burst tolerance (window - interval)
+        
+        Returns:
+            0.0 if the call is allowed, otherwise seconds until it would be
+        """
+        tat = self._tat.get(key, now)
+        if tat < now:
+            tat = now
+        
+        retry_after = tat - tolerance - now
+        if retry_after > 0:
+            return retry_after
+        
+        self._tat[key] = tat + interval
+        self._tat.move_to_end(key)
+        
+        self._updates += 1
+        if self._updates >= self.evict_every:
+            self._updates = 0
+            self._evict(now)
+        return 0.0
+    
+    def _evict(self, now: float):
+        """Drop idle keys from the front of the update order."""
+        tat = self._tat
+        expired = []
+        for key, key_tat in tat.items():
+            if key_tat > now:
+                break
+            expired.append(key)
+        for key in expired:
+            del tat[key]
+    
+    def evict_expired(self, now: float = None) -> int:
+        """
+        Drop every idle key.
+        
+        Args:
+            now: Current time in seconds
+        
+        Returns:
+            Number of keys evicted
+        """
+        now = time.time() if now is None else now
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        return len(expired)
+    
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class SQLiteRateLimitBackend:
+    """
+    SQLite store of theoretical arrival times, shared by several processes.
+    
+    Each update is a single immediate transaction, so concurrent processes
+    never both consume the same slot. Updates wait at most ``busy_timeout``
+    seconds for another process holding the database; past that the call is
+    allowed (fail open) rather than delaying the bot.
+    """
+    
+    # Updates do I/O and may wait for a lock: RateLimiter runs them in a thread
+    blocking = True
+    
+    def __init__(self, path: str, sweep_interval: float = 60.0, busy_timeout: float = 0.25):
+        """
+        Initialize the backend.
+        
+        Args:
+            path: Path to the SQLite database file
+            sweep_interval: Seconds between deletions of idle keys
+            busy_timeout: Seconds an update waits for the database lock
+        """
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+        )
+    
+    def update(self, key: Hashable, now: float, interval: float, tolerance: float) -> float:
+        """
+        Apply one GCRA step to a key.
+        
+        Args:
+            key: Rate limit key
+            now: Current time in seconds
+            interval: Emission interval (window / max_calls)
+            tolerance: Burst tolerance (window - interval)
+        
+        Returns:
+            0.0 if the call is allowed (also when the database stays locked),
+            otherwise seconds until it would be
+        """
+        key = str(key)
+        with self._lock:
+            conn = self._conn
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Rate limit database busy, allowing {key}: {e}")
+                return 0.0
+            try:
+                row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                tat = max(row[0], now) if row else now
+                
+                retry_after = tat - tolerance - now
+                if retry_after <= 0:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)",
+                        (key, tat + interval)
+                    )
+                    retry_after = 0.0
+                
+                if now - self._last_sweep >= self.sweep_interval:
+                    conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                    self._last_sweep = now
+                
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        
+        return retry_after
+    
+    def evict_expired(self, now: float = None) -> int:
+        """Delete every idle key and return how many were deleted."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,)).rowcount
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter allowing ``max_calls`` per ``window`` seconds per key.
+    
+    Calls are spread over the window like a token bucket refilled one token
+    every ``window / max_calls`` seconds, with bursts of up to ``max_calls``.
+    """
+    
+    def __init__(
+        self,
+        max_calls: int,
+        window: float,
+        backend=None,
+        name: str = None,
+        time_func: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            max_calls: Calls allowed per window
+            window: Window length in seconds
+            backend: Store of key state (in-memory by default)
+            name: Prefix of keys in the backend, so limiters can share one
+            time_func: Clock returning the current time in seconds
+        """
+        if max_calls < 1 or window <= 0:
+            raise ValueError("max_calls must be at least 1 and window must be positive")
+        
+        self.max_calls = max_calls
+        self.window = window
+        self.interval = window / max_calls
+        self.tolerance = window - self.interval
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self.name = name
+        self.time = time_func
+    
+    def acquire(self, key: Hashable) -> float:
+        """
+        Try to use one call for a key.
+        
+        Args:
+            key: Rate limit key (user ID, chat ID, ...)
+        
+        Returns:
+            0.0 if the call is allowed, otherwise seconds until it would be
+        """
+        if self.name is not None:
+            key = f"{self.name}:{key}"
+        return self.backend.update(key, self.time(), self.interval, self.tolerance)
+    
+    async def acquire_async(self, key: Hashable) -> float:
+        """Like acquire, running blocking backends in a thread so the event loop never waits on them."""
+        if not getattr(self.backend, 'blocking', False):
+            return self.acquire(key)
+        return await asyncio.get_running_loop().run_in_executor(None, self.acquire, key)
+    
+    def allow(self, key: Hashable) -> bool:
+        """Check and consume one call for a key."""
+        return self.acquire(key) == 0.0
+
+
+# Named limiters shared by every command using the same name
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, max_calls: int, window: float, backend=None) -> RateLimiter:
+    """
+    Get or create a named rate limiter shared across commands.
+    
+    Args:
+        name: Limiter name
+        max_calls: Calls allowed per window
+        window: Window length in seconds
+        backend: Store of key state (in-memory by default)
+    
+    Returns:
+        The shared RateLimiter
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = RateLimiter(max_calls, window, backend=backend, name=name)
+        elif (limiter.max_calls, limiter.window) != (max_calls, window):
+            logger.warning(
+                f"Rate limiter '{name}' already exists with {limiter.max_calls}/{limiter.window}s; "
+                f"ignoring {max_calls}/{window}s"
+            )
+        return limiter
+
+
+def rate_limit_key(update, scope: RateLimitScope) -> Optional[Hashable]:
+    """
+    Get the rate limit key of an update for a scope.
+    
+    Args:
+        update: Telegram update
+        scope: Rate limit scope
+    
+    Returns:
+        Key, or None when the update has no user/chat for the scope
+    """
+    if scope == RateLimitScope.GLOBAL:
+        return "global"
+    if scope == RateLimitScope.CHAT:
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat else None
+    user = getattr(update, 'effective_user', None)
+    return user.id if user else None
@@ -5,9 +5,17 @@ This module provides advanced job scheduling functionality for the Telegram Bot
 Built on APScheduler with persistence, monitoring, and Telegram integration.
 """
 
+import gc
+import heapq
 import json
 import uuid
-from datetime import datetime, timedelta
+import time
+import asyncio
+import inspect
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from typing import Dict, List, Optional, Any, Callable, Union
 from dataclasses import dataclass, asdict
@@ -15,7 +23,7 @@ import logging
 import traceback
 import pickle
 import base64
-from functools import wraps
+from functools import wraps, partial
 
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -28,11 +36,15 @@ try:
     from apscheduler.jobstores.memory import MemoryJobStore
     from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
     from apscheduler.executors.pool import ThreadPoolExecutor
+    from apscheduler.executors.asyncio import AsyncIOExecutor
     HAS_APSCHEDULER = True
 except ImportError:
     HAS_APSCHEDULER = False
 
 from ..utils.logger import get_logger
+from .job_store import FunctionRegistry, FunctionRegistryError, MisfirePolicy, SQLiteJobStore
+from .job_stats import JobRunHistory, JobStatistics
+from .job_lease import LeaseManager
 
 
 class JobStatus(Enum):
@@ -53,6 +65,13 @@ class TriggerType(Enum):
     CRON = "cron"
 
 
+class ExecutorType(Enum):
+    """Job executor type enumeration."""
+    ASYNC = "async"      # Coroutine jobs, run on the bot's event loop
+    THREAD = "thread"    # Blocking jobs, run on the thread pool
+    PROCESS = "process"  # CPU-heavy jobs, run on the process pool
+
+
 @dataclass
 class JobInfo:
     """Job information container."""
@@ -74,6 +93,12 @@ class JobInfo:
     user_id: Optional[int] = None
     chat_id: Optional[int] = None
     metadata: Dict[str, Any] = None
+    executor: ExecutorType = ExecutorType.THREAD
+    function_ref: Optional[str] = None
+    misfire_policy: MisfirePolicy = MisfirePolicy.RUN_ONCE
+    last_duration: Optional[float] = None
+    last_queue_delay: Optional[float] = None
+    total_duration: float = 0.0
     
     def __post_init__(self):
         if self.metadata is None:
@@ -111,9 +136,14 @@ def scheduled_job(
         **trigger_kwargs: Trigger-specific parameters
     """
     def decorator(func: Callable):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func(*args, **kwargs)
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(*args, **kwargs)
         
         # Store job metadata on function
         wrapper._job_config = {
@@ -129,7 +159,26 @@ def scheduled_job(
     return decorator
 
 
+# Schedulers by name, so durable jobs stored by APScheduler can find theirs
+_schedulers: "weakref.WeakValueDictionary[str, JobScheduler]" = weakref.WeakValueDictionary()
+
+
+def _get_named_scheduler(scheduler_name: str) -> "JobScheduler":
+    """Get a live scheduler by name."""
+    scheduler = _schedulers.get(scheduler_name)
+    if scheduler is None:
+        raise RuntimeError(f"Job scheduler not found: {scheduler_name}")
+    return scheduler
+
+
+def run_durable_job(scheduler_name: str, job_id: str):
+    """Entry point of durable blocking jobs (importable, so APScheduler can store it)."""
+    return _get_named_scheduler(scheduler_name)._execute_job_wrapper(job_id)
+
 
+async def run_durable_job_async(scheduler_name: str, job_id: str):
+    """Entry point of durable coroutine and process pool jobs."""
+    return await _get_named_scheduler(scheduler_name)._execute_async_job_wrapper(job_id)
 
 
 class JobScheduler:
@@ -152,12 +201,44 @@ class JobScheduler:
         
         self.bot = bot_instance
         self.config = config or {}
+        self.name = self.config.get('name', 'default')
         self.logger = get_logger(__name__)
         
         # Job storage
         self.jobs: Dict[str, JobInfo] = {}
         self.job_functions: Dict[str, Callable] = {}
         
+        # Statistics, kept up to date on each job state transition
+        self.stats = JobStatistics()
+        self.job_history: Dict[str, JobRunHistory] = {}
+        self.history_size = self.config.get('job_history_size', 50)
+        
+        # Finished one-shot jobs ordered by last run time, for eviction
+        self._finished_jobs: List[tuple] = []
+        self._finished_lock = threading.Lock()
+        self.max_finished_jobs = self.config.get('max_finished_jobs', 1000)
+        
+        # Event loop used by coroutine jobs (set on start)
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Durable job storage (opened on first use)
+        self.function_registry = FunctionRegistry()
+        self.job_store: Optional[SQLiteJobStore] = None
+        self._dirty_jobs: set = set()
+        self._dirty_lock = threading.Lock()
+        
+        # Coordination with other instances sharing the workload (optional)
+        self.lease_manager: Optional[LeaseManager] = None
+        if self.config.get('lease_url'):
+            self.lease_manager = LeaseManager(
+                self.config['lease_url'],
+                instance_id=self.config.get('instance_id'),
+                lease_ttl=self.config.get('lease_ttl', 30.0)
+            )
+        
+        # Maintenance jobs run on every instance
+        self._local_jobs: set = set()
+        
         # Event callbacks
         self.job_callbacks: Dict[str, List[Callable]] = {
             'job_added': [],
@@ -168,6 +249,7 @@ class JobScheduler:
         
         # Initialize scheduler
         self._initialize_scheduler()
+        _schedulers[self.name] = self
         
         self.logger.info("Job scheduler initialized")
     
@@ -187,25 +269,46 @@ class JobScheduler:
             except Exception as e:
                 self.logger.warning(f"Failed to configure persistent job store: {e}")
         
-        # Configure executors
-        executors = {
-            'default': ThreadPoolExecutor(max_workers=self.config.get('max_workers', 20)),
-        }
+        # Durable jobs keep their triggers and next run times in APScheduler's
+        # SQLAlchemy store, next to the framework's job information
+        if self.config.get('job_store_path'):
+            jobstores['durable'] = SQLAlchemyJobStore(url=f"sqlite:///{self.config['job_store_path']}")
+        
+        # Configure executors: coroutine jobs run on the event loop, blocking
+        # jobs on a dedicated thread pool
+        self.async_mode = self.config.get('async_mode', True)
+        thread_pool = ThreadPoolExecutor(max_workers=self.config.get('max_workers', 20))
+        if self.async_mode:
+            executors = {
+                'default': AsyncIOExecutor(),
+                'threadpool': thread_pool,
+            }
+        else:
+            executors = {
+                'default': thread_pool,
+            }
+        
+        # Process pool for CPU-heavy jobs, created on first use
+        self.process_pool = None
         
         # Job defaults
         job_defaults = {
             'coalesce': True,
             'max_instances': 1,
-            'misfire_grace_time': 30
+            'misfire_grace_time': self.config.get('misfire_grace_time', 30)
         }
         
         # Choose scheduler type based on bot's async mode
-        if self.config.get('async_mode', True):
+        if self.async_mode:
+            scheduler_options = {}
+            if self.config.get('event_loop'):
+                scheduler_options['event_loop'] = self.config['event_loop']
             self.scheduler = AsyncIOScheduler(
                 jobstores=jobstores,
                 executors=executors,
                 job_defaults=job_defaults,
-                timezone='UTC'
+                timezone='UTC',
+                **scheduler_options
             )
         else:
             self.scheduler = BackgroundScheduler(
@@ -224,15 +327,38 @@ class JobScheduler:
     def start(self):
         """Start the scheduler."""
         if not self.scheduler.running:
+            # Load jobs from persistent storage before any of them can run
+            self._load_jobs_from_storage()
+            
+            # Know which jobs this instance owns before the first run
+            self._renew_leases()
+            
             self.scheduler.start()
+            self._event_loop = self._get_event_loop()
+            self._sync_next_run_times()
             self.logger.info("Job scheduler started")
             
-            # Load jobs from persistent storage
-            self._load_jobs_from_storage()
-            
             # Register built-in maintenance jobs
             self._register_maintenance_jobs()
     
+    def _sync_next_run_times(self):
+        """Copy next run times computed by APScheduler into in-memory job infos."""
+        for apscheduler_job in self.scheduler.get_jobs(jobstore='default'):
+            job_info = self.jobs.get(apscheduler_job.id)
+            if job_info:
+                job_info.next_run_time = apscheduler_job.next_run_time
+    
+    def _get_event_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """Get the event loop coroutine jobs and notifications run on."""
+        loop = getattr(self.scheduler, '_eventloop', None)
+        if loop:
+            return loop
+        
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return self.config.get('event_loop')
+    
     def stop(self):
         """Stop the scheduler."""
         if self.scheduler.running:
@@ -241,6 +367,21 @@ class JobScheduler:
             
             self.scheduler.shutdown(wait=True)
             self.logger.info("Job scheduler stopped")
+        
+        # Hand our jobs over to the other instances right away
+        if self.lease_manager:
+            try:
+                self.lease_manager.release_all()
+            except Exception as e:
+                self.logger.warning(f"Failed to release job leases: {e}")
+        
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False)
+            self.process_pool = None
+        
+        if self.job_store:
+            self.job_store.close()
+            self.job_store = None
     
     def add_job(
         self,
@@ -252,6 +393,10 @@ class JobScheduler:
         user_id: int = None,
         chat_id: int = None,
         replace_existing: bool = False,
+        executor: Union[str, ExecutorType] = None,
+        misfire_policy: Union[str, MisfirePolicy] = None,
+        persistent: bool = None,
+        lease_key: str = None,
         **trigger_kwargs
     ) -> JobInfo:
         """
@@ -266,6 +411,16 @@ class JobScheduler:
             chat_id: Associated chat ID
             job_id: Custom job ID
             replace_existing: Replace existing job with same ID
+            executor: Executor type (async, thread, process); detected
+                from the function when omitted
+            misfire_policy: What to do with runs missed while the bot was
+                down (skip, run_once, catch_up)
+            persistent: Store the job so it survives restarts. Defaults to
+                storing it when a job store is configured and the function
+                is importable; True raises if it is not
+            lease_key: Lease shared with other jobs when several instances
+                share the workload, e.g. lease_bucket(host, n); defaults
+                to the job ID
             **trigger_kwargs: Trigger-specific parameters
             
         Returns:
@@ -287,25 +442,15 @@ class JobScheduler:
             # Create trigger
             trigger_obj = self._create_trigger(trigger, trigger_kwargs)
             
-            # Register function
-            func_name = f"job_func_{job_id}"
-            self.job_functions[func_name] = func
+            # Pick the executor for the job
+            executor = self._resolve_executor(func, executor)
             
-            # Add job to scheduler
-            apscheduler_job = self.scheduler.add_job(
-                func=self._execute_job_wrapper,
-                trigger=trigger_obj,
-                id=job_id,
-                name=name or func.__name__,
-                args=[job_id],
-                replace_existing=replace_existing
-            )
-            
-            # Create job info - handle next_run_time safely
-            try:
-                next_run = getattr(apscheduler_job, 'next_run_time', None)
-            except AttributeError:
-                next_run = None
+            # Resolve the misfire policy and the durable function reference
+            if misfire_policy is None:
+                misfire_policy = self.config.get('misfire_policy', MisfirePolicy.RUN_ONCE)
+            if isinstance(misfire_policy, str):
+                misfire_policy = MisfirePolicy(misfire_policy.lower())
+            function_ref = self._get_function_reference(func, persistent)
             
             job_info = JobInfo(
                 id=job_id,
@@ -313,18 +458,26 @@ class JobScheduler:
                 description=description,
                 trigger_type=trigger,
                 trigger_config=trigger_kwargs,
-                function_name=func_name,
+                function_name=f"job_func_{job_id}",
                 args=[],
                 kwargs={},
                 status=JobStatus.SCHEDULED,
                 created_at=datetime.now(),
-                next_run_time=next_run,
                 user_id=user_id,
-                chat_id=chat_id
+                chat_id=chat_id,
+                executor=executor,
+                function_ref=function_ref,
+                misfire_policy=misfire_policy
             )
+            if lease_key:
+                job_info.metadata['lease_key'] = lease_key
             
-            # Store job info
-            self.jobs[job_id] = job_info
+            # Add job to scheduler
+            self._schedule_job(job_info, func, trigger_obj, replace_existing=replace_existing)
+            
+            # Persist durable jobs right away
+            if function_ref:
+                self._persist_jobs([job_info])
             
             self.logger.info(f"Job added: {job_id} ({name})")
             return job_info
@@ -350,12 +503,16 @@ class JobScheduler:
             # Remove from storage
             if job_id in self.jobs:
                 job_info = self.jobs[job_id]
-                job_info.status = JobStatus.CANCELLED
-                del self.jobs[job_id]
+                self._set_status(job_info, JobStatus.CANCELLED)
+                self._untrack_job(job_id)
                 
                 # Clean up function reference
                 if job_info.function_name in self.job_functions:
                     del self.job_functions[job_info.function_name]
+                
+                # Remove from durable storage
+                if job_info.function_ref and self._get_job_store():
+                    self.job_store.delete_jobs([job_id])
             
             self.logger.info(f"Job removed: {job_id}")
             return True
@@ -378,7 +535,8 @@ class JobScheduler:
             self.scheduler.pause_job(job_id)
             
             if job_id in self.jobs:
-                self.jobs[job_id].status = JobStatus.PAUSED
+                self._set_status(self.jobs[job_id], JobStatus.PAUSED)
+                self._persist_jobs([self.jobs[job_id]])
             
             self.logger.info(f"Job paused: {job_id}")
             return True
@@ -401,12 +559,14 @@ class JobScheduler:
             self.scheduler.resume_job(job_id)
             
             if job_id in self.jobs:
-                self.jobs[job_id].status = JobStatus.SCHEDULED
+                self._set_status(self.jobs[job_id], JobStatus.SCHEDULED)
                 
                 # Update next run time
                 apscheduler_job = self.scheduler.get_job(job_id)
                 if apscheduler_job:
                     self.jobs[job_id].next_run_time = apscheduler_job.next_run_time
+                
+                self._persist_jobs([self.jobs[job_id]])
             
             self.logger.info(f"Job resumed: {job_id}")
             return True
@@ -438,6 +598,8 @@ class JobScheduler:
                 apscheduler_job = self.scheduler.get_job(job_id)
                 if apscheduler_job:
                     job_info.next_run_time = apscheduler_job.next_run_time
+                
+                self._persist_jobs([job_info])
             
             self.logger.info(f"Job modified: {job_id}")
             return True
@@ -492,7 +654,10 @@ class JobScheduler:
                 "last_error": job_info.last_error,
                 "user_id": job_info.user_id,
                 "chat_id": job_info.chat_id,
-                "metadata": job_info.metadata
+                "metadata": job_info.metadata,
+                "executor": job_info.executor.value,
+                "last_duration": job_info.last_duration,
+                "last_queue_delay": job_info.last_queue_delay
             }
         return None
     
@@ -519,7 +684,10 @@ class JobScheduler:
                 "last_error": job_info.last_error,
                 "user_id": job_info.user_id,
                 "chat_id": job_info.chat_id,
-                "metadata": job_info.metadata
+                "metadata": job_info.metadata,
+                "executor": job_info.executor.value,
+                "last_duration": job_info.last_duration,
+                "last_queue_delay": job_info.last_queue_delay
             })
         return jobs_list
     
@@ -570,7 +738,10 @@ class JobScheduler:
                 raise ValueError(f"Job {job_id} not found")
             
             # Execute job
-            apscheduler_job.modify(next_run_time=datetime.now())
+            run_time = datetime.now(timezone.utc)
+            apscheduler_job.modify(next_run_time=run_time)
+            if job_id in self.jobs:
+                self.jobs[job_id].next_run_time = run_time
             
             self.logger.info(f"Job scheduled for immediate execution: {job_id}")
             return True
@@ -641,81 +812,496 @@ class JobScheduler:
         else:
             raise ValueError(f"Unsupported trigger type: {trigger_type}")
     
-    def _execute_job_wrapper(self, job_id: str):
-        """Wrapper for job execution with error handling and logging."""
+    def _misfire_options(self, policy: MisfirePolicy) -> Dict[str, Any]:
+        """Map a misfire policy to APScheduler job options."""
+        if policy == MisfirePolicy.CATCH_UP:
+            return {'coalesce': False, 'misfire_grace_time': None}
+        if policy == MisfirePolicy.RUN_ONCE:
+            return {'coalesce': True, 'misfire_grace_time': None}
+        return {'coalesce': True, 'misfire_grace_time': self.config.get('misfire_grace_time', 30)}
+    
+    def _schedule_job(
+        self,
+        job_info: JobInfo,
+        func: Callable,
+        trigger_obj,
+        replace_existing: bool = False,
+        **job_options
+    ):
+        """Add a job described by a JobInfo to APScheduler."""
+        wrapper, executor_alias = self._get_job_wrapper(job_info.executor)
+        options = self._misfire_options(job_info.misfire_policy)
+        options.update(job_options)
+        
+        if job_info.function_ref and self.config.get('job_store_path'):
+            # Stored by APScheduler, so the entry point must be importable
+            if wrapper == self._execute_job_wrapper:
+                wrapper = run_durable_job
+            else:
+                wrapper = run_durable_job_async
+            options['jobstore'] = 'durable'
+            args = [self.name, job_info.id]
+        else:
+            args = [job_info.id]
+        
+        apscheduler_job = self.scheduler.add_job(
+            func=wrapper,
+            trigger=trigger_obj,
+            id=job_info.id,
+            name=job_info.name,
+            args=args,
+            executor=executor_alias,
+            replace_existing=replace_existing,
+            **options
+        )
+        
+        # Register function and job info
+        self.job_functions[job_info.function_name] = func
+        job_info.next_run_time = getattr(apscheduler_job, 'next_run_time', None)
+        self._track_job(job_info)
+        
+        return apscheduler_job
+    
+    def _get_function_reference(self, func: Callable, persistent: Optional[bool]) -> Optional[str]:
+        """Get the durable reference of a job function, if the job is persistent."""
+        if persistent is False:
+            return None
+        if persistent is None and not self.config.get('job_store_path'):
+            return None
+        
+        try:
+            return self.function_registry.register(func)
+        except FunctionRegistryError as e:
+            if persistent:
+                raise
+            self.logger.debug(f"Job will not survive restarts: {e}")
+            return None
+    
+    def _get_job_store(self) -> Optional[SQLiteJobStore]:
+        """Get the durable job store, opening it on first use."""
+        if self.job_store is None and self.config.get('job_store_path'):
+            self.job_store = SQLiteJobStore(self.config['job_store_path'])
+            self.logger.info(f"Durable job store opened: {self.job_store.path}")
+        return self.job_store
+    
+    @staticmethod
+    def _job_record(job_info: JobInfo):
+        """Serialize a durable job for the job store (see _load_jobs_from_storage)."""
+        state = (
+            job_info.name,
+            job_info.description,
+            job_info.trigger_type.value,
+            job_info.trigger_config,
+            job_info.args,
+            job_info.kwargs,
+            job_info.created_at.timestamp(),
+            job_info.run_count,
+            job_info.error_count,
+            job_info.last_error,
+            job_info.user_id,
+            job_info.chat_id,
+            job_info.metadata,
+            job_info.executor.value,
+            job_info.misfire_policy.value,
+        )
+        
+        return job_info.id, job_info.function_ref, state
+    
+    def _persist_jobs(self, jobs: List[JobInfo]):
+        """Write durable jobs to the job store."""
+        records = [self._job_record(job_info) for job_info in jobs if job_info.function_ref]
+        if not records or not self._get_job_store():
+            return
+        
+        try:
+            self.job_store.save_jobs(records)
+        except Exception as e:
+            self.logger.error(f"Failed to persist jobs: {e}")
+    
+    @staticmethod
+    def _is_finished(job_info: JobInfo) -> bool:
+        """Check whether a job ran and has no further run scheduled."""
+        return (
+            job_info.next_run_time is None and
+            job_info.status in [JobStatus.COMPLETED, JobStatus.FAILED]
+        )
+    
+    def _flush_job_store(self):
+        """Write back run bookkeeping of durable jobs that ran since the last flush."""
+        if not self.job_store:
+            return
+        
+        with self._dirty_lock:
+            dirty, self._dirty_jobs = self._dirty_jobs, set()
+        
+        to_save, to_delete = [], []
+        for job_id in dirty:
+            job_info = self.jobs.get(job_id)
+            if job_info and not self._is_finished(job_info):
+                to_save.append(job_info)
+            else:
+                # One-shot job finished or job was removed
+                to_delete.append(job_id)
+        
+        try:
+            self._persist_jobs(to_save)
+            self.job_store.delete_jobs(to_delete)
+        except Exception as e:
+            self.logger.error(f"Failed to flush job store: {e}")
+    
+    def _resolve_executor(self, func: Callable, executor: Union[str, ExecutorType, None]) -> ExecutorType:
+        """Determine which executor should run a job function."""
+        if executor is None:
+            target = func
+            while isinstance(target, partial):
+                target = target.func
+            if asyncio.iscoroutinefunction(target):
+                return ExecutorType.ASYNC
+            return ExecutorType.THREAD
+        
+        if isinstance(executor, str):
+            executor = ExecutorType(executor.lower())
+        
+        if executor == ExecutorType.PROCESS:
+            if asyncio.iscoroutinefunction(func):
+                raise ValueError("Coroutine jobs cannot run in the process pool")
+            try:
+                pickle.dumps(func)
+            except Exception as e:
+                raise ValueError(f"Process pool jobs must be picklable module-level functions: {e}")
+        
+        return executor
+    
+    def _get_job_wrapper(self, executor: ExecutorType):
+        """Return the execution wrapper and APScheduler executor alias for a job."""
+        if not self.async_mode:
+            return self._execute_job_wrapper, 'default'
+        
+        if executor == ExecutorType.THREAD:
+            return self._execute_job_wrapper, 'threadpool'
+        
+        # Coroutine jobs run on the event loop; process jobs are awaited from it
+        return self._execute_async_job_wrapper, 'default'
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Get the process pool, creating it on first use."""
+        if self.process_pool is None:
+            max_workers = self.config.get('process_pool_workers') or None
+            self.process_pool = ProcessPoolExecutor(max_workers=max_workers)
+        return self.process_pool
+    
+    def _get_job_function(self, job_info: JobInfo) -> Callable:
+        """Get the registered function for a job."""
+        func = self.job_functions.get(job_info.function_name)
+        if not func and job_info.function_ref:
+            # Restored durable job, resolved on its first run
+            func = self.job_functions[job_info.function_name] = self.function_registry.resolve(job_info.function_ref)
+        if not func:
+            raise ValueError(f"Job function not found: {job_info.function_name}")
+        return func
+    
+    @staticmethod
+    def _compute_queue_delay(scheduled_time: Optional[datetime]) -> Optional[float]:
+        """Seconds elapsed between the scheduled run time and now."""
+        if scheduled_time is None:
+            return None
+        
+        if scheduled_time.tzinfo:
+            now = datetime.now(scheduled_time.tzinfo)
+        else:
+            now = datetime.now()
+        
+        return max(0.0, (now - scheduled_time).total_seconds())
+    
+    def _begin_job_run(self, job_id: str) -> Optional[JobInfo]:
+        """Mark a job as running and record its queue delay."""
         job_info = self.jobs.get(job_id)
         if not job_info:
             self.logger.error(f"Job info not found for job: {job_id}")
-            return
+            return None
         
-        start_time = datetime.now()
-        job_info.status = JobStatus.RUNNING
-        job_info.last_run_time = start_time
+        if not self._owns_job(job_info):
+            self.logger.debug(f"Job {job_id} is leased by another instance, skipping run")
+            return None
+        
+        job_info.last_queue_delay = self._compute_queue_delay(job_info.next_run_time)
+        self._set_status(job_info, JobStatus.RUNNING)
+        job_info.last_run_time = datetime.now()
         job_info.run_count += 1
+        self.stats.record_run()
         
+        return job_info
+    
+    def _record_job_duration(self, job_info: JobInfo, started: float):
+        """Record the wall time of a job run."""
+        duration = time.perf_counter() - started
+        job_info.last_duration = duration
+        job_info.total_duration += duration
+    
+    def _record_job_success(self, job_info: JobInfo, result: Any):
+        """Update job state after a successful run."""
+        self._set_status(job_info, JobStatus.COMPLETED)
+        job_info.last_error = None
+        
+        # Trigger callbacks
+        self._trigger_callbacks('job_executed', JobResult(True, job_info, result))
+        
+        self.logger.info(f"Job executed successfully: {job_info.id} ({job_info.last_duration:.3f}s)")
+    
+    def _record_job_failure(self, job_info: JobInfo, error: Exception):
+        """Update job state after a failed run."""
+        self._set_status(job_info, JobStatus.FAILED)
+        job_info.error_count += 1
+        job_info.last_error = str(error)
+        self.stats.record_error()
+        
+        # Trigger callbacks
+        self._trigger_callbacks('job_error', JobResult(False, job_info, error=str(error)))
+        
+        self.logger.error(f"Job execution failed: {job_info.id} - {error}")
+        self.logger.debug(traceback.format_exc())
+    
+    def _finish_job_run(self, job_id: str, job_info: JobInfo):
+        """Refresh the next run time and statistics once a job run is over."""
+        apscheduler_job = self.scheduler.get_job(job_id)
+        if apscheduler_job:
+            job_info.next_run_time = apscheduler_job.next_run_time
+        else:
+            # Job was removed or completed
+            job_info.next_run_time = None
+            if job_info.status not in [JobStatus.FAILED, JobStatus.COMPLETED]:
+                self._set_status(job_info, JobStatus.COMPLETED)
+        
+        self._record_job_history(job_info)
+        
+        # Finished one-shot jobs are evicted oldest first
+        if self._is_finished(job_info):
+            self._add_finished_job(job_info)
+        
+        # Durable jobs are written back to the store on the next flush
+        if job_info.function_ref:
+            with self._dirty_lock:
+                self._dirty_jobs.add(job_id)
+    
+    @staticmethod
+    def _lease_resource(job_info: JobInfo) -> str:
+        """Get the lease a job runs under."""
+        return job_info.metadata.get('lease_key') or job_info.id
+    
+    def _owns_job(self, job_info: JobInfo) -> bool:
+        """Check whether this instance should run a job."""
+        if not self.lease_manager or job_info.id in self._local_jobs:
+            return True
+        return self.lease_manager.owns(self._lease_resource(job_info))
+    
+    def _renew_leases(self):
+        """Renew the heartbeat and rebalance job leases with the other instances."""
+        if not self.lease_manager:
+            return
+        
+        resources = {
+            self._lease_resource(job_info)
+            for job_id, job_info in list(self.jobs.items())
+            if job_id not in self._local_jobs
+        }
+        try:
+            self.lease_manager.heartbeat(resources)
+        except Exception as e:
+            self.logger.error(f"Failed to renew job leases: {e}")
+    
+    def _track_job(self, job_info: JobInfo):
+        """Store a job and count it in the statistics."""
+        if job_info.id in self.jobs:
+            self._untrack_job(job_info.id)
+        
+        self.jobs[job_info.id] = job_info
+        self.stats.add_job(job_info.status, job_info.run_count, job_info.error_count)
+    
+    def _untrack_job(self, job_id: str) -> Optional[JobInfo]:
+        """Drop a job from storage and from the statistics."""
+        job_info = self.jobs.pop(job_id, None)
+        if job_info:
+            self.job_history.pop(job_id, None)
+            self.stats.remove_job(job_info.status, job_info.run_count, job_info.error_count)
+        return job_info
+    
+    def _set_status(self, job_info: JobInfo, status: JobStatus):
+        """Change the status of a job, keeping the status counters in sync."""
+        old_status = job_info.status
+        job_info.status = status
+        if self.jobs.get(job_info.id) is job_info:
+            self.stats.transition(old_status, status)
+    
+    def _record_job_history(self, job_info: JobInfo):
+        """Add the last run of a job to its history and the latency histograms."""
+        if self.jobs.get(job_info.id) is not job_info:
+            return
+        
+        history = self.job_history.get(job_info.id)
+        if history is None:
+            history = self.job_history[job_info.id] = JobRunHistory(self.history_size)
+        
+        failed = job_info.status == JobStatus.FAILED
+        history.record(
+            job_info.last_run_time,
+            job_info.last_duration,
+            job_info.last_queue_delay,
+            not failed,
+            job_info.last_error if failed else None
+        )
+        self.stats.record_timing(job_info.last_duration, job_info.last_queue_delay)
+    
+    def _add_finished_job(self, job_info: JobInfo):
+        """Queue a finished one-shot job for eviction, evicting the oldest over the limit."""
+        with self._finished_lock:
+            heapq.heappush(self._finished_jobs, (job_info.last_run_time, job_info.id))
+            while len(self._finished_jobs) > self.max_finished_jobs:
+                last_run_time, job_id = heapq.heappop(self._finished_jobs)
+                self._evict_finished_job(job_id, last_run_time)
+    
+    def _evict_finished_job(self, job_id: str, last_run_time: datetime) -> bool:
+        """Evict a job popped from the eviction heap, unless the entry is stale."""
+        job_info = self.jobs.get(job_id)
+        if (job_info is None or
+            job_info.last_run_time != last_run_time or
+            not self._is_finished(job_info)):
+            # Job was removed, replaced or rescheduled since it was queued
+            return False
+        
+        self._untrack_job(job_id)
+        self.job_functions.pop(job_info.function_name, None)
+        self.stats.evicted_jobs += 1
+        return True
+    
+    def _should_notify(self, job_info: JobInfo) -> bool:
+        """Check whether the job's chat should be notified about runs."""
+        return bool(job_info.chat_id) and hasattr(self.bot, 'send_message')
+    
+    async def _notify_job_chat(self, job_info: JobInfo, text: str):
+        """Send a job notification to the job's chat."""
+        try:
+            result = self.bot.send_message(job_info.chat_id, text)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            self.logger.warning(f"Failed to notify chat {job_info.chat_id} about job {job_info.id}: {e}")
+    
+    def _run_coroutine_blocking(self, coro):
+        """Run a coroutine from a worker thread and wait for its result."""
+        loop = self._event_loop
+        if loop and loop.is_running():
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
+            
+            if running_loop is loop:
+                # Cannot block the loop we are running on
+                return loop.create_task(coro)
+            
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+        
+        return asyncio.run(coro)
+    
+    def _execute_job_wrapper(self, job_id: str):
+        """Wrapper for blocking job execution with error handling and logging."""
+        job_info = self._begin_job_run(job_id)
+        if not job_info:
+            return
+        
+        started = time.perf_counter()
         try:
-            # Get job function
-            func = self.job_functions.get(job_info.function_name)
-            if not func:
-                raise ValueError(f"Job function not found: {job_info.function_name}")
+            func = self._get_job_function(job_info)
             
             # Execute function
-            result = func(*job_info.args, **job_info.kwargs)
-            
-            # Update status
-            job_info.status = JobStatus.COMPLETED
-            job_info.last_error = None
+            if job_info.executor == ExecutorType.PROCESS:
+                future = self._get_process_pool().submit(func, *job_info.args, **job_info.kwargs)
+                result = future.result()
+            else:
+                result = func(*job_info.args, **job_info.kwargs)
             
-            # Create result
-            job_result = JobResult(True, job_info, result)
+            if inspect.isawaitable(result):
+                result = self._run_coroutine_blocking(result)
             
-            # Trigger callbacks
-            self._trigger_callbacks('job_executed', job_result)
+            self._record_job_duration(job_info, started)
+            self._record_job_success(job_info, result)
             
             # Notify user if configured
-            if job_info.chat_id and hasattr(self.bot, 'send_message'):
-                self.bot.send_message(
-                    job_info.chat_id,
+            if self._should_notify(job_info):
+                self._run_coroutine_blocking(self._notify_job_chat(
+                    job_info,
                     f"✅ Job '{job_info.name}' completed successfully"
-                )
+                ))
             
-            self.logger.info(f"Job executed successfully: {job_id}")
             return result
             
         except Exception as e:
-            # Update error status
-            job_info.status = JobStatus.FAILED
-            job_info.error_count += 1
-            job_info.last_error = str(e)
+            if job_info.status == JobStatus.RUNNING:
+                self._record_job_duration(job_info, started)
+            self._record_job_failure(job_info, e)
             
-            # Create error result
-            job_result = JobResult(False, job_info, error=str(e))
+            # Notify user if configured
+            if self._should_notify(job_info):
+                self._run_coroutine_blocking(self._notify_job_chat(
+                    job_info,
+                    f"❌ Job '{job_info.name}' failed: {str(e)}"
+                ))
             
-            # Trigger callbacks
-            self._trigger_callbacks('job_error', job_result)
+            raise
+        
+        finally:
+            self._finish_job_run(job_id, job_info)
+    
+    async def _execute_async_job_wrapper(self, job_id: str):
+        """Wrapper for coroutine and process pool jobs, run on the event loop."""
+        job_info = self._begin_job_run(job_id)
+        if not job_info:
+            return
+        
+        started = time.perf_counter()
+        try:
+            func = self._get_job_function(job_info)
+            
+            # Execute function
+            if job_info.executor == ExecutorType.PROCESS:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._get_process_pool(),
+                    partial(func, *job_info.args, **job_info.kwargs)
+                )
+            else:
+                result = func(*job_info.args, **job_info.kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+            
+            self._record_job_duration(job_info, started)
+            self._record_job_success(job_info, result)
             
             # Notify user if configured
-            if job_info.chat_id and hasattr(self.bot, 'send_message'):
-                self.bot.send_message(
-                    job_info.chat_id,
-                    f"❌ Job '{job_info.name}' failed: {str(e)}"
+            if self._should_notify(job_info):
+                await self._notify_job_chat(
+                    job_info,
+                    f"✅ Job '{job_info.name}' completed successfully"
                 )
             
-            self.logger.error(f"Job execution failed: {job_id} - {e}")
-            self.logger.debug(traceback.format_exc())
+            return result
+            
+        except Exception as e:
+            if job_info.status == JobStatus.RUNNING:
+                self._record_job_duration(job_info, started)
+            self._record_job_failure(job_info, e)
+            
+            # Notify user if configured
+            if self._should_notify(job_info):
+                await self._notify_job_chat(
+                    job_info,
+                    f"❌ Job '{job_info.name}' failed: {str(e)}"
+                )
             
             raise
         
         finally:
-            # Update next run time
-            apscheduler_job = self.scheduler.get_job(job_id)
-            if apscheduler_job:
-                job_info.next_run_time = apscheduler_job.next_run_time
-            else:
-                # Job was removed or completed
-                job_info.next_run_time = None
-                if job_info.status not in [JobStatus.FAILED, JobStatus.COMPLETED]:
-                    job_info.status = JobStatus.COMPLETED
+            self._finish_job_run(job_id, job_info)
     
     def _on_job_executed(self, event):
         """Handle job executed event."""
@@ -756,142 +1342,234 @@ class JobScheduler:
     def _register_maintenance_jobs(self):
         """Register built-in maintenance jobs."""
         # Job cleanup (remove old completed jobs)
-        self.add_job(
+        cleanup_job = self.add_job(
             func=self._cleanup_old_jobs,
             trigger=TriggerType.INTERVAL,
             name="job_cleanup",
             description="Clean up old completed jobs",
+            persistent=False,
             hours=6
         )
         
         # Statistics update
-        self.add_job(
+        stats_job = self.add_job(
             func=self._update_job_statistics,
             trigger=TriggerType.INTERVAL,
             name="job_stats",
             description="Update job statistics",
+            persistent=False,
             minutes=30
         )
+        self._local_jobs.update((cleanup_job.id, stats_job.id))
+        
+        # Write back run bookkeeping of durable jobs
+        if self.job_store:
+            flush_job = self.add_job(
+                func=self._flush_job_store,
+                trigger=TriggerType.INTERVAL,
+                name="job_store_flush",
+                description="Flush durable job state to the job store",
+                persistent=False,
+                seconds=self.config.get('job_store_flush_interval', 30)
+            )
+            self._local_jobs.add(flush_job.id)
+        
+        # Lease heartbeat, well within the lease TTL
+        if self.lease_manager:
+            lease_job = self.add_job(
+                func=self._renew_leases,
+                trigger=TriggerType.INTERVAL,
+                name="job_lease_heartbeat",
+                description="Renew job leases shared with other instances",
+                persistent=False,
+                seconds=self.config.get('lease_heartbeat_interval', self.lease_manager.lease_ttl / 3)
+            )
+            self._local_jobs.add(lease_job.id)
     
     def _cleanup_old_jobs(self):
         """Clean up old completed jobs."""
-        cutoff_time = datetime.now() - timedelta(days=7)
+        cutoff_time = datetime.now() - timedelta(days=self.config.get('finished_job_retention_days', 7))
         removed_count = 0
         
-        jobs_to_remove = []
-        for job_id, job_info in self.jobs.items():
-            if (job_info.status in [JobStatus.COMPLETED, JobStatus.FAILED] and
-                job_info.last_run_time and
-                job_info.last_run_time < cutoff_time):
-                jobs_to_remove.append(job_id)
-        
-        for job_id in jobs_to_remove:
-            del self.jobs[job_id]
-            removed_count += 1
+        # Only the heap head has to be inspected: entries are ordered by last run time
+        with self._finished_lock:
+            while self._finished_jobs and self._finished_jobs[0][0] < cutoff_time:
+                last_run_time, job_id = heapq.heappop(self._finished_jobs)
+                if self._evict_finished_job(job_id, last_run_time):
+                    removed_count += 1
         
         if removed_count > 0:
             self.logger.info(f"Cleaned up {removed_count} old jobs")
     
     def _update_job_statistics(self):
-        """Update job statistics."""
-        total_jobs = len(self.jobs)
-        scheduled_jobs = len([j for j in self.jobs.values() if j.status == JobStatus.SCHEDULED])
-        completed_jobs = len([j for j in self.jobs.values() if j.status == JobStatus.COMPLETED])
-        failed_jobs = len([j for j in self.jobs.values() if j.status == JobStatus.FAILED])
-        
+        """Log a snapshot of the job statistics."""
+        # Nothing to persist: the counts live in JobStatistics and the jobs in the job store
+        count = self.stats.count
         stats = {
-            'total': total_jobs,
-            'scheduled': scheduled_jobs,
-            'completed': completed_jobs,
-            'failed': failed_jobs,
+            'total': len(self.jobs),
+            'scheduled': count(JobStatus.SCHEDULED),
+            'completed': count(JobStatus.COMPLETED),
+            'failed': count(JobStatus.FAILED),
             'updated_at': datetime.now().isoformat()
         }
         
-        # Store statistics if persistence is available
-        if hasattr(self.bot, 'persistence'):
-            self.bot.persistence.save_bot_data('job_statistics', stats)
-        
         self.logger.debug(f"Job statistics updated: {stats}")
     
     def _save_jobs_to_storage(self):
-        """Save jobs to persistent storage."""
-        if hasattr(self.bot, 'persistence'):
-            try:
-                jobs_data = {}
-                for job_id, job_info in self.jobs.items():
-                    # Serialize job info
-                    job_data = asdict(job_info)
-                    
-                    # Serialize function if possible
-                    func = self.job_functions.get(job_info.function_name)
-                    if func and hasattr(func, '__name__'):
-                        job_data['function_module'] = getattr(func, '__module__', None)
-                        job_data['function_name_original'] = func.__name__
-                    
-                    jobs_data[job_id] = job_data
-                
-                self.bot.persistence.save_bot_data('scheduled_jobs', jobs_data)
-                self.logger.info(f"Saved {len(jobs_data)} jobs to persistent storage")
-                
-            except Exception as e:
-                self.logger.error(f"Failed to save jobs to storage: {e}")
+        """Save all durable jobs to the job store."""
+        if not self.job_store:
+            return
+        
+        with self._dirty_lock:
+            dirty, self._dirty_jobs = self._dirty_jobs, set()
+        
+        try:
+            durable_jobs = [
+                job_info for job_info in self.jobs.values()
+                if job_info.function_ref and not self._is_finished(job_info)
+            ]
+            self._persist_jobs(durable_jobs)
+            
+            # Finished one-shot jobs are no longer needed
+            durable_ids = {job_info.id for job_info in durable_jobs}
+            self.job_store.delete_jobs(job_id for job_id in dirty if job_id not in durable_ids)
+            self.logger.info(f"Saved {len(durable_jobs)} jobs to persistent storage")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to save jobs to storage: {e}")
     
     def _load_jobs_from_storage(self):
-        """Load jobs from persistent storage."""
-        if hasattr(self.bot, 'persistence'):
+        """
+        Restore durable jobs from the job store.
+        
+        Triggers and next run times live in APScheduler's durable job store,
+        which also replays missed runs according to each job's misfire
+        policy; only the job information is rebuilt here. Job functions are
+        resolved from their references on first run.
+        """
+        if not self._get_job_store():
+            return
+        
+        # Bulk allocation of job infos would otherwise trigger repeated
+        # full garbage collections
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._restore_jobs()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    
+    def _restore_jobs(self):
+        """Rebuild job information from the job store records."""
+        try:
+            records = self.job_store.load_jobs()
+        except Exception as e:
+            self.logger.error(f"Failed to load jobs from storage: {e}")
+            return
+        
+        loaded_count = 0
+        finished = []
+        
+        # Enum lookups by value, hoisted out of the loop
+        trigger_types = {t.value: t for t in TriggerType}
+        executors = {e.value: e for e in ExecutorType}
+        misfire_policies = {p.value: p for p in MisfirePolicy}
+        fromtimestamp = datetime.fromtimestamp
+        
+        for job_id, function_ref, scheduled, next_run_ts, state in records:
+            if job_id in self.jobs:
+                continue
+            
+            if not scheduled:
+                # One-shot job that already ran
+                finished.append(job_id)
+                continue
+            
             try:
-                jobs_data = self.bot.persistence.load_bot_data('scheduled_jobs')
-                if not jobs_data:
-                    return
-                
-                loaded_count = 0
-                for job_id, job_data in jobs_data.items():
-                    try:
-                        # Recreate job info
-                        job_info = JobInfo(**job_data)
-                        
-                        # Skip completed or failed jobs
-                        if job_info.status in [JobStatus.COMPLETED, JobStatus.FAILED]:
-                            continue
-                        
-                        # Try to restore function (simplified - would need more complex logic)
-                        # For now, we'll mark jobs as needing manual restoration
-                        job_info.status = JobStatus.PAUSED
-                        
-                        self.jobs[job_id] = job_info
-                        loaded_count += 1
-                        
-                    except Exception as e:
-                        self.logger.warning(f"Failed to restore job {job_id}: {e}")
+                (name, description, trigger_type, trigger_config, args, kwargs, created_at,
+                 run_count, error_count, last_error, user_id, chat_id, metadata,
+                 executor, misfire_policy) = state
                 
-                self.logger.info(f"Loaded {loaded_count} jobs from persistent storage")
+                self._track_job(JobInfo(
+                    id=job_id,
+                    name=name,
+                    description=description,
+                    trigger_type=trigger_types[trigger_type],
+                    trigger_config=trigger_config,
+                    function_name=f"job_func_{job_id}",
+                    args=args,
+                    kwargs=kwargs,
+                    # APScheduler keeps no next run time for paused jobs
+                    status=JobStatus.SCHEDULED if next_run_ts is not None else JobStatus.PAUSED,
+                    created_at=fromtimestamp(created_at),
+                    next_run_time=fromtimestamp(next_run_ts, timezone.utc) if next_run_ts is not None else None,
+                    run_count=run_count,
+                    error_count=error_count,
+                    last_error=last_error,
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    metadata=metadata,
+                    executor=executors[executor],
+                    function_ref=function_ref,
+                    misfire_policy=misfire_policies[misfire_policy]
+                ))
+                loaded_count += 1
                 
             except Exception as e:
-                self.logger.error(f"Failed to load jobs from storage: {e}")
+                self.logger.warning(f"Failed to restore job {job_id}: {e}")
+        
+        if finished:
+            self.job_store.delete_jobs(finished)
+        
+        self.logger.info(f"Loaded {loaded_count} jobs from persistent storage")
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get job statistics."""
+        count = self.stats.count
         stats = {
             'total_jobs': len(self.jobs),
-            'scheduled': len([j for j in self.jobs.values() if j.status == JobStatus.SCHEDULED]),
-            'running': len([j for j in self.jobs.values() if j.status == JobStatus.RUNNING]),
-            'completed': len([j for j in self.jobs.values() if j.status == JobStatus.COMPLETED]),
-            'failed': len([j for j in self.jobs.values() if j.status == JobStatus.FAILED]),
-            'paused': len([j for j in self.jobs.values() if j.status == JobStatus.PAUSED]),
-            'cancelled': len([j for j in self.jobs.values() if j.status == JobStatus.CANCELLED]),
+            'scheduled': count(JobStatus.SCHEDULED),
+            'running': count(JobStatus.RUNNING),
+            'completed': count(JobStatus.COMPLETED),
+            'failed': count(JobStatus.FAILED),
+            'paused': count(JobStatus.PAUSED),
+            'cancelled': count(JobStatus.CANCELLED),
             'scheduler_running': self.scheduler.running,
         }
         
-        # Calculate total runs and errors
-        total_runs = sum(job.run_count for job in self.jobs.values())
-        total_errors = sum(job.error_count for job in self.jobs.values())
+        # Total runs and errors of the current jobs
+        total_runs = self.stats.total_runs
+        total_errors = self.stats.total_errors
         
         stats['total_runs'] = total_runs
         stats['total_errors'] = total_errors
         stats['success_rate'] = (total_runs - total_errors) / total_runs if total_runs > 0 else 0
+        stats['evicted_jobs'] = self.stats.evicted_jobs
+        stats['duration'] = self.stats.durations.to_dict()
+        stats['queue_delay'] = self.stats.queue_delays.to_dict()
+        
+        if self.lease_manager:
+            stats['instance_id'] = self.lease_manager.instance_id
+            stats['held_leases'] = len(self.lease_manager.held)
         
         return stats
     
+    def get_job_history(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the recent runs and latency histograms of a job.
+        
+        Args:
+            job_id: Job ID to get the history for
+            
+        Returns:
+            Dictionary with the recent runs and histograms or None if not found
+        """
+        history = self.job_history.get(job_id)
+        if history is None:
+            return None
+        return history.to_dict()
+    
     @property
     def running(self) -> bool:
         """Check if scheduler is running."""
@@ -6,6 +6,8 @@ This module contains utility functions and classes for the Telegram Bot Framewor
 
 from .logger import get_logger, setup_logging, TelegramLogHandler, PerformanceLogger
 from .crypto import CryptoUtils, EnvCrypto, generate_encryption_key, create_secure_token
+from .metrics import MetricsRegistry, MetricsServer
+from .tracing import Tracer, Profiler, StackSampler, get_tracer
 
 __all__ = [
     # Logging utilities
@@ -14,6 +16,16 @@ __all__ = [
     'TelegramLogHandler',
     'PerformanceLogger',
     
+    # Metrics
+    'MetricsRegistry',
+    'MetricsServer',
+    
+    # Tracing and profiling
+    'Tracer',
+    'Profiler',
+    'StackSampler',
+    'get_tracer',
+    
     # Cryptography utilities
     'CryptoUtils',
     'EnvCrypto',
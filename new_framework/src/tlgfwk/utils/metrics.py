@@ -0,0 +1,411 @@
+"""
+Metrics
+
+Counters, gauges and histograms exposed in the OpenMetrics text format, the
+format Prometheus scrapes, and a small HTTP server serving them.
+
+Updates take no lock: every thread adds to its own cell of a series and
+reading a series sums the cells. On the event loop thread an update is a
+dict lookup and an addition.
+"""
+
+import asyncio
+import math
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import get_ident
+from time import perf_counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .logger import get_logger
+
+
+# Upper bounds (seconds) of the histogram buckets; the +Inf bucket is implicit
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+logger = get_logger("tlgfwk.metrics")
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value or bucket bound."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class _Cells:
+    """Per-thread cells of one series, each only written by its thread."""
+
+    __slots__ = ('_cells', '_size')
+
+    def __init__(self, size: int = 1):
+        self._cells: Dict[int, List[float]] = {}
+        self._size = size
+
+    def cell(self) -> List[float]:
+        """The cell of the calling thread."""
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), [0.0] * self._size)
+        return cell
+
+    def totals(self) -> List[float]:
+        """Sum of the cells of all threads."""
+        totals = [0.0] * self._size
+        for cell in list(self._cells.values()):
+            for index, value in enumerate(cell):
+                totals[index] += value
+        return totals
+
+
+class CounterChild:
+    """One series of a counter."""
+
+    __slots__ = ('_cells',)
+
+    def __init__(self):
+        self._cells = _Cells()
+
+    def inc(self, amount: float = 1.0):
+        """Increase the counter."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self._cells.cell()[0] += amount
+
+    def get(self) -> float:
+        """Current value."""
+        return self._cells.totals()[0]
+
+
+class GaugeChild:
+    """One series of a gauge."""
+
+    __slots__ = ('_cells', '_base', '_function')
+
+    def __init__(self):
+        self._cells = _Cells()
+        self._base = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        """Increase the gauge."""
+        self._cells.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        """Decrease the gauge."""
+        self._cells.cell()[0] -= amount
+
+    def set(self, value: float):
+        """Set the gauge; not atomic with increments from other threads."""
+        self._base = value - self._cells.totals()[0]
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the gauge from a function, called on each collection."""
+        self._function = function
+
+    def get(self) -> float:
+        """Current value."""
+        if self._function is not None:
+            return float(self._function())
+        return self._base + self._cells.totals()[0]
+
+
+class HistogramChild:
+    """One series of a histogram."""
+
+    __slots__ = ('_buckets', '_cells')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # Bucket counts, the +Inf bucket, then the sum
+        self._cells = _Cells(len(buckets) + 2)
+
+    def observe(self, value: float):
+        """Record an observation."""
+        cell = self._cells.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of a block, in seconds."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started)
+
+    def get(self) -> Tuple[List[float], float, float]:
+        """Cumulative bucket counts (+Inf last), count and sum."""
+        totals = self._cells.totals()
+        cumulative = []
+        seen = 0.0
+        for count in totals[:-1]:
+            seen += count
+            cumulative.append(seen)
+        return cumulative, seen, totals[-1]
+
+
+class _Metric:
+    """A metric family: its series, one per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        """
+        Series of these label values, created on first use.
+
+        Keep the label values few: every combination is a series kept forever.
+        """
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        """Forget the series of these label values."""
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def series(self) -> List[Tuple[Dict[str, str], object]]:
+        """Labels and series of the family."""
+        return [
+            (dict(zip(self.labelnames, key)), child)
+            for key, child in sorted(list(self._children.items()), key=lambda item: item[0])
+        ]
+
+    def _samples(self, labels: Dict[str, str], child) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """OpenMetrics lines of the family."""
+        lines = [
+            f"# TYPE {self.name} {self.kind}",
+            f"# HELP {self.name} {self.documentation}",
+        ]
+        for labels, child in self.series():
+            for name, sample_labels, value in self._samples(labels, child):
+                label_text = ",".join(f'{key}="{_escape(item)}"' for key, item in sample_labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{name} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Counter: a total that only increases, exposed as `<name>_total`."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Increase the counter without labels."""
+        self._default.inc(amount)
+
+    def _samples(self, labels, child):
+        yield f"{self.name}_total", labels, child.get()
+
+
+class Gauge(_Metric):
+    """Gauge: a value that goes up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        """Increase the gauge without labels."""
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        """Decrease the gauge without labels."""
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        """Set the gauge without labels."""
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the gauge without labels from a function."""
+        self._default.set_function(function)
+
+    def _samples(self, labels, child):
+        try:
+            value = child.get()
+        except Exception as e:
+            logger.warning(f"Failed to read gauge {self.name}: {e}")
+            return
+        yield self.name, labels, value
+
+
+class Histogram(_Metric):
+    """Histogram: observations counted in fixed buckets, with their count and sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(bucket for bucket in buckets if not math.isinf(bucket)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Record an observation without labels."""
+        self._default.observe(value)
+
+    def time(self):
+        """Observe the duration of a block without labels."""
+        return self._default.time()
+
+    def _samples(self, labels, child):
+        cumulative, count, total = child.get()
+        for bound, value in zip((*self.buckets, math.inf), cumulative):
+            yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, value
+        yield f"{self.name}_count", labels, count
+        yield f"{self.name}_sum", labels, total
+
+
+class MetricsRegistry:
+    """Metric families by name."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics.setdefault(name, cls(name, documentation, labelnames, **kwargs))
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered as a {metric.kind} with labels {metric.labelnames}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Get or create a counter; name without the `_total` suffix."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Metric family by name."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All the metrics in the OpenMetrics text format."""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    HTTP server answering `GET /metrics` with the metrics of a registry.
+
+    Binds to localhost by default: the metrics name commands and hosts, put a
+    proxy in front to expose them further.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9100):
+        """
+        Initialize the server.
+
+        Args:
+            registry: Metrics served
+            host: Address to listen on
+            port: Port to listen on, 0 for any free port
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Start listening; the bound port is in `port`."""
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics served on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop listening."""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the server is listening."""
+        return self._server is not None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer one request and close the connection."""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            # Skip the headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=10)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+            if parts[:1] != ["GET"]:
+                status, content_type, body = "405 Method Not Allowed", "text/plain", b"Method not allowed\n"
+            elif path in ("/metrics", "/"):
+                status, content_type, body = "200 OK", CONTENT_TYPE, self.registry.render().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not found, see /metrics\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning(f"Error serving metrics: {e}")
+        finally:
+            writer.close()
@@ -0,0 +1,422 @@
+"""
+Tracing
+
+Nested timing spans around handlers, decorators, Telegram Bot API requests
+and persistence writes, and a sampling profiler recording the Python stacks
+of all threads, reported as the top functions or as collapsed stacks for
+flamegraph.pl, speedscope or inferno.
+
+Both are off by default: a disabled span is one attribute check, and the
+sampler has no thread until a profile starts.
+
+The framework wiring (request, handler and decorator spans) lives with the
+code it instruments. The legacy framework at the repository root is packaged
+on its own and keeps a copy of this core in util/util_tracing.py; its tests
+run the same cases against both copies, so change them together.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, Optional
+
+
+# Separator of the span names in a span path
+SPAN_SEPARATOR = " > "
+
+# Leaf frames of a thread waiting for work, counted as idle
+IDLE_FRAMES = frozenset({
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+})
+
+
+class _NoSpan:
+    """Span of a disabled tracer."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    """A timed block, child of the span current when it starts."""
+
+    __slots__ = ("_tracer", "_name", "_path", "_token", "_started")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self._tracer = tracer
+        self._name = name
+
+    def __enter__(self):
+        parent = self._tracer._current.get()
+        self._path = self._name if parent is None else f"{parent}{SPAN_SEPARATOR}{self._name}"
+        self._token = self._tracer._current.set(self._path)
+        self._started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = perf_counter() - self._started
+        self._tracer._current.reset(self._token)
+        self._tracer.record(self._path, elapsed, exc_type is not None)
+        return False
+
+
+class Tracer:
+    """
+    Timing spans aggregated by path, e.g. `/ping > typing_action > api:sendMessage`.
+
+    The current span is a context variable: concurrent updates nest their own
+    spans, and tasks started inside a span nest under it.
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled: Record spans from the start
+        """
+        self.enabled = enabled
+        self.started = time.time()
+        self._current: ContextVar[Optional[str]] = ContextVar("tlgfwk_span", default=None)
+        self._lock = threading.Lock()
+        # Span path -> [calls, total seconds, max seconds, errors]
+        self._stats: Dict[str, list] = {}
+
+    def span(self, name: str):
+        """Context manager timing a block as a child of the current span."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def wrap(self, name: str, func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Wrap a coroutine function so that every call is a span."""
+        if getattr(func, "_traced", False):
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return await func(*args, **kwargs)
+            with _Span(self, name):
+                return await func(*args, **kwargs)
+
+        wrapper._traced = True
+        return wrapper
+
+    def record(self, path: str, seconds: float, error: bool = False):
+        """Add a finished span."""
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None:
+                stats = self._stats[path] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+            stats[3] += error
+
+    def reset(self):
+        """Forget the spans recorded."""
+        with self._lock:
+            self._stats = {}
+        self.started = time.time()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calls, total, max, self and errors of every span path; self excludes the child spans."""
+        with self._lock:
+            stats = {path: list(values) for path, values in self._stats.items()}
+
+        children: Counter = Counter()
+        for path, values in stats.items():
+            parent, separator, _ = path.rpartition(SPAN_SEPARATOR)
+            if separator:
+                children[parent] += values[1]
+
+        return {
+            path: {
+                "calls": calls,
+                "total": total,
+                "max": longest,
+                "self": max(total - children[path], 0.0),
+                "errors": errors,
+            }
+            for path, (calls, total, longest, errors) in stats.items()
+        }
+
+    def report(self, top: int = 20) -> str:
+        """
+        Plain text list of the spans taking the most time.
+
+        Args:
+            top: Most spans listed
+        """
+        stats = self.stats()
+        if not stats:
+            return "No spans recorded"
+
+        rows = sorted(stats.items(), key=lambda item: item[1]["total"], reverse=True)[:top]
+        lines = [f"Spans over {time.time() - self.started:.0f} s (calls, total, avg, max, self ms, errors):"]
+        for path, span in rows:
+            lines.append(
+                f"  {path}: {span['calls']}, {span['total'] * 1000:.0f}, "
+                f"{span['total'] / span['calls'] * 1000:.1f}, {span['max'] * 1000:.1f}, "
+                f"{span['self'] * 1000:.0f}, {span['errors']}"
+            )
+        return "\n".join(lines)
+
+
+# Tracer of the framework, shared by its decorators, handlers and requests
+tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Get the tracer of the framework."""
+    return tracer
+
+
+def frame_label(code) -> str:
+    """Name of a function in a profile: `name (file.py:line)`."""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackProfile:
+    """Stacks sampled over a time window."""
+
+    def __init__(self, stacks: Counter, idle: int, seconds: float, interval: float):
+        """
+        Initialize the profile.
+
+        Args:
+            stacks: (thread name, code objects from the outermost frame) -> samples
+            idle: Samples of threads waiting for work
+            seconds: Length of the window
+            interval: Seconds between samples
+        """
+        self.stacks = stacks
+        self.idle = idle
+        self.seconds = seconds
+        self.interval = interval
+
+    @property
+    def samples(self) -> int:
+        """Samples of busy threads."""
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """Collapsed stacks: one `thread;outer;...;inner samples` line per stack."""
+        lines = []
+        for (thread_name, *codes), count in self.stacks.most_common():
+            frames = [thread_name] + [frame_label(code) for code in codes]
+            lines.append(f"{';'.join(frame.replace(';', ',') for frame in frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def top(self, top: int = 20) -> str:
+        """
+        Plain text list of the functions with the most samples, on top of
+        the stack (self) and anywhere on it (total).
+
+        Args:
+            top: Most functions listed
+        """
+        samples = self.samples
+        lines = [
+            f"Samples: {samples} busy, {self.idle} idle, over {self.seconds:.1f} s "
+            f"every {self.interval * 1000:g} ms"
+        ]
+        if not samples:
+            return "\n".join(lines)
+
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (_, *codes), count in self.stacks.items():
+            if codes:
+                own[codes[-1]] += count
+            for code in set(codes):
+                total[code] += count
+
+        lines.append("Top functions (self %, total %):")
+        for code, count in own.most_common(top):
+            lines.append(f"  {count / samples:6.1%} {total[code] / samples:6.1%}  {frame_label(code)}")
+        return "\n".join(lines)
+
+
+class StackSampler:
+    """Samples the Python stacks of all threads from a background thread."""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Innermost frames kept of deeper stacks
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks: Counter = Counter()
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started: Optional[float] = None
+        self._stopped: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether samples are being taken."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._started = perf_counter()
+        self._stopped = None
+        self._thread = threading.Thread(target=self._run, name="tlgfwk-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> StackProfile:
+        """Stop sampling and return the profile."""
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+            self._stopped = perf_counter()
+        return self.profile()
+
+    def profile(self) -> StackProfile:
+        """Samples taken so far, also while running."""
+        with self._lock:
+            stacks = Counter(self._stacks)
+            idle = self._idle
+        seconds = ((self._stopped or perf_counter()) - self._started) if self._started else 0.0
+        return StackProfile(stacks, idle, seconds, self.interval)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                name = names.get(thread_id)
+                if name is None:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    name = names.get(thread_id, str(thread_id))
+                self._sample(name, frame)
+
+    def _sample(self, thread_name: str, frame):
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            with self._lock:
+                self._idle += 1
+            return
+
+        codes = []
+        while frame is not None and len(codes) < self.max_depth:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        with self._lock:
+            self._stacks[(thread_name, *codes)] += 1
+
+
+class Profiler:
+    """A profiling window: span tracing and stack sampling, started and stopped together."""
+
+    def __init__(self, tracer: Tracer = tracer, interval: float = 0.005, max_seconds: float = 600):
+        """
+        Initialize the profiler.
+
+        Args:
+            tracer: Tracer enabled during the window
+            interval: Seconds between stack samples
+            max_seconds: Longest window
+        """
+        self.tracer = tracer
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.profile: Optional[StackProfile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._tracing_before = tracer.enabled
+
+    @property
+    def running(self) -> bool:
+        """Whether a window is open."""
+        return self._sampler is not None
+
+    def start(self, seconds: Optional[float] = None,
+              on_timeout: Optional[Callable[[], Awaitable]] = None):
+        """
+        Open a window, closed after `seconds`; call from the event loop.
+
+        Args:
+            seconds: Length of the window, at most (and by default) max_seconds
+            on_timeout: Awaited when the window closes by itself
+
+        Raises:
+            RuntimeError: A window is already open
+        """
+        if self.running:
+            raise RuntimeError("A profile is already running")
+
+        self.profile = None
+        self._tracing_before = self.tracer.enabled
+        self.tracer.reset()
+        self.tracer.enabled = True
+        self._sampler = StackSampler(self.interval)
+        self._sampler.start()
+
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        self._timer = asyncio.get_running_loop().create_task(self._stop_after(seconds, on_timeout))
+
+    async def _stop_after(self, seconds: float, on_timeout: Optional[Callable[[], Awaitable]]):
+        await asyncio.sleep(seconds)
+        self._timer = None
+        self.stop()
+        if on_timeout:
+            await on_timeout()
+
+    def stop(self) -> Optional[StackProfile]:
+        """Close the window and return its profile."""
+        if not self.running:
+            return self.profile
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.profile = self._sampler.stop()
+        self._sampler = None
+        self.tracer.enabled = self._tracing_before
+        return self.profile
+
+    def report(self, top: int = 20) -> str:
+        """
+        Plain text report of the spans and top functions of the open or last window.
+
+        Args:
+            top: Most spans and functions listed
+        """
+        profile = self._sampler.profile() if self.running else self.profile
+        parts = [self.tracer.report(top)]
+        if profile is not None:
+            parts.append(profile.top(top))
+        return "\n\n".join(parts)
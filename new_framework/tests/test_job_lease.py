@@ -0,0 +1,191 @@
+"""
+Tests for distributed job leasing.
+"""
+
+import pytest
+import asyncio
+import multiprocessing
+import time
+from unittest.mock import Mock
+from datetime import datetime
+
+from tlgfwk.core.job_lease import LeaseManager, lease_bucket
+from tlgfwk.core.scheduler import JobScheduler
+
+
+RESOURCES = {f"job_{i}" for i in range(40)}
+
+
+class FakeClock:
+    """Manually advanced clock."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def lease_worker(url, instance_id, deadline, results):
+    """Heartbeat until the deadline and report the leases held at the end."""
+    manager = LeaseManager(url, instance_id=instance_id, lease_ttl=1.0)
+    held = set()
+    while time.time() < deadline:
+        held = manager.heartbeat(RESOURCES)
+        time.sleep(0.1)
+    results.put((instance_id, sorted(held)))
+
+
+class TestLeaseManager:
+    """Test cases for LeaseManager."""
+    
+    @pytest.fixture
+    def url(self, tmp_path):
+        """URL of the shared lease database."""
+        return f"sqlite:///{tmp_path / 'leases.db'}"
+    
+    @pytest.fixture
+    def clock(self):
+        """Shared fake clock."""
+        return FakeClock()
+    
+    def make_manager(self, url, clock, instance_id):
+        """Create a lease manager on the fake clock."""
+        return LeaseManager(url, instance_id=instance_id, lease_ttl=30.0, time_func=clock)
+    
+    def test_single_instance_leases_everything(self, url, clock):
+        """Test that a lone instance leases all resources."""
+        manager = self.make_manager(url, clock, "a")
+        
+        assert manager.heartbeat(RESOURCES) == RESOURCES
+        assert manager.owns("job_0")
+        assert not manager.owns("unknown")
+    
+    def test_rebalance_when_instance_joins(self, url, clock):
+        """Test that work is split once a second instance joins."""
+        a = self.make_manager(url, clock, "a")
+        b = self.make_manager(url, clock, "b")
+        a.heartbeat(RESOURCES)
+        
+        # A's leases are still valid, so B cannot take them yet
+        assert b.heartbeat(RESOURCES) == set()
+        
+        # A releases what B should own, B picks it up
+        held_a = a.heartbeat(RESOURCES)
+        held_b = b.heartbeat(RESOURCES)
+        
+        assert held_a and held_b
+        assert held_a.isdisjoint(held_b)
+        assert held_a | held_b == RESOURCES
+    
+    def test_expired_leases_are_taken_over(self, url, clock):
+        """Test that leases of a crashed instance are taken over after the TTL."""
+        a = self.make_manager(url, clock, "a")
+        b = self.make_manager(url, clock, "b")
+        a.heartbeat(RESOURCES)
+        b.heartbeat(RESOURCES)
+        
+        # A stops heartbeating
+        clock.now += 31
+        
+        assert not a.owns("job_0")
+        assert b.heartbeat(RESOURCES) == RESOURCES
+    
+    def test_release_all_hands_over_work(self, url, clock):
+        """Test that a stopping instance hands its leases over immediately."""
+        a = self.make_manager(url, clock, "a")
+        b = self.make_manager(url, clock, "b")
+        a.heartbeat(RESOURCES)
+        b.heartbeat(RESOURCES)
+        a.heartbeat(RESOURCES)
+        b.heartbeat(RESOURCES)
+        
+        a.release_all()
+        
+        assert a.held == set()
+        assert b.heartbeat(RESOURCES) == RESOURCES
+        assert b.get_status()['instances'] == ["b"]
+    
+    def test_lease_bucket_is_stable(self):
+        """Test that keys map to the same bucket every time."""
+        bucket = lease_bucket("example.com", 8)
+        
+        assert bucket == lease_bucket("example.com", 8)
+        assert bucket.startswith("bucket:")
+        assert 0 <= int(bucket.split(":")[1]) < 8
+    
+    @pytest.mark.slow
+    def test_processes_share_resources(self, url):
+        """Test that several processes on one machine split the resources."""
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        deadline = time.time() + 4.0
+        workers = [
+            ctx.Process(target=lease_worker, args=(url, f"worker_{i}", deadline, results))
+            for i in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        held = dict(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join(timeout=10)
+        
+        leased = [set(resources) for resources in held.values()]
+        assert all(leased)
+        assert sum(len(resources) for resources in leased) == len(RESOURCES)
+        assert set().union(*leased) == RESOURCES
+
+
+class TestSchedulerLeasing:
+    """Test cases for leased job execution in JobScheduler."""
+    
+    def make_scheduler(self, tmp_path, instance_id):
+        """Create a scheduler coordinating through a shared lease database."""
+        return JobScheduler(Mock(), {
+            'name': instance_id,
+            'lease_url': f"sqlite:///{tmp_path / 'leases.db'}",
+            'instance_id': instance_id
+        })
+    
+    async def test_job_runs_on_one_instance(self, tmp_path):
+        """Test that a job scheduled on two instances runs only once."""
+        runs = []
+        
+        async def probe():
+            runs.append(1)
+        
+        first = self.make_scheduler(tmp_path, "first")
+        second = self.make_scheduler(tmp_path, "second")
+        jobs = []
+        for scheduler in (first, second):
+            jobs.append(scheduler.add_job("probe", probe, "date", run_date=datetime.now()))
+            scheduler.start()
+        
+        try:
+            for _ in range(100):
+                if runs:
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.1)
+        finally:
+            first.stop()
+            second.stop()
+        
+        assert len(runs) == 1
+        assert sorted(job.run_count for job in jobs) == [0, 1]
+    
+    def test_lease_key_groups_jobs(self, tmp_path):
+        """Test that jobs with the same lease key share one lease."""
+        scheduler = self.make_scheduler(tmp_path, "solo")
+        bucket = lease_bucket("host-1", 4)
+        
+        def check():
+            pass
+        
+        ping = scheduler.add_job("ping", check, "interval", seconds=60, lease_key=bucket)
+        http = scheduler.add_job("http", check, "interval", seconds=60, lease_key=bucket)
+        scheduler._renew_leases()
+        
+        assert scheduler.lease_manager.held == {bucket}
+        assert scheduler._owns_job(ping) and scheduler._owns_job(http)
@@ -0,0 +1,165 @@
+"""
+Tests for the metrics.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from telegram.request import HTTPXRequest
+
+from tlgfwk.core.bot_metrics import BotMetrics, InstrumentedRequest, api_method
+from tlgfwk.utils.metrics import MetricsRegistry, MetricsServer
+
+
+class TestMetricsRegistry:
+    """Test cases for the metric types and their exposition."""
+
+    def test_render(self):
+        """Test the OpenMetrics text of each metric type."""
+        registry = MetricsRegistry()
+        registry.counter('requests', 'Requests', ('path',)).labels('/a"b').inc(2)
+        registry.gauge('depth', 'Queue depth').set(3)
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+
+        assert 'requests_total{path="/a\\"b"} 2' in lines
+        assert '# TYPE requests counter' in lines
+        assert 'depth 3' in lines
+        assert [line for line in lines if line.startswith('latency_seconds')] == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_count 4',
+            'latency_seconds_sum 6.05',
+        ]
+        assert lines[-1] == '# EOF'
+
+    def test_threads(self):
+        """Test that increments from many threads all count."""
+        counter = MetricsRegistry().counter('events', 'Events')
+
+        def work():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.labels().get() == 40000
+
+    def test_gauge(self):
+        """Test set, increments and gauges read from a function."""
+        registry = MetricsRegistry()
+        gauge = registry.gauge('in_flight', 'In flight')
+        gauge.inc()
+        gauge.inc()
+        gauge.set(10)
+        gauge.dec()
+        assert gauge.labels().get() == 9
+
+        gauge.set_function(lambda: 42)
+        assert 'in_flight 42' in registry.render()
+
+    def test_register_conflicts(self):
+        """Test that a name is one metric type with one set of labels."""
+        registry = MetricsRegistry()
+        counter = registry.counter('events', 'Events', ('kind',))
+
+        assert registry.counter('events', 'Events', ('kind',)) is counter
+        with pytest.raises(ValueError):
+            registry.gauge('events', 'Events', ('kind',))
+        with pytest.raises(ValueError):
+            counter.labels('a', 'b')
+        with pytest.raises(ValueError):
+            counter.labels('a').inc(-1)
+
+    @pytest.mark.asyncio
+    async def test_server(self):
+        """Test serving the metrics over HTTP."""
+        registry = MetricsRegistry()
+        registry.counter('events', 'Events').inc()
+        server = MetricsServer(registry, port=0)
+        await server.start()
+
+        try:
+            async def get(path):
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+                response = await reader.read()
+                writer.close()
+                return response.decode()
+
+            response = await get('/metrics')
+            assert response.startswith('HTTP/1.1 200 OK')
+            assert 'application/openmetrics-text' in response
+            assert 'events_total 1' in response
+            assert (await get('/other')).startswith('HTTP/1.1 404')
+        finally:
+            await server.stop()
+
+
+class TestBotMetrics:
+    """Test cases for the framework metrics."""
+
+    @pytest.mark.asyncio
+    async def test_instrument_handler(self):
+        """Test the latency and errors of a command handler."""
+        metrics = BotMetrics()
+
+        async def fails(update, context):
+            raise RuntimeError("boom")
+
+        ok = metrics.instrument_handler('ok', AsyncMock(return_value='done'))
+        failing = metrics.instrument_handler('fail', fails)
+
+        assert await ok(Mock(), Mock()) == 'done'
+        with pytest.raises(RuntimeError):
+            await failing(Mock(), Mock())
+
+        assert metrics.handler_seconds.labels('ok').get()[1] == 1
+        assert metrics.handler_errors.labels('fail').get() == 1
+        assert metrics.handler_errors.labels('ok').get() == 0
+        assert 'fail: 1' in metrics.summary()
+
+    def test_count_update(self):
+        """Test updates counted by type."""
+        metrics = BotMetrics()
+
+        metrics.count_update(Mock(spec=['message'], message=object()))
+        metrics.count_update(Mock(spec=['callback_query'], callback_query=object()))
+        metrics.count_update(Mock(spec=[]))
+
+        assert [metrics.updates.labels(name).get() for name in ('message', 'callback_query', 'other')] == [1, 1, 1]
+
+    def test_api_method(self):
+        """Test the method label of Bot API URLs."""
+        assert api_method('https://api.telegram.org/bot123:abc/sendMessage') == 'sendMessage'
+        assert api_method('https://api.telegram.org/file/bot123:abc/photos/file_1.jpg') == 'file'
+
+    @pytest.mark.asyncio
+    async def test_instrumented_request(self):
+        """Test the latency, errors and requests in flight of Bot API calls."""
+        metrics = BotMetrics()
+        request = InstrumentedRequest(metrics, connection_pool_size=1)
+        url = 'https://api.telegram.org/bot123:abc/sendMessage'
+
+        with patch.object(HTTPXRequest, 'do_request', AsyncMock(side_effect=[(200, b'{}'), (429, b'{}')])):
+            assert await request.do_request(url, 'POST') == (200, b'{}')
+            await request.do_request(url, 'POST')
+        with patch.object(HTTPXRequest, 'do_request', AsyncMock(side_effect=TimeoutError())):
+            with pytest.raises(TimeoutError):
+                await request.do_request(url, 'POST')
+
+        assert metrics.api_seconds.labels('sendMessage').get()[1] == 3
+        assert metrics.api_errors.labels('sendMessage', '429').get() == 1
+        assert metrics.api_errors.labels('sendMessage', 'TimeoutError').get() == 1
+        assert metrics.api_in_flight.labels().get() == 0
+        await request.shutdown()
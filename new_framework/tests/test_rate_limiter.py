@@ -0,0 +1,176 @@
+"""
+Tests for the rate limiter.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, AsyncMock
+from telegram import Update, Message, User, Chat
+
+from tlgfwk.core.decorators import rate_limit
+from tlgfwk.core.rate_limiter import (
+    RateLimiter, RateLimitScope, MemoryRateLimitBackend, SQLiteRateLimitBackend,
+    get_rate_limiter, rate_limit_key
+)
+
+
+class FakeClock:
+    """Manually advanced clock."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def make_update(user_id, chat_id=1):
+    """Create an update from a user in a chat."""
+    update = Mock(spec=Update)
+    update.effective_user = Mock(spec=User)
+    update.effective_user.id = user_id
+    update.effective_chat = Mock(spec=Chat)
+    update.effective_chat.id = chat_id
+    update.message = Mock(spec=Message)
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter."""
+    
+    @pytest.fixture
+    def clock(self):
+        """Fake clock."""
+        return FakeClock()
+    
+    def test_burst_then_refill(self, clock):
+        """Test that a full burst is allowed and calls refill over the window."""
+        limiter = RateLimiter(3, 60, time_func=clock)
+        
+        assert [limiter.allow(1) for _ in range(4)] == [True, True, True, False]
+        assert limiter.acquire(1) == pytest.approx(20.0)
+        
+        clock.now += 20
+        assert limiter.allow(1)
+        assert not limiter.allow(1)
+    
+    def test_keys_are_independent(self, clock):
+        """Test that each key has its own limit."""
+        limiter = RateLimiter(1, 60, time_func=clock)
+        
+        assert limiter.allow(1)
+        assert limiter.allow(2)
+        assert not limiter.allow(1)
+    
+    def test_idle_keys_are_evicted(self, clock):
+        """Test that keys are dropped once they are idle."""
+        backend = MemoryRateLimitBackend(evict_every=100)
+        limiter = RateLimiter(2, 10, backend=backend, time_func=clock)
+        
+        for user_id in range(99):
+            limiter.allow(user_id)
+        assert len(backend) == 99
+        
+        # Every key is idle after one emission interval
+        clock.now += 5
+        limiter.allow("fresh")
+        assert len(backend) == 1
+        
+        clock.now += 5
+        assert backend.evict_expired(clock.now) == 1
+        assert len(backend) == 0
+    
+    def test_sqlite_backend_is_shared(self, tmp_path, clock):
+        """Test that limits hold across backends on the same database."""
+        path = str(tmp_path / "limits.db")
+        first = RateLimiter(2, 60, backend=SQLiteRateLimitBackend(path), name="cmd", time_func=clock)
+        second = RateLimiter(2, 60, backend=SQLiteRateLimitBackend(path), name="cmd", time_func=clock)
+        
+        assert first.allow(1)
+        assert second.allow(1)
+        assert not first.allow(1)
+        assert not second.allow(1)
+        
+        clock.now += 61
+        assert second.backend.evict_expired(clock.now) == 1
+        assert first.allow(1)
+    
+    def test_sqlite_backend_fails_open_when_locked(self, tmp_path, clock):
+        """Test that a database locked by another process does not block the call."""
+        path = str(tmp_path / "limits.db")
+        limiter = RateLimiter(1, 60, backend=SQLiteRateLimitBackend(path, busy_timeout=0.05),
+                              name="cmd", time_func=clock)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        
+        try:
+            started = time.monotonic()
+            assert limiter.allow(1)
+            assert time.monotonic() - started < 1
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+        
+        assert limiter.allow(1)
+        assert not limiter.allow(1)
+    
+    async def test_blocking_backend_runs_off_the_event_loop(self, clock):
+        """Test that acquire_async runs blocking backends in a thread."""
+        backend = Mock(blocking=True)
+        backend.update.side_effect = lambda *args: threading.get_ident()
+        limiter = RateLimiter(1, 60, backend=backend, time_func=clock)
+        
+        assert await limiter.acquire_async(1) != threading.get_ident()
+        
+        memory = RateLimiter(1, 60, time_func=clock)
+        assert await memory.acquire_async(1) == 0.0
+        assert await memory.acquire_async(1) > 0
+    
+    def test_named_limiters_are_shared(self):
+        """Test that limiters with the same name are the same object."""
+        limiter = get_rate_limiter("test_shared", 5, 60)
+        
+        assert get_rate_limiter("test_shared", 5, 60) is limiter
+    
+    def test_rate_limit_keys(self):
+        """Test key extraction for each scope."""
+        update = make_update(user_id=7, chat_id=-100)
+        
+        assert rate_limit_key(update, RateLimitScope.USER) == 7
+        assert rate_limit_key(update, RateLimitScope.CHAT) == -100
+        assert rate_limit_key(update, RateLimitScope.GLOBAL) == "global"
+
+
+class TestRateLimitDecorator:
+    """Test cases for scoped and shared @rate_limit limits."""
+    
+    async def test_shared_limit_across_commands(self):
+        """Test that commands with the same limit name share it."""
+        @rate_limit(max_calls=1, window=60, name="test_across_commands")
+        async def first(update, context):
+            return "first"
+        
+        @rate_limit(max_calls=1, window=60, name="test_across_commands")
+        async def second(update, context):
+            return "second"
+        
+        update = make_update(user_id=1)
+        
+        assert await first(update, Mock()) == "first"
+        assert await second(update, Mock()) is None
+        update.message.reply_text.assert_called_once()
+    
+    async def test_chat_scope(self):
+        """Test that a chat-scoped limit applies to every user in the chat."""
+        @rate_limit(max_calls=1, window=60, scope="chat")
+        async def limited(update, context):
+            return "executed"
+        
+        assert await limited(make_update(user_id=1, chat_id=5), Mock()) == "executed"
+        assert await limited(make_update(user_id=2, chat_id=5), Mock()) is None
+        assert await limited(make_update(user_id=2, chat_id=6), Mock()) == "executed"
+        assert limited._rate_limit_config["scope"] == "chat"
@@ -8,7 +8,22 @@ from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
-from tlgfwk.core.scheduler import JobScheduler, Job, JobStatus, TriggerType
+from tlgfwk.core.scheduler import JobScheduler, Job, JobStatus, TriggerType, ExecutorType
+from tlgfwk.core.job_store import FunctionRegistry, FunctionRegistryError, MisfirePolicy
+from tlgfwk.core.job_stats import LatencyHistogram
+
+
+def cpu_bound_job():
+    """Module-level job so it can be pickled for the process pool."""
+    return sum(i * i for i in range(1000))
+
+
+durable_runs = []
+
+
+async def durable_job(label="run"):
+    """Module-level job so it can be stored and restored by reference."""
+    durable_runs.append(label)
 
 
 class TestJob:
@@ -407,3 +422,404 @@ class TestScheduler:
         assert job.description == "Testing metadata"
         # If metadata is supported:
         # assert job.metadata == metadata
+
+
+class TestJobExecutors:
+    """Test cases for executor selection and job execution."""
+    
+    @pytest.fixture
+    def scheduler(self):
+        """Create a JobScheduler instance with an async notifying bot."""
+        mock_bot = Mock()
+        mock_bot.send_message = AsyncMock()
+        return JobScheduler(mock_bot)
+    
+    def test_coroutine_job_uses_async_executor(self, scheduler):
+        """Test that coroutine jobs are routed to the event loop executor."""
+        async def async_job():
+            pass
+        
+        job = scheduler.add_job("async_job", async_job, "interval", seconds=30)
+        
+        assert job.executor == ExecutorType.ASYNC
+        assert scheduler.scheduler.get_job("async_job").executor == "default"
+    
+    def test_blocking_job_uses_thread_pool(self, scheduler):
+        """Test that regular functions are routed to the thread pool."""
+        def blocking_job():
+            pass
+        
+        job = scheduler.add_job("blocking_job", blocking_job, "interval", seconds=30)
+        
+        assert job.executor == ExecutorType.THREAD
+        assert scheduler.scheduler.get_job("blocking_job").executor == "threadpool"
+    
+    def test_process_job_requires_picklable_function(self, scheduler):
+        """Test that process pool jobs must be picklable."""
+        with pytest.raises(ValueError):
+            scheduler.add_job(
+                "process_job", lambda: None, "interval",
+                executor="process", seconds=30
+            )
+    
+    async def test_async_job_is_awaited(self, scheduler):
+        """Test that coroutine jobs run on the loop and record timings."""
+        executed = asyncio.Event()
+        
+        async def async_job():
+            executed.set()
+            return "done"
+        
+        scheduler.start()
+        try:
+            job = scheduler.add_job(
+                "awaited_job", async_job, "date",
+                run_date=datetime.now(), chat_id=123
+            )
+            await asyncio.wait_for(executed.wait(), timeout=3.0)
+            await asyncio.sleep(0.05)
+            
+            assert job.run_count == 1
+            assert job.status == JobStatus.COMPLETED
+            assert job.last_duration is not None
+            assert job.last_queue_delay is not None
+            scheduler.bot.send_message.assert_awaited_once()
+        finally:
+            scheduler.stop()
+    
+    async def test_blocking_job_notification_is_awaited(self, scheduler):
+        """Test that notifications from thread pool jobs reach the event loop."""
+        def blocking_job():
+            return "done"
+        
+        scheduler.start()
+        try:
+            job = scheduler.add_job(
+                "blocking_notify", blocking_job, "date",
+                run_date=datetime.now(), chat_id=123
+            )
+            for _ in range(100):
+                if scheduler.bot.send_message.await_count:
+                    break
+                await asyncio.sleep(0.02)
+            
+            assert job.status == JobStatus.COMPLETED
+            scheduler.bot.send_message.assert_awaited_once()
+        finally:
+            scheduler.stop()
+    
+    async def test_process_job_runs_in_pool(self, scheduler):
+        """Test that process pool jobs are executed and awaited."""
+        scheduler.start()
+        try:
+            job = scheduler.add_job(
+                "process_job", cpu_bound_job, "date",
+                executor="process", run_date=datetime.now()
+            )
+            for _ in range(250):
+                if job.status == JobStatus.COMPLETED:
+                    break
+                await asyncio.sleep(0.02)
+            
+            assert job.executor == ExecutorType.PROCESS
+            assert job.status == JobStatus.COMPLETED
+            assert job.last_duration is not None
+        finally:
+            scheduler.stop()
+
+
+class TestDurableJobs:
+    """Test cases for the durable job store and misfire policies."""
+    
+    @pytest.fixture
+    def store_path(self, tmp_path):
+        """Path of the SQLite job store."""
+        durable_runs.clear()
+        return str(tmp_path / "jobs.db")
+    
+    def make_scheduler(self, store_path, **config):
+        """Create a JobScheduler backed by the job store."""
+        return JobScheduler(Mock(), {'job_store_path': store_path, **config})
+    
+    async def restart(self, scheduler, store_path, **config):
+        """Stop a scheduler and start a new one on the same store."""
+        scheduler.stop()
+        await asyncio.sleep(0)
+        restored = self.make_scheduler(store_path, **config)
+        restored.start()
+        return restored
+    
+    def test_registry_references_module_functions(self):
+        """Test that module-level functions round-trip through the registry."""
+        registry = FunctionRegistry()
+        
+        reference = registry.register(durable_job)
+        
+        assert reference == f"{__name__}:durable_job"
+        assert registry.resolve(reference) is durable_job
+    
+    def test_registry_rejects_nested_functions(self):
+        """Test that lambdas and nested functions cannot be registered."""
+        def nested():
+            pass
+        
+        registry = FunctionRegistry()
+        
+        with pytest.raises(FunctionRegistryError):
+            registry.register(nested)
+        with pytest.raises(FunctionRegistryError):
+            registry.register(lambda: None)
+        with pytest.raises(FunctionRegistryError):
+            registry.resolve("missing.module:func")
+    
+    def test_persistent_job_requires_importable_function(self, store_path):
+        """Test that forcing persistence of a nested function fails."""
+        def nested():
+            pass
+        
+        scheduler = self.make_scheduler(store_path)
+        
+        with pytest.raises(FunctionRegistryError):
+            scheduler.add_job("nested", nested, "interval", seconds=30, persistent=True)
+        
+        job = scheduler.add_job("volatile", nested, "interval", seconds=30)
+        assert job.function_ref is None
+    
+    async def test_jobs_survive_restart(self, store_path):
+        """Test that jobs are restored with their state after a restart."""
+        scheduler = self.make_scheduler(store_path)
+        scheduler.start()
+        scheduler.add_job(
+            "report", durable_job, "interval", seconds=3600,
+            name="Report", chat_id=42,
+            misfire_policy="catch_up"
+        )
+        scheduler.add_job("paused", durable_job, "interval", seconds=3600)
+        scheduler.pause_job("paused")
+        
+        restored = await self.restart(scheduler, store_path)
+        try:
+            report = restored.get_job("report")
+            assert report is not None
+            assert report.name == "Report"
+            assert report.chat_id == 42
+            assert report.misfire_policy == MisfirePolicy.CATCH_UP
+            assert report.function_ref == f"{__name__}:durable_job"
+            assert report.status == JobStatus.SCHEDULED
+            assert restored.get_job("paused").status == JobStatus.PAUSED
+            
+            restored.run_job_now("report")
+            for _ in range(100):
+                if durable_runs:
+                    break
+                await asyncio.sleep(0.02)
+            
+            assert durable_runs == ["run"]
+            assert report.run_count == 1
+        finally:
+            restored.stop()
+    
+    async def test_finished_one_shot_job_is_not_restored(self, store_path):
+        """Test that one-shot jobs that already ran are dropped."""
+        scheduler = self.make_scheduler(store_path)
+        scheduler.start()
+        job = scheduler.add_job("once", durable_job, "date", run_date=datetime.now())
+        for _ in range(100):
+            if job.status == JobStatus.COMPLETED:
+                break
+            await asyncio.sleep(0.02)
+        
+        restored = await self.restart(scheduler, store_path)
+        try:
+            assert job.status == JobStatus.COMPLETED
+            assert restored.get_job("once") is None
+            assert restored.job_store.count() == 0
+        finally:
+            restored.stop()
+    
+    async def test_catch_up_runs_every_missed_run(self, store_path):
+        """Test that catch-up jobs replay each run missed while stopped."""
+        scheduler = self.make_scheduler(store_path)
+        scheduler.start()
+        scheduler.add_job(
+            "catch_up", durable_job, "interval", seconds=1,
+            misfire_policy=MisfirePolicy.CATCH_UP
+        )
+        scheduler.stop()
+        await asyncio.sleep(2.5)
+        
+        restored = await self.restart(scheduler, store_path)
+        try:
+            await asyncio.sleep(0.2)
+            assert len(durable_runs) >= 2
+        finally:
+            restored.stop()
+    
+    async def test_run_once_coalesces_missed_runs(self, store_path):
+        """Test that run-once jobs run a single time for all missed runs."""
+        scheduler = self.make_scheduler(store_path)
+        scheduler.start()
+        scheduler.add_job("run_once", durable_job, "interval", seconds=1)
+        scheduler.stop()
+        await asyncio.sleep(2.5)
+        
+        restored = await self.restart(scheduler, store_path)
+        try:
+            await asyncio.sleep(0.2)
+            assert len(durable_runs) == 1
+        finally:
+            restored.stop()
+    
+    async def test_skip_drops_missed_runs(self, store_path):
+        """Test that skipped runs outside the grace time are not executed."""
+        scheduler = self.make_scheduler(store_path, misfire_grace_time=1)
+        scheduler.start()
+        try:
+            job = scheduler.add_job(
+                "skip", durable_job, "date",
+                run_date=datetime.now() - timedelta(seconds=5),
+                misfire_policy=MisfirePolicy.SKIP
+            )
+            await asyncio.sleep(0.2)
+            
+            assert durable_runs == []
+            assert job.run_count == 0
+        finally:
+            scheduler.stop()
+
+
+class TestJobStatistics:
+    """Test cases for incremental job statistics and eviction."""
+    
+    @pytest.fixture
+    def scheduler(self):
+        """Create a JobScheduler instance with a small eviction limit."""
+        return JobScheduler(Mock(), {'max_finished_jobs': 2})
+    
+    @staticmethod
+    def recount(scheduler, status):
+        """Count jobs with a status by scanning all jobs."""
+        return len([j for j in scheduler.jobs.values() if j.status == status])
+    
+    @staticmethod
+    async def wait_finished(job):
+        """Wait until a one-shot job has run."""
+        for _ in range(150):
+            if job.status == JobStatus.COMPLETED:
+                break
+            await asyncio.sleep(0.02)
+    
+    def test_counters_follow_transitions(self, scheduler):
+        """Test that status counters match a full scan after transitions."""
+        def job_func():
+            pass
+        
+        for i in range(5):
+            scheduler.add_job(f"job_{i}", job_func, "interval", seconds=30)
+        scheduler.pause_job("job_0")
+        scheduler.pause_job("job_1")
+        scheduler.resume_job("job_1")
+        scheduler.remove_job("job_2")
+        scheduler.add_job("job_3", job_func, "interval", seconds=60, replace_existing=True)
+        
+        stats = scheduler.get_statistics()
+        
+        assert stats['total_jobs'] == 4
+        for status in (JobStatus.SCHEDULED, JobStatus.PAUSED, JobStatus.CANCELLED):
+            assert stats[status.value] == self.recount(scheduler, status)
+        assert stats['paused'] == 1
+        assert stats['scheduled'] == 3
+    
+    async def test_run_history_and_histograms(self, scheduler):
+        """Test that runs are recorded in the ring buffer and histograms."""
+        async def failing_job():
+            raise ValueError("boom")
+        
+        scheduler.start()
+        try:
+            job = scheduler.add_job("failing", failing_job, "interval", seconds=3600)
+            scheduler.run_job_now("failing")
+            for _ in range(100):
+                if job.error_count:
+                    break
+                await asyncio.sleep(0.02)
+            
+            history = scheduler.get_job_history("failing")
+            stats = scheduler.get_statistics()
+        finally:
+            scheduler.stop()
+        
+        assert len(history['runs']) == 1
+        assert history['runs'][0]['success'] is False
+        assert history['runs'][0]['error'] == "boom"
+        assert history['duration']['count'] == 1
+        assert stats['total_runs'] == 1
+        assert stats['total_errors'] == 1
+        assert stats['failed'] == 1
+        assert stats['duration']['count'] >= 1
+    
+    async def test_finished_jobs_are_evicted_oldest_first(self, scheduler):
+        """Test that finished one-shot jobs over the limit are evicted."""
+        async def one_shot():
+            pass
+        
+        scheduler.start()
+        try:
+            for i in range(3):
+                job = scheduler.add_job(f"once_{i}", one_shot, "date", run_date=datetime.now())
+                await self.wait_finished(job)
+            
+            stats = scheduler.get_statistics()
+        finally:
+            scheduler.stop()
+        
+        assert "once_0" not in scheduler.jobs
+        assert "once_1" in scheduler.jobs and "once_2" in scheduler.jobs
+        assert stats['evicted_jobs'] == 1
+        assert stats['completed'] == 2
+        assert stats['total_runs'] == 2
+    
+    async def test_cleanup_evicts_expired_jobs(self, scheduler):
+        """Test that cleanup evicts finished jobs past the retention period."""
+        async def one_shot():
+            pass
+        
+        scheduler.start()
+        try:
+            job = scheduler.add_job("expired", one_shot, "date", run_date=datetime.now())
+            await self.wait_finished(job)
+        finally:
+            scheduler.stop()
+        
+        scheduler._cleanup_old_jobs()
+        assert "expired" in scheduler.jobs
+        
+        # Age the heap entry as well as the job
+        job.last_run_time -= timedelta(days=8)
+        scheduler._finished_jobs = [(job.last_run_time, job.id)]
+        scheduler._cleanup_old_jobs()
+        
+        assert "expired" not in scheduler.jobs
+        assert scheduler.get_statistics()['completed'] == 0
+    
+    def test_statistics_job_does_not_touch_persistence(self, scheduler):
+        """Test that the statistics job only reads the in-memory counters."""
+        scheduler.bot.persistence = Mock()
+        
+        scheduler._update_job_statistics()
+        
+        assert scheduler.bot.persistence.mock_calls == []
+    
+    def test_latency_histogram_quantiles(self):
+        """Test histogram bucketing and quantile estimates."""
+        histogram = LatencyHistogram()
+        for value in (0.001, 0.002, 0.003, 0.2, 7.0):
+            histogram.observe(value)
+        
+        summary = histogram.to_dict()
+        
+        assert summary['count'] == 5
+        assert summary['max'] == 7.0
+        assert summary['p50'] == 0.005
+        assert summary['p99'] == 7.0
+        assert summary['buckets']['0.005'] == 3
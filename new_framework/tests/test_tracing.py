@@ -0,0 +1,160 @@
+"""
+Tests for the tracing and profiling.
+"""
+
+import asyncio
+import time
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from telegram.request import HTTPXRequest
+
+from tlgfwk.core.bot_metrics import InstrumentedRequest
+from tlgfwk.core.decorators import log_command_usage, typing_action
+from tlgfwk.utils.tracing import Profiler, StackSampler, Tracer, tracer
+
+
+def busy(seconds):
+    """Keep the CPU busy."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestTracer:
+    """Test cases for the spans."""
+
+    def test_disabled(self):
+        """Test that a disabled tracer records nothing."""
+        tracer = Tracer()
+        with tracer.span("work"):
+            pass
+        assert tracer.stats() == {}
+        assert tracer.report() == "No spans recorded"
+
+    @pytest.mark.asyncio
+    async def test_nesting(self):
+        """Test span paths, self time and errors of nested and concurrent spans."""
+        tracer = Tracer(enabled=True)
+
+        async def handler(fail):
+            with tracer.span("decorator"):
+                await asyncio.sleep(0.01)
+                with tracer.span("api:sendMessage"):
+                    await asyncio.sleep(0.02)
+                if fail:
+                    raise RuntimeError("boom")
+
+        wrapped = tracer.wrap("/ping", handler)
+        assert tracer.wrap("/ping", wrapped) is wrapped
+
+        results = await asyncio.gather(wrapped(False), wrapped(True), return_exceptions=True)
+        assert isinstance(results[1], RuntimeError)
+
+        stats = tracer.stats()
+        assert set(stats) == {"/ping", "/ping > decorator", "/ping > decorator > api:sendMessage"}
+        assert stats["/ping"]["calls"] == 2
+        assert stats["/ping"]["errors"] == 1
+        decorator = stats["/ping > decorator"]
+        api = stats["/ping > decorator > api:sendMessage"]
+        assert api["total"] >= 0.04
+        assert decorator["self"] == pytest.approx(decorator["total"] - api["total"])
+        assert "/ping > decorator > api:sendMessage: 2" in tracer.report()
+
+    @pytest.mark.asyncio
+    async def test_decorators(self):
+        """Test the spans of the framework decorators."""
+        @typing_action
+        @log_command_usage
+        async def command(self, update, context):
+            return "done"
+
+        context = Mock()
+        context.bot.send_chat_action = AsyncMock()
+        tracer.reset()
+        tracer.enabled = True
+        try:
+            assert await command(Mock(spec=[]), Mock(), context) == "done"
+        finally:
+            tracer.enabled = False
+
+        assert "typing_action > log_command_usage" in tracer.stats()
+        tracer.reset()
+
+    @pytest.mark.asyncio
+    async def test_api_spans(self):
+        """Test that Bot API requests are spans, also without metrics."""
+        request = InstrumentedRequest(None, connection_pool_size=1)
+        url = "https://api.telegram.org/bot123:abc/sendMessage"
+        tracer.reset()
+
+        with patch.object(HTTPXRequest, "do_request", AsyncMock(return_value=(200, b"{}"))):
+            await request.do_request(url, "POST")
+            tracer.enabled = True
+            try:
+                with tracer.span("/ping"):
+                    assert await request.do_request(url, "POST") == (200, b"{}")
+            finally:
+                tracer.enabled = False
+
+        assert set(tracer.stats()) == {"/ping", "/ping > api:sendMessage"}
+        assert tracer.stats()["/ping > api:sendMessage"]["calls"] == 1
+        tracer.reset()
+        await request.shutdown()
+
+
+class TestProfiler:
+    """Test cases for the stack sampler and the profiling windows."""
+
+    def test_sampler(self):
+        """Test top functions and collapsed stacks of a busy thread."""
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        busy(0.2)
+        profile = sampler.stop()
+
+        assert not sampler.running
+        assert profile.samples > 0
+        assert "busy (test_tracing.py:" in profile.top(5)
+        line = next(line for line in profile.collapsed().splitlines() if "busy (" in line)
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("MainThread;")
+        assert stack.split(";")[-1].startswith("busy (")
+        assert int(count) > 0
+
+    @pytest.mark.asyncio
+    async def test_window(self):
+        """Test that a window enables tracing, closes by itself and restores the tracer."""
+        tracer = Tracer()
+        profiler = Profiler(tracer, interval=0.001)
+        closed = AsyncMock()
+
+        profiler.start(0.1, on_timeout=closed)
+        assert profiler.running and tracer.enabled
+        with pytest.raises(RuntimeError):
+            profiler.start()
+        with tracer.span("work"):
+            busy(0.05)
+        assert "work: 1" in profiler.report()
+
+        await asyncio.sleep(0.2)
+        closed.assert_awaited_once()
+        assert not profiler.running and not tracer.enabled
+        assert profiler.profile.samples > 0
+        assert "Top functions" in profiler.report()
+
+    @pytest.mark.asyncio
+    async def test_stop(self):
+        """Test closing a window before its end."""
+        tracer = Tracer(enabled=True)
+        profiler = Profiler(tracer, interval=0.001, max_seconds=60)
+        closed = AsyncMock()
+
+        profiler.start(3600, on_timeout=closed)
+        profile = profiler.stop()
+        await asyncio.sleep(0)
+
+        assert profile is profiler.profile
+        assert profiler.stop() is profile
+        assert tracer.enabled
+        closed.assert_not_awaited()
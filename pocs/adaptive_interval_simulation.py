@@ -0,0 +1,164 @@
+"""Simulation of the adaptive check interval of modern_host_watch_bot
+
+Replays a synthetic week of outages of a fleet of hosts: mostly short blips,
+some outages of minutes to hours, a few hosts down for days and a few
+flapping hosts. The hosts are checked at a fixed interval, then with
+AdaptivePolicy, and the simulation reports the number of checks (in total and
+of hosts that were down), the alerts sent, the alerted blips (outages under 5
+minutes) and longer outages, and how long failures and recoveries took to be
+noticed.
+
+Usage:
+    python pocs/adaptive_interval_simulation.py [--hosts 500] [--days 7] [--interval 300] [--seed 1]
+"""
+
+import argparse
+import bisect
+import os
+import random
+import statistics
+import sys
+
+# scheduling.py has no package imports: load it alone, without the bot settings the package needs
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'modern_host_watch_bot', 'src', 'utils'))
+
+from scheduling import AdaptivePolicy
+
+DAY = 86400.0
+
+
+def outage_trace(rng: random.Random, days: float) -> list:
+    """Outages (start, end) of one host over the given days"""
+    horizon = days * DAY
+    kind = rng.random()
+    if kind < 0.02:
+        # Decommissioned or broken for days
+        start = rng.uniform(0, horizon / 2)
+        return [(start, start + rng.uniform(2, days) * DAY)]
+
+    outages = []
+    if kind < 0.05:
+        # Flapping for an hour or two, once a day
+        for day in range(int(days)):
+            t = day * DAY + rng.uniform(0, DAY - 7200)
+            end = t + rng.uniform(3600, 7200)
+            while t < end:
+                down = rng.uniform(30, 300)
+                outages.append((t, t + down))
+                t += down + rng.uniform(60, 600)
+
+    # Independent outages, one every three days on average
+    t = rng.expovariate(1 / (3 * DAY))
+    while t < horizon:
+        kind = rng.random()
+        if kind < 0.6:
+            duration = rng.uniform(20, 300)        # blip: reboot, network hiccup
+        elif kind < 0.92:
+            duration = rng.uniform(300, 7200)      # incident
+        else:
+            duration = rng.uniform(7200, DAY)      # long outage
+        outages.append((t, t + duration))
+        t += duration + rng.expovariate(1 / (3 * DAY))
+
+    # Merge overlapping outages
+    merged = []
+    for start, end in sorted(outages):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def simulate(outages: list, horizon: float, interval: float, policy: AdaptivePolicy, rng: random.Random) -> dict:
+    """Check one host until the horizon, with the policy or at a fixed interval when policy is None"""
+    starts = [start for start, _ in outages]
+    alerted = {}
+    recovered = {}
+    checks = down_checks = alerts = failures = 0
+
+    t = rng.uniform(0, interval)
+    while t < horizon:
+        index = bisect.bisect_right(starts, t) - 1
+        down = index >= 0 and t < outages[index][1]
+        checks += 1
+        if down:
+            down_checks += 1
+            failures += 1
+            if policy is None or policy.is_confirmed(failures):
+                alerts += 1
+                alerted.setdefault(index, t - outages[index][0])
+        else:
+            if failures and index >= 0 and index in alerted:
+                recovered.setdefault(index, t - outages[index][1])
+            failures = 0
+        t += interval if policy is None else policy.next_interval(interval, failures, rng)
+
+    return {'checks': checks, 'down_checks': down_checks, 'alerts': alerts,
+            'detection': list(alerted.values()), 'recovery': list(recovered.values()), 'alerted': set(alerted)}
+
+
+def run(name: str, traces: list, horizon: float, interval: float, policy: AdaptivePolicy, seed: int) -> dict:
+    rng = random.Random(seed)
+    totals = {'checks': 0, 'down_checks': 0, 'alerts': 0, 'detection': [], 'recovery': [], 'noticed_blips': 0, 'noticed_long': 0}
+    for outages in traces:
+        result = simulate(outages, horizon, interval, policy, rng)
+        for key in ('checks', 'down_checks', 'alerts'):
+            totals[key] += result[key]
+        totals['detection'] += result['detection']
+        totals['recovery'] += result['recovery']
+        for index in result['alerted']:
+            start, end = outages[index]
+            totals['noticed_blips' if end - start < 300 else 'noticed_long'] += 1
+    totals['name'] = name
+    return totals
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=500)
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--interval', type=float, default=300, help='configured check interval in seconds')
+    parser.add_argument('--max-interval', type=float, default=2400)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    traces = [outage_trace(rng, args.days) for _ in range(args.hosts)]
+    horizon = args.days * DAY
+    outages = [outage for trace in traces for outage in trace]
+    blips = sum(1 for start, end in outages if end - start < 300)
+    long_outages = len(outages) - blips
+    downtime = sum(min(end, horizon) - start for start, end in outages) / (args.hosts * horizon)
+
+    print(f"{args.hosts} hosts, {args.days:g} days, {len(outages)} outages ({blips} under 5 min), "
+          f"{downtime:.1%} of the time down, interval {args.interval:g} s")
+
+    results = [
+        run('fixed interval', traces, horizon, args.interval, None, args.seed),
+        run('adaptive', traces, horizon, args.interval, AdaptivePolicy(max_interval=args.max_interval), args.seed),
+    ]
+
+    print(f"{'':16}{'checks':>10}{'down':>9}{'alerts':>9}{'blips':>8}{'longer':>8}"
+          f"{'detect p50':>12}{'detect p95':>12}{'recover p50':>13}{'recover p95':>13}")
+    for result in results:
+        print(f"{result['name']:16}{result['checks']:>10}{result['down_checks']:>9}{result['alerts']:>9}"
+              f"{result['noticed_blips']:>8}{result['noticed_long']:>5}/{long_outages:<3}"
+              f"{statistics.median(result['detection'] or [0]):>11.0f}s{percentile(result['detection'], 0.95):>11.0f}s"
+              f"{statistics.median(result['recovery'] or [0]):>12.0f}s{percentile(result['recovery'], 0.95):>12.0f}s")
+
+    fixed, adaptive = results
+    print(f"checks: {1 - adaptive['checks'] / fixed['checks']:.1%} fewer, "
+          f"checks of hosts down: {1 - adaptive['down_checks'] / max(1, fixed['down_checks']):.1%} fewer, "
+          f"alerts: {1 - adaptive['alerts'] / max(1, fixed['alerts']):.1%} fewer")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark of the bulk host import of modern_host_watch_bot
+
+Adds N hosts to a MonitoringService backed by a fresh SQLite database and a
+running job queue, first one at a time as /pingadd does (validation, duplicate
+lookup, one database commit and one scheduler wake-up per host), then as one
+CSV document through /pingimport's path (parse, validate every row, one
+transaction, scheduling with a paused scheduler and the first checks spread
+over the interval). Both runs start from an empty database.
+
+Usage:
+    python pocs/bulk_import_benchmark.py [--hosts 10000] [--interval 300]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from cryptography.fernet import Fernet
+
+PROJECT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modern_host_watch_bot')
+sys.path.insert(0, PROJECT)
+
+# The package reads its settings and opens bot_data.db in the working directory on import
+os.environ.setdefault('BOT_TOKEN', '123456:benchmark')
+os.environ.setdefault('BOT_OWNER_ID', '1')
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+os.chdir(tempfile.mkdtemp(prefix='bulk_import_'))
+
+from telegram.ext import Application  # noqa: E402
+
+from src.models.host import HostConfig, HostJob, HostStatus  # noqa: E402
+from src.services.monitoring import MonitoringService  # noqa: E402
+from src.services.persistence import db_manager  # noqa: E402
+from src.utils.host_documents import parse_host_document, plan_import  # noqa: E402
+
+USER_ID = 1
+
+
+def csv_document(hosts: int, interval: int) -> bytes:
+    lines = ['host_address,interval_seconds,port']
+    lines += [f"host{index}.example,{interval},{80 if index % 2 else 443}" for index in range(hosts)]
+    return '\n'.join(lines).encode()
+
+
+def reset_database():
+    for name in os.listdir('.'):
+        if name.startswith('bot_data.db'):
+            os.remove(name)
+    db_manager._init_database()
+
+
+async def one_at_a_time(service: MonitoringService, document: bytes) -> None:
+    """The /pingadd path, per host."""
+    for line in document.decode().splitlines()[1:]:
+        host, interval, port = line.split(',')
+        config = HostConfig(host_address=host, interval_seconds=int(interval), port=int(port))
+        if await service.get_job_by_host(USER_ID, host):
+            continue
+        job = HostJob(job_id=str(uuid.uuid4()), user_id=USER_ID, host_config=config,
+                      host_status=HostStatus(host_address=host))
+        await service.add_host_job(job)
+
+
+async def bulk(service: MonitoringService, document: bytes) -> None:
+    """The /pingimport path."""
+    existing = {job.host_config.host_address for job in await service.get_user_jobs(USER_ID)}
+    plan = plan_import(parse_host_document(document, 'csv'), existing)
+    assert not plan.errors, plan.errors[:3]
+    jobs = [HostJob(job_id=str(uuid.uuid4()), user_id=USER_ID, host_config=config,
+                    host_status=HostStatus(host_address=config.host_address)) for config in plan.configs]
+    assert await service.add_host_jobs(jobs)
+
+
+async def measure(name: str, method, document: bytes, hosts: int) -> float:
+    reset_database()
+    application = Application.builder().token(os.environ['BOT_TOKEN']).build()
+    job_queue = application.job_queue
+    await job_queue.start()
+    service = MonitoringService(application.bot, job_queue)
+    try:
+        started = time.perf_counter()
+        await method(service, document)
+        # Let the scheduler process its wake-ups
+        await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+    finally:
+        await job_queue.stop(wait=False)
+
+    saved = len(await db_manager.get_host_jobs(USER_ID))
+    first_runs = sorted(job.next_t.timestamp() for job in service.scheduled.values())
+    spread = first_runs[-1] - first_runs[0] if first_runs else 0
+    print(f"{name:15}{elapsed:>9.2f} s{hosts / elapsed:>10.0f} hosts/s   {saved:>6} saved   "
+          f"{len(service.scheduled):>6} scheduled, first checks over {spread:>4.0f} s")
+    return elapsed
+
+
+async def main_async(args):
+    # The first checks spread over the interval start during the runs, quiet their failures and cancellations
+    logging.disable(logging.CRITICAL)
+    document = csv_document(args.hosts, args.interval)
+    print(f"{args.hosts} hosts, interval {args.interval} s, database in {os.getcwd()}")
+    slow = await measure('one at a time', one_at_a_time, document, args.hosts)
+    fast = await measure('bulk import', bulk, document, args.hosts)
+    print(f"bulk import {slow / fast:.1f}x faster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=10000)
+    parser.add_argument('--interval', type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Command dispatch microbenchmark
+
+Registers N commands (half of them admin-only) plus the unknown-command
+MessageHandler, like TlgBotFwk does, and measures the time to find the handler
+of an update with PTB's linear check_update loop and with CommandDispatcher.
+
+Usage:
+    python pocs/dispatch_benchmark.py [--commands 200] [--updates 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from telegram import Update, User
+from telegram.ext import Application, CommandHandler, MessageHandler, filters
+
+from util.util_dispatch import compile_command_handlers
+
+ADMIN_ID = 1
+USER_ID = 2
+
+
+async def callback(update, context):
+    pass
+
+
+def build_application(commands: int) -> Application:
+    application = Application.builder().token('123456:benchmark').build()
+
+    # The bot is never initialized, so set the user that get_me would return
+    application.bot._bot_user = User(ADMIN_ID + 1000, 'bench', True, username='bench_bot')
+
+    for i in range(commands):
+        if i % 2:
+            application.add_handler(CommandHandler(f'cmd{i}', callback, filters=filters.User(user_id=ADMIN_ID)))
+        else:
+            application.add_handler(CommandHandler(f'cmd{i}', callback))
+    application.add_handler(MessageHandler(filters.COMMAND, callback))
+    return application
+
+
+def build_updates(application: Application, commands: int, count: int) -> list:
+    updates = []
+    for i in range(count):
+        text = f'/cmd{(i * 7919) % commands} arg' if i % 10 else '/nosuchcommand'
+        data = {
+            'update_id': i,
+            'message': {
+                'message_id': i,
+                'date': 0,
+                'chat': {'id': USER_ID, 'type': 'private'},
+                'from': {'id': ADMIN_ID if i % 3 else USER_ID, 'is_bot': False, 'first_name': 'user'},
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}],
+            },
+        }
+        updates.append(Update.de_json(data, application.bot))
+    return updates
+
+
+def find_handlers(application: Application, updates: list) -> tuple:
+    """The handler lookup of Application.process_update, without running callbacks"""
+    matched = []
+    start = time.perf_counter()
+    for update in updates:
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                check = handler.check_update(update)
+                if check is not None and check is not False:
+                    matched.append(check)
+                    break
+    elapsed = time.perf_counter() - start
+    return elapsed / len(updates), len(matched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=20000)
+    args = parser.parse_args()
+
+    application = build_application(args.commands)
+    updates = build_updates(application, args.commands, args.updates)
+
+    linear, linear_matched = find_handlers(application, updates)
+    compile_command_handlers(application)
+    indexed, indexed_matched = find_handlers(application, updates)
+
+    assert linear_matched == indexed_matched
+    print(f"{args.commands} commands, {args.updates} updates")
+    print(f"linear check_update: {linear * 1e6:8.2f} us/update")
+    print(f"CommandDispatcher:   {indexed * 1e6:8.2f} us/update ({linear / indexed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
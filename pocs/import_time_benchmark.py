@@ -0,0 +1,69 @@
+"""Import time regression check for the framework package
+
+Imports the package (__init__.py) in fresh interpreters with `python -X importtime`
+and fails (exit code 1) when the cumulative import time exceeds the budget or a
+subsystem that must be lazy (payments, plugins, Flask) is imported eagerly.
+The test suite runs it (util/test_import_time.py).
+
+Usage:
+    python pocs/import_time_benchmark.py [--budget-ms 1500] [--runs 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ['util.util_stripe', 'util.util_paypal_receive', 'flask', 'paypalrestsdk', 'plugin_system.plugin_manager', 'requests']
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure() -> dict:
+    """Import the package once and return {module: (self us, cumulative us)}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import __init__'],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Import failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500)))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    # Best of several runs, the first one also compiles the .pyc files
+    runs = [measure() for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: modules['__init__'][1])
+    total_ms = best['__init__'][1] / 1000
+
+    print(f"package import: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms), {len(best)} modules")
+    print("slowest modules (self time):")
+    for name, (self_us, _) in sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+
+    sys.exit(1 if eager or total_ms > args.budget_ms else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""User presence persistence benchmark
+
+Compares bot_data['user_dict'] holding telegram.User objects (plus the old
+user_status last_message_date strings) with compact UserRecords, reporting the
+pickled size and the time to pickle it, as PicklePersistence does on flush.
+
+Usage:
+    python pocs/presence_benchmark.py [--users 100000]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from telegram import User
+
+from util.util_presence import migrate_user_dict
+
+
+def build_bot_data(users: int) -> dict:
+    bot_data = {'user_dict': {}, 'user_status': {}}
+    for user_id in range(users):
+        bot_data['user_dict'][user_id] = User(
+            user_id, f'First{user_id}', False, last_name=f'Last{user_id}',
+            username=f'user_{user_id}', language_code='pt-br'
+        )
+        bot_data['user_status'][user_id] = {'last_message_date': '18/10 09:30', 'balance': 0}
+    return bot_data
+
+
+def measure(bot_data: dict, rounds: int = 3) -> tuple:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        data = pickle.dumps(bot_data, protocol=pickle.HIGHEST_PROTOCOL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(data), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    args = parser.parse_args()
+
+    bot_data = build_bot_data(args.users)
+    user_size, user_time = measure(bot_data)
+
+    start = time.perf_counter()
+    migrate_user_dict(bot_data)
+    migration_time = time.perf_counter() - start
+    record_size, record_time = measure(bot_data)
+
+    print(f"{args.users} users")
+    print(f"telegram.User: {user_size / 1e6:7.2f} MB pickled in {user_time * 1e3:7.1f} ms")
+    print(f"UserRecord:    {record_size / 1e6:7.2f} MB pickled in {record_time * 1e3:7.1f} ms")
+    print(f"migration:     {migration_time * 1e3:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Head-of-line blocking benchmark of the update processor
+
+Feeds an Application one slow command (like /git) followed by quick messages
+of other chats and of the slow chat itself, with the default sequential
+processing and with ChatOrderedUpdateProcessor, and reports how long the quick
+messages waited and whether each chat was handled in order.
+
+Usage:
+    python pocs/update_processor_benchmark.py [--chats 50] [--messages 20] [--slow 2.0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from util.util_update_processor import ChatOrderedUpdateProcessor
+
+
+class FakeBotApi(BaseRequest):
+    """Answers every Bot API call locally"""
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 1.0
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        result = {'id': 1, 'is_bot': True, 'first_name': 'Bot', 'username': 'bot'} if url.endswith('/getMe') else True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def make_update(bot, update_id: int, chat_id: int, text: str) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': 'user'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'user'},
+        },
+    }, bot)
+
+
+async def run(processor, chats: int, messages: int, slow: float) -> dict:
+    builder = Application.builder().token('1:benchmark').request(FakeBotApi()).get_updates_request(FakeBotApi())
+    if processor:
+        builder = builder.concurrent_updates(processor)
+    application = builder.build()
+
+    handled = defaultdict(list)
+    waits = []
+    sent = {}
+
+    async def handle(update, context):
+        waits.append(time.monotonic() - sent[update.update_id])
+        if update.message.text == '/git':
+            await asyncio.sleep(slow)
+        handled[update.effective_chat.id].append(update.update_id)
+
+    application.add_handler(MessageHandler(filters.ALL, handle))
+
+    async with application:
+        await application.start()
+        update_id = 0
+        for sequence in range(messages):
+            for chat_id in range(chats):
+                update_id += 1
+                sent[update_id] = time.monotonic()
+                text = '/git' if update_id == 1 else f"message {sequence}"
+                await application.update_queue.put(make_update(application.bot, update_id, chat_id, text))
+        while sum(map(len, handled.values())) < update_id:
+            await asyncio.sleep(0.01)
+        await application.stop()
+
+    in_order = all(ids == sorted(ids) for ids in handled.values())
+    waits.sort()
+    return {'median': waits[len(waits) // 2], 'p95': waits[int(len(waits) * 0.95)], 'in_order': in_order}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--slow', type=float, default=2.0)
+    args = parser.parse_args()
+
+    for name, processor in (('sequential', None), ('chat-ordered', ChatOrderedUpdateProcessor(max_concurrency=8))):
+        result = asyncio.run(run(processor, args.chats, args.messages, args.slow))
+        print(f"{name:>12}: median wait {result['median'] * 1000:8.1f} ms, p95 {result['p95'] * 1000:8.1f} ms, "
+              f"per-chat order kept: {result['in_order']}")
+        if processor:
+            print(f"{'':>12}  {processor.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Load test of the sharded webhook runner
+
+Starts ShardedWebhookRunner with N workers on localhost, whose bots answer the
+Bot API with a local fake instead of calling Telegram, posts synthetic message
+updates for many chats over keep-alive connections and checks that every
+update was handled exactly once, by a single worker per chat, in order.
+
+Usage:
+    python pocs/webhook_load_test.py [--workers 4] [--chats 200] [--updates 20000] [--connections 16]
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from telegram.ext import Application, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from util.util_webhook_shard import ShardedWebhookRunner
+
+SECRET_TOKEN = 'load-test-secret'
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'LoadTestBot', 'username': 'load_test_bot'}
+
+
+class FakeBotApi(BaseRequest):
+    """Answers every Bot API call locally, so workers never reach Telegram"""
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 1.0
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        result = BOT_USER if url.endswith('/getMe') else True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def build_worker_application(results_dir: str, worker_index: int) -> Application:
+    """Worker bot: records (chat, sequence, worker) of every message it handles"""
+    application = Application.builder().token('1:load-test').request(FakeBotApi()).get_updates_request(FakeBotApi()).build()
+    results = open(os.path.join(results_dir, f"worker{worker_index}.txt"), 'a', buffering=1)
+
+    async def record(update, context):
+        results.write(f"{update.effective_chat.id} {update.message.text} {worker_index}\n")
+
+    application.add_handler(MessageHandler(filters.ALL, record))
+    return application
+
+
+def make_update(update_id: int, chat_id: int, sequence: int) -> bytes:
+    return json.dumps({
+        'update_id': update_id,
+        'message': {
+            'message_id': sequence,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f"user{chat_id}"},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f"user{chat_id}"},
+            'text': str(sequence),
+        },
+    }).encode()
+
+
+async def post_updates(port: int, bodies: list) -> int:
+    """Send the bodies in order over one keep-alive connection, return the rejected count"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    rejected = 0
+    for body in bodies:
+        writer.write(
+            b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            + f"X-Telegram-Bot-Api-Secret-Token: {SECRET_TOKEN}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        status_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        if b' 200 ' not in status_line:
+            rejected += 1
+    writer.close()
+    return rejected
+
+
+async def generate_load(port: int, chats: int, updates: int, connections: int) -> int:
+    # A chat always uses the same connection, so its updates are sent in order
+    per_connection = defaultdict(list)
+    for update_id in range(updates):
+        chat_id = 1000 + update_id % chats
+        per_connection[chat_id % connections].append(make_update(update_id, chat_id, update_id // chats))
+    return sum(await asyncio.gather(*(post_updates(port, bodies) for bodies in per_connection.values())))
+
+
+async def post_forged(port: int) -> bytes:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = make_update(0, 1, 0)
+    writer.write(f"POST / HTTP/1.1\r\nX-Telegram-Bot-Api-Secret-Token: wrong\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    status_line = await reader.readline()
+    writer.close()
+    return status_line
+
+
+def check_results(results_dir: str, chats: int, updates: int) -> list:
+    """Errors found in the worker results"""
+    sequences = defaultdict(list)
+    workers_of_chat = defaultdict(set)
+    for file_name in os.listdir(results_dir):
+        with open(os.path.join(results_dir, file_name)) as file:
+            for line in file:
+                chat_id, sequence, worker_index = map(int, line.split())
+                sequences[chat_id].append(sequence)
+                workers_of_chat[chat_id].add(worker_index)
+
+    errors = []
+    handled = sum(len(values) for values in sequences.values())
+    if handled != updates:
+        errors.append(f"{handled} updates handled, {updates} sent")
+    for chat_id, values in sequences.items():
+        if values != sorted(values) or len(set(values)) != len(values):
+            errors.append(f"chat {chat_id} handled out of order or twice")
+        if len(workers_of_chat[chat_id]) != 1:
+            errors.append(f"chat {chat_id} handled by workers {sorted(workers_of_chat[chat_id])}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as results_dir:
+        runner = ShardedWebhookRunner(
+            functools.partial(build_worker_application, results_dir),
+            workers=args.workers, port=args.port, secret_token=SECRET_TOKEN
+        )
+        thread = threading.Thread(target=runner.run)
+        thread.start()
+        runner.ready.wait(60)
+
+        forged_status = asyncio.run(post_forged(args.port))
+
+        start = time.perf_counter()
+        rejected = asyncio.run(generate_load(args.port, args.chats, args.updates, args.connections))
+        accepted_seconds = time.perf_counter() - start
+
+        # Stopping waits for the workers to handle every queued update
+        runner.stop()
+        thread.join()
+        total_seconds = time.perf_counter() - start
+
+        errors = check_results(results_dir, args.chats, args.updates)
+
+    print(f"{args.workers} workers, {args.chats} chats, {args.connections} connections")
+    print(f"accepted {args.updates - rejected} updates in {accepted_seconds:.2f} s ({args.updates / accepted_seconds:,.0f}/s)")
+    print(f"handled all updates in {total_seconds:.2f} s ({args.updates / total_seconds:,.0f}/s)")
+    print(f"per worker: {runner.stats['dispatched']}")
+    print(f"forged secret token: {forged_status.decode().strip()}")
+
+    if b' 403 ' not in forged_status:
+        errors.append("request with a wrong secret token was not rejected")
+    for error in errors[:20]:
+        print(f"FAIL: {error}")
+    sys.exit(1 if errors or rejected else 0)
+
+
+if __name__ == '__main__':
+    main()
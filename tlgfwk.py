@@ -110,12 +110,8 @@ class TlgBotFwk(Application):
         """
         
         try:
-            # if the dictionary of users does not exist on bot_data, create it
-            if 'user_dict' not in context.bot_data:
-                context.bot_data['user_dict'] = {}
-                
             # Insert or update user on the bot_data dictionary
-            context.bot_data['user_dict'][update.effective_user.id] = update.effective_user
+            touch_user(context.bot_data, update.effective_user)
             
             # force persistence of the bot_data dictionary
             self.application.persistence.update_bot_data(context.bot_data) if self.application.persistence else None
@@ -156,7 +152,7 @@ _Path:_
             self.default_start_message = translations.get_translated_message(language_code, 'start_message', 'en', full_name, self.application.bot.name, self.application.bot.first_name)
             
             # if self.bot_owner and user_id == self.bot_owner:                          
-            if user_id in self.admins_owner:                          
+            if self.auth.is_admin(user_id):                          
                 self.default_start_message += f"{os.linesep}{os.linesep}_You are one of the bot admins:_` {self.admins_owner}`"
                 self.default_start_message += f"{os.linesep}_User language code:_ `{language_code}`"
                 self.default_start_message += f"{os.linesep}_Default language code:_ `{self.default_language_code}`"
@@ -233,6 +229,97 @@ _Links:_
             logger.error(f"Error in cmd_show_config: {e}")
             await update.message.reply_text(f"Sorry, we encountered an error: {e}")
     
+    async def cmd_update_stats(self, update: Update, context: CallbackContext, *args, **kwargs):
+        """Show the update processing metrics: concurrency, queue depth and wait times
+
+        Args:
+            update (Update): _description_
+            context (CallbackContext): _description_
+        """
+        
+        try:
+            stats = self.update_processor.stats()
+            
+            message = f"""*Update Processing*{os.linesep}
+_Running:_ `{stats['running']} of {stats['max_concurrency']}`
+_Waiting:_ `{stats['waiting']}`
+_Busy chats:_ `{stats['busy_chats']}`
+_Processed:_ `{stats['processed']}`
+_Unordered:_ `{stats['unordered_processed']}`
+_Timed out:_ `{stats['timed_out']}`
+_Average wait:_ `{stats['average_wait'] * 1000:.1f} ms`
+_Max wait:_ `{stats['max_wait'] * 1000:.1f} ms`"""
+
+            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+            
+        except Exception as e:
+            logger.error(f"Error in cmd_update_stats: {e}")
+            await update.message.reply_text(f"Sorry, we encountered an error: {e}")
+    
+    async def cmd_profile(self, update: Update, context: CallbackContext, *args, **kwargs):
+        """Profile the bot: /profile start [seconds], /profile stop, /profile report [top]
+        
+        The report lists the slowest handler spans and the functions with the most
+        stack samples, the stop and report answers also carry the collapsed stacks
+        of the window as profile.folded, e.g. for flamegraph.pl profile.folded > profile.svg
+
+        Args:
+            update (Update): _description_
+            context (CallbackContext): _description_
+        """
+        
+        try:
+            action = context.args[0].lower() if context.args else 'report'
+            chat_id = update.effective_chat.id
+            
+            if action == 'start':
+                if self.profiler.running:
+                    await update.message.reply_text("A profile is already running, /profile stop ends it", parse_mode=None)
+                    return
+                
+                seconds = float(context.args[1]) if len(context.args) > 1 else self.profile_seconds
+                self.profiler.start(seconds, on_timeout=lambda: self.send_profile(chat_id))
+                await update.message.reply_text(f"Profiling for {min(seconds, self.profiler.max_seconds):g} s, /profile stop ends it earlier", parse_mode=None)
+            
+            elif action == 'stop':
+                if not self.profiler.running:
+                    await update.message.reply_text("No profile running, /profile start [seconds] starts one", parse_mode=None)
+                    return
+                
+                self.profiler.stop()
+                await self.send_profile(chat_id)
+            
+            elif action == 'report':
+                top = int(context.args[1]) if len(context.args) > 1 else 20
+                await self.send_profile(chat_id, top)
+            
+            else:
+                await update.message.reply_text("Usage: /profile start [seconds] | stop | report [top]", parse_mode=None)
+            
+        except Exception as e:
+            logger.error(f"Error in cmd_profile: {e}")
+            await update.message.reply_text(f"Sorry, we encountered an error: {e}")
+    
+    async def send_profile(self, chat_id: int, top: int = 20):
+        """Send the profile report of the running or last window, and its collapsed stacks when it ended
+
+        Args:
+            chat_id (int): chat to send to
+            top (int, optional): spans and functions listed. Defaults to 20.
+        """
+        
+        bot = self.application.bot
+        report = self.profiler.report(top)
+        await bot.send_message(chat_id=chat_id, text=report[:4000], parse_mode=None)
+        
+        profile = self.profiler.profile
+        if not self.profiler.running and profile and profile.samples:
+            await bot.send_document(
+                chat_id=chat_id,
+                document=InputFile(profile.collapsed().encode(), filename='profile.folded'),
+                caption="Collapsed stacks: flamegraph.pl profile.folded > profile.svg"
+            )
+    
     async def cmd_show_env(self, update: Update, context: CallbackContext, *args, **kwargs):
         """Show the bot environment settings
 
@@ -294,15 +381,14 @@ _Links:_
         command_dict = {}
             
         try:
-            for handler_group in self.application.handlers.values():                    
-                    for handler in handler_group:
+            for handler_group, handler in iter_handlers(self.application):
                         try:
                             if isinstance(handler, CommandHandler):
                                 command_name = list(handler.commands)[0]
                                 command_description = handler.callback.__doc__.split("\n")[0] if handler.callback.__doc__ else command_name
                                 command_filter = handler.filters
-                                user_allowed = list(command_filter.user_ids)[0] if isinstance(command_filter, filters.User) else None
-                                is_admin = True if isinstance(command_filter, filters.User) else False
+                                is_admin = True if isinstance(command_filter, (filters.User, RoleFilter)) else False
+                                user_allowed = next(iter(command_filter.user_ids), None) if is_admin else None
                                 command_dict[command_name] = {'command_description': command_description, 'is_admin': is_admin, 'user_allowed': user_allowed}
                                 
                                 # yield handler
@@ -357,7 +443,7 @@ _Links:_
                 try:
                     if command_name not in [bot_command.command for bot_command in self.common_users_commands]:
                         if command_data['is_admin']:
-                            if current_user_id in self.admins_owner:
+                            if self.auth.is_admin(current_user_id):
                                 self.help_text += f"/{command_name} {flag_admin} - {command_data['command_description']}{os.linesep}"
                                 
                                 # add command got from command handler to telegram menu commands only to specific admin user
@@ -452,6 +538,8 @@ _Links:_
             return None
     
     def check_encrypt(self, decrypted_token: str = None, decrypted_bot_owner: str = None, decrypt_key = None, encrypted_token: str = None, encrypted_bot_owner: str = None):             
+        
+        from cryptography.fernet import Fernet
             
         def decrypt(encrypted_token, key):
             f = Fernet(key)
@@ -533,17 +621,26 @@ _Links:_
     # --------------- Init stop bot event handlers--------------------
 
     async def post_init(self, application: Application) -> None:   
+        await self.setup_process(application)
+        await self.notify_start(application)
 
+    async def setup_process(self, application: Application) -> None:
+        """Startup of this process, run by every sharded webhook worker"""
+        
         try:
             self.bot_name = application.bot.username
             
-            post_init_message = await self.get_init_message() 
-            logger.info(f"{post_init_message}") 
+            # convert users of older persistence files into compact user records
+            migrated_users = migrate_user_dict(application.bot_data)
+            if migrated_users:
+                logger.info(f"Converted {migrated_users} users of bot_data['user_dict'] into user records")
+            
+            # admins added or removed by other processes of the bot
+            if self.shared_persistence and 'admin_ids' in application.bot_data:
+                self.admins_owner = application.bot_data['admin_ids']
             
             # Set the start message for all admin users 
             await self.set_start_message(self.default_language_code, 'Admin', self.admins_owner[0])
-            
-            post_init_message += f"{os.linesep}{os.linesep}{self.default_start_message}"
              
             self.common_users_commands = await application.bot.get_my_commands(scope=BotCommandScopeDefault())            
             logger.info(f"Get Current commands: {self.common_users_commands}")
@@ -558,6 +655,17 @@ _Links:_
             
             self.all_commands = tuple(list(self.common_users_commands) + list(self.admin_commands))
             
+        except Exception as e:
+            logger.error(f"Error: {e}")
+
+    async def notify_start(self, application: Application) -> None:
+        """One-time startup: admin message and external_post_init, run by the first sharded webhook worker only"""
+        
+        try:
+            post_init_message = await self.get_init_message() 
+            
+            post_init_message += f"{os.linesep}{os.linesep}{self.default_start_message}"
+            
             # for all admin users set the scope of the commands to chat_id
             await self.send_admins_message(message=post_init_message)
             
@@ -568,11 +676,31 @@ _Links:_
             logger.error(f"Error: {e}")
 
     async def post_stop(self, application: Application) -> None:
+        await self.teardown_process(application)
+        await self.notify_stop(application)
+                
+        sys.exit(0)
+
+    async def teardown_process(self, application: Application) -> None:
+        """Shutdown of this process, run by every sharded webhook worker"""
         
         try:            
             # force persistence of all bot data
-            self.application.persistence.flush() if self.application.persistence else None
+            await self.application.persistence.flush() if self.application.persistence else None
+            
+            # deliver the pending audit events before stopping
+            await self.audit_feed.stop()
+            
+            # kill running git/exec/ssh commands
+            self.command_runner.shutdown()
             
+        except Exception as e:
+            logger.error(f"Error: {e}")
+
+    async def notify_stop(self, application: Application) -> None:
+        """Admin stop message, sent by the first sharded webhook worker only"""
+        
+        try:            
             stop_message = f"_STOPPING_ @{self.bot_name} {os.linesep}`{self.hostname}`{os.linesep}`{__file__}` {self.bot_name}..."
             logger.info(stop_message)
                      
@@ -580,8 +708,6 @@ _Links:_
             
         except Exception as e:
             logger.error(f"Error: {e}")
-                
-        sys.exit(0)
 
     # --------------- Payment handlers --------------------
     
@@ -643,6 +769,15 @@ _Links:_
             logger.error(f"Error in EXECUTE_PAYMENT_CALLBACK: {e}")
             return f"An error occurred: {e}"
         
+    @property
+    def admins_owner(self) -> list:
+        """Admin user ids, the bot owner first. Backed by self.auth, so changes apply to all admin filters"""
+        return self.auth.ordered_members(ROLE_ADMIN)
+    
+    @admins_owner.setter
+    def admins_owner(self, admin_ids: list):
+        self.auth.set_members(ROLE_ADMIN, admin_ids)
+    
     # ---------------- Bot constructor and initializers -------    
     
     def __init__(self, 
@@ -661,6 +796,7 @@ _Links:_
         persistence_file: str = None,
         disable_persistence = False,
         default_persistence_interval = 10,
+        shared_persistence = False,
         logger = logger,
         sort_commands = True,
         enable_plugins = False,
@@ -669,10 +805,17 @@ _Links:_
         disable_commands_list = [],
         disable_command_not_implemented = False,
         disable_error_handler = False,
-        external_post_init = None
+        external_post_init = None,
+        fast_dispatch = False,
+        max_concurrent_updates: int = None,
+        handler_timeouts: dict = None,
+        unordered_commands: set = None
         ):
         
         try: 
+            # logging and debugger hook of the bot process, no longer configured at import time
+            setup()
+            
             self.hostname = socket.getfqdn()
             self.main_script_path = sys.argv[0]
             self.bot_name = None
@@ -704,7 +847,7 @@ _Links:_
             # read list of admin users from the .env file
             default_list = [self.bot_owner] + [int(admin_id) for admin_id in (self.admin_id_string.split(',') if self.admin_id_string else [])]
             default_str = ','.join(map(str, default_list))
-            self.admins_owner = [int(admin_id) for admin_id in os.environ.get('ADMIN_ID_LIST', default_str).split(',')]
+            admin_id_list = [int(admin_id) for admin_id in os.environ.get('ADMIN_ID_LIST', default_str).split(',')]
             
             # if validate_token:            
             #     self.validate_token(self.token, quit_if_error)  
@@ -715,6 +858,9 @@ _Links:_
             else:
                 self.token = os.environ.get('DEFAULT_BOT_TOKEN', None) if not self.token else self.token
                 self.bot_owner = int(os.environ.get('DEFAULT_BOT_OWNER', None)) if not self.bot_owner else int(self.bot_owner)
+            
+            # Roles of all users, shared by every admin filter and decorator
+            self.auth = AuthorizationService(self.bot_owner, admin_id_list)
                                
             self.default_language_code = os.environ.get('DEFAULT_LANGUAGE_CODE', 'en-US') if not default_language_code else default_language_code
             
@@ -726,7 +872,7 @@ _Links:_
             
             self.bot_defaults_build = bot_defaults_build 
             
-            self.admin_filters = admin_filters if admin_filters else filters.User(user_id=self.admins_owner) 
+            self.admin_filters = admin_filters if admin_filters else self.auth.admin_filter 
             
             self.force_common_commands = force_common_commands  
             self.disable_command_not_implemented = disable_command_not_implemented
@@ -735,17 +881,69 @@ _Links:_
             
             self.external_post_init = external_post_init
             
+            # Longer /showpickle outputs are sent as a compressed document
+            self.show_pickle_max_pages = int(os.environ.get('SHOW_PICKLE_MAX_PAGES', 3))
+            
+            # Commands of non-admin users, sent to all admins as periodic digests
+            self.audit_feed = AdminAuditFeed(
+                send_message=lambda chat_id, text: self.application.bot.send_message(chat_id=chat_id, text=text, parse_mode=None),
+                get_admin_ids=lambda: self.admins_owner,
+                interval=float(os.environ.get('AUDIT_FEED_INTERVAL', 5)),
+                log_file=os.environ.get('AUDIT_LOG_FILE', None)
+            )
+            
+            # git/exec/ssh commands run off the event loop, a few at a time per admin
+            self.command_runner = CommandRunner(
+                max_per_owner=int(os.environ.get('MAX_COMMANDS_PER_ADMIN', 2)),
+                default_timeout=float(os.environ.get('COMMAND_TIMEOUT', 300))
+            )
+            
+            # Dispatch commands through a dict lookup instead of checking each CommandHandler
+            self.fast_dispatch = os.environ.get('FAST_DISPATCH', 'False').lower() == 'true' if not fast_dispatch else fast_dispatch
+            
+            # Updates of different chats run concurrently, the ones of a chat in order
+            self.update_processor = ChatOrderedUpdateProcessor(
+                max_concurrency=max_concurrent_updates or int(os.environ.get('MAX_CONCURRENT_UPDATES', 8)),
+                # handlers are only cancelled when HANDLER_TIMEOUT (seconds) is set
+                default_timeout=float(os.environ.get('HANDLER_TIMEOUT', 0)) or None,
+                # commands run by the command runner have their own COMMAND_TIMEOUT
+                timeouts={'git': None, 'exec': None, 'ssh': None, **(handler_timeouts or {})},
+                # /cancel must not queue behind the command it stops, and the commands run by the
+                # command runner (limited per admin there) must not hold the chat meanwhile
+                unordered={'cancel', 'git', 'exec', 'ssh', *(unordered_commands or ())}
+            )
+            
+            # Spans of handlers, decorators, Bot API calls and persistence writes, always on with TRACE_HANDLERS
+            # and during the /profile windows, that also sample the stacks of all threads
+            tracer.enabled = os.environ.get('TRACE_HANDLERS', 'False').lower() == 'true'
+            self.profiler = Profiler(tracer, interval=float(os.environ.get('PROFILE_INTERVAL', 0.005)))
+            self.profile_seconds = float(os.environ.get('PROFILE_SECONDS', 60))
+            
             # ---------- Build the bot application ------------
               
             # Making bot persistant from the base class      
             # https://github.com/python-telegram-bot/python-telegram-bot/wiki/Making-your-bot-persistent
             # self.persistence_file = f"{script_path}{os.sep}{self.bot_info.username + '.pickle'}" if not persistence_file else persistence_file
             self.persistence_file = f"{script_path}{os.sep}{'HostWatchBot.pickle'}" if not persistence_file else persistence_file
-            persistence = PicklePersistence(filepath=self.persistence_file, update_interval=self.default_persistence_interval) if not disable_persistence else None
+            
+            # Processes of the same bot (sharded webhook workers) share a SQLite store, the pickle file is imported into it once
+            self.shared_persistence = shared_persistence
+            self.shared_persistence_file = f"{os.path.splitext(self.persistence_file)[0]}.sqlite"
+            if disable_persistence:
+                persistence = None
+            elif shared_persistence:
+                persistence = SQLitePersistence(self.shared_persistence_file, migrate_from=self.persistence_file, update_interval=self.default_persistence_interval)
+            else:
+                persistence = PicklePersistence(filepath=self.persistence_file, update_interval=self.default_persistence_interval)
             
             # Create an Application instance using the builder pattern  
             # ('To use `JobQueue`, PTB must be installed via `pip install "python-telegram-bot[job-queue]"`.',)    
-            self.application = Application.builder().defaults(bot_defaults_build).token(self.token).post_init(self.post_init).post_stop(self.post_stop).persistence(persistence).job_queue(JobQueue()).build()
+            self.application = Application.builder().defaults(bot_defaults_build).token(self.token).post_init(self.post_init).post_stop(self.post_stop).persistence(persistence).job_queue(JobQueue()).concurrent_updates(self.update_processor).request(TracedRequest(connection_pool_size=256)).build()
+            if persistence:
+                self.application.update_persistence = tracer.wrap('update_persistence', self.application.update_persistence)
+            if shared_persistence and persistence:
+                # Admins added or removed by another process, before any admin filter is checked
+                self.application.add_handler(TypeHandler(Update, self.sync_shared_admins), group=-1000)
            
             # --------------------------------------------------
             
@@ -760,6 +958,8 @@ _Links:_
              
             if enable_plugins:
                 try:                    
+                    from plugin_system.plugin_manager import PluginManager
+                    
                     # self.plugin_manager = PluginManager(plugins_dir)
                     self.plugin_manager = PluginManager()
                     self.plugin_manager.load_plugins()     
@@ -822,7 +1022,7 @@ _Links:_
                 self.logger.info("Default handlers disabled")
             
             # handler for the /lang command to set the default language code
-            set_language_code_handler = CommandHandler('lang', self.set_default_language, filters=filters.User(user_id=self.admins_owner))
+            set_language_code_handler = CommandHandler('lang', self.set_default_language, filters=self.auth.admin_filter)
             self.application.add_handler(set_language_code_handler)
             
             # add handler for the /userlang command to set the user language code
@@ -832,19 +1032,23 @@ _Links:_
                 self.application.add_handler(set_user_language_handler)
             
             # add handler for the /git command to update the bot's code from a git repository
-            git_handler = CommandHandler('git', self.cmd_git, filters=filters.User(user_id=self.admins_owner))
+            git_handler = CommandHandler('git', self.cmd_git, filters=self.auth.admin_filter)
             self.application.add_handler(git_handler)
             
+            # add cancel command handler, stops running git/exec/ssh commands
+            cancel_handler = CommandHandler('cancel', self.cmd_cancel, filters=self.auth.admin_filter)
+            self.application.add_handler(cancel_handler)
+            
             # add handler for the /restart command to restart the bot
-            restart_handler = CommandHandler('restart', self.restart_bot, filters=filters.User(user_id=self.admins_owner))
+            restart_handler = CommandHandler('restart', self.restart_bot, filters=self.auth.admin_filter)
             self.application.add_handler(restart_handler)
             
             # add handler for the /stop command to stop the bot
-            stop_handler = CommandHandler('stop', self.stop_bot, filters=filters.User(user_id=self.admins_owner))
+            stop_handler = CommandHandler('stop', self.stop_bot, filters=self.auth.admin_filter)
             self.application.add_handler(stop_handler)
             
             # add handler for the /showconfig command to show the bot configuration settings
-            show_config_handler = CommandHandler('showconfig', self.cmd_show_config, filters=filters.User(user_id=self.admins_owner))
+            show_config_handler = CommandHandler('showconfig', self.cmd_show_config, filters=self.auth.admin_filter)
             self.application.add_handler(show_config_handler)
             
             # add version command handler
@@ -854,7 +1058,7 @@ _Links:_
                 self.application.add_handler(version_handler)
             
             # add admin manage command handler
-            admin_manage_handler = CommandHandler('admin', self.cmd_manage_admin, filters=filters.User(user_id=self.admins_owner))
+            admin_manage_handler = CommandHandler('admin', self.cmd_manage_admin, filters=self.auth.admin_filter)
             self.application.add_handler(admin_manage_handler)
             
             # add useful links command handler
@@ -864,19 +1068,27 @@ _Links:_
                 self.application.add_handler(useful_links_handler)
             
             # add show env command handler
-            show_env_handler = CommandHandler('showenv', self.cmd_show_env, filters=filters.User(user_id=self.admins_owner))
+            show_env_handler = CommandHandler('showenv', self.cmd_show_env, filters=self.auth.admin_filter)
             self.application.add_handler(show_env_handler)
             
             # add show pickle command handler
-            show_pickle_handler = CommandHandler('showpickle', self.cmd_show_pickle, filters=filters.User(user_id=self.admins_owner))
+            show_pickle_handler = CommandHandler('showpickle', self.cmd_show_pickle, filters=self.auth.admin_filter)
             self.application.add_handler(show_pickle_handler)
             
             # add force persistence command handler
-            force_persistence_handler = CommandHandler('forcepersistence', self.cmd_force_persistence, filters=filters.User(user_id=self.admins_owner))
+            force_persistence_handler = CommandHandler('forcepersistence', self.cmd_force_persistence, filters=self.auth.admin_filter)
             self.application.add_handler(force_persistence_handler)
             
+            # add update processing metrics command handler
+            update_stats_handler = CommandHandler('updatestats', self.cmd_update_stats, filters=self.auth.admin_filter)
+            self.application.add_handler(update_stats_handler)
+            
+            # add profiling command handler
+            profile_handler = CommandHandler('profile', self.cmd_profile, filters=self.auth.admin_filter)
+            self.application.add_handler(profile_handler)
+            
             # Add admin command to show users from persistence file
-            show_users_handler = CommandHandler('showusers', self.cmd_show_users, filters=filters.User(user_id=self.admins_owner))
+            show_users_handler = CommandHandler('showusers', self.cmd_show_users, filters=self.auth.admin_filter)
             self.application.add_handler(show_users_handler)
             
             command_text = 'payment'
@@ -884,11 +1096,11 @@ _Links:_
                 self.application.add_handler(CommandHandler(command_text, self.cmd_payment)) 
             
             # add handler for the /loadplugin command to load a plugin dynamically
-            load_plugin_handler = CommandHandler('loadplugin', self.cmd_load_plugin, filters=filters.User(user_id=self.admins_owner))
+            load_plugin_handler = CommandHandler('loadplugin', self.cmd_load_plugin, filters=self.auth.admin_filter)
             self.application.add_handler(load_plugin_handler)
             
             # Add handler for the /showcommands command to show the commands available to the user and admin
-            show_commands_handler = CommandHandler('showcommands', self.cmd_show_commands, filters=filters.User(user_id=self.admins_owner))
+            show_commands_handler = CommandHandler('showcommands', self.cmd_show_commands, filters=self.auth.admin_filter)
             self.application.add_handler(show_commands_handler)
             
             # Add handler for the /showbalance command to show the current user's balance
@@ -901,11 +1113,11 @@ _Links:_
             self.application.add_handler(PreCheckoutQueryHandler(self.precheckout_callback)) 
             
             # Add a command to manage user's balance
-            manage_balance_handler = CommandHandler('managebalance', self.cmd_manage_balance, filters=filters.User(user_id=self.admins_owner))
+            manage_balance_handler = CommandHandler('managebalance', self.cmd_manage_balance, filters=self.auth.admin_filter)
             self.application.add_handler(manage_balance_handler)  
             
             # Add a command to manage the Stripe payment token
-            manage_stripe_token_handler = CommandHandler('paytoken', self.cmd_manage_stripe_token, filters=filters.User(user_id=self.admins_owner))
+            manage_stripe_token_handler = CommandHandler('paytoken', self.cmd_manage_stripe_token, filters=self.auth.admin_filter)
             self.application.add_handler(manage_stripe_token_handler)  
             
             # Command to generate Paypal payment links
@@ -915,26 +1127,26 @@ _Links:_
                 self.application.add_handler(generate_paypal_link_handler)  
             
             # Add a command handler that lists all PayPal pending links, restricted to admin users
-            list_paypal_links_handler = CommandHandler('listpaypal', self.cmd_list_paypal_links, filters=filters.User(user_id=self.admins_owner))
+            list_paypal_links_handler = CommandHandler('listpaypal', self.cmd_list_paypal_links, filters=self.auth.admin_filter)
             self.application.add_handler(list_paypal_links_handler)
             
             #  Command to remove paypal links
-            remove_paypal_link_handler = CommandHandler('removepaypal', self.cmd_remove_paypal_link, filters=filters.User(user_id=self.admins_owner))
+            remove_paypal_link_handler = CommandHandler('removepaypal', self.cmd_remove_paypal_link, filters=self.auth.admin_filter)
             self.application.add_handler(remove_paypal_link_handler)
             
             # Add a command handler that switches between PayPal live and sandbox environments
             switch_paypal_env_command = 'switchpaypal'
-            switch_paypal_env_handler = CommandHandler(switch_paypal_env_command, self.cmd_switch_paypal_env, filters=filters.User(user_id=self.admins_owner))
+            switch_paypal_env_handler = CommandHandler(switch_paypal_env_command, self.cmd_switch_paypal_env, filters=self.auth.admin_filter)
             self.application.add_handler(switch_paypal_env_handler) 
             
             # Add a command handler that schedules a function to run recurrently
             schedule_function_command = 'schedule'
-            schedule_function_handler = CommandHandler(schedule_function_command, self.cmd_schedule_function, filters=filters.User(user_id=self.admins_owner))
+            schedule_function_handler = CommandHandler(schedule_function_command, self.cmd_schedule_function, filters=self.auth.admin_filter)
             self.application.add_handler(schedule_function_handler)
             
             # add a command handler that unschedules a previously scheduled function
             unschedule_function_command = 'unschedule'
-            unschedule_function_handler = CommandHandler(unschedule_function_command, self.cmd_unschedule_function, filters=filters.User(user_id=self.admins_owner))
+            unschedule_function_handler = CommandHandler(unschedule_function_command, self.cmd_unschedule_function, filters=self.auth.admin_filter)
             self.application.add_handler(unschedule_function_handler)
             
             if not self.disable_command_not_implemented:
@@ -1403,7 +1615,7 @@ _Links:_
         
         try:
             user_id = update.effective_user.id
-            is_admin = user_id in self.admins_owner
+            is_admin = self.auth.is_admin(user_id)
 
             common_commands = [get_command_line(cmd) for cmd in self.common_users_commands]
             admin_commands = [get_command_line(cmd) for cmd in self.admin_commands if cmd not in self.common_users_commands]
@@ -1462,6 +1674,13 @@ _Links:_
             context (CallbackContext): _description_
         """
         
+        # payment settings are loaded on the first payment
+        from util.util_stripe import (
+            DEFAULT_LANGUAGE, DEFAULT_STRIPE_CURRENCY, DEFAULT_STRIPE_DESCRIPTION, DEFAULT_STRIPE_LIVE_TOKEN, DEFAULT_STRIPE_MODE,
+            DEFAULT_STRIPE_PAYLOAD, DEFAULT_STRIPE_PRICE, DEFAULT_STRIPE_START_PARAMETER, DEFAULT_STRIPE_TEST_TOKEN, DEFAULT_STRIPE_TITLE,
+            bot_user_admin
+        )
+        
         try:            
             user_language = update.effective_user.language_code
             
@@ -1543,12 +1762,10 @@ _Links:_
         
         async def get_user_line(user, persistence_user_data, user_balance = 0):
             
-            empty_date = '-' * 11
-            
-            # Get the user data buffer from bot context
-            last_message = context.bot_data['user_status'][user.id]['last_message_date'] if 'user_status' in context.bot_data and user.id in context.bot_data['user_status'] else empty_date  # (datetime.datetime.now()+ timedelta(hours=-3)).strftime('%d/%m %H:%M') 
+            # Last time the user accessed the bot
+            last_message = user.last_seen_text
          
-            flag_admin = '👑' if user.id in self.admins_owner else ' '
+            flag_admin = '👑' if self.auth.is_admin(user.id) else ' '
             user_data = persistence_user_data.get(user.id, None) if persistence_user_data else None
         
             # user_balance = user_data.get('balance', 0) if user_data else 0
@@ -1635,58 +1852,50 @@ _Links:_
     @with_writing_action
     @with_log_admin
     async def cmd_show_pickle(self, update: Update, context: CallbackContext):
-        """Show the bot persistence file
+        """Show the bot persistence file. Usage: /showpickle [path], e.g. /showpickle user_data.12345
 
         Args:
             update (Update): _description_
             context (CallbackContext): _description_
         """
-                        
-        # Define the persistent_load function
-        def persistent_load(persid):
-            # Handle the persistent ID
-            # For example, you can return a default value or raise an error
-            if persid == "a known bot replaced by PTB's PicklePersistence":
-                return persid
-            # else:
-            #     raise pickle.UnpicklingError(f"Unsupported persistent id: {persid}")     
-                    
+        
         try:  
+            # the pickle file was only imported into the shared store, its data is outdated
+            if self.shared_persistence:
+                await update.message.reply_text(f"_The bot data is kept in the shared persistence:_ {os.linesep}`{self.shared_persistence_file}`")
+                return
+            
             # in case the persistence file does not exist, warn the user
             if not os.path.exists(self.persistence_file):
                 await update.message.reply_text(f"_Persistence file not found:_ {os.linesep}`{self.persistence_file}`")
                 return
-                             
-            # Read the bot .pickle persistence file and show it to the user
-            with open(self.persistence_file, 'rb') as file:
-                unpickler = pickle.Unpickler(file)
-                unpickler.persistent_load = persistent_load
-                pickle_data = unpickler.load()                       
-                
-            # First, serialize bot data with a custom encoder because it is a telegram bot user that is not serializable
-            bot_data = next(iter(pickle_data['bot_data']['user_dict'].values()))
-            serialized_bot_data = json.dumps(bot_data, cls=TelegramObjectEncoder, indent=4) 
-            print(f"JSON data: {serialized_bot_data}") 
-                       
-            # Format bot data as json snippet and show to telegram user
-            formatted_json = f"```json\n{serialized_bot_data}\n```"
-            print(f"JSON data: {formatted_json}")
-            await update.message.reply_text(f"_Bot data:_ {os.linesep}{formatted_json}")
-            
-            # Now, remove the item 'bot_data" from the dictionary because it was already shown
-            pickle_data.pop('bot_data')  
-                      
-            # Then serialize the rest of all other items of dictionary data with default encoder    
-            serialized_other_data = json.dumps(pickle_data, indent=4) 
-            print(f"JSON data: {serialized_other_data}") 
             
-            # Then format them as json snippet and show it to the telegram user
-            formatted_json = f"```json\n{serialized_other_data}\n```"
-            print(f"JSON data: {formatted_json}")
-            await update.message.reply_text(f"_Chat and User data:_ {os.linesep}{formatted_json}")
+            query = context.args[0] if context.args else ''
+            
+            # Load and query the file in a resource limited worker process, off the event loop
+            result = await inspect_pickle_file(self.persistence_file, query)
+            
+            # Sizes of each key of the selected node
+            if result['summary']:
+                for page in html_pages(format_summary(result)):
+                    await update.message.reply_text(page, parse_mode=ParseMode.HTML)
             
+            # Up to a few messages of JSON, otherwise a compressed JSON document
+            pages = html_pages(result['json'], 'json')
+            if len(pages) <= self.show_pickle_max_pages and not result['truncated']:
+                for page in pages:
+                    await update.message.reply_text(page, parse_mode=ParseMode.HTML)
+            else:
+                file_name = f"{query or os.path.basename(self.persistence_file)}.json.gz"
+                await update.message.reply_document(
+                    document=InputFile(compress_json(result['json']), filename=file_name),
+                    caption=f"_{len(result['json']):,} chars{' (truncated)' if result['truncated'] else ''}_"
+                )
+            
+        except PickleInspectError as e:
+            await update.message.reply_text(f"Sorry, cannot show the persistence file: {e}", parse_mode=None)
         except Exception as e:
-            logger.error(f"Error in cmd_show_env: {e}")
+            logger.error(f"Error in cmd_show_pickle: {e}")
             await update.message.reply_text(f"Sorry, we encountered an error: {e}", parse_mode=None)
     
     @with_writing_action
@@ -1701,7 +1910,7 @@ _Links:_
         
         try:
             # command with parameters is only allowed to admin users
-            if len(update.message.text.split(' ')) > 1 and update.effective_user.id in self.admins_owner:
+            if len(update.message.text.split(' ')) > 1 and self.auth.is_admin(update.effective_user.id):
                 link = update.message.text.split(' ')[1]
                 
                 if link not in self.links_list:
@@ -1739,20 +1948,25 @@ _Links:_
             if len(update.message.text.split(' ')) > 1:
                 owner_list = int(update.message.text.split(' ')[1])
                 
-                if owner_list not in self.admins_owner:
-                    self.admins_owner.append(owner_list)
+                if not self.auth.is_admin(owner_list):
+                    self.auth.grant(owner_list, ROLE_ADMIN)
                     await self.set_admin_commands()
                     await update.message.reply_text(f"_Admin user added:_ `{owner_list}`")
                 else:
                     if owner_list == self.bot_owner:
                         await update.message.reply_text(f"_Bot owner cannot be removed:_ `{owner_list}`")
                     else:
-                        self.admins_owner.remove(owner_list)
+                        self.auth.revoke(owner_list, ROLE_ADMIN)
                         await self.set_admin_commands()
                         await update.message.reply_text(f"_Admin user removed:_ `{owner_list}`")
 
                 # dotenv.set_key(self.env_file, 'ADMIN_ID_LIST', self.admins_owner)
                 dotenv.set_key(self.env_file, 'ADMIN_ID_LIST', ','.join(map(str, self.admins_owner)))
+                
+                # the other processes of the bot pick the change from the shared persistence
+                if self.shared_persistence:
+                    context.bot_data['admin_ids'] = list(self.admins_owner)
+                    await self.application.persistence.update_bot_data(context.bot_data)
                                     
             else:
                 await update.message.reply_text(f"_Admin users:_ `{self.admins_owner}`")                  
@@ -1761,6 +1975,13 @@ _Links:_
             logger.error(f"Error: {e}")
             await update.message.reply_text(f"An error occurred: {e}")  
     
+    async def sync_shared_admins(self, update: Update, context: CallbackContext):
+        """Apply the admin changes made by the other processes of the bot, kept in bot_data['admin_ids']"""
+        
+        admin_ids = context.bot_data.get('admin_ids')
+        if admin_ids is not None and set(admin_ids) != self.auth.members(ROLE_ADMIN):
+            self.admins_owner = admin_ids
+    
     @with_writing_action
     @with_log_admin
     async def cmd_version_handler(self, update: Update, context: CallbackContext, *args, **kwargs):
@@ -1835,9 +2056,7 @@ _Links:_
             #     return
            
             # get all command handlers from the bot
-            all_command_handlers = self.application.handlers
-            for command_hadler in all_command_handlers.values():
-                for handler in command_hadler:
+            for handler_group, handler in iter_handlers(self.application):
                     try:
                         logger.debug(f"Handler: {handler}")
                         command_text = list(handler.commands)[0] if handler.commands else None 
@@ -1863,9 +2082,8 @@ _Links:_
     async def default_start_handler(self, update: Update, context: CallbackContext, *args, **kwargs):
         
         try:                
-            # if the dictionary of users does not exist on bot_data, create it
-            if 'user_dict' not in context.bot_data:
-                context.bot_data['user_dict'] = {}
+            # Insert or update user on the bot_data dictionary
+            touch_user(context.bot_data, update.effective_user)
                         
             # force persistence of the bot_data dictionary
             self.application.persistence.update_bot_data(context.bot_data) if self.application.persistence else None
@@ -1882,11 +2100,6 @@ _Links:_
             await self.set_start_message(language_code, update.effective_user.full_name, update.effective_user.id)
                 
             await update.message.reply_text(self.default_start_message.format(update.effective_user.first_name))
-            
-            context.bot_data['user_status'] = context.bot_data.get('user_status', {})
-            context.bot_data['user_status'][update.effective_user.id] = context.bot_data['user_status'].get(update.effective_user.id, {})
-            
-            context.bot_data['user_status'][update.effective_user.id]['last_message_date'] = datetime.datetime.now().strftime('%d/%m %H:%M')          
                 
         except Exception as e:
             logger.error(f"Error in default_start_handler: {e}")
@@ -1911,35 +2124,47 @@ _Links:_
     @with_writing_action
     @with_log_admin
     async def cmd_git(self, update: Update, context: CallbackContext):
-        """Update the bot's version from a git repository"""
+        """Update the bot's version from a git repository, e.g. /git pull"""
         
         try:
-            # get the branch name from the message
-            # branch_name = update.message.text.split(' ')[1]
-            message = f"_Updating the bot's code from the branch..._" # `{branch_name}`"
-            logger.info(message)
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+            # git arguments from the message, `git status` by default
+            command = "git " + (" ".join(shlex.quote(arg) for arg in context.args) if context.args else "status")
+            logger.info(f"git command: {command}")
             
-            # update the bot's code
-            # command = f"git fetch origin {branch_name} && git reset --hard origin/{branch_name}"
-            command = "git status"
+            # run without blocking the bot, showing the output as it comes
+            stream = await ChatOutputStream.start(update.message, f"$ {command}")
+            result = await self.command_runner.run_shell(command, owner_id=update.effective_user.id, on_output=stream.write)
+            self.logger.info(f"Result: {result.status_text}")
             
-            if len(update.effective_message.text.split(' ')) > 1:
-                git_command = update.effective_message.text.split(' ')[1]
-                logger.info(f"git command: {command}")
-                command = f"git {git_command}"
+            await stream.close(result.status_text)
             
-            # execute system command and return the result
-            # os.system(command=command)
-            result = os.popen(command).read()
-            self.logger.info(f"Result: {result}")
+        except CommandLimitError as e:
+            await update.message.reply_text(f"_{e}_", parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            await update.message.reply_text(f"An error occurred: {e}")
+
+    @with_log_admin
+    async def cmd_cancel(self, update: Update, context: CallbackContext):
+        """Cancel your running commands: /cancel [id], or list them with /cancel list"""
+        
+        try:
+            user_id = update.effective_user.id
             
-            result = f"_Result:_ `{result}`"
+            if context.args and context.args[0] == 'list':
+                running = self.command_runner.running(user_id)
+                message = os.linesep.join(f"`{id}` {description[:60]} ({seconds:.0f} s)" for id, _, description, seconds in running)
+                await update.message.reply_text(message or "_No commands running_", parse_mode=ParseMode.MARKDOWN)
+                return
             
-            await update.message.reply_text(result, parse_mode=ParseMode.MARKDOWN)
+            execution_id = int(context.args[0]) if context.args else None
+            cancelled = self.command_runner.cancel(user_id, execution_id)
+            await update.message.reply_text(f"_{cancelled} command(s) cancelled_", parse_mode=ParseMode.MARKDOWN)
             
+        except ValueError:
+            await update.message.reply_text("_Usage:_ `/cancel [id|list]`", parse_mode=ParseMode.MARKDOWN)
         except Exception as e:
-            logger.error(f"Error: {e}")
+            logger.error(f"Error in cmd_cancel: {e}")
             await update.message.reply_text(f"An error occurred: {e}")
 
     @with_writing_action
@@ -1973,9 +2198,67 @@ _Links:_
     
     # ------------------------------------------
 
+    def prepare_run(self):
+        """Last steps before updates are processed, shared by run() and the sharded webhook workers
+
+        Subclasses may add their handlers in an override, calling super().prepare_run() after them.
+        """
+        # Every handler is a span, subclasses add their handlers before calling run()
+        trace_handlers(self.application)
+        
+        if self.fast_dispatch:
+            # Subclasses add their handlers before calling run(), so index them all here
+            indexed = compile_command_handlers(self.application)
+            self.logger.info(f"Fast command dispatch enabled for {indexed} command handlers")
+
     def run(self):
+        self.prepare_run()
+        
         self.application.run_polling()
         # There is no current event loop in thread 'MainThread'.
+    
+    @classmethod
+    def run_sharded(cls, workers: int = None, listen: str = None, port: int = None, url_path: str = None,
+                    webhook_url: str = None, secret_token: str = None, **bot_kwargs):
+        """Run the bot in webhook mode with one worker process per CPU core, sharding updates by chat
+        
+        Every worker builds its own bot with cls(**bot_kwargs, shared_persistence=True): all workers
+        share <name>.sqlite, into which the existing <name>.pickle is imported once, so the user_data of
+        a user seen in chats of different workers and bot_data stay consistent. Updates of a chat always
+        go to the same worker, in order. Every worker runs setup_process/teardown_process, the first one
+        also notify_start/notify_stop.
+        Handlers must be added in __init__, initialize_handlers or prepare_run, a subclass run() is not called.
+
+        Args:
+            workers (int, optional): worker processes. Defaults to WEBHOOK_WORKERS or the number of CPU cores.
+            listen (str, optional): front-end address. Defaults to WEBHOOK_LISTEN or '127.0.0.1'.
+            port (int, optional): front-end port. Defaults to WEBHOOK_PORT or 8443.
+            url_path (str, optional): webhook path. Defaults to WEBHOOK_PATH or '/'.
+            webhook_url (str, optional): public URL to register with Telegram. Defaults to WEBHOOK_URL.
+            secret_token (str, optional): secret token checked on every request. Defaults to WEBHOOK_SECRET_TOKEN.
+            **bot_kwargs: arguments of the bot constructor
+        """
+        dotenv.load_dotenv(bot_kwargs.get('env_file') or '.env')
+        
+        workers = workers or int(os.environ.get('WEBHOOK_WORKERS', 0)) or None
+        secret_token = secret_token or os.environ.get('WEBHOOK_SECRET_TOKEN', None)
+        webhook_url = webhook_url or os.environ.get('WEBHOOK_URL', None)
+        
+        runner = ShardedWebhookRunner(
+            functools.partial(build_sharded_worker_bot, cls, bot_kwargs),
+            workers=workers,
+            listen=listen or os.environ.get('WEBHOOK_LISTEN', '127.0.0.1'),
+            port=port or int(os.environ.get('WEBHOOK_PORT', 8443)),
+            url_path=url_path or os.environ.get('WEBHOOK_PATH', '/'),
+            secret_token=secret_token,
+            token=bot_kwargs.get('token') or os.environ.get('DEFAULT_BOT_TOKEN', None),
+            webhook_url=webhook_url
+        )
+        runner.run()
+
+def build_sharded_worker_bot(bot_class, bot_kwargs: dict, worker_index: int):
+    """Bot of a sharded webhook worker, sharing the persistence of the other workers"""
+    return bot_class(**{**bot_kwargs, 'shared_persistence': True})
         
 if __name__ == '__main__':
     
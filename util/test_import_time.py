@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+BENCHMARK = os.path.join(os.path.dirname(__file__), '..', 'pocs', 'import_time_benchmark.py')
+
+
+def run_benchmark(*args):
+    return subprocess.run([sys.executable, BENCHMARK, *args], capture_output=True, text=True, timeout=120)
+
+
+def test_package_import_is_within_budget():
+    # Budget from IMPORT_TIME_BUDGET_MS, 1500 ms by default
+    result = run_benchmark()
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_import_over_budget_fails():
+    result = run_benchmark('--budget-ms', '0', '--runs', '1')
+    assert result.returncode == 1
+    assert 'FAIL: import time over budget' in result.stdout
@@ -0,0 +1,52 @@
+import json
+import sys
+
+import pytest
+
+from .. import LAZY_ATTRIBUTES, lazy_import
+
+
+@pytest.fixture
+def heavy_module(tmp_path, monkeypatch):
+    """Module that leaves a marker file when it is executed"""
+    marker = tmp_path / 'heavy.ran'
+    (tmp_path / 'heavy_module_for_test.py').write_text(
+        f"open({str(marker)!r}, 'w').close()\nVALUE = 42\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield marker
+    sys.modules.pop('heavy_module_for_test', None)
+
+
+def test_lazy_import_runs_on_first_attribute(heavy_module):
+    module = lazy_import('heavy_module_for_test')
+
+    assert not heavy_module.exists()
+    assert sys.modules['heavy_module_for_test'] is module
+
+    assert module.VALUE == 42
+    assert heavy_module.exists()
+
+
+def test_lazy_import_reuses_loaded_modules():
+    assert lazy_import('json') is json
+
+
+def test_lazy_import_missing_module():
+    assert lazy_import('no_such_module_for_test') is None
+
+
+def test_lazy_attributes(monkeypatch):
+    root = sys.modules[lazy_import.__module__]
+    monkeypatch.setitem(LAZY_ATTRIBUTES, 'JSONDecoder', 'json')
+
+    try:
+        from .. import JSONDecoder
+        assert JSONDecoder is json.JSONDecoder
+        # Cached as a regular attribute after the first lookup
+        assert vars(root)['JSONDecoder'] is json.JSONDecoder
+    finally:
+        vars(root).pop('JSONDecoder', None)
+
+    with pytest.raises(AttributeError):
+        root.no_such_attribute
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from util.util_auth import ROLE_ADMIN, ROLE_OWNER, AuthorizationService
+
+
+def message_from(user_id):
+    return Message(message_id=1, date=datetime.now(), chat=Chat(user_id, Chat.PRIVATE),
+                   from_user=User(user_id, 'user', False), text='/stop')
+
+
+def test_owner_and_admins():
+    auth = AuthorizationService(owner_id='10', admin_ids=[20, 30])
+
+    assert auth.roles(10) == frozenset({ROLE_OWNER, ROLE_ADMIN})
+    assert auth.is_admin(10) and auth.is_admin(20) and not auth.is_admin(40)
+    assert auth.has_role(10, ROLE_OWNER) and not auth.has_role(20, ROLE_OWNER)
+    assert auth.ordered_members(ROLE_ADMIN) == [10, 20, 30]
+
+
+def test_grant_and_revoke():
+    auth = AuthorizationService(owner_id=10)
+    members = auth.members(ROLE_ADMIN)
+
+    auth.grant(20, ROLE_ADMIN)
+    auth.revoke(10, ROLE_ADMIN)
+
+    # Earlier snapshots are never mutated
+    assert members == frozenset({10})
+    assert auth.members(ROLE_ADMIN) == frozenset({20})
+    assert auth.roles(10) == frozenset({ROLE_OWNER})
+
+    auth.revoke(20, ROLE_ADMIN)
+    assert auth.roles(20) == frozenset()
+    assert auth.ordered_members(ROLE_ADMIN) == []
+
+
+def test_set_members():
+    auth = AuthorizationService(owner_id=10, admin_ids=[20])
+
+    auth.set_members(ROLE_ADMIN, [10, '30'])
+
+    assert auth.members(ROLE_ADMIN) == frozenset({10, 30})
+    assert auth.has_role(10, ROLE_OWNER)
+
+
+def test_admin_filter_follows_changes():
+    auth = AuthorizationService(owner_id=10)
+    admin_filter = auth.admin_filter
+
+    assert auth.filter(ROLE_ADMIN) is admin_filter
+    assert admin_filter.check_update(Update(1, message=message_from(10)))
+    assert not admin_filter.filter(message_from(20))
+
+    auth.grant(20, ROLE_ADMIN)
+    assert admin_filter.filter(message_from(20))
+    assert admin_filter.user_ids == frozenset({10, 20})
@@ -0,0 +1,73 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from util.util_chat_action import ChatActionManager
+
+
+def make_bot():
+    bot = Mock()
+    bot.send_chat_action = AsyncMock()
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_send_is_debounced_per_chat():
+    manager = ChatActionManager(lifetime=5)
+    bot = make_bot()
+
+    assert await manager.send(bot, 1)
+    assert not await manager.send(bot, 1)
+    assert await manager.send(bot, 2)
+    assert await manager.send(bot, 1, force=True)
+
+    assert bot.send_chat_action.await_count == 3
+    assert (manager.sent_count, manager.skipped_count) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried():
+    manager = ChatActionManager()
+    bot = make_bot()
+    bot.send_chat_action.side_effect = [RuntimeError('flood'), None]
+
+    assert not await manager.send(bot, 1)
+    assert await manager.send(bot, 1)
+
+
+@pytest.mark.asyncio
+async def test_keep_refreshes_until_the_last_block_ends():
+    manager = ChatActionManager(lifetime=0.05, refresh_interval=0.02)
+    bot = make_bot()
+
+    async with manager.keep(bot, 1):
+        async with manager.keep(bot, 1):
+            # One refresher per chat, shared by concurrent handlers
+            assert len(manager._refreshers) == 1
+            await asyncio.sleep(0.07)
+        assert len(manager._refreshers) == 1
+
+    assert manager._refreshers == {}
+    sent = bot.send_chat_action.await_count
+    assert sent >= 3
+
+    await asyncio.sleep(0.05)
+    assert bot.send_chat_action.await_count == sent
+
+
+@pytest.mark.asyncio
+async def test_keep_does_not_delay_the_block():
+    manager = ChatActionManager()
+    bot = make_bot()
+    sending = asyncio.Event()
+
+    async def slow_send(**kwargs):
+        sending.set()
+        await asyncio.sleep(10)
+
+    bot.send_chat_action.side_effect = slow_send
+
+    async with manager.keep(bot, 1):
+        # The block runs before the action is even sent
+        assert not sending.is_set()
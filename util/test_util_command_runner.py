@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from util.util_command_runner import ChatOutputStream, CommandLimitError, CommandResult, CommandRunner
+
+
+@pytest.fixture
+def runner():
+    runner = CommandRunner(max_per_owner=1, default_timeout=5, threads=2)
+    yield runner
+    runner.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_shell_streams_output(runner):
+    chunks = []
+
+    async def on_output(text):
+        chunks.append(text)
+
+    result = await runner.run_shell('echo hello; echo oops >&2; exit 3', owner_id=1, on_output=on_output)
+
+    assert result.status == 'finished' and result.exit_code == 3 and not result.ok
+    assert result.output == ''.join(chunks) == 'hello\noops\n'
+    assert result.status_text.startswith('exit code 3 in ')
+    assert runner.running() == []
+
+
+@pytest.mark.asyncio
+async def test_run_shell_timeout_keeps_partial_output(runner):
+    result = await runner.run_shell('echo started; sleep 10', timeout=0.5)
+
+    assert result.status == 'timed out' and not result.ok
+    assert result.output == 'started\n'
+
+
+@pytest.mark.asyncio
+async def test_limit_per_owner_and_cancel(runner):
+    task = asyncio.ensure_future(runner.run_shell('sleep 10', owner_id=1))
+    await asyncio.sleep(0.2)
+
+    [(execution_id, owner_id, description, _)] = runner.running(owner_id=1)
+    assert (owner_id, description) == (1, 'sleep 10')
+
+    with pytest.raises(CommandLimitError):
+        await runner.run_shell('true', owner_id=1)
+    # Other admins are not limited
+    assert (await runner.run_shell('true', owner_id=2)).ok
+
+    assert runner.cancel(owner_id=2) == 0
+    assert runner.cancel(execution_id=execution_id) == 1
+    assert (await task).status == 'cancelled'
+    assert runner.running() == []
+
+
+@pytest.mark.asyncio
+async def test_run_blocking(runner):
+    result = await runner.run_blocking('add', lambda a, b: a + b, 2, 3)
+    assert result.ok and result.value == 5
+
+    def fail():
+        raise OSError('unreachable')
+
+    result = await runner.run_blocking('connect', fail)
+    assert result.status == 'failed' and result.output == 'OSError: unreachable'
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_timeout_aborts_the_call(runner):
+    release = threading.Event()
+    on_cancel = Mock(side_effect=release.set)
+
+    result = await runner.run_blocking('hang', release.wait, 10, timeout=0.2, on_cancel=on_cancel)
+
+    assert result.status == 'timed out'
+    on_cancel.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_run_coroutine(runner):
+    async def job():
+        return 'done'
+
+    assert (await runner.run_coroutine('job', job(), owner_id=1)).value == 'done'
+
+    blocker = asyncio.ensure_future(runner.run_coroutine('wait', asyncio.sleep(10), owner_id=1))
+    await asyncio.sleep(0.05)
+    refused = job()
+    with pytest.raises(CommandLimitError):
+        await runner.run_coroutine('job', refused, owner_id=1)
+    # The refused coroutine is closed, not left unawaited
+    assert refused.cr_frame is None
+
+    runner.cancel(owner_id=1)
+    assert (await blocker).status == 'cancelled'
+
+
+def test_command_result_status_text():
+    assert CommandResult('x', 'finished', elapsed=1.25).status_text == 'done in 1.2 s'
+    assert CommandResult('x', 'cancelled', elapsed=3).status_text == 'cancelled in 3.0 s'
+
+
+@pytest.mark.asyncio
+async def test_chat_output_stream():
+    message = Mock()
+    message.edit_text = AsyncMock()
+    stream = ChatOutputStream(message, 'ls <dir>', interval=60, tail_chars=15)
+
+    await stream.write('a & b\n')
+    await stream.write('more output\n')
+    # Only the first write edits, the next one waits for the interval
+    assert message.edit_text.await_count == 1
+    assert message.edit_text.await_args.args[0] == '<b>ls &lt;dir&gt;</b>\n<pre>a &amp; b\n</pre>\n<i>running...</i>'
+
+    await stream.close('exit code 0 in 0.1 s')
+    text = message.edit_text.await_args.args[0]
+    assert '<pre>...more output\n</pre>' in text and text.endswith('<i>exit code 0 in 0.1 s</i>')
+    assert stream.edits == 2
+
+    # Nothing changed, no edit
+    await stream.close('exit code 0 in 0.1 s')
+    assert stream.edits == 2
@@ -0,0 +1,54 @@
+from unittest.mock import Mock
+
+import pytest
+
+from util.util_auth import AuthorizationService
+from util.util_decorators import with_log_admin
+
+
+class Bot:
+    def __init__(self, handler):
+        self.auth = AuthorizationService(owner_id=1)
+        self.audit_feed = Mock()
+        self.logger = Mock()
+        self.calls = 0
+        self.handler = handler
+
+    @with_log_admin
+    async def command(self, update, context):
+        self.calls += 1
+        return await self.handler()
+
+
+def update_from(user_id):
+    update = Mock()
+    update.effective_user.id = user_id
+    update.effective_user.full_name = 'User'
+    update.effective_message.text = '/git pull'
+    return update
+
+
+@pytest.mark.asyncio
+async def test_log_admin_records_non_admins():
+    async def handler():
+        return 'done'
+
+    bot = Bot(handler)
+
+    assert await bot.command(update_from(1), Mock()) == 'done'
+    bot.audit_feed.record.assert_not_called()
+
+    assert await bot.command(update_from(2), Mock()) == 'done'
+    bot.audit_feed.record.assert_called_once_with('/git pull - User - from 2')
+
+
+@pytest.mark.asyncio
+async def test_log_admin_runs_a_failing_handler_once():
+    async def handler():
+        raise RuntimeError('boom')
+
+    bot = Bot(handler)
+
+    with pytest.raises(RuntimeError):
+        await bot.command(update_from(2), Mock())
+    assert bot.calls == 1
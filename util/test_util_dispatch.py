@@ -0,0 +1,96 @@
+from datetime import datetime
+from unittest.mock import Mock
+
+from telegram import Chat, Message, MessageEntity, Update, User
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+
+from util.util_auth import AuthorizationService
+from util.util_dispatch import CommandDispatcher, compile_command_handlers, iter_handlers
+
+
+async def callback(update, context):
+    pass
+
+
+def command_update(text, user_id=1, bot_username='MyBot', offset=0):
+    """Update of a message starting with a command entity"""
+    length = len(text[offset:].split()[0])
+    message = Message(
+        message_id=1, date=datetime.now(), chat=Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, 'user', False), text=text,
+        entities=[MessageEntity(MessageEntity.BOT_COMMAND, offset, length)]
+    )
+    message.set_bot(Mock(username=bot_username))
+    return Update(1, message=message)
+
+
+class TestCommandDispatcher:
+
+    def test_command_and_arguments(self):
+        handler = CommandHandler('start', callback)
+        dispatcher = CommandDispatcher([handler])
+
+        matched, check = dispatcher.check_update(command_update('/START  a b'))
+
+        assert matched is handler
+        assert check[0] == ['a', 'b']
+        assert dispatcher.commands == frozenset({'start'})
+
+    def test_not_a_command(self):
+        dispatcher = CommandDispatcher([CommandHandler('start', callback)])
+
+        assert dispatcher.check_update(command_update('/help')) is None
+        assert dispatcher.check_update(command_update('hi /start', offset=3)) is None
+        assert dispatcher.check_update(object()) is None
+
+    def test_bot_username(self):
+        handler = CommandHandler('start', callback)
+        dispatcher = CommandDispatcher([handler])
+
+        assert dispatcher.check_update(command_update('/start@mybot x'))[0] is handler
+        assert dispatcher.check_update(command_update('/start@OtherBot x')) is None
+
+    def test_role_filter_falls_through(self):
+        auth = AuthorizationService(owner_id=1)
+        admin = CommandHandler('stats', callback, filters=auth.admin_filter)
+        everyone = CommandHandler('stats', callback)
+        dispatcher = CommandDispatcher([admin, everyone])
+
+        assert dispatcher.check_update(command_update('/stats', user_id=1))[0] is admin
+        assert dispatcher.check_update(command_update('/stats', user_id=2))[0] is everyone
+
+        # Roles are read on every update, no re-registration needed
+        auth.grant(2, 'admin')
+        assert dispatcher.check_update(command_update('/stats', user_id=2))[0] is admin
+
+    def test_user_filter_with_arguments(self):
+        handler = CommandHandler('ban', callback, filters=filters.User(user_id=1))
+        dispatcher = CommandDispatcher([handler])
+
+        matched, check = dispatcher.check_update(command_update('/ban 42', user_id=1))
+        assert matched is handler and check == (['42'], True)
+        assert dispatcher.check_update(command_update('/ban 42', user_id=2)) is None
+
+
+def test_compile_command_handlers():
+    application = Application.builder().token('123:abc').build()
+    start = CommandHandler('start', callback)
+    button = CallbackQueryHandler(callback)
+    help_handler = CommandHandler('help', callback)
+    text = MessageHandler(filters.TEXT, callback)
+    stop = CommandHandler('stop', callback)
+    for handler in (start, button, help_handler, text, stop):
+        application.add_handler(handler)
+
+    assert compile_command_handlers(application) == 3
+
+    first, second, third, fourth = application.handlers[0]
+    # Commands are merged across the callback query handler, not across the message handler
+    assert isinstance(first, CommandDispatcher) and first.handlers == [start, help_handler]
+    assert second is button and third is text
+    assert isinstance(fourth, CommandDispatcher) and fourth.handlers == [stop]
+    assert [handler for _, handler in iter_handlers(application)] == [start, help_handler, button, text, stop]
+
+    # Compiling again keeps the same handlers
+    assert compile_command_handlers(application) == 3
+    assert [handler for _, handler in iter_handlers(application)] == [start, help_handler, button, text, stop]
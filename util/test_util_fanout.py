@@ -0,0 +1,181 @@
+import socket
+import threading
+
+import pytest
+
+from util.util_fanout import (
+    FanoutResult, FanoutTarget, SSHSessionPool, format_fanout_report, format_fanout_summary, group_results, run_fanout
+)
+
+
+class FakeClient:
+    def __init__(self, target):
+        self.target = target
+        self.closed = False
+        self.commands = []
+        self.fail_next = None
+
+    def get_transport(self):
+        return None if self.closed else self
+
+    def is_active(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(SSHSessionPool):
+    """Pool whose connections are fake clients"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.clients = []
+
+    def _connect(self, target, timeout):
+        client = FakeClient(target)
+        self.clients.append(client)
+        return client
+
+    @staticmethod
+    def _exec(client, command, timeout):
+        if client.fail_next:
+            error, client.fail_next = client.fail_next, None
+            raise error
+        client.commands.append(command)
+        return 0, f"{client.target.host}: {command}"
+
+
+@pytest.fixture
+def pool():
+    pool = FakePool(idle_timeout=60)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused_per_credentials(pool):
+    target = FanoutTarget('10.0.0.1', 'root', 'secret')
+
+    assert pool.run(target, 'uptime', 5) == (0, '10.0.0.1: uptime')
+    assert pool.run(target, 'df', 5) == (0, '10.0.0.1: df')
+    assert len(pool.clients) == 1 and pool.clients[0].commands == ['uptime', 'df']
+
+    pool.run(FanoutTarget('10.0.0.1', 'root', 'other'), 'uptime', 5)
+    assert pool.stats() == {'connections': 2, 'active_commands': 0, 'connections_opened': 2}
+
+
+def test_broken_connection_is_replaced_once(pool):
+    target = FanoutTarget('10.0.0.1', 'root', 'secret')
+    pool.run(target, 'uptime', 5)
+
+    pool.clients[0].fail_next = EOFError('closed by the host')
+    assert pool.run(target, 'uptime', 5) == (0, '10.0.0.1: uptime')
+    assert pool.clients[0].closed and len(pool.clients) == 2
+
+    # Closed transports are noticed before running the command
+    pool.clients[1].close()
+    pool.run(target, 'uptime', 5)
+    assert len(pool.clients) == 3
+
+
+def test_errors_of_new_connections_are_raised(pool):
+    target = FanoutTarget('10.0.0.1', 'root', 'secret')
+    pool.run(target, 'uptime', 5)
+    pool.clients[0].close()
+
+    pool_connect = pool._connect
+
+    def connect_then_fail(target, timeout):
+        client = pool_connect(target, timeout)
+        client.fail_next = EOFError('refused')
+        return client
+
+    pool._connect = connect_then_fail
+    with pytest.raises(EOFError):
+        pool.run(target, 'uptime', 5)
+    assert pool.stats()['connections'] == 0
+
+    def refuse(target, timeout):
+        raise ConnectionRefusedError
+
+    # Failed connections are not kept
+    pool._connect = refuse
+    with pytest.raises(ConnectionRefusedError):
+        pool.run(target, 'uptime', 5)
+    assert pool.stats() == {'connections': 0, 'active_commands': 0, 'connections_opened': 2}
+
+
+def test_command_timeout_keeps_the_connection(pool):
+    target = FanoutTarget('10.0.0.1', 'root', 'secret')
+    pool.run(target, 'uptime', 5)
+
+    pool.clients[0].fail_next = socket.timeout('timed out')
+    with pytest.raises(socket.timeout):
+        pool.run(target, 'sleep 60', 5)
+    assert not pool.clients[0].closed and len(pool.clients) == 1
+
+
+def test_idle_connections_are_closed():
+    pool = FakePool(max_connections=1, idle_timeout=60)
+    first, second = FanoutTarget('10.0.0.1', 'root', 'a'), FanoutTarget('10.0.0.2', 'root', 'b')
+
+    pool.run(first, 'uptime', 5)
+    pool.run(second, 'uptime', 5)
+    # Over max_connections, the least recently used idle connection is closed
+    assert pool.clients[0].closed and pool.stats()['connections'] == 1
+
+    pool.idle_timeout = 0
+    with pool._lock:
+        assert pool._close_idle(expired_only=True) == 1
+    assert pool.clients[1].closed and pool.stats()['connections'] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_fanout():
+    threads = set()
+
+    def run_target(target, command, timeout):
+        threads.add(threading.current_thread().name)
+        if target.host == 'down':
+            raise socket.timeout('timed out')
+        if target.host == 'bad':
+            raise OSError('no route')
+        return (0 if target.host.startswith('ok') else 2), 'same\n'
+
+    progress = []
+
+    async def on_progress(done, total, failed):
+        progress.append((done, total, failed))
+
+    targets = [FanoutTarget(host, 'root', 'secret') for host in ('ok1', 'down', 'bad', 'fail', 'ok2')]
+    targets.append(FanoutTarget('nocreds'))
+
+    results = await run_fanout(targets, 'uptime', concurrency=2, on_progress=on_progress, run_target=run_target)
+
+    assert [(result.host, result.status) for result in results] == [
+        ('ok1', 'ok'), ('down', 'timed out'), ('bad', 'error'), ('fail', 'failed'), ('ok2', 'ok'), ('nocreds', 'skipped')
+    ]
+    assert results[2].output == 'OSError: no route' and results[3].exit_code == 2
+    assert progress[-1] == (6, 6, 4)
+    assert all(name.startswith('fanout') for name in threads)
+
+    # Later fan-outs run in the same thread pool
+    await run_fanout(targets[:1], 'uptime', run_target=run_target)
+    assert all(name.startswith('fanout') for name in threads)
+
+
+def test_summary_groups_identical_output():
+    results = [
+        FanoutResult('a', 'ok', 'up 1 day\n'),
+        FanoutResult('b', 'ok', 'up 1 day'),
+        FanoutResult('c', 'error', 'OSError: <no route>'),
+    ]
+
+    assert group_results(results) == [('ok', 'up 1 day', ['a', 'b']), ('error', 'OSError: <no route>', ['c'])]
+
+    summary = format_fanout_summary('uptime', results)
+    assert summary.startswith('<b>$ uptime</b> on 3 hosts\nok: 2, error: 1')
+    assert '&lt;no route&gt;' in summary
+
+    report = format_fanout_report('uptime', results)
+    assert '=== 2 hosts, ok: a, b' in report and '--- c: error, 0.0 s' in report
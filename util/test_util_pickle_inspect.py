@@ -0,0 +1,91 @@
+import gzip
+import json
+import pickle
+
+import pytest
+
+from util.util_pickle_inspect import (
+    PickleInspectError, compress_json, format_summary, html_pages, inspect_pickle, inspect_pickle_file, paginate
+)
+
+
+@pytest.fixture
+def pickle_file(tmp_path):
+    path = tmp_path / 'bot.pickle'
+    data = {
+        'user_data': {12345: {'balance': 10, 'note': 'a `tick` & <tag>'}},
+        'bot_data': {'hosts': list(range(100))},
+    }
+    path.write_bytes(pickle.dumps(data))
+    return str(path)
+
+
+def test_inspect_pickle_query(pickle_file):
+    result = inspect_pickle(pickle_file, 'user_data.12345')
+
+    assert result['type'] == 'dict'
+    assert json.loads(result['json']) == {'balance': 10, 'note': 'a `tick` & <tag>'}
+    assert [row[0] for row in result['summary']] == ['note', 'balance']
+    assert not result['truncated']
+
+    with pytest.raises(PickleInspectError):
+        inspect_pickle(pickle_file, 'user_data.999')
+
+
+def test_inspect_pickle_limits(pickle_file):
+    result = inspect_pickle(pickle_file, 'bot_data', max_items=10, max_json_chars=50)
+
+    assert result['truncated'] and len(result['json']) == 50
+
+    hosts = json.loads(inspect_pickle(pickle_file, 'bot_data.hosts', max_items=3)['json'])
+    assert hosts == [0, 1, 2, '... 97 more']
+
+
+@pytest.mark.asyncio
+async def test_inspect_pickle_file(pickle_file):
+    result = await inspect_pickle_file(pickle_file, 'user_data.12345.balance')
+    assert result['json'] == '10'
+
+    with pytest.raises(PickleInspectError):
+        await inspect_pickle_file(pickle_file, max_file_bytes=10)
+
+
+def test_format_summary(pickle_file):
+    text = format_summary(inspect_pickle(pickle_file), max_rows=1)
+
+    lines = text.splitlines()
+    assert lines[0] == '(root): dict'
+    assert lines[1].startswith('bot_data') and '1 entries' in lines[1]
+    assert lines[2] == '... 1 more'
+
+
+def test_paginate():
+    text = 'aaa\nbbb\ncccccccc\n'
+
+    assert paginate(text, page_size=8) == ['aaa\nbbb\n', 'cccccccc', '\n']
+    assert ''.join(paginate(text, page_size=3)) == text
+    assert paginate('') == []
+
+
+def test_paginate_keeps_entities():
+    assert paginate('ab&amp;cd', page_size=4) == ['ab&a', 'mp;c', 'd']
+    assert paginate('ab&amp;cd', page_size=4, keep_entities=True) == ['ab', '&amp', ';cd']
+    assert paginate('abcd&lt;', page_size=6, keep_entities=True) == ['abcd', '&lt;']
+
+
+def test_html_pages_escape_everything():
+    pages = html_pages('```\n<b>&</b>', 'json')
+
+    assert pages == ['<pre><code class="language-json">```\n&lt;b&gt;&amp;&lt;/b&gt;</code></pre>']
+    assert html_pages('x') == ['<pre>x</pre>']
+
+
+def test_html_pages_count_escaped_size():
+    pages = html_pages('<' * 100, page_size=42)
+
+    assert len(pages) == 10
+    assert all(page == '<pre>' + '&lt;' * 10 + '</pre>' for page in pages)
+
+
+def test_compress_json():
+    assert gzip.decompress(compress_json('{"a": "é"}')).decode('utf-8') == '{"a": "é"}'
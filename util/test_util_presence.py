@@ -0,0 +1,66 @@
+import pickle
+from datetime import datetime, timezone
+
+from telegram import User
+
+from util.util_presence import DISPLAY_TIMEZONE, UserRecord, UserTable, migrate_user_dict, touch_user
+
+
+def test_touch_user_inserts_then_updates_in_place():
+    bot_data = {}
+    user = User(1, 'Ana', False, last_name='Lima', username='ana', language_code='pt-br')
+
+    record = touch_user(bot_data, user, datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc))
+
+    assert isinstance(bot_data['user_dict'], UserTable)
+    assert record.full_name == 'Ana Lima' and record.name == '@ana'
+    assert record.last_seen_text == '01/05 09:00'
+
+    renamed = User(1, 'Ana', False, username='anal')
+    assert touch_user(bot_data, renamed) is record
+    assert record.name == '@anal' and record.last_name is None
+    assert record.last_seen > datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_user_table_pickles_as_rows():
+    table = UserTable({
+        1: UserRecord(1, 'Ana', None, 'ana', 'pt-br', 1700000000.0),
+        2: UserRecord(2, 'Bob', 'Silva', None, None, 0.0),
+    })
+
+    restored = pickle.loads(pickle.dumps(table))
+
+    assert type(restored) is UserTable
+    assert restored == table
+    assert restored[2].full_name == 'Bob Silva'
+    assert pickle.loads(pickle.dumps(table[1])) == table[1]
+    # Rows of plain values, no per-record class reference or slot names
+    assert b'UserRecord' not in pickle.dumps(table)
+
+
+def test_unmigrated_table_pickles_as_a_dict():
+    user = User(3, 'Cid', False)
+    table = UserTable({3: user})
+
+    restored = pickle.loads(pickle.dumps(table))
+
+    assert type(restored) is UserTable and restored[3] == user
+
+
+def test_migrate_user_dict():
+    bot_data = {
+        'user_dict': {1: User(1, 'Ana', False), 2: UserRecord(2, 'Bob')},
+        'user_status': {1: {'last_message_date': '01/01 10:30', 'other': True}, 2: {'last_message_date': 'bad'}},
+    }
+
+    assert migrate_user_dict(bot_data) == 1
+
+    record = bot_data['user_dict'][1]
+    assert isinstance(bot_data['user_dict'], UserTable) and isinstance(record, UserRecord)
+    last_seen = datetime.fromtimestamp(record.last_seen, DISPLAY_TIMEZONE)
+    assert (last_seen.day, last_seen.month, last_seen.hour, last_seen.minute) == (1, 1, 10, 30)
+    assert bot_data['user_status'][1] == {'other': True}
+    assert bot_data['user_dict'][2].last_seen == 0.0
+
+    # Running it again converts nothing
+    assert migrate_user_dict(bot_data) == 0
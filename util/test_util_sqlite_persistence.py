@@ -0,0 +1,203 @@
+import asyncio
+import pickle
+
+import pytest
+from telegram.ext import ExtBot, PicklePersistence
+
+from util.util_sqlite_persistence import SQLitePersistence
+
+
+def open_persistence(path, **kwargs):
+    persistence = SQLitePersistence(str(path), **kwargs)
+    persistence.set_bot(ExtBot('123:abc'))
+    return persistence
+
+
+@pytest.fixture
+def database(tmp_path):
+    return tmp_path / 'bot.sqlite'
+
+
+@pytest.mark.asyncio
+async def test_user_and_chat_data_are_shared(database):
+    first, second = open_persistence(database), open_persistence(database)
+    assert await first.get_user_data() == {} and await second.get_user_data() == {}
+
+    await first.update_user_data(1, {'balance': 10})
+    await first.update_chat_data(-5, {'topic': 'ops'})
+
+    user_data, chat_data = {}, {'local': True}
+    await second.refresh_user_data(1, user_data)
+    await second.refresh_chat_data(-5, chat_data)
+    assert user_data == {'balance': 10} and chat_data == {'local': True, 'topic': 'ops'}
+
+    # Nothing newer, the live data is left alone
+    user_data['local'] = True
+    await second.refresh_user_data(1, user_data)
+    assert user_data == {'balance': 10, 'local': True}
+
+    await second.drop_user_data(1)
+    assert await first.get_user_data() == {}
+    await first.refresh_user_data(1, user_data)
+    assert user_data == {'local': True}
+
+    await first.flush()
+    await second.flush()
+
+
+@pytest.mark.asyncio
+async def test_keys_changed_by_different_processes_are_merged(database):
+    first, second = open_persistence(database), open_persistence(database)
+    await first.update_user_data(1, {'balance': 10, 'language_code': 'en'})
+    first_data, second_data = {'balance': 10, 'language_code': 'en'}, {}
+    await second.refresh_user_data(1, second_data)
+
+    # Both change the user between refreshes, each a different key
+    first_data['balance'] = 15
+    second_data['language_code'] = 'pt'
+    await first.update_user_data(1, first_data)
+    await second.update_user_data(1, second_data)
+
+    await first.refresh_user_data(1, first_data)
+    await second.refresh_user_data(1, second_data)
+    assert first_data == second_data == {'balance': 15, 'language_code': 'pt'}
+    assert await open_persistence(database).get_user_data() == {1: first_data}
+    assert first.conflicts == second.conflicts == 0
+
+    await first.flush()
+    await second.flush()
+
+
+@pytest.mark.asyncio
+async def test_a_key_changed_by_two_processes_keeps_the_first_write(database, caplog):
+    first, second = open_persistence(database), open_persistence(database)
+    await first.update_chat_data(-5, {'topic': 'ops'})
+    first_data, second_data = {'topic': 'ops'}, {}
+    await second.refresh_chat_data(-5, second_data)
+
+    first_data['topic'] = 'deploys'
+    second_data['topic'] = 'alerts'
+    await first.update_chat_data(-5, first_data)
+    # Not written over the change of the first process
+    await second.update_chat_data(-5, second_data)
+    assert second.conflicts == 1 and 'changed meanwhile by another process' in caplog.text
+
+    await second.refresh_chat_data(-5, second_data)
+    assert second_data == {'topic': 'deploys'}
+    assert await open_persistence(database).get_chat_data() == {-5: {'topic': 'deploys'}}
+
+    # Unsaved changes of a key written by another process are replaced at the refresh, and logged
+    second_data['topic'] = 'unsaved'
+    await first.update_chat_data(-5, {'topic': 'incidents'})
+    await second.refresh_chat_data(-5, second_data)
+    assert second_data == {'topic': 'incidents'} and second.conflicts == 2
+
+    # Rows unchanged since the last write are not written again
+    await first.update_chat_data(-5, {'topic': 'incidents'})
+    assert first.conflicts == 0
+
+    await first.flush()
+    await second.flush()
+
+
+@pytest.mark.asyncio
+async def test_bot_data_entries_merge_per_item(database):
+    first, second = open_persistence(database), open_persistence(database)
+    first_data, second_data = await first.get_bot_data(), await second.get_bot_data()
+
+    first_data.update({'user_dict': {1: 'alice'}, 'links': ['a']})
+    await first.update_bot_data(first_data)
+    await second.refresh_bot_data(second_data)
+    assert second_data == {'user_dict': {1: 'alice'}, 'links': ['a']}
+
+    # Each process adds its own user between refreshes
+    first_data['user_dict'][2] = 'bob'
+    second_data['user_dict'][3] = 'carol'
+    await first.update_bot_data(first_data)
+    await second.update_bot_data(second_data)
+
+    await first.refresh_bot_data(first_data)
+    await second.refresh_bot_data(second_data)
+    assert first_data['user_dict'] == second_data['user_dict'] == {1: 'alice', 2: 'bob', 3: 'carol'}
+    assert await first.get_bot_data() == first_data
+
+    # The same item changed by both: the first write is kept
+    first_data['user_dict'][2] = 'bobby'
+    second_data['user_dict'][2] = 'robert'
+    await first.update_bot_data(first_data)
+    await second.update_bot_data(second_data)
+    await second.refresh_bot_data(second_data)
+    assert second_data['user_dict'][2] == 'bobby' and second.conflicts == 1
+    second_data['user_dict'][2] = first_data['user_dict'][2] = 'bob'
+    await first.update_bot_data(first_data)
+    await second.refresh_bot_data(second_data)
+
+    # Deleted items and entries reach the other process
+    del first_data['links']
+    del first_data['user_dict'][1]
+    await first.update_bot_data(first_data)
+    await second.refresh_bot_data(second_data)
+    assert second_data == {'user_dict': {2: 'bob', 3: 'carol'}}
+
+    await first.flush()
+    await second.flush()
+
+
+@pytest.mark.asyncio
+async def test_conversations_and_callback_data(database):
+    persistence = open_persistence(database)
+
+    await persistence.update_conversation('setup', (1, 1), 'ASK_NAME')
+    await persistence.update_conversation('setup', (2, 2), 'ASK_AGE')
+    await persistence.update_conversation('setup', (2, 2), None)
+    assert await persistence.get_conversations('setup') == {(1, 1): 'ASK_NAME'}
+    assert await persistence.get_conversations('other') == {}
+
+    assert await persistence.get_callback_data() is None
+    await persistence.update_callback_data(([], {'a': 'b'}))
+    assert await persistence.get_callback_data() == ([], {'a': 'b'})
+
+    await persistence.flush()
+
+
+@pytest.mark.asyncio
+async def test_pickle_file_is_imported_once(tmp_path, database):
+    pickle_file = tmp_path / 'bot.pickle'
+    source = PicklePersistence(str(pickle_file))
+    source.set_bot(ExtBot('123:abc'))
+    await source.update_user_data(1, {'balance': 10})
+    await source.update_bot_data({'user_dict': {1: 'alice'}})
+    await source.update_conversation('setup', (1, 1), 'ASK_NAME')
+
+    workers = [open_persistence(database, migrate_from=str(pickle_file)) for _ in range(3)]
+    assert [await worker.get_user_data() for worker in workers] == [{1: {'balance': 10}}] * 3
+    assert await workers[0].get_bot_data() == {'user_dict': {1: 'alice'}}
+    assert await workers[1].get_conversations('setup') == {(1, 1): 'ASK_NAME'}
+
+    # Later changes of the pickle are not imported again
+    await workers[0].update_user_data(1, {'balance': 5})
+    await source.update_user_data(1, {'balance': 99})
+    later = open_persistence(database, migrate_from=str(pickle_file))
+    assert await later.get_user_data() == {1: {'balance': 5}}
+
+    with open(pickle_file, 'rb') as file:
+        assert pickle.load(file)['user_data'] == {1: {'balance': 99}}
+
+    for persistence in workers + [later]:
+        await persistence.flush()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_of_processes(database):
+    persistences = [open_persistence(database) for _ in range(4)]
+    for persistence in persistences:
+        await persistence.get_bot_data()
+
+    await asyncio.gather(*(
+        persistence.update_bot_data({'user_dict': {index: f"user{index}"}})
+        for index, persistence in enumerate(persistences)
+    ))
+
+    assert (await open_persistence(database).get_bot_data())['user_dict'] == {index: f"user{index}" for index in range(4)}
+    for persistence in persistences:
+        await persistence.flush()
@@ -0,0 +1,124 @@
+import importlib.util
+import os
+from collections import Counter
+
+import pytest
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler
+
+from util import util_tracing
+from util.util_tracing import Tracer, TracedRequest, trace_handlers
+
+# new_framework keeps its own copy of the standard-library tracing core, both must behave the same
+NEW_FRAMEWORK_TRACING = os.path.join(os.path.dirname(__file__), '..', 'new_framework', 'src', 'tlgfwk', 'utils', 'tracing.py')
+
+
+def load_new_framework_tracing():
+    spec = importlib.util.spec_from_file_location('new_framework_tracing', NEW_FRAMEWORK_TRACING)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+tracing_copies = pytest.mark.parametrize('tracing', [util_tracing, load_new_framework_tracing()], ids=['util', 'new_framework'])
+
+
+async def start(update, context):
+    return 'started'
+
+
+async def button(update, context):
+    pass
+
+
+def sync_callback(update, context):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_trace_handlers():
+    tracer = Tracer(enabled=True)
+    application = Application.builder().token('123:abc').build()
+    application.add_handler(CommandHandler(['start', 'begin'], start))
+    application.add_handler(CallbackQueryHandler(button))
+    application.add_handler(CallbackQueryHandler(sync_callback), group=1)
+
+    assert trace_handlers(application, tracer) == 2
+    # Handlers already wrapped are left as they are
+    assert trace_handlers(application, tracer) == 0
+
+    command, query = application.handlers[0]
+    with tracer.span('update'):
+        assert await command.callback(None, None) == 'started'
+        await query.callback(None, None)
+
+    assert set(tracer.stats()) == {'update', 'update > /begin', 'update > CallbackQueryHandler:button'}
+
+
+@pytest.mark.asyncio
+async def test_traced_request_spans(monkeypatch):
+    async def do_request(self, url, method, *args, **kwargs):
+        return 200, b'{}'
+
+    monkeypatch.setattr('telegram.request.HTTPXRequest.do_request', do_request)
+    tracer = Tracer()
+    request = TracedRequest(tracer=tracer)
+
+    await request.do_request('https://api.telegram.org/bot1:a/getMe', 'POST')
+    assert tracer.stats() == {}
+
+    tracer.enabled = True
+    await request.do_request('https://api.telegram.org/bot1:a/sendMessage', 'POST')
+    assert list(tracer.stats()) == ['api:sendMessage']
+
+
+@tracing_copies
+@pytest.mark.asyncio
+async def test_tracer_copies_agree(tracing):
+    tracer = tracing.Tracer()
+    with tracer.span('disabled'):
+        pass
+    assert tracer.stats() == {} and tracer.report() == 'No spans recorded'
+
+    async def callback():
+        with tracer.span('inner'):
+            pass
+
+    wrapped = tracer.wrap('handler', callback)
+    assert tracer.wrap('again', wrapped) is wrapped
+    tracer.enabled = True
+    await wrapped()
+    with pytest.raises(ValueError):
+        with tracer.span('failing'):
+            raise ValueError
+
+    stats = tracer.stats()
+    assert sorted(stats) == ['failing', 'handler', 'handler > inner']
+    assert [stats[path]['calls'] for path in sorted(stats)] == [1, 1, 1]
+    assert [stats[path]['errors'] for path in sorted(stats)] == [1, 0, 0]
+    assert stats['handler']['self'] <= stats['handler']['total']
+    assert tracer.report(top=1).count('\n') == 1
+
+    tracer.reset()
+    assert tracer.stats() == {}
+
+
+@tracing_copies
+def test_stack_profile_copies_agree(tracing):
+    outer, inner = load_new_framework_tracing.__code__, test_stack_profile_copies_agree.__code__
+    profile = tracing.StackProfile(Counter({('main', outer, inner): 3, ('worker', outer): 1}), idle=2, seconds=1.0, interval=0.005)
+
+    assert profile.samples == 4
+    assert profile.collapsed().splitlines() == [
+        f"main;{tracing.frame_label(outer)};{tracing.frame_label(inner)} 3",
+        f"worker;{tracing.frame_label(outer)} 1",
+    ]
+    assert profile.top(top=1).splitlines() == [
+        'Samples: 4 busy, 2 idle, over 1.0 s every 5 ms',
+        'Top functions (self %, total %):',
+        f"   75.0%  75.0%  {tracing.frame_label(inner)}",
+    ]
+
+    sampler = tracing.StackSampler(interval=0.001)
+    sampler.start()
+    assert sampler.running
+    assert sampler.stop().seconds >= 0 and not sampler.running
@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from telegram import Chat, Message, Update, User
+
+from util.util_command_runner import CommandRunner
+from util.util_update_processor import ChatOrderedUpdateProcessor
+
+
+def update_in(chat_id, text='hi', update_id=1):
+    message = Message(message_id=update_id, date=datetime.now(), chat=Chat(chat_id, Chat.PRIVATE),
+                      from_user=User(chat_id, 'user', False), text=text)
+    return Update(update_id, message=message)
+
+
+class Recorder:
+    """Handler coroutines that record when they start and end"""
+
+    def __init__(self):
+        self.events = []
+        self.running = 0
+        self.max_running = 0
+
+    async def handle(self, name, seconds=0.01):
+        self.events.append(('start', name))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.running -= 1
+        self.events.append(('end', name))
+
+
+@pytest.mark.asyncio
+async def test_updates_of_a_chat_run_in_arrival_order():
+    processor = ChatOrderedUpdateProcessor(max_concurrency=8)
+    recorder = Recorder()
+
+    await asyncio.gather(
+        processor.do_process_update(update_in(1, update_id=1), recorder.handle('a1', 0.05)),
+        processor.do_process_update(update_in(1, update_id=2), recorder.handle('a2', 0.01)),
+        processor.do_process_update(update_in(2, update_id=3), recorder.handle('b1', 0.01)),
+        processor.do_process_update(update_in(1, update_id=4), recorder.handle('a3', 0)),
+    )
+
+    chat_events = [event for event in recorder.events if event[1].startswith('a')]
+    assert chat_events == [('start', 'a1'), ('end', 'a1'), ('start', 'a2'), ('end', 'a2'), ('start', 'a3'), ('end', 'a3')]
+    # The other chat is not delayed by the slow update
+    assert recorder.events.index(('end', 'b1')) < recorder.events.index(('end', 'a1'))
+    assert processor.stats()['processed'] == 4 and processor.stats()['busy_chats'] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    processor = ChatOrderedUpdateProcessor(max_concurrency=2)
+    recorder = Recorder()
+
+    await asyncio.gather(*(
+        processor.do_process_update(update_in(chat_id, update_id=chat_id), recorder.handle(chat_id, 0.02))
+        for chat_id in range(1, 7)
+    ))
+
+    assert recorder.max_running == 2
+    stats = processor.stats()
+    assert (stats['processed'], stats['running'], stats['waiting']) == (6, 0, 0)
+    assert stats['max_wait'] > 0
+
+
+@pytest.mark.asyncio
+async def test_updates_without_chat_run_concurrently():
+    processor = ChatOrderedUpdateProcessor(max_concurrency=8)
+    recorder = Recorder()
+
+    await asyncio.gather(*(processor.do_process_update(object(), recorder.handle(index)) for index in range(3)))
+
+    assert recorder.max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_no_timeout_by_default():
+    processor = ChatOrderedUpdateProcessor()
+    recorder = Recorder()
+
+    await processor.do_process_update(update_in(1), recorder.handle('slow', 0.1))
+
+    assert recorder.events[-1] == ('end', 'slow')
+    assert processor.stats()['timed_out'] == 0
+
+
+@pytest.mark.asyncio
+async def test_handler_timeout():
+    processor = ChatOrderedUpdateProcessor(default_timeout=0.05, timeouts={'Git': None, 'report': 0.2})
+    recorder = Recorder()
+
+    await processor.do_process_update(update_in(1, '/stats'), recorder.handle('stats', 1))
+    assert recorder.events == [('start', 'stats')] and recorder.running == 0
+    assert processor.stats()['timed_out'] == 1
+
+    # Exempt and longer timeouts by command name
+    await processor.do_process_update(update_in(1, '/git@MyBot pull'), recorder.handle('git', 0.1))
+    await processor.do_process_update(update_in(1, '/report'), recorder.handle('report', 0.1))
+    assert ('end', 'git') in recorder.events and ('end', 'report') in recorder.events
+    assert processor.stats()['timed_out'] == 1
+
+    # The next update of the chat is not blocked by the cancelled one
+    assert processor.stats()['busy_chats'] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_from_the_chat_of_a_running_command():
+    processor = ChatOrderedUpdateProcessor(max_concurrency=1, unordered={'cancel', 'exec'})
+    runner = CommandRunner()
+    results = {}
+
+    async def exec_handler():
+        results['exec'] = await runner.run_shell('sleep 10', owner_id=1)
+
+    async def cancel_handler():
+        results['cancel'] = runner.cancel(owner_id=1)
+
+    try:
+        command = asyncio.ensure_future(processor.do_process_update(update_in(1, '/exec sleep 10', 1), exec_handler()))
+        await asyncio.sleep(0.2)
+
+        # Neither the chat nor the only slot are held by the running command
+        await asyncio.wait_for(processor.do_process_update(update_in(1, '/stats', 2), asyncio.sleep(0)), 1)
+        await asyncio.wait_for(processor.do_process_update(update_in(1, '/cancel@MyBot', 3), cancel_handler()), 1)
+        await asyncio.wait_for(command, 5)
+    finally:
+        runner.shutdown()
+
+    assert results['cancel'] == 1 and results['exec'].status == 'cancelled'
+    assert processor.stats()['unordered_processed'] == 2 and processor.stats()['processed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_ordered_commands_wait_for_the_chat():
+    processor = ChatOrderedUpdateProcessor(unordered={'cancel'})
+    recorder = Recorder()
+
+    await asyncio.gather(
+        processor.do_process_update(update_in(1, '/git pull', 1), recorder.handle('git', 0.05)),
+        processor.do_process_update(update_in(1, '/stats', 2), recorder.handle('stats', 0)),
+        processor.do_process_update(update_in(1, '/cancel', 3), recorder.handle('cancel', 0)),
+    )
+
+    assert recorder.events.index(('end', 'git')) < recorder.events.index(('start', 'stats'))
+    assert recorder.events.index(('end', 'cancel')) < recorder.events.index(('end', 'git'))
+
+
+def test_timeout_for():
+    processor = ChatOrderedUpdateProcessor(default_timeout=10, timeouts={'git': None})
+
+    assert processor.timeout_for(update_in(1, '/git pull')) is None
+    assert processor.timeout_for(update_in(1, '/GIT@MyBot')) is None
+    assert processor.timeout_for(update_in(1, 'git')) == 10
+    assert processor.timeout_for(update_in(1, '/')) == 10
+    assert processor.timeout_for(object()) == 10
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import queue
+
+import pytest
+
+from util.util_webhook_shard import _worker_loop, update_shard_key
+
+
+def message_update(update_id, chat_id, user_id=None):
+    message = {'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'group'}, 'text': 'hi'}
+    if user_id is not None:
+        message['from'] = {'id': user_id, 'is_bot': False, 'first_name': 'user'}
+    return {'update_id': update_id, 'message': message}
+
+
+def test_update_shard_key():
+    # The chat decides the worker, whoever writes in it
+    assert update_shard_key(message_update(1, -100, user_id=7)) == -100
+    assert update_shard_key(message_update(2, -100, user_id=8)) == -100
+    assert update_shard_key({'update_id': 3, 'channel_post': message_update(3, -200)['message']}) == -200
+
+    # Buttons belong to the chat of their message
+    callback_query = {'id': 'q', 'from': {'id': 8}, 'message': {'chat': {'id': -100}}, 'chat_instance': 'c'}
+    assert update_shard_key({'update_id': 4, 'callback_query': callback_query}) == -100
+
+    # Updates without a chat go by user, or by update id
+    inline_query = {'id': 'i', 'from': {'id': 8}, 'query': '', 'offset': ''}
+    assert update_shard_key({'update_id': 5, 'inline_query': inline_query}) == 8
+    assert update_shard_key({'update_id': 6, 'poll_answer': {'poll_id': 'p', 'user': {'id': 9}}}) == 9
+    assert update_shard_key({'update_id': 7, 'poll': {'id': 'p'}}) == 7
+
+
+class FakeApplication:
+    def __init__(self, events):
+        self.events = events
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+        self.post_init = self.post_stop = None
+
+    async def __aenter__(self):
+        self.events.append('initialize')
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.events.append('shutdown')
+
+    async def start(self):
+        self.events.append('start')
+
+    async def stop(self):
+        self.events.append('stop')
+
+
+class FakeBot:
+    """Bot with the hooks of TlgBotFwk"""
+
+    def __init__(self):
+        self.events = []
+        self.application = FakeApplication(self.events)
+
+    def prepare_run(self):
+        self.events.append('prepare_run')
+
+    async def setup_process(self, application):
+        self.events.append('setup_process')
+
+    async def notify_start(self, application):
+        self.events.append('notify_start')
+
+    async def teardown_process(self, application):
+        self.events.append('teardown_process')
+
+    async def notify_stop(self, application):
+        self.events.append('notify_stop')
+
+
+def run_worker(bot, worker_index, bodies):
+    update_queue = queue.Queue()
+    for body in bodies + [None]:
+        update_queue.put(body)
+    asyncio.run(_worker_loop(bot, worker_index, update_queue))
+
+
+def test_every_worker_runs_the_process_hooks():
+    bot = FakeBot()
+    run_worker(bot, 1, [json.dumps(message_update(1, 7, user_id=7)), b'not json'])
+
+    assert bot.events == ['prepare_run', 'initialize', 'setup_process', 'start', 'stop', 'teardown_process', 'shutdown']
+    # The invalid body is discarded
+    assert bot.application.update_queue.qsize() == 1
+    assert bot.application.update_queue.get_nowait().effective_user.id == 7
+
+
+def test_first_worker_also_notifies():
+    bot = FakeBot()
+    run_worker(bot, 0, [])
+
+    assert bot.events == [
+        'prepare_run', 'initialize', 'setup_process', 'notify_start', 'start',
+        'stop', 'teardown_process', 'notify_stop', 'shutdown'
+    ]
+
+
+@pytest.mark.parametrize('worker_index', [0, 2])
+def test_applications_run_their_hooks_in_every_worker(worker_index):
+    events = []
+    application = FakeApplication(events)
+
+    async def post_init(application):
+        events.append('post_init')
+
+    async def post_stop(application):
+        events.append('post_stop')
+
+    application.post_init, application.post_stop = post_init, post_stop
+    run_worker(application, worker_index, [])
+
+    assert events == ['initialize', 'post_init', 'start', 'stop', 'post_stop', 'shutdown']
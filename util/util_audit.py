@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Admin audit feed
+
+Commands of non-admin users are recorded without awaiting anything, and
+delivered to every admin as one digest message every few seconds, so the
+command handler starts immediately. Events can also be written to a rotating
+audit log file, through a queue so file writes never run on the event loop.
+
+Usage:
+    feed = AdminAuditFeed(send_message, lambda: admin_ids, log_file='audit.log')
+    feed.record(f"/start - John - from 123")
+    await feed.stop()
+"""
+
+import asyncio
+import logging
+import logging.handlers
+import queue
+from collections import deque
+from datetime import datetime
+
+__all__ = ['AdminAuditFeed']
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+
+class AdminAuditFeed:
+    """Background, batched feed of audit events to the bot admins"""
+
+    def __init__(
+        self,
+        send_message,
+        get_admin_ids,
+        interval: float = 5.0,
+        max_pending: int = 1000,
+        log_file: str = None,
+        log_max_bytes: int = 1024 * 1024,
+        log_backup_count: int = 5
+    ):
+        """Create the feed
+
+        Args:
+            send_message (coroutine function): called as send_message(chat_id, text)
+            get_admin_ids (callable): returns the admin ids to deliver digests to
+            interval (float, optional): seconds between digests. Defaults to 5.0.
+            max_pending (int, optional): events kept between digests, older ones are dropped. Defaults to 1000.
+            log_file (str, optional): rotating audit log file. Defaults to None (disabled).
+            log_max_bytes (int, optional): size of the audit log before rotating. Defaults to 1 MB.
+            log_backup_count (int, optional): rotated audit logs to keep. Defaults to 5.
+        """
+        self.send_message = send_message
+        self.get_admin_ids = get_admin_ids
+        self.interval = interval
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self._task = None
+
+        self.audit_logger = None
+        self._listener = None
+        if log_file:
+            log_queue = queue.SimpleQueue()
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=log_max_bytes, backupCount=log_backup_count, encoding='utf-8'
+            )
+            file_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self._listener = logging.handlers.QueueListener(log_queue, file_handler)
+            self._listener.start()
+
+            self.audit_logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self.audit_logger.setLevel(logging.INFO)
+            self.audit_logger.propagate = False
+            self.audit_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    def record(self, event: str):
+        """Queue an event for the next digest. Never blocks."""
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(f"{datetime.now():%H:%M:%S} {event}")
+
+        if self.audit_logger:
+            self.audit_logger.info(event)
+
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                # No running loop: the event waits for the next flush
+                pass
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def _digests(self, events: list) -> list:
+        """Split the events into messages under the Telegram size limit"""
+        header = f"Audit: {len(events)} command(s) from non-admin users"
+        if self.dropped:
+            header += f" ({self.dropped} older dropped)"
+            self.dropped = 0
+
+        messages = []
+        current = header
+        for event in events:
+            event = event[:MAX_MESSAGE_LENGTH - 1]
+            if len(current) + 1 + len(event) > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = event
+            else:
+                current += f"\n{event}"
+        messages.append(current)
+        return messages
+
+    async def flush(self):
+        """Send the pending events to every admin now"""
+        if not self.pending:
+            return
+
+        events = list(self.pending)
+        self.pending.clear()
+        messages = self._digests(events)
+
+        for admin_id in self.get_admin_ids():
+            for message in messages:
+                try:
+                    await self.send_message(admin_id, message)
+                except Exception as e:
+                    logger.error(f"Error sending audit digest to admin {admin_id}: {e}")
+
+    async def stop(self):
+        """Cancel the background task, send what is pending and close the audit log"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        await self.flush()
+
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
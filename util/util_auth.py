@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Authorization service
+
+Holds the roles of every user as a frozenset, so role checks are O(1) set
+lookups. Role changes replace the frozensets instead of mutating them, and
+every filter and decorator reads them through the same service, so a change
+made by /admin applies immediately without re-registering handlers.
+
+Usage:
+    auth = AuthorizationService(owner_id, admin_ids)
+    CommandHandler('stop', callback, filters=auth.admin_filter)
+    auth.is_admin(user_id)
+"""
+
+from telegram import Message
+from telegram.ext import filters
+
+__all__ = ['ROLE_OWNER', 'ROLE_ADMIN', 'RoleFilter', 'AuthorizationService']
+
+ROLE_OWNER = 'owner'
+ROLE_ADMIN = 'admin'
+
+
+class RoleFilter(filters.MessageFilter):
+    """Allows messages from users holding a role in an AuthorizationService"""
+
+    # Same attribute as filters.User, used by the command dispatcher fast path
+    allow_empty = False
+
+    def __init__(self, auth: "AuthorizationService", role: str):
+        super().__init__(name=f"RoleFilter({role})")
+        self.auth = auth
+        self.role = role
+
+    @property
+    def user_ids(self) -> frozenset:
+        """Current members of the role"""
+        return self.auth.members(self.role)
+
+    def filter(self, message: Message) -> bool:
+        return message.from_user is not None and message.from_user.id in self.auth.members(self.role)
+
+
+class AuthorizationService:
+    """Roles per user, shared by all handlers of a bot"""
+
+    def __init__(self, owner_id: int = None, admin_ids: list = None):
+        """Create the service
+
+        Args:
+            owner_id (int, optional): bot owner, gets the owner and admin roles
+            admin_ids (list, optional): users with the admin role
+        """
+        # user id -> roles, in the order users were first granted a role
+        self._roles = {}
+        # role -> user ids, rebuilt on every change
+        self._members = {}
+        self._filters = {}
+
+        if owner_id is not None:
+            self.grant(owner_id, ROLE_OWNER, ROLE_ADMIN)
+        for admin_id in admin_ids or []:
+            self.grant(admin_id, ROLE_ADMIN)
+
+    def _rebuild_members(self):
+        members = {}
+        for user_id, roles in self._roles.items():
+            for role in roles:
+                members.setdefault(role, []).append(user_id)
+        self._members = {role: frozenset(user_ids) for role, user_ids in members.items()}
+
+    def grant(self, user_id: int, *roles: str):
+        """Add roles to a user"""
+        user_id = int(user_id)
+        self._roles[user_id] = self._roles.get(user_id, frozenset()) | frozenset(roles)
+        self._rebuild_members()
+
+    def revoke(self, user_id: int, *roles: str):
+        """Remove roles from a user"""
+        user_id = int(user_id)
+        remaining = self._roles.get(user_id, frozenset()) - frozenset(roles)
+        if remaining:
+            self._roles[user_id] = remaining
+        else:
+            self._roles.pop(user_id, None)
+        self._rebuild_members()
+
+    def set_members(self, role: str, user_ids: list):
+        """Make exactly these users hold a role"""
+        user_ids = [int(user_id) for user_id in user_ids]
+        for user_id in [user_id for user_id in self._roles if user_id not in user_ids]:
+            self.revoke(user_id, role)
+        for user_id in user_ids:
+            self.grant(user_id, role)
+
+    def roles(self, user_id: int) -> frozenset:
+        """Roles of a user"""
+        return self._roles.get(user_id, frozenset())
+
+    def members(self, role: str) -> frozenset:
+        """Users holding a role"""
+        return self._members.get(role, frozenset())
+
+    def ordered_members(self, role: str) -> list:
+        """Users holding a role, in the order they were added (the owner first)"""
+        return [user_id for user_id, roles in self._roles.items() if role in roles]
+
+    def has_role(self, user_id: int, role: str) -> bool:
+        return user_id in self._members.get(role, ())
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self._members.get(ROLE_ADMIN, ())
+
+    def filter(self, role: str) -> RoleFilter:
+        """Shared filter for a role, always reflecting the current members"""
+        if role not in self._filters:
+            self._filters[role] = RoleFilter(self, role)
+        return self._filters[role]
+
+    @property
+    def admin_filter(self) -> RoleFilter:
+        return self.filter(ROLE_ADMIN)
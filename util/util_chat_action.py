@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Debounced chat actions
+
+A chat action ("typing...") is shown by Telegram for about 5 seconds, so
+sending it again within that time is a wasted API call. ChatActionManager
+sends the action in the background while the handler runs, skips it when the
+chat already shows it, and refreshes it until long-running handlers finish.
+
+Usage:
+    async with chat_actions.keep(context.bot, update.effective_chat.id):
+        await long_running_handler()
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from telegram.constants import ChatAction
+
+logger = logging.getLogger(__name__)
+
+
+class ChatActionManager:
+    """Sends chat actions concurrently with handlers, at most once per indicator lifetime"""
+
+    def __init__(self, lifetime: float = 5.0, refresh_interval: float = 4.0, max_tracked: int = 1024):
+        """Create the manager
+
+        Args:
+            lifetime (float, optional): seconds Telegram shows a chat action. Defaults to 5.0.
+            refresh_interval (float, optional): seconds between refreshes while a handler runs. Defaults to 4.0.
+            max_tracked (int, optional): chats tracked before expired entries are pruned. Defaults to 1024.
+        """
+        self.lifetime = lifetime
+        self.refresh_interval = refresh_interval
+        self.max_tracked = max_tracked
+        self.sent_count = 0
+        self.skipped_count = 0
+
+        # (chat_id, action) -> monotonic time the action was last sent
+        self._last_sent = {}
+        # (chat_id, action) -> [refresh task, running handlers]
+        self._refreshers = {}
+
+    def _prune(self, now: float):
+        expired = [key for key, sent_at in self._last_sent.items() if now - sent_at >= self.lifetime]
+        for key in expired:
+            del self._last_sent[key]
+
+    async def send(self, bot, chat_id: int, action: str = ChatAction.TYPING, force: bool = False) -> bool:
+        """Send a chat action unless the chat is still showing it
+
+        Returns:
+            bool: True if the action was sent
+        """
+        key = (chat_id, action)
+        now = time.monotonic()
+        if not force and now - self._last_sent.get(key, -self.lifetime) < self.lifetime:
+            self.skipped_count += 1
+            return False
+
+        self._last_sent[key] = now
+        if len(self._last_sent) > self.max_tracked:
+            self._prune(now)
+
+        try:
+            await bot.send_chat_action(chat_id=chat_id, action=action)
+            self.sent_count += 1
+            return True
+        except Exception as e:
+            # Allow a retry on the next call
+            self._last_sent.pop(key, None)
+            logger.debug(f"Error sending chat action to chat_id {chat_id}: {e}")
+            return False
+
+    async def _refresh(self, bot, chat_id: int, action: str):
+        await self.send(bot, chat_id, action)
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.send(bot, chat_id, action, force=True)
+
+    @asynccontextmanager
+    async def keep(self, bot, chat_id: int, action: str = ChatAction.TYPING):
+        """Show a chat action while the block runs, without delaying it"""
+        key = (chat_id, action)
+        refresher = self._refreshers.get(key)
+        if refresher is None:
+            task = asyncio.get_running_loop().create_task(self._refresh(bot, chat_id, action))
+            refresher = self._refreshers[key] = [task, 0]
+        refresher[1] += 1
+
+        try:
+            yield
+        finally:
+            refresher[1] -= 1
+            if refresher[1] == 0:
+                refresher[0].cancel()
+                del self._refreshers[key]
+
+
+# Shared by all handlers, so duplicates are suppressed across commands
+chat_actions = ChatActionManager()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Command execution service
+
+Runs the blocking work of admin commands without freezing the bot: shell
+commands run as asyncio subprocesses, and blocking library calls (paramiko
+SSH sessions) run in a dedicated thread pool. Every execution has an id,
+belongs to an admin, can be cancelled and has a timeout, and each admin can
+only run a few executions at a time.
+
+ChatOutputStream shows the output in one Telegram message, edited as the
+output grows, at most once per interval.
+
+Usage:
+    stream = await ChatOutputStream.start(update.message, f"$ {command}")
+    result = await command_runner.run_shell(command, owner_id=user_id, on_output=stream.write)
+    await stream.close(result.status_text)
+"""
+
+import asyncio
+import codecs
+import html
+import itertools
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+__all__ = ['CommandLimitError', 'CommandResult', 'CommandRunner', 'ChatOutputStream']
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages, leave room for the title and the status line
+STREAM_TAIL_CHARS = 3500
+
+
+class CommandLimitError(Exception):
+    """The admin already runs the maximum number of executions"""
+
+
+class CommandResult:
+    """Outcome of an execution"""
+
+    def __init__(self, description: str, status: str, output: str = '', exit_code: int = None, value=None, elapsed: float = 0.0):
+        self.description = description
+        # finished, timed out, cancelled or failed
+        self.status = status
+        self.output = output
+        self.exit_code = exit_code
+        self.value = value
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'finished' and self.exit_code in (0, None)
+
+    @property
+    def status_text(self) -> str:
+        """One line summary, e.g. 'exit code 0 in 1.2 s'"""
+        if self.status == 'finished':
+            outcome = f"exit code {self.exit_code}" if self.exit_code is not None else 'done'
+        else:
+            outcome = self.status
+        return f"{outcome} in {self.elapsed:.1f} s"
+
+    def __repr__(self):
+        return f"CommandResult({self.description!r}, {self.status!r}, exit_code={self.exit_code})"
+
+
+class _Execution:
+    __slots__ = ('id', 'owner_id', 'description', 'started', 'task', 'cancel_requested')
+
+    def __init__(self, id: int, owner_id, description: str):
+        self.id = id
+        self.owner_id = owner_id
+        self.description = description
+        self.started = time.monotonic()
+        self.task = None
+        self.cancel_requested = False
+
+
+class CommandRunner:
+    """Runs shell commands and blocking calls off the event loop, per admin"""
+
+    def __init__(self, max_per_owner: int = 2, default_timeout: float = 300, threads: int = 4, max_output_chars: int = 1024 * 1024):
+        """Create the runner
+
+        Args:
+            max_per_owner (int, optional): executions an admin can run at the same time. Defaults to 2.
+            default_timeout (float, optional): seconds before an execution is stopped. Defaults to 300.
+            threads (int, optional): threads of the pool for blocking calls. Defaults to 4.
+            max_output_chars (int, optional): output kept per execution, older output is dropped. Defaults to 1 MB.
+        """
+        self.max_per_owner = max_per_owner
+        self.default_timeout = default_timeout
+        self.max_output_chars = max_output_chars
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='command-runner')
+        self._executions = {}
+        self._ids = itertools.count(1)
+
+    # ---------- bookkeeping ----------
+
+    def _register(self, owner_id, description: str) -> _Execution:
+        if owner_id is not None and self.max_per_owner:
+            running = sum(1 for execution in self._executions.values() if execution.owner_id == owner_id)
+            if running >= self.max_per_owner:
+                raise CommandLimitError(f"{running} executions already running, wait or /cancel one")
+        execution = _Execution(next(self._ids), owner_id, description)
+        self._executions[execution.id] = execution
+        return execution
+
+    async def _run(self, execution: _Execution, coroutine, timeout: float) -> CommandResult:
+        """Run the execution in its own task, so it can be cancelled without cancelling the handler"""
+        timeout = self.default_timeout if timeout is None else timeout
+        execution.task = asyncio.ensure_future(asyncio.wait_for(coroutine, timeout) if timeout else coroutine)
+        try:
+            return await execution.task
+        except asyncio.TimeoutError:
+            return CommandResult(execution.description, 'timed out', elapsed=time.monotonic() - execution.started)
+        except asyncio.CancelledError:
+            if not execution.cancel_requested:
+                raise
+            return CommandResult(execution.description, 'cancelled', elapsed=time.monotonic() - execution.started)
+        finally:
+            self._executions.pop(execution.id, None)
+
+    def running(self, owner_id=None) -> list:
+        """(id, owner id, description, seconds running) of the executions, optionally of one admin"""
+        now = time.monotonic()
+        return [
+            (execution.id, execution.owner_id, execution.description, now - execution.started)
+            for execution in self._executions.values()
+            if owner_id is None or execution.owner_id == owner_id
+        ]
+
+    def cancel(self, owner_id=None, execution_id: int = None) -> int:
+        """Cancel one execution, or all executions of an admin (all when owner_id is None)
+
+        Returns:
+            int: number of executions cancelled
+        """
+        cancelled = 0
+        for execution in list(self._executions.values()):
+            if execution_id is not None and execution.id != execution_id:
+                continue
+            if owner_id is not None and execution.owner_id != owner_id:
+                continue
+            if execution.task and not execution.task.done():
+                execution.cancel_requested = True
+                execution.task.cancel()
+                cancelled += 1
+        return cancelled
+
+    # ---------- shell commands ----------
+
+    async def run_shell(self, command: str, owner_id=None, on_output=None, timeout: float = None, cwd: str = None) -> CommandResult:
+        """Run a shell command as a subprocess, stdout and stderr merged
+
+        Args:
+            command (str): shell command line
+            owner_id (int, optional): admin running it, for the per-admin limit and /cancel
+            on_output (coroutine function, optional): called with each chunk of output text
+            timeout (float, optional): seconds before the command is killed. Defaults to default_timeout.
+            cwd (str, optional): working directory
+
+        Raises:
+            CommandLimitError: the admin already runs max_per_owner executions
+        """
+        execution = self._register(owner_id, command)
+        output = []
+        result = await self._run(execution, self._shell(execution, command, output, on_output, cwd), timeout)
+        if result.status != 'finished':
+            result.output = ''.join(output)
+        return result
+
+    async def _shell(self, execution: _Execution, command: str, output: list, on_output, cwd: str) -> CommandResult:
+        process = await asyncio.create_subprocess_shell(
+            command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=cwd,
+            # Own process group, so the whole pipeline can be killed
+            start_new_session=os.name == 'posix'
+        )
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        size = 0
+        try:
+            while True:
+                chunk = await process.stdout.read(4096)
+                text = decoder.decode(chunk, final=not chunk)
+                if text:
+                    output.append(text)
+                    size += len(text)
+                    while size > self.max_output_chars and len(output) > 1:
+                        size -= len(output.pop(0))
+                    if on_output:
+                        await on_output(text)
+                if not chunk:
+                    break
+            exit_code = await process.wait()
+        finally:
+            if process.returncode is None:
+                self._kill(process)
+                await process.wait()
+
+        return CommandResult(command, 'finished', ''.join(output), exit_code, elapsed=time.monotonic() - execution.started)
+
+    @staticmethod
+    def _kill(process):
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    # ---------- blocking calls ----------
+
+    async def run_blocking(self, description: str, func, *args, owner_id=None, timeout: float = None, on_cancel=None) -> CommandResult:
+        """Run a blocking call (paramiko, ...) in the runner's thread pool
+
+        A thread cannot be killed: on timeout or cancel, on_cancel() is called to
+        abort the call (e.g. close the SSH client) and the result is not awaited.
+
+        Args:
+            description (str): shown by running() and /cancel
+            func (callable): blocking function, its return value is the result value
+            owner_id (int, optional): admin running it, for the per-admin limit and /cancel
+            timeout (float, optional): seconds before giving up. Defaults to default_timeout.
+            on_cancel (callable, optional): called from the event loop when the call is abandoned
+
+        Raises:
+            CommandLimitError: the admin already runs max_per_owner executions
+        """
+        execution = self._register(owner_id, description)
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            value = await loop.run_in_executor(self._executor, func, *args)
+            return CommandResult(description, 'finished', value=value, elapsed=time.monotonic() - execution.started)
+
+        try:
+            result = await self._run(execution, call(), timeout)
+        except Exception as e:
+            return CommandResult(description, 'failed', output=f"{type(e).__name__}: {e}", elapsed=time.monotonic() - execution.started)
+        if result.status != 'finished' and on_cancel:
+            try:
+                on_cancel()
+            except Exception as e:
+                logger.error(f"Error aborting {description}: {e}")
+        return result
+
+    async def run_coroutine(self, description: str, coroutine, owner_id=None, timeout: float = None) -> CommandResult:
+        """Run an async job (e.g. a fleet fan-out) as a cancellable execution
+
+        Args:
+            description (str): shown by running() and /cancel
+            coroutine (coroutine): the job, its return value is the result value
+            owner_id (int, optional): admin running it, for the per-admin limit and /cancel
+            timeout (float, optional): seconds before it is cancelled, 0 for none. Defaults to default_timeout.
+
+        Raises:
+            CommandLimitError: the admin already runs max_per_owner executions
+        """
+        try:
+            execution = self._register(owner_id, description)
+        except CommandLimitError:
+            coroutine.close()
+            raise
+
+        async def job():
+            value = await coroutine
+            return CommandResult(description, 'finished', value=value, elapsed=time.monotonic() - execution.started)
+
+        return await self._run(execution, job(), timeout)
+
+    def shutdown(self):
+        """Cancel all executions and stop the thread pool"""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ChatOutputStream:
+    """Output of an execution shown in one Telegram message, edited as it grows"""
+
+    def __init__(self, message, title: str, interval: float = 1.5, tail_chars: int = STREAM_TAIL_CHARS):
+        """Create the stream
+
+        Args:
+            message (telegram.Message): message sent by the bot, edited with the output
+            title (str): first line of the message, e.g. the command
+            interval (float, optional): minimum seconds between edits. Defaults to 1.5.
+            tail_chars (int, optional): last characters of the output shown. Defaults to STREAM_TAIL_CHARS.
+        """
+        self.message = message
+        self.title = title
+        self.interval = interval
+        self.tail_chars = tail_chars
+        self.text = ''
+        self.edits = 0
+        self._shown = None
+        self._next_edit = 0.0
+
+    @classmethod
+    async def start(cls, reply_to, title: str, **kwargs) -> "ChatOutputStream":
+        """Reply to a message with a placeholder and stream into it"""
+        message = await reply_to.reply_text(f"<b>{html.escape(title)}</b>\n<i>running...</i>", parse_mode=ParseMode.HTML)
+        return cls(message, title, **kwargs)
+
+    def _render(self, status: str = None) -> str:
+        tail = self.text[-self.tail_chars:]
+        if len(self.text) > self.tail_chars:
+            tail = '...' + tail[tail.find('\n') + 1:] if '\n' in tail else '...' + tail
+        body = f"<pre>{html.escape(tail)}</pre>" if tail.strip() else "<i>(no output yet)</i>" if status is None else "<i>(no output)</i>"
+        footer = f"\n<i>{html.escape(status)}</i>" if status else "\n<i>running...</i>"
+        return f"<b>{html.escape(self.title)}</b>\n{body}{footer}"
+
+    async def _edit(self, text: str):
+        if text == self._shown:
+            return
+        try:
+            await self.message.edit_text(text, parse_mode=ParseMode.HTML)
+            self._shown = text
+            self.edits += 1
+        except RetryAfter as e:
+            self._next_edit = time.monotonic() + e.retry_after
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logger.error(f"Error editing the output message: {e}")
+
+    async def write(self, text: str):
+        """Add output, editing the message if the interval has passed"""
+        self.text += text
+        if len(self.text) > 4 * self.tail_chars:
+            self.text = self.text[-self.tail_chars:]
+        now = time.monotonic()
+        if now >= self._next_edit:
+            self._next_edit = now + self.interval
+            await self._edit(self._render())
+
+    async def set(self, text: str):
+        """Replace the shown text (e.g. a progress line), editing the message if the interval has passed"""
+        self.text = ''
+        await self.write(text)
+
+    async def close(self, status: str):
+        """Show the final output and status"""
+        await self._edit(self._render(status))
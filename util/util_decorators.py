@@ -16,33 +16,28 @@ from telegram import InlineKeyboardButton, Update
 from telegram.ext import CallbackContext
 
 from .util_telegram import *
+from .util_chat_action import chat_actions
+from .util_presence import touch_user
+from .util_tracing import tracer
 
 def with_writing_action(handler):
     @wraps(handler)
     async def wrapper(self, update: Update, context: CallbackContext, *args, **kwargs):
         
-        try:      
-                      
-            await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
-            self.logger.debug(f"Typing action sent to chat_id: {update.effective_chat.id}")            
-             
-            # Insert or update user on the bot_data dictionary
-            context.bot_data['user_dict'] = {} if 'user_dict' not in context.bot_data else context.bot_data['user_dict']
-            context.bot_data['user_dict'][update.effective_user.id] = update.effective_user 
+        with tracer.span('with_writing_action'):
+            try:      
+                # Insert or update the user record and the last time the user accessed the bot
+                touch_user(context.bot_data, update.effective_user, update.message.date if update.message else None)
             
-            # Add to bot_data the last time the user accessed the bot
-            if 'user_status' not in context.bot_data:
-                context.bot_data['user_status'] = {}
-            if update.effective_user.id not in context.bot_data['user_status']:
-                context.bot_data['user_status'][update.effective_user.id] = {}
+            except Exception as e:
+                self.logger.error(f"Error: {e}")
             
-            context.bot_data['user_status'][update.effective_user.id]['last_message_date'] = (update.message.date + timedelta(hours=-3)).strftime('%d/%m %H:%M')
+            if not update.effective_chat:
+                return await handler(self, update, context, *args, **kwargs)
             
-            return await handler(self, update, context, *args, **kwargs)
-        
-        except Exception as e:
-            self.logger.error(f"Error: {e}")
-            return await handler(self, update, context, *args, **kwargs)
+            # Typing action is sent alongside the handler and refreshed until it finishes
+            async with chat_actions.keep(context.bot, update.effective_chat.id, ChatAction.TYPING):
+                return await handler(self, update, context, *args, **kwargs)
         
     return wrapper
 
@@ -82,14 +77,9 @@ def with_register_user(handler):
     async def wrapper(self, update: Update, context: CallbackContext, *args, **kwargs):
         try:
             user_id = update.effective_user.id
-            user_data = update.effective_user
-
-            # Ensure the bot_data dictionary has a 'user_dict' key
-            if 'user_dict' not in context.bot_data:
-                context.bot_data['user_dict'] = {}
 
-            # Register or update the user data
-            context.bot_data['user_dict'][user_id] = user_data
+            # Register or update the user record
+            touch_user(context.bot_data, update.effective_user)
 
             self.logger.debug(f"User {user_id} registered in bot data dictionary.")
 
@@ -145,24 +135,26 @@ def check_user_allowed(handler):
     
     return wrapper
 
-# Define the decorator and duplicate all non-admin messages to admin
+# Define the decorator and duplicate all non-admin messages to admins through the audit feed
 def with_log_admin(handler):
     @wraps(handler)
     async def wrapper(self, update: Update, context: CallbackContext, *args, **kwargs):
-        try:
+        with tracer.span('with_log_admin'):
             try:
-                if update.effective_user.id not in self.admins_owner:
-                    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)      
-                    await context.bot.send_message(chat_id=self.admins_owner[0], text=f"_{update.effective_message.text} - {update.effective_user.full_name} - from {update.effective_message.from_user.id} {update.effective_user.full_name}_", parse_mode=ParseMode.MARKDOWN)
+                try:
+                    # Queued without awaiting, admins get it in the next digest
+                    if not self.auth.is_admin(update.effective_user.id):
+                        self.audit_feed.record(f"{update.effective_message.text} - {update.effective_user.full_name} - from {update.effective_user.id}")
+                        
+                except Exception as e:
+                    self.logger.error(f"Error: {e}")
                     
+                return await handler(self, update, context, *args, **kwargs)
+            
             except Exception as e:
+                # The handler already ran, running it again would repeat its side effects
                 self.logger.error(f"Error: {e}")
-                
-            return await handler(self, update, context, *args, **kwargs)
-        
-        except Exception as e:
-            self.logger.error(f"Error: {e}")
-            return await handler(self, update, context,  *args, **kwargs)
+                raise
         
     return wrapper
 
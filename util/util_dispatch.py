@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fast-path command dispatch
+
+PTB calls check_update on every handler of a group, in order, for every update.
+With dozens of CommandHandlers that means dozens of command parses per message.
+CommandDispatcher replaces each run of CommandHandlers with a single handler
+that parses the command once and looks it up in a dict.
+
+Usage:
+    compile_command_handlers(application)   # after all handlers were added
+"""
+
+from telegram import MessageEntity, Update
+from telegram.ext import (
+    Application, BaseHandler, CallbackQueryHandler, ChosenInlineResultHandler, CommandHandler,
+    InlineQueryHandler, PollAnswerHandler, PollHandler, PreCheckoutQueryHandler, ShippingQueryHandler,
+    filters
+)
+
+from util.util_auth import RoleFilter
+
+__all__ = ['CommandDispatcher', 'iter_handlers', 'compile_command_handlers']
+
+# Handlers that never match a message, so command handlers can be moved across them
+NON_MESSAGE_HANDLERS = (
+    CallbackQueryHandler, ChosenInlineResultHandler, InlineQueryHandler, PollAnswerHandler,
+    PollHandler, PreCheckoutQueryHandler, ShippingQueryHandler
+)
+
+
+class CommandDispatcher(BaseHandler):
+    """Dispatches commands to CommandHandlers through a dict lookup.
+
+    Handlers keep their registration order per command, and a command whose
+    filters reject the update falls through to the following handlers exactly
+    like with separate CommandHandlers.
+    """
+
+    def __init__(self, handlers: list = None):
+        super().__init__(self._dispatch, block=True)
+        self.handlers = []
+        self.command_map = {}
+        for handler in handlers or []:
+            self.add(handler)
+
+    def add(self, handler: CommandHandler):
+        """Index a CommandHandler by its commands"""
+
+        # A filters.User or RoleFilter check becomes a set-membership test
+        user_filter = None
+        if isinstance(handler.filters, RoleFilter) or (
+            isinstance(handler.filters, filters.User) and not handler.filters.usernames
+        ):
+            user_filter = handler.filters
+
+        entry = (handler, user_filter)
+        self.handlers.append(handler)
+        for command in handler.commands:
+            self.command_map.setdefault(command.lower(), []).append(entry)
+
+    @property
+    def commands(self) -> frozenset:
+        """All commands handled by the dispatcher"""
+        return frozenset(self.command_map)
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update):
+            return None
+
+        message = update.effective_message
+        if not message or not message.entities or not message.text:
+            return None
+
+        entity = message.entities[0]
+        if entity.type != MessageEntity.BOT_COMMAND or entity.offset != 0:
+            return None
+
+        command, _, bot_username = message.text[1:entity.length].partition('@')
+        entries = self.command_map.get(command.lower())
+        if not entries:
+            return None
+
+        if bot_username:
+            bot = message.get_bot()
+            if not bot or bot_username.lower() != bot.username.lower():
+                return None
+
+        for handler, user_filter in entries:
+            if user_filter is not None and handler.has_args is None:
+                # Same outcome as the filter's check_update, without the filter machinery
+                user_ids = user_filter.user_ids
+                user = message.from_user
+                if user_ids:
+                    allowed = user is not None and user.id in user_ids
+                else:
+                    allowed = user_filter.allow_empty
+                if not allowed:
+                    continue
+                return handler, (message.text.split()[1:], True)
+
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler, check
+
+        return None
+
+    async def handle_update(self, update, application: Application, check_result, context):
+        handler, handler_check = check_result
+        coroutine = handler.handle_update(update, application, handler_check, context)
+
+        # Honour block=False of the original handler, as Application.process_update does
+        defaults = getattr(application.bot, 'defaults', None)
+        if not handler.block or (
+            handler.block is not True
+            and defaults is not None
+            and not defaults.block
+        ):
+            application.create_task(coroutine, update=update)
+            return None
+        return await coroutine
+
+    async def _dispatch(self, update, context):
+        # Never called: handle_update delegates to the matched handler
+        return None
+
+
+def iter_handlers(application: Application):
+    """Yield (group, handler) for every handler, including those inside dispatchers"""
+    for group, handlers in application.handlers.items():
+        for handler in handlers:
+            if isinstance(handler, CommandDispatcher):
+                for command_handler in handler.handlers:
+                    yield group, command_handler
+            else:
+                yield group, handler
+
+
+def compile_command_handlers(application: Application) -> int:
+    """Replace CommandHandlers of every group with CommandDispatchers
+
+    Command handlers are merged across handlers that never match messages;
+    any other handler (e.g. a MessageHandler) keeps its place between them.
+    Can be called again after more handlers are added.
+
+    Returns:
+        int: number of command handlers indexed
+    """
+    indexed = 0
+    for group, handlers in application.handlers.items():
+        compiled = []
+        dispatcher = None
+        for handler in handlers:
+            if isinstance(handler, CommandDispatcher):
+                handler_list = handler.handlers
+            elif isinstance(handler, CommandHandler):
+                handler_list = [handler]
+            else:
+                handler_list = None
+
+            if handler_list is not None:
+                if dispatcher is None:
+                    dispatcher = CommandDispatcher()
+                    compiled.append(dispatcher)
+                for command_handler in handler_list:
+                    dispatcher.add(command_handler)
+                    indexed += 1
+            else:
+                if not isinstance(handler, NON_MESSAGE_HANDLERS):
+                    dispatcher = None
+                compiled.append(handler)
+
+        handlers[:] = compiled
+
+    return indexed
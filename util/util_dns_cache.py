@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""DNS resolution cache for host checks
+
+Host checks resolve the monitored name once through this cache and probe the
+cached address. Addresses are kept for their TTL and failed lookups for a short
+negative TTL, concurrent lookups of one name share a single query, and an entry
+still in use is refreshed in the background before it expires.
+
+The system resolver does not report TTLs: with dnspython installed the record
+TTL is used (between min_ttl and ttl), otherwise addresses are kept for ttl
+seconds. Names dnspython cannot resolve (e.g. from /etc/hosts) go through the
+system resolver.
+
+modern_host_watch_bot/src/utils/dns_cache.py is the same cache for the modern
+bot, which is installed on its own from its src folder and does not depend on
+this framework, so neither package can import the other. Its tests
+(modern_host_watch_bot/tests/test_dns_cache.py) also run against this copy.
+
+Usage:
+    dns_cache = DNSCache(ttl=300, negative_ttl=30)
+    resolution = await dns_cache.resolve('example.com')  # raises DNSResolutionError
+    print(resolution.address, resolution.elapsed)
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+
+try:
+    import dns.asyncresolver
+except ImportError:
+    dns = None
+
+__all__ = ['DNSResolutionError', 'Resolution', 'DNSCache']
+
+logger = logging.getLogger(__name__)
+
+
+class DNSResolutionError(Exception):
+    """The host name does not resolve"""
+
+
+class Resolution:
+    """Address of a host and the seconds spent getting it"""
+
+    __slots__ = ('host', 'address', 'elapsed', 'cached')
+
+    def __init__(self, host: str, address: str, elapsed: float, cached: bool):
+        self.host = host
+        self.address = address
+        self.elapsed = elapsed
+        self.cached = cached
+
+
+class _Entry:
+    """Address, or error of a failed lookup, and when it expires"""
+
+    __slots__ = ('address', 'error', 'resolved_at', 'ttl')
+
+    def __init__(self, address: str, error: str, ttl: float):
+        self.address = address
+        self.error = error
+        self.resolved_at = time.monotonic()
+        self.ttl = ttl
+
+    @property
+    def expires(self) -> float:
+        return self.resolved_at + self.ttl
+
+
+class DNSCache:
+    """Async resolver cache shared by the host checks"""
+
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 30.0, min_ttl: float = 5.0, prefetch_ratio: float = 0.8,
+                 timeout: float = 5.0, max_entries: int = 4096):
+        """Create the cache
+
+        Args:
+            ttl (float, optional): seconds an address is kept, the maximum when record TTLs are known. Defaults to 300.0.
+            negative_ttl (float, optional): seconds a failed lookup is kept. Defaults to 30.0.
+            min_ttl (float, optional): shortest time an address is kept. Defaults to 5.0.
+            prefetch_ratio (float, optional): fraction of the TTL after which a used entry is refreshed. Defaults to 0.8.
+            timeout (float, optional): seconds a lookup may take. Defaults to 5.0.
+            max_entries (int, optional): host names kept. Defaults to 4096.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min(min_ttl, ttl)
+        self.prefetch_ratio = prefetch_ratio
+        self.timeout = timeout
+        self.max_entries = max_entries
+
+        self._entries = {}
+        self._pending = {}
+        self.counters = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'lookups': 0, 'failures': 0, 'prefetches': 0}
+
+    async def _query(self, host: str) -> tuple:
+        """Resolve an IPv4 address of host
+
+        Returns:
+            tuple: (address, ttl)
+        """
+        if dns is not None:
+            try:
+                answer = await dns.asyncresolver.resolve(host, 'A', lifetime=self.timeout)
+                return answer[0].to_text(), max(self.min_ttl, min(self.ttl, answer.rrset.ttl))
+            except Exception as e:
+                logger.debug(f"dnspython could not resolve {host}, using the system resolver: {e}")
+
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM), self.timeout
+        )
+        return infos[0][4][0], self.ttl
+
+    async def _lookup(self, host: str) -> _Entry:
+        self.counters['lookups'] += 1
+        try:
+            address, ttl = await self._query(host)
+            entry = _Entry(address, None, ttl)
+        except Exception as e:
+            self.counters['failures'] += 1
+            error = 'timed out' if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            previous = self._entries.get(host)
+            if previous and previous.address and time.monotonic() < previous.expires:
+                # A failed refresh keeps the current address until it expires
+                logger.debug(f"Error refreshing {host}, keeping {previous.address}: {error}")
+                return previous
+            entry = _Entry(None, error, self.negative_ttl)
+
+        self._entries.pop(host, None)
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            expired = [name for name, cached in self._entries.items() if cached.expires <= now]
+            for name in expired or [next(iter(self._entries))]:
+                del self._entries[name]
+        self._entries[host] = entry
+        return entry
+
+    def _start_lookup(self, host: str) -> asyncio.Task:
+        """Start a lookup of host, or return the one already running"""
+        task = self._pending.get(host)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._lookup(host))
+            self._pending[host] = task
+            task.add_done_callback(lambda _: self._pending.pop(host, None))
+        return task
+
+    async def resolve(self, host: str) -> Resolution:
+        """Get the address of a host, from the cache when possible
+
+        Args:
+            host (str): host name or IP address
+
+        Raises:
+            DNSResolutionError: the name does not resolve, possibly a cached failure
+
+        Returns:
+            Resolution: the address and the seconds spent resolving it
+        """
+        started = time.monotonic()
+        try:
+            ipaddress.ip_address(host)
+            return Resolution(host, host, 0.0, True)
+        except ValueError:
+            pass
+
+        name = host.lower().rstrip('.')
+        entry = self._entries.get(name)
+        cached = entry is not None and started < entry.expires
+
+        if not cached:
+            self.counters['misses'] += 1
+            # shielded: a cancelled check must not cancel the lookup other checks wait for
+            entry = await asyncio.shield(self._start_lookup(name))
+        elif entry.address is None:
+            self.counters['negative_hits'] += 1
+        else:
+            self.counters['hits'] += 1
+            if started >= entry.resolved_at + entry.ttl * self.prefetch_ratio and name not in self._pending:
+                self.counters['prefetches'] += 1
+                self._start_lookup(name)
+
+        if entry.address is None:
+            raise DNSResolutionError(f"Cannot resolve {host}: {entry.error}")
+        return Resolution(host, entry.address, time.monotonic() - started, cached)
+
+    def invalidate(self, host: str = None):
+        """Forget a host name, or all of them"""
+        if host is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(host.lower().rstrip('.'), None)
+
+    def stats(self) -> dict:
+        """Cache usage counters"""
+        return {'entries': len(self._entries), 'pending': len(self._pending), **self.counters}
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fleet command fan-out
+
+Runs one command over SSH on many hosts at the same time, with a concurrency
+limit and a timeout per host, reporting progress as hosts finish. The results
+are summarized by grouping the hosts that returned identical output, and can
+be rendered as a full text report to send as a file.
+
+SSH connections are kept open by ssh_pool and reused by later fan-outs, each
+command runs on a new channel of the open connection. The blocking paramiko
+calls of every fan-out share one long-lived thread pool. The pool of the modern
+bot (modern_host_watch_bot/src/utils/ssh_pool.py) works the same way, and its
+tests also run the behaviour both share against SSHSessionPool.
+
+Usage:
+    targets = [FanoutTarget('10.0.0.1', 'root', 'secret'), ...]
+    results = await run_fanout(targets, 'uptime', concurrency=16, timeout=30, on_progress=progress)
+    summary = format_fanout_summary('uptime', results)
+    report = format_fanout_report('uptime', results)
+"""
+
+import asyncio
+import hashlib
+import html
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = [
+    'FanoutTarget',
+    'FanoutResult',
+    'SSHSessionPool',
+    'ssh_pool',
+    'ssh_run',
+    'run_fanout',
+    'group_results',
+    'format_fanout_summary',
+    'format_fanout_report',
+]
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+# Threads running the SSH commands of all fan-outs, larger concurrencies wait for a free thread
+FANOUT_THREADS = 64
+
+
+class FanoutTarget:
+    """Host and credentials of a fan-out command"""
+
+    __slots__ = ('host', 'username', 'password', 'port')
+
+    def __init__(self, host: str, username: str = None, password: str = None, port: int = 22):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+
+
+class FanoutResult:
+    """Outcome of the command on one host"""
+
+    __slots__ = ('host', 'status', 'output', 'exit_code', 'elapsed')
+
+    def __init__(self, host: str, status: str, output: str = '', exit_code: int = None, elapsed: float = 0.0):
+        self.host = host
+        # ok, failed (non-zero exit code), error, timed out or skipped
+        self.status = status
+        self.output = output
+        self.exit_code = exit_code
+        self.elapsed = elapsed
+
+
+class _Connection:
+    __slots__ = ('key', 'lock', 'client', 'active', 'last_used')
+
+    def __init__(self, key: tuple):
+        self.key = key
+        # Held while connecting, so concurrent commands to the host open a single connection
+        self.lock = threading.Lock()
+        self.client = None
+        self.active = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.is_active()
+
+    def close(self):
+        client, self.client = self.client, None
+        if client:
+            try:
+                client.close()
+            except Exception as e:
+                logger.debug(f"Error closing the SSH connection to {self.key[0]}: {e}")
+
+
+class SSHSessionPool:
+    """Keep-alive SSH connections, one per host and credentials, shared by the threads running commands
+
+    A connection is only reused with the credentials that opened it. Connections idle for
+    idle_timeout are closed by a background thread, and opening a connection when max_connections
+    are open closes the least recently used idle one.
+    """
+
+    def __init__(self, max_connections: int = 256, idle_timeout: float = 300.0, keepalive_interval: int = 30):
+        """Create the pool
+
+        Args:
+            max_connections (int, optional): connections kept open while idle. Defaults to 256.
+            idle_timeout (float, optional): seconds before an unused connection is closed. Defaults to 300.0.
+            keepalive_interval (int, optional): seconds between SSH keepalive packets. Defaults to 30.
+        """
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.connections_opened = 0
+
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._reaper = None
+
+    # ---------- connections ----------
+
+    def _connect(self, target: FanoutTarget, timeout: float):
+        import paramiko
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(
+                hostname=target.host, port=target.port, username=target.username, password=target.password,
+                timeout=timeout, banner_timeout=timeout, auth_timeout=timeout, allow_agent=False, look_for_keys=False
+            )
+            client.get_transport().set_keepalive(self.keepalive_interval)
+        except Exception:
+            client.close()
+            raise
+        return client
+
+    def _close_idle(self, expired_only: bool) -> int:
+        """Close idle connections: the expired ones, or else the least recently used one (lock held)"""
+        now = time.monotonic()
+        idle = [connection for connection in self._connections.values() if connection.active == 0]
+        if expired_only:
+            victims = [connection for connection in idle if now - connection.last_used >= self.idle_timeout]
+        else:
+            victims = sorted(idle, key=lambda connection: connection.last_used)[:1]
+        for connection in victims:
+            del self._connections[connection.key]
+            connection.close()
+        return len(victims)
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, min(self.idle_timeout / 2, 60.0)))
+            with self._lock:
+                self._close_idle(expired_only=True)
+                if not self._connections:
+                    self._reaper = None
+                    return
+
+    def _acquire(self, target: FanoutTarget, timeout: float) -> tuple:
+        """(connection, reused) for the target, connecting when needed"""
+        key = (target.host, target.port, target.username, hashlib.sha256((target.password or '').encode()).hexdigest())
+        with self._lock:
+            connection = self._connections.get(key)
+            if connection is None:
+                if len(self._connections) >= self.max_connections:
+                    self._close_idle(expired_only=False)
+                connection = self._connections[key] = _Connection(key)
+            connection.active += 1
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name='ssh-pool-reaper', daemon=True)
+                self._reaper.start()
+
+        try:
+            with connection.lock:
+                reused = connection.alive
+                if not reused:
+                    connection.close()
+                    connection.client = self._connect(target, timeout)
+                    with self._lock:
+                        self.connections_opened += 1
+        except BaseException:
+            self._release(connection)
+            raise
+        return connection, reused
+
+    def _release(self, connection: _Connection):
+        with self._lock:
+            connection.active -= 1
+            connection.last_used = time.monotonic()
+            # Failed to connect or closed as broken: not kept for max_connections and the reaper
+            if connection.client is None and connection.active == 0 and self._connections.get(connection.key) is connection:
+                del self._connections[connection.key]
+
+    # ---------- commands ----------
+
+    @staticmethod
+    def _exec(client, command: str, timeout: float) -> tuple:
+        channel = client.get_transport().open_session(timeout=timeout)
+        try:
+            channel.settimeout(timeout)
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+
+            output = []
+            while True:
+                data = channel.recv(32768)
+                if not data:
+                    break
+                output.append(data)
+            return channel.recv_exit_status(), b''.join(output).decode('utf-8', errors='replace')
+        finally:
+            channel.close()
+
+    def run(self, target: FanoutTarget, command: str, timeout: float) -> tuple:
+        """Run a command on a pooled connection, stdout and stderr merged (blocking)
+
+        A reused connection that turns out to be broken is replaced once.
+
+        Returns:
+            tuple: (exit code, output)
+        """
+        import paramiko
+
+        for attempt in range(2):
+            connection, reused = self._acquire(target, timeout)
+            try:
+                return self._exec(connection.client, command, timeout)
+            except socket.timeout:
+                # Only this command is slow, the other channels of the connection keep it
+                raise
+            except (paramiko.SSHException, EOFError, OSError, AttributeError) as e:
+                # AttributeError: the transport was closed and get_transport() returned None
+                with connection.lock:
+                    connection.close()
+                if not reused or attempt:
+                    raise
+                logger.info(f"SSH connection to {target.host} was broken, reconnecting: {e}")
+            finally:
+                self._release(connection)
+
+    def stats(self) -> dict:
+        """Pool usage counters"""
+        with self._lock:
+            return {
+                'connections': len(self._connections),
+                'active_commands': sum(connection.active for connection in self._connections.values()),
+                'connections_opened': self.connections_opened,
+            }
+
+    def close(self):
+        """Close every connection"""
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
+
+
+ssh_pool = SSHSessionPool()
+
+_executor = None
+
+
+def _fanout_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FANOUT_THREADS, thread_name_prefix='fanout')
+    return _executor
+
+
+def ssh_run(target: FanoutTarget, command: str, timeout: float) -> tuple:
+    """Run a command on a host over a connection of ssh_pool, stdout and stderr merged (blocking)
+
+    Returns:
+        tuple: (exit code, output)
+    """
+    return ssh_pool.run(target, command, timeout)
+
+
+async def run_fanout(targets: list, command: str, concurrency: int = 16, timeout: float = 30.0,
+                     on_progress=None, run_target=ssh_run) -> list:
+    """Run a command on every target, at most concurrency hosts at a time
+
+    Args:
+        targets (list): FanoutTarget of each host; targets without username are skipped
+        command (str): command to run
+        concurrency (int, optional): hosts contacted at the same time, at most FANOUT_THREADS. Defaults to 16.
+        timeout (float, optional): seconds allowed per host, connection included. Defaults to 30.0.
+        on_progress (coroutine function, optional): called as on_progress(done, total, failed) when a host finishes
+        run_target (callable, optional): blocking run_target(target, command, timeout) -> (exit code, output). Defaults to ssh_run.
+
+    Returns:
+        list: FanoutResult of each target, in the same order
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = {'done': 0, 'failed': 0}
+    executor = _fanout_executor()
+
+    async def run_one(target: FanoutTarget) -> FanoutResult:
+        if not target.username:
+            result = FanoutResult(target.host, 'skipped', 'no stored credentials')
+        else:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    # The SSH timeouts stop the thread, wait_for only guards against a stuck connect
+                    exit_code, output = await asyncio.wait_for(
+                        loop.run_in_executor(executor, run_target, target, command, timeout), timeout * 2 + 5
+                    )
+                    result = FanoutResult(target.host, 'ok' if exit_code == 0 else 'failed', output, exit_code)
+                except asyncio.TimeoutError:
+                    result = FanoutResult(target.host, 'timed out')
+                except Exception as e:
+                    status = 'timed out' if isinstance(e, socket.timeout) else 'error'
+                    result = FanoutResult(target.host, status, f"{type(e).__name__}: {e}")
+                result.elapsed = time.monotonic() - started
+
+        progress['done'] += 1
+        if result.status != 'ok':
+            progress['failed'] += 1
+        if on_progress:
+            await on_progress(progress['done'], len(targets), progress['failed'])
+        return result
+
+    # Threads still connecting end on their own SSH timeouts, never wait for them on the event loop
+    return list(await asyncio.gather(*(run_one(target) for target in targets)))
+
+
+def group_results(results: list) -> list:
+    """Group hosts by identical status and output, largest groups first
+
+    Returns:
+        list: (status, output, [hosts]) tuples
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result.status, result.output.strip()), []).append(result.host)
+    return sorted(((status, output, hosts) for (status, output), hosts in groups.items()),
+                  key=lambda group: (group[0] != 'ok', -len(group[2])))
+
+
+def format_fanout_summary(command: str, results: list, max_length: int = MAX_MESSAGE_LENGTH) -> str:
+    """HTML summary of the fan-out that fits in one Telegram message"""
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    header = f"<b>$ {html.escape(command)}</b> on {len(results)} hosts\n" + ', '.join(f"{status}: {count}" for status, count in counts.items())
+
+    parts = [header]
+    length = len(header)
+    groups = group_results(results)
+    for index, (status, output, hosts) in enumerate(groups):
+        host_list = ', '.join(hosts[:10]) + (f" and {len(hosts) - 10} more" if len(hosts) > 10 else '')
+        lines = output.splitlines()
+        shown = '\n'.join(lines[:8])[:600] + ('\n...' if len(lines) > 8 or len(output) > 600 else '')
+        part = f"\n\n<b>{len(hosts)} × {html.escape(status)}</b>: {html.escape(host_list)}" + (f"\n<pre>{html.escape(shown)}</pre>" if shown else '')
+        if length + len(part) > max_length - 100:
+            parts.append(f"\n\n<i>{len(groups) - index} more groups in the report file</i>")
+            break
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+
+def format_fanout_report(command: str, results: list) -> str:
+    """Full plain text report: the groups, then the output of every host"""
+    lines = [f"$ {command}", f"{len(results)} hosts", '']
+    for status, output, hosts in group_results(results):
+        lines.append(f"=== {len(hosts)} hosts, {status}: {', '.join(hosts)}")
+        lines.extend([output, ''] if output else [''])
+    lines.append('=== per host')
+    for result in sorted(results, key=lambda result: result.host):
+        exit_code = f", exit code {result.exit_code}" if result.exit_code is not None else ''
+        lines.append(f"--- {result.host}: {result.status}{exit_code}, {result.elapsed:.1f} s")
+        lines.append(result.output.rstrip())
+    return '\n'.join(lines) + '\n'
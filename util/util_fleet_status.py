@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fleet status snapshot for the host listings
+
+JobScheduleIndex maps job names to their scheduler jobs, kept up to date by
+the scheduler events, so the next run time of a host is a dict lookup instead
+of a scan of the job queue. FleetStatusTable holds the monitored hosts of the
+users in columns, built in one pass over the user data, and renders sorted,
+filtered pages of the listing.
+
+Usage:
+    schedule_index = JobScheduleIndex()
+    schedule_index.attach(application.job_queue.scheduler)
+
+    table = FleetStatusTable.from_user_data(all_user_data, owners=[user_id])
+    rows = table.select(down_only=False, order='status')
+    page_rows, page, pages = paginate_rows(rows, page=0, page_size=25)
+    lines = table.render(page_rows, schedule_index.next_run)
+    keyboard = page_keyboard('pinglist:me:status', page, pages)
+"""
+
+from datetime import datetime
+
+from apscheduler.events import EVENT_ALL_JOBS_REMOVED, EVENT_JOB_ADDED, EVENT_JOB_REMOVED
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from util.util_presence import DISPLAY_TIMEZONE
+
+__all__ = ['JobScheduleIndex', 'FleetStatusTable', 'paginate_rows', 'page_keyboard']
+
+
+class JobScheduleIndex:
+    """Job name -> scheduled job, maintained by scheduler events"""
+
+    def __init__(self):
+        self.scheduler = None
+        self._jobs = {}
+        self._names = {}
+
+    def attach(self, scheduler):
+        """Index the jobs of an APScheduler scheduler and follow its additions and removals"""
+        self.scheduler = scheduler
+        scheduler.add_listener(self._on_event, EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_ALL_JOBS_REMOVED)
+        for job in scheduler.get_jobs():
+            self._add(job)
+
+    def _add(self, job):
+        self._jobs[job.name] = job
+        self._names[job.id] = job.name
+
+    def _on_event(self, event):
+        if event.code == EVENT_ALL_JOBS_REMOVED:
+            self._jobs.clear()
+            self._names.clear()
+        elif event.code == EVENT_JOB_ADDED:
+            job = self.scheduler.get_job(event.job_id, event.jobstore)
+            if job:
+                self._add(job)
+        else:
+            name = self._names.pop(event.job_id, None)
+            # Another job may have been added with the same name since
+            if name is not None and self._jobs.get(name) is not None and self._jobs[name].id == event.job_id:
+                del self._jobs[name]
+
+    def next_run(self, name: str) -> datetime:
+        """Next run time of the job with that name, None if it is not scheduled"""
+        job = self._jobs.get(name)
+        return job.next_run_time if job is not None else None
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+class FleetStatusTable:
+    """Monitored hosts of the users, one list per column"""
+
+    COLUMNS = ('owner', 'job_name', 'host', 'port', 'interval', 'ping_ok', 'port_ok', 'latency', 'last_check', 'last_fail')
+
+    def __init__(self):
+        for column in self.COLUMNS:
+            setattr(self, column, [])
+
+    @classmethod
+    def from_user_data(cls, all_user_data: dict, owners: list = None) -> 'FleetStatusTable':
+        """Build the table from the user data of the persistence
+
+        Args:
+            all_user_data (dict): user id -> user data with the ping_<host> job parameters
+            owners (list, optional): only the hosts of these users. Defaults to all users.
+        """
+        table = cls()
+        for owner in (owners if owners is not None else all_user_data):
+            for job_name, params in (all_user_data.get(owner) or {}).items():
+                if not job_name.startswith('ping_') or not isinstance(params, dict):
+                    continue
+                table.owner.append(owner)
+                table.job_name.append(job_name)
+                table.host.append(params.get('ip_address') or job_name[len('ping_'):])
+                table.port.append(params.get('port', 80))
+                table.interval.append(params.get('interval'))
+                table.ping_ok.append(bool(params.get('last_status')))
+                table.port_ok.append(bool(params.get('port_status')))
+                table.latency.append(params.get('latency_ms'))
+                table.last_check.append(params.get('http_ping_time'))
+                table.last_fail.append(params.get('last_fail_date'))
+        return table
+
+    def __len__(self):
+        return len(self.job_name)
+
+    def select(self, down_only: bool = False, order: str = 'status') -> list:
+        """Row indexes to show
+
+        Args:
+            down_only (bool, optional): only hosts failing the ping or the port check. Defaults to False.
+            order (str, optional): 'status' for down first then slowest first, 'failures' for the latest
+                failure first, 'host' for by host. Defaults to 'status'.
+        """
+        up = [ping_ok and port_ok for ping_ok, port_ok in zip(self.ping_ok, self.port_ok)]
+        rows = [row for row in range(len(self)) if not (down_only and up[row])]
+
+        if order == 'failures':
+            # Dates are stored as '%Y-%m-%d %H:%M:%S' strings, which sort chronologically
+            rows.sort(key=lambda row: self.last_fail[row] or '', reverse=True)
+        elif order == 'host':
+            rows.sort(key=lambda row: self.host[row])
+        else:
+            latency = self.latency
+            rows.sort(key=lambda row: (up[row], latency[row] is None, -(latency[row] or 0)))
+        return rows
+
+    def render(self, rows: list, next_run=None, show_owner: bool = False) -> list:
+        """Markdown lines of the listing, one per row
+
+        Args:
+            rows (list): row indexes, in display order
+            next_run (callable, optional): job name -> next run datetime. Defaults to no next run column.
+            show_owner (bool, optional): add the owner user id column. Defaults to False.
+        """
+        lines = []
+        for row in rows:
+            next_time = next_run(self.job_name[row]) if next_run else None
+            next_time = next_time.astimezone(DISPLAY_TIMEZONE).strftime('%H:%M') if next_time else ''
+            interval = f"{self.interval[row]}s" if self.interval[row] else ''
+            latency = f"{self.latency[row]:.0f}" if self.latency[row] is not None else '-'
+            owner = f"`{self.owner[row]:<10}`" if show_owner else ''
+            host = self.host[row]
+            lines.append(
+                f"{'✅' if self.ping_ok[row] else '🔴'}{'✅' if self.port_ok[row] else '🔴'}`{self.port[row]:<5}`{owner}"
+                f"`{interval:<6}` `{next_time:<5}` `{self.last_check[row] or '':<5}` `{latency:>4}` [{host}](https://{host})"
+            )
+        return lines
+
+    def render_failures(self, rows: list) -> list:
+        """Markdown lines of the last failure date of each row"""
+        return [f"`{str(self.last_fail[row] or 'No failures'):<19}` - `{self.host[row]}`" for row in rows]
+
+
+def paginate_rows(rows: list, page: int, page_size: int) -> tuple:
+    """Rows of one page
+
+    Returns:
+        tuple: (rows of the page, page number within range, number of pages)
+    """
+    pages = max(1, -(-len(rows) // page_size))
+    page = min(max(page, 0), pages - 1)
+    return rows[page * page_size:(page + 1) * page_size], page, pages
+
+
+def page_keyboard(prefix: str, page: int, pages: int) -> InlineKeyboardMarkup:
+    """Previous and next buttons sending '<prefix>:<page>' callback data, None for a single page"""
+    if pages <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton('◀️', callback_data=f"{prefix}:{page - 1}"))
+    buttons.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"{prefix}:{page}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton('▶️', callback_data=f"{prefix}:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Persistence file inspector
+
+Loads a PicklePersistence file in a separate worker process, with CPU time and
+memory limits where the platform supports them, so a large or hostile file
+never blocks or bloats the bot. Only the selected part of the data, converted
+to size-bounded JSON, comes back to the bot.
+
+Usage:
+    result = await inspect_pickle_file('bot.pickle', 'user_data.12345')
+    for page in paginate(result['json']):
+        ...
+"""
+
+import asyncio
+import gzip
+import html
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+__all__ = [
+    'PickleInspectError',
+    'inspect_pickle',
+    'inspect_pickle_file',
+    'format_summary',
+    'paginate',
+    'compress_json',
+    'html_pages',
+]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Telegram rejects longer messages, leave room for the code block markers
+PAGE_SIZE = 3900
+
+
+class PickleInspectError(Exception):
+    """The file or the query cannot be inspected"""
+
+
+def _persistent_load(persid):
+    # PicklePersistence replaces bots with this persistent id
+    return persid
+
+
+def _limit_resources(cpu_seconds: int, memory_bytes: int):
+    """Worker initializer: cap CPU time and address space"""
+    if resource is None:
+        return
+    for limit, value in ((resource.RLIMIT_CPU, cpu_seconds), (resource.RLIMIT_AS, memory_bytes)):
+        try:
+            soft, hard = resource.getrlimit(limit)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            resource.setrlimit(limit, (value, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def _select(data, query: str):
+    """Follow a dotted path like 'user_data.12345.balance'"""
+    node = data
+    for part in [part for part in query.split('.') if part]:
+        if isinstance(node, dict):
+            if part in node:
+                node = node[part]
+            elif part.lstrip('-').isdigit() and int(part) in node:
+                node = node[int(part)]
+            else:
+                raise PickleInspectError(f"Key not found: {part}")
+        elif isinstance(node, (list, tuple)) and part.lstrip('-').isdigit():
+            try:
+                node = node[int(part)]
+            except IndexError:
+                raise PickleInspectError(f"Index out of range: {part}")
+        elif hasattr(node, part):
+            node = getattr(node, part)
+        else:
+            raise PickleInspectError(f"Cannot go into {type(node).__name__} with: {part}")
+    return node
+
+
+def _jsonable(obj, depth: int, max_items: int):
+    """Convert to JSON-compatible data, cutting deep or long containers"""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if depth <= 0:
+        return f"<{type(obj).__name__}>"
+
+    if hasattr(obj, 'to_dict'):
+        try:
+            obj = obj.to_dict()
+        except Exception:
+            return repr(obj)[:200]
+
+    if isinstance(obj, dict):
+        items = {}
+        for index, (key, value) in enumerate(obj.items()):
+            if index >= max_items:
+                items['...'] = f"{len(obj) - max_items} more"
+                break
+            items[str(key)] = _jsonable(value, depth - 1, max_items)
+        return items
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        values = [_jsonable(value, depth - 1, max_items) for _, value in zip(range(max_items), obj)]
+        if len(obj) > max_items:
+            values.append(f"... {len(obj) - max_items} more")
+        return values
+    return repr(obj)[:200]
+
+
+def _summary(node) -> list:
+    """(key, type, entries, pickled bytes) of every child of a container"""
+    children = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, (list, tuple)) else []
+    rows = []
+    for key, value in children:
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            size = None
+        entries = len(value) if hasattr(value, '__len__') and not isinstance(value, (str, bytes)) else None
+        rows.append((str(key), type(value).__name__, entries, size))
+    rows.sort(key=lambda row: row[3] or 0, reverse=True)
+    return rows
+
+
+def inspect_pickle(path: str, query: str = '', max_depth: int = 4, max_items: int = 50, max_json_chars: int = 1_000_000) -> dict:
+    """Load a pickle file and describe the node selected by query (runs in the worker)
+
+    Returns:
+        dict: query, type, summary rows, json text and whether the json was cut
+    """
+    with open(path, 'rb') as file:
+        unpickler = pickle.Unpickler(file)
+        unpickler.persistent_load = _persistent_load
+        data = unpickler.load()
+
+    node = _select(data, query)
+    text = json.dumps(_jsonable(node, max_depth, max_items), indent=2, ensure_ascii=False, default=str)
+    truncated = len(text) > max_json_chars
+    return {
+        'query': query,
+        'type': type(node).__name__,
+        'summary': _summary(node),
+        'json': text[:max_json_chars],
+        'truncated': truncated,
+    }
+
+
+async def inspect_pickle_file(path: str, query: str = '', max_file_bytes: int = 200 * 1024 * 1024,
+                              cpu_seconds: int = 30, memory_bytes: int = 1024 * 1024 * 1024, **kwargs) -> dict:
+    """Inspect a pickle file in a resource-limited worker process, without blocking the event loop
+
+    Args:
+        path (str): persistence file
+        query (str, optional): dotted path to the node to show. Defaults to the whole file.
+        max_file_bytes (int, optional): larger files are refused. Defaults to 200 MB.
+        cpu_seconds (int, optional): CPU time limit of the worker. Defaults to 30.
+        memory_bytes (int, optional): address space limit of the worker. Defaults to 1 GB.
+        **kwargs: max_depth, max_items and max_json_chars of inspect_pickle
+
+    Raises:
+        PickleInspectError: file too large, query not found or worker limits exceeded
+    """
+    size = os.path.getsize(path)
+    if size > max_file_bytes:
+        raise PickleInspectError(f"File is {size:,} bytes, more than the {max_file_bytes:,} bytes limit")
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=1, initializer=_limit_resources, initargs=(cpu_seconds, memory_bytes)) as executor:
+        try:
+            return await loop.run_in_executor(executor, _inspect_with_options, path, query, kwargs)
+        except PickleInspectError:
+            raise
+        except Exception as e:
+            raise PickleInspectError(f"Could not inspect {os.path.basename(path)}: {type(e).__name__}: {e}")
+
+
+def _inspect_with_options(path: str, query: str, options: dict) -> dict:
+    return inspect_pickle(path, query, **options)
+
+
+def format_summary(result: dict, max_rows: int = 30) -> str:
+    """Plain text table of the summary rows"""
+    lines = [f"{result['query'] or '(root)'}: {result['type']}"]
+    for key, type_name, entries, size in result['summary'][:max_rows]:
+        entries_text = f"{entries} entries" if entries is not None else ''
+        size_text = f"{size:,} bytes" if size is not None else 'unpicklable'
+        lines.append(f"{key[:30]:<30} {type_name[:12]:<12} {entries_text:>14} {size_text:>16}")
+    if len(result['summary']) > max_rows:
+        lines.append(f"... {len(result['summary']) - max_rows} more")
+    return "\n".join(lines)
+
+
+def paginate(text: str, page_size: int = PAGE_SIZE, keep_entities: bool = False) -> list:
+    """Split text into pages on line boundaries
+
+    With keep_entities, long lines are never cut inside an HTML entity like &amp;
+    """
+    pages = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        while len(line) > page_size:
+            if current:
+                pages.append(current)
+                current = ''
+            cut = page_size
+            if keep_entities:
+                amp = line.rfind('&', max(cut - 5, 1), cut)
+                if amp != -1 and ';' not in line[amp:cut]:
+                    cut = amp
+            pages.append(line[:cut])
+            line = line[cut:]
+        if len(current) + len(line) > page_size:
+            pages.append(current)
+            current = ''
+        current += line
+    if current:
+        pages.append(current)
+    return pages
+
+
+def compress_json(text: str) -> bytes:
+    return gzip.compress(text.encode('utf-8'))
+
+
+def html_pages(text: str, language: str = None, page_size: int = PAGE_SIZE) -> list:
+    """Escaped <pre> blocks for parse_mode=HTML, unlike Markdown code blocks any character can be escaped
+
+    page_size counts the escaped text, so a page never grows past the Telegram limit
+    """
+    if language:
+        start, end = f'<pre><code class="language-{language}">', '</code></pre>'
+    else:
+        start, end = '<pre>', '</pre>'
+    return [f"{start}{page}{end}" for page in paginate(html.escape(text, quote=False), page_size, keep_entities=True)]
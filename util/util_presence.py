@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""User presence tracker
+
+bot_data['user_dict'] is a UserTable mapping user ids to compact UserRecord
+objects instead of full telegram.User objects. A record holds only what the
+bot shows (id, name, username, language and last-seen epoch) and is updated
+in place on every message. The table pickles as one list of plain tuples, so
+persistence files are smaller and faster to flush.
+
+Usage:
+    touch_user(context.bot_data, update.effective_user)
+    migrate_user_dict(application.bot_data)   # converts telegram.User entries of old pickles
+"""
+
+import time
+from operator import attrgetter
+from datetime import datetime, timedelta, timezone
+
+__all__ = ['DISPLAY_TIMEZONE', 'UserRecord', 'UserTable', 'touch_user', 'migrate_user_dict']
+
+# Dates are shown in the bot's timezone (UTC-3), like before
+DISPLAY_TIMEZONE = timezone(timedelta(hours=-3))
+
+
+class UserRecord:
+    """Compact user record stored in bot_data['user_dict']"""
+
+    __slots__ = ('id', 'first_name', 'last_name', 'username', 'language_code', 'last_seen')
+
+    def __init__(self, id: int, first_name: str = '', last_name: str = None, username: str = None,
+                 language_code: str = None, last_seen: float = 0.0):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+        self.language_code = language_code
+        self.last_seen = last_seen
+
+    @classmethod
+    def from_user(cls, user, last_seen: float = 0.0) -> "UserRecord":
+        """Create a record from a telegram.User"""
+        return cls(user.id, user.first_name, user.last_name, user.username, user.language_code, last_seen)
+
+    def update(self, user, last_seen: float):
+        """Refresh the record in place from a telegram.User"""
+        if self.first_name != user.first_name:
+            self.first_name = user.first_name
+        if self.last_name != user.last_name:
+            self.last_name = user.last_name
+        if self.username != user.username:
+            self.username = user.username
+        if self.language_code != user.language_code:
+            self.language_code = user.language_code
+        self.last_seen = last_seen
+
+    @property
+    def full_name(self) -> str:
+        """Same as telegram.User.full_name"""
+        return f"{self.first_name} {self.last_name}" if self.last_name else self.first_name
+
+    @property
+    def name(self) -> str:
+        """Same as telegram.User.name"""
+        return f"@{self.username}" if self.username else self.full_name
+
+    @property
+    def last_seen_text(self) -> str:
+        """Last seen date as shown by /showusers"""
+        if not self.last_seen:
+            return '-' * 11
+        return datetime.fromtimestamp(self.last_seen, DISPLAY_TIMEZONE).strftime('%d/%m %H:%M')
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __reduce__(self):
+        # Pickle as a tuple of values, without the slot names
+        return (UserRecord, tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __eq__(self, other):
+        return isinstance(other, UserRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"UserRecord(id={self.id}, name={self.name!r}, last_seen={self.last_seen})"
+
+
+def _restore_user_table(rows: list) -> "UserTable":
+    return UserTable((row[0], UserRecord(*row)) for row in rows)
+
+
+class UserTable(dict):
+    """bot_data['user_dict']: user id -> UserRecord, pickled as rows of values"""
+
+    _row = attrgetter(*UserRecord.__slots__)
+
+    def __reduce__(self):
+        if all(type(record) is UserRecord and record.id == user_id for user_id, record in self.items()):
+            return (_restore_user_table, (list(map(self._row, self.values())),))
+        # Not migrated yet, pickle as a regular dict
+        return (UserTable, (), None, None, iter(self.items()))
+
+
+def touch_user(bot_data: dict, user, when: datetime = None) -> UserRecord:
+    """Insert or update a user in bot_data['user_dict'] and set its last-seen time
+
+    Args:
+        bot_data (dict): application bot_data
+        user (telegram.User): user that sent the update
+        when (datetime, optional): time of the update. Defaults to now.
+
+    Returns:
+        UserRecord: the user's record
+    """
+    last_seen = when.timestamp() if when else time.time()
+    user_dict = bot_data.get('user_dict')
+    if user_dict is None:
+        user_dict = bot_data['user_dict'] = UserTable()
+
+    record = user_dict.get(user.id)
+    if isinstance(record, UserRecord):
+        record.update(user, last_seen)
+    else:
+        record = user_dict[user.id] = UserRecord.from_user(user, last_seen)
+    return record
+
+
+def _parse_last_message_date(text: str) -> float:
+    """Epoch of an old 'dd/mm HH:MM' last_message_date, assumed to be in the current year"""
+    try:
+        now = datetime.now(DISPLAY_TIMEZONE)
+        parsed = datetime.strptime(f"{now.year}/{text}", '%Y/%d/%m %H:%M').replace(tzinfo=DISPLAY_TIMEZONE)
+        if parsed > now:
+            parsed = parsed.replace(year=now.year - 1)
+        return parsed.timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def migrate_user_dict(bot_data: dict) -> int:
+    """Convert bot_data['user_dict'] into a UserTable of UserRecords
+
+    The last_message_date strings kept in bot_data['user_status'] become the
+    records' last_seen and are removed.
+
+    Returns:
+        int: number of users converted
+    """
+    user_dict = bot_data.get('user_dict') or {}
+    user_status = bot_data.get('user_status') or {}
+    if not isinstance(user_dict, UserTable):
+        user_dict = bot_data['user_dict'] = UserTable(user_dict)
+
+    # Most users share a few dates, parse each one once
+    parsed_dates = {}
+
+    converted = 0
+    for user_id, user in list(user_dict.items()):
+        status = user_status.get(user_id)
+        last_message_date = status.pop('last_message_date', None) if isinstance(status, dict) else None
+
+        last_seen = 0.0
+        if last_message_date:
+            if last_message_date not in parsed_dates:
+                parsed_dates[last_message_date] = _parse_last_message_date(last_message_date)
+            last_seen = parsed_dates[last_message_date]
+
+        if isinstance(user, UserRecord):
+            if last_seen and not user.last_seen:
+                user.last_seen = last_seen
+            continue
+
+        user_dict[user_id] = UserRecord.from_user(user, last_seen)
+        converted += 1
+
+    return converted
@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""SQLite persistence shared by several processes
+
+PicklePersistence keeps the data of one process and rewrites the whole file,
+so processes using the same file overwrite each other. SQLitePersistence
+stores one row per key of the user_data and chat_data of each user and chat,
+and per bot_data entry (one row per item for dict entries like user_dict).
+It writes only the rows whose value changed, and before an update is handled
+reloads the rows written since by the other processes: the sharded webhook
+workers share user_data, chat_data and bot_data.
+
+Every write is checked against the version of the row this process last
+read. A row changed meanwhile by another process is not overwritten: the
+value written first is kept, replaces ours at the next refresh, and the
+conflict is logged. Changes of different keys of the same user, chat or
+bot_data entry are merged.
+
+The data of an existing pickle file (migrate_from) is imported once, by the
+first process opening the database. SQLite calls run in a thread of the
+persistence, off the event loop.
+
+Usage:
+    persistence = SQLitePersistence('bot.sqlite', migrate_from='bot.pickle')
+    application = Application.builder().token(token).persistence(persistence).build()
+"""
+
+import asyncio
+import copy
+import functools
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+
+__all__ = ['SQLitePersistence']
+
+logger = logging.getLogger(__name__)
+
+# Persistent id of the bot in pickled values, the bot itself is not stored
+_BOT_ID = 'bot'
+
+# Key of the bot_data row holding a whole entry, or the empty container of a dict entry
+_CONTAINER = b''
+
+# id: user id, chat id or pickled bot_data entry name; key: pickled key of the data (of the entry
+# item for bot_data); value: pickled value, NULL once deleted so the other processes notice
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS user_data (id INTEGER, key BLOB, value BLOB, version INTEGER NOT NULL, PRIMARY KEY (id, key));
+CREATE TABLE IF NOT EXISTS chat_data (id INTEGER, key BLOB, value BLOB, version INTEGER NOT NULL, PRIMARY KEY (id, key));
+CREATE TABLE IF NOT EXISTS bot_data (id BLOB, key BLOB, value BLOB, version INTEGER NOT NULL, PRIMARY KEY (id, key));
+CREATE INDEX IF NOT EXISTS bot_data_version ON bot_data (version);
+CREATE TABLE IF NOT EXISTS conversations (name TEXT, key BLOB, state BLOB, PRIMARY KEY (name, key));
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+"""
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, bot, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._bot = bot
+
+    def persistent_id(self, obj):
+        return _BOT_ID if self._bot is not None and obj is self._bot else None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, bot, file):
+        super().__init__(file)
+        self._bot = bot
+
+    def persistent_load(self, pid):
+        if pid == _BOT_ID:
+            return self._bot
+        raise pickle.UnpicklingError(f"Unknown persistent id: {pid}")
+
+
+def _digest(value: bytes) -> bytes:
+    return hashlib.blake2b(value, digest_size=16).digest()
+
+
+class SQLitePersistence(BasePersistence):
+    """BasePersistence on a SQLite database shared by the processes of a bot"""
+
+    def __init__(
+        self,
+        filepath: str,
+        migrate_from: str = None,
+        store_data: PersistenceInput = None,
+        update_interval: float = 60,
+        timeout: float = 30.0
+    ):
+        """Create the persistence, the database is opened on first use
+
+        Args:
+            filepath (str): SQLite database file, created if missing.
+            migrate_from (str, optional): single file pickle of PicklePersistence imported into a new database. Defaults to None.
+            store_data (PersistenceInput, optional): kinds of data to store. Defaults to all.
+            update_interval (float, optional): seconds between persistence updates of the application. Defaults to 60.
+            timeout (float, optional): seconds to wait for a database locked by another process. Defaults to 30.
+        """
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.filepath = filepath
+        self.migrate_from = migrate_from
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-persistence')
+        self._connection = None
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+
+        # Rows this process holds: (id, key) -> (digest of our pickling or None once deleted, version),
+        # per user and chat id for user_data and chat_data
+        self._known = {'user_data': {}, 'chat_data': {}}
+        self._bot_rows = {}
+        # Highest version read, per user and chat id and for bot_data
+        self._versions = {'user_data': {}, 'chat_data': {}}
+        self._bot_version = None
+        self._loaded = set()
+
+        self.conflicts = 0
+
+    # ---------- pickling ----------
+
+    def _dumps(self, obj) -> bytes:
+        buffer = io.BytesIO()
+        _Pickler(self.bot, buffer).dump(obj)
+        return buffer.getvalue()
+
+    def _loads(self, data: bytes):
+        return _Unpickler(self.bot, io.BytesIO(data)).load()
+
+    def _load(self, data: bytes):
+        """Value of a row and the digest of its pickling by this process"""
+        obj = self._loads(data)
+        return obj, _digest(self._dumps(obj))
+
+    def _data_rows(self, data_id: int, data: dict) -> dict:
+        """Pickled rows of the user_data or chat_data of an id, {(id, key): value}"""
+        return {(data_id, self._dumps(key)): self._dumps(value) for key, value in data.items()}
+
+    def _bot_data_rows(self, bot_data: dict) -> dict:
+        """Pickled rows of bot_data, {(entry, item): value}"""
+        rows = {}
+        for key, value in bot_data.items():
+            key_bytes = self._dumps(key)
+            if isinstance(value, dict):
+                container = {} if type(value) is dict else copy.copy(value)
+                container.clear()
+                rows[(key_bytes, _CONTAINER)] = self._dumps(container)
+                for item, item_value in value.items():
+                    rows[(key_bytes, self._dumps(item))] = self._dumps(item_value)
+            else:
+                rows[(key_bytes, _CONTAINER)] = self._dumps(value)
+        return rows
+
+    def _is_local_change(self, data: dict, name, state: tuple) -> bool:
+        """Whether data[name] was changed by this process since it was last read or written"""
+        known_digest = state[0] if state else None
+        live_digest = _digest(self._dumps(data[name])) if name in data else None
+        return live_digest != known_digest
+
+    # ---------- database, in the persistence thread ----------
+
+    async def _run(self, function, *args):
+        if not self._opened:
+            await self._open()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args))
+
+    def _connect(self):
+        connection = sqlite3.connect(self.filepath, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _write(self, write):
+        """Run write(connection, version) in a transaction with a new version, returned"""
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            version = connection.execute(
+                "UPDATE meta SET value = value + 1 WHERE name = 'version' RETURNING value"
+            ).fetchone()[0]
+            write(connection, version)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return version
+
+    def _write_rows(self, table: str, rows: dict, expected: dict):
+        """Write rows (None values delete) still at their expected version, returning the version and the conflicts"""
+        conflicts = []
+
+        def write(connection, version):
+            for row, value in rows.items():
+                cursor = connection.execute(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?) ON CONFLICT (id, key) DO UPDATE "
+                    f"SET value = excluded.value, version = excluded.version WHERE {table}.version = ?",
+                    (*row, value, version, expected[row])
+                )
+                if not cursor.rowcount:
+                    conflicts.append(row)
+
+        return self._write(write), conflicts
+
+    def _query(self, sql, parameters=()):
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def _is_migrated(self) -> bool:
+        return bool(self._query("SELECT 1 FROM meta WHERE name = 'migrated_from'"))
+
+    def _import(self, path: str, rows: dict) -> bool:
+        """Insert the rows of a pickle file unless another process already did"""
+        imported = []
+
+        def write(connection, version):
+            # checked again in the transaction, workers start at the same time
+            if self._is_migrated():
+                return
+            for table in ('user_data', 'chat_data', 'bot_data'):
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)",
+                    [(*row, value, version) for row, value in rows[table].items()]
+                )
+            connection.executemany("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)", rows['conversations'])
+            if rows['callback_data'] is not None:
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('callback_data', ?)", (rows['callback_data'],))
+            connection.execute("INSERT INTO meta VALUES ('migrated_from', ?)", (path,))
+            imported.append(path)
+
+        self._write(write)
+        return bool(imported)
+
+    async def _open(self):
+        async with self._open_lock:
+            if self._opened:
+                return
+            loop = asyncio.get_running_loop()
+            self._connection = await loop.run_in_executor(self._executor, self._connect)
+
+            if self.migrate_from and os.path.exists(self.migrate_from) and not await loop.run_in_executor(
+                self._executor, self._is_migrated
+            ):
+                rows = await self._read_pickle(self.migrate_from)
+                if await loop.run_in_executor(self._executor, self._import, self.migrate_from, rows):
+                    logger.info(
+                        f"Imported {self.migrate_from} into {self.filepath}: {len(rows['user_data'])} user_data, "
+                        f"{len(rows['chat_data'])} chat_data and {len(rows['bot_data'])} bot_data rows"
+                    )
+            self._opened = True
+
+    async def _read_pickle(self, path: str) -> dict:
+        """Rows of the data of a PicklePersistence file"""
+        source = PicklePersistence(filepath=path, store_data=self.store_data)
+        source.set_bot(self.bot)
+
+        # kinds of data a bot never stored are None in the file
+        callback_data = await source.get_callback_data()
+        rows = {'user_data': {}, 'chat_data': {}}
+        for table, data in (('user_data', await source.get_user_data()), ('chat_data', await source.get_chat_data())):
+            for data_id, values in (data or {}).items():
+                rows[table].update(self._data_rows(data_id, values))
+        return {
+            **rows,
+            'bot_data': self._bot_data_rows(await source.get_bot_data() or {}),
+            'conversations': [
+                (name, self._dumps(key), self._dumps(state))
+                for name, states in (source.conversations or {}).items()
+                for key, state in states.items()
+            ],
+            'callback_data': self._dumps(callback_data) if callback_data is not None else None,
+        }
+
+    async def _save(self, table: str, known: dict, rows: dict, description: str):
+        """Write the rows that changed and the deletions, unless changed meanwhile by another process"""
+        digests = {row: _digest(value) for row, value in rows.items()}
+        changed = {row: value for row, value in rows.items() if known.get(row, (None,))[0] != digests[row]}
+        changed.update({row: None for row, (row_digest, _) in known.items() if row_digest is not None and row not in rows})
+        if not changed:
+            return
+
+        expected = {row: known.get(row, (None, 0))[1] for row in changed}
+        version, conflicts = await self._run(self._write_rows, table, changed, expected)
+        for row in changed:
+            if row in conflicts:
+                # Stored first by another process: kept, and loaded over ours by the next refresh
+                known[row] = (digests.get(row), expected[row])
+            else:
+                known[row] = (digests.get(row), version)
+
+        if conflicts:
+            self.conflicts += len(conflicts)
+            names = [self._loads(key) for _, key in conflicts if key != _CONTAINER]
+            logger.warning(f"{description}: kept the values of {names or 'the entry'} changed meanwhile by another process")
+
+    # ---------- user_data and chat_data ----------
+
+    async def _get_data(self, table: str) -> dict:
+        data = {}
+        known, versions = {}, {}
+        for data_id, key, value, version in await self._run(self._query, f"SELECT id, key, value, version FROM {table}"):
+            versions[data_id] = max(versions.get(data_id, 0), version)
+            if value is None:
+                known.setdefault(data_id, {})[(data_id, key)] = (None, version)
+                continue
+            loaded, row_digest = self._load(value)
+            data.setdefault(data_id, {})[self._loads(key)] = loaded
+            known.setdefault(data_id, {})[(data_id, key)] = (row_digest, version)
+
+        # The data loaded by the application, later calls return a copy of the stored data
+        if table not in self._loaded:
+            self._loaded.add(table)
+            self._known[table], self._versions[table] = known, versions
+        return data
+
+    async def _update_data(self, table: str, data_id: int, data: dict):
+        known = self._known[table].setdefault(data_id, {})
+        await self._save(table, known, self._data_rows(data_id, data), f"{table} of {data_id}")
+
+    async def _refresh_data(self, table: str, data_id: int, data: dict):
+        known = self._known[table].setdefault(data_id, {})
+        versions = self._versions[table]
+        rows = await self._run(
+            self._query, f"SELECT key, value, version FROM {table} WHERE id = ? AND version > ? ORDER BY version",
+            (data_id, versions.get(data_id, 0))
+        )
+        for key, value, version in rows:
+            versions[data_id] = max(versions.get(data_id, 0), version)
+            row = (data_id, key)
+            if known.get(row, (None, 0))[1] == version:
+                continue  # our own write
+
+            name = self._loads(key)
+            if self._is_local_change(data, name, known.get(row)):
+                self.conflicts += 1
+                logger.warning(f"{table} of {data_id}: kept the value of {name!r} changed meanwhile by another process")
+            if value is None:
+                data.pop(name, None)
+                known[row] = (None, version)
+            else:
+                data[name], row_digest = self._load(value)
+                known[row] = (row_digest, version)
+
+    async def _drop_data(self, table: str, data_id: int):
+        version = await self._run(self._write, lambda connection, version: connection.execute(
+            f"UPDATE {table} SET value = NULL, version = ? WHERE id = ? AND value IS NOT NULL", (version, data_id)
+        ))
+        self._known[table][data_id] = {row: (None, version) for row in self._known[table].get(data_id, {})}
+
+    async def get_user_data(self) -> dict:
+        return await self._get_data('user_data')
+
+    async def get_chat_data(self) -> dict:
+        return await self._get_data('chat_data')
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        await self._update_data('user_data', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        await self._update_data('chat_data', chat_id, data)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh_data('user_data', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh_data('chat_data', chat_id, chat_data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._drop_data('user_data', user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._drop_data('chat_data', chat_id)
+
+    # ---------- bot_data ----------
+
+    async def get_bot_data(self) -> dict:
+        rows = await self._run(
+            self._query, "SELECT id, key, value, version FROM bot_data WHERE value IS NOT NULL ORDER BY id, key"
+        )
+        bot_data = {}
+        known = {}
+        for entry, item, value, version in rows:
+            loaded, row_digest = self._load(value)
+            if item == _CONTAINER:
+                bot_data[self._loads(entry)] = loaded
+            else:
+                bot_data.setdefault(self._loads(entry), {})[self._loads(item)] = loaded
+            known[(entry, item)] = (row_digest, version)
+
+        # The data loaded by the application, later calls return a copy of the stored data
+        if self._bot_version is None:
+            self._bot_rows = known
+            self._bot_version = (await self._run(self._query, "SELECT COALESCE(MAX(version), 0) FROM bot_data"))[0][0]
+        return bot_data
+
+    async def update_bot_data(self, data: dict) -> None:
+        await self._save('bot_data', self._bot_rows, self._bot_data_rows(data), 'bot_data')
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        if self._bot_version is None:
+            return
+        rows = await self._run(
+            self._query, "SELECT id, key, value, version FROM bot_data WHERE version > ? ORDER BY version, key",
+            (self._bot_version,)
+        )
+        for entry, item, value, version in rows:
+            self._bot_version = max(self._bot_version, version)
+            row = (entry, item)
+            if self._bot_rows.get(row, (None, 0))[1] == version:
+                continue  # our own write
+
+            name = self._loads(entry)
+            container = bot_data.get(name)
+            if item != _CONTAINER:
+                item_name = self._loads(item)
+                if isinstance(container, dict) and self._is_local_change(container, item_name, self._bot_rows.get(row)):
+                    self.conflicts += 1
+                    logger.warning(f"bot_data: kept the value of {item_name!r} in {name!r} changed meanwhile by another process")
+
+            if value is None:
+                if item == _CONTAINER:
+                    bot_data.pop(name, None)
+                elif isinstance(container, dict):
+                    container.pop(item_name, None)
+                self._bot_rows[row] = (None, version)
+                continue
+
+            loaded, row_digest = self._load(value)
+            if item == _CONTAINER:
+                if isinstance(loaded, dict) and isinstance(container, dict):
+                    # the items of the entry are rows of their own
+                    loaded.update(container)
+                bot_data[name] = loaded
+            else:
+                if not isinstance(container, dict):
+                    container = bot_data[name] = {}
+                container[item_name] = loaded
+            self._bot_rows[row] = (row_digest, version)
+
+    # ---------- conversations and callback data ----------
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await self._run(self._query, "SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {self._loads(key): self._loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        key = self._dumps(key)
+        if new_state is None:
+            await self._run(self._write, lambda connection, version: connection.execute(
+                "DELETE FROM conversations WHERE name = ? AND key = ?", (name, key)
+            ))
+        else:
+            state = self._dumps(new_state)
+            await self._run(self._write, lambda connection, version: connection.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)", (name, key, state)
+            ))
+
+    async def get_callback_data(self):
+        rows = await self._run(self._query, "SELECT value FROM meta WHERE name = 'callback_data'")
+        return self._loads(rows[0][0]) if rows else None
+
+    async def update_callback_data(self, data) -> None:
+        value = self._dumps(data)
+        await self._run(self._write, lambda connection, version: connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('callback_data', ?)", (value,)
+        ))
+
+    async def flush(self) -> None:
+        """Close the database, it is opened again if the persistence is used later"""
+        async with self._open_lock:
+            if self._connection is not None:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._connection.close)
+                self._connection = None
+            self._opened = False
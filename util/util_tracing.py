@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Handler tracing and sampling profiler
+
+Spans time the handlers, the decorators around them, the Telegram Bot API
+requests and the persistence writes, nested as they run: a slow command shows
+which of its decorators, API calls or own code took the time. The stack
+sampler records, every few milliseconds, the Python stack of every thread,
+for a top-N report of the functions using the time and a collapsed stacks
+file for flamegraph.pl, speedscope or inferno.
+
+Both are off by default. A disabled span is one attribute check, and the
+sampler has no thread until a profile starts.
+
+new_framework (tlgfwk.utils.tracing) has its own copy of the Tracer and the
+profiler, tested against this one in util/test_util_tracing.py: change both.
+
+Usage:
+    with tracer.span('load_hosts'):
+        hosts = load_hosts()
+
+    profiler = Profiler(tracer)
+    profiler.start(seconds=60)
+    ...
+    profiler.stop()
+    print(profiler.report(top=20))
+    open('profile.folded', 'w').write(profiler.profile.collapsed())
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+
+from telegram.ext import CommandHandler
+from telegram.request import HTTPXRequest
+
+from util.util_dispatch import iter_handlers
+
+__all__ = ['Tracer', 'tracer', 'TracedRequest', 'trace_handlers', 'StackSampler', 'StackProfile', 'Profiler']
+
+# Separator of the span names in a span path
+SPAN_SEPARATOR = ' > '
+
+# Leaf frames of a thread waiting for work, left out of the profile
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+}
+
+
+class _NoSpan:
+    """Span of a disabled tracer, does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('_tracer', '_name', '_path', '_token', '_started')
+
+    def __init__(self, tracer: 'Tracer', name: str):
+        self._tracer = tracer
+        self._name = name
+
+    def __enter__(self):
+        parent = self._tracer._current.get()
+        self._path = self._name if parent is None else f"{parent}{SPAN_SEPARATOR}{self._name}"
+        self._token = self._tracer._current.set(self._path)
+        self._started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = perf_counter() - self._started
+        self._tracer._current.reset(self._token)
+        self._tracer.record(self._path, elapsed, exc_type is not None)
+        return False
+
+
+class Tracer:
+    """Nested timing spans, aggregated by path
+
+    The current span is kept in a context variable, so concurrent updates each
+    nest their own spans, and tasks started inside a span nest under it.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._current = ContextVar('span', default=None)
+        self._lock = threading.Lock()
+        # span path -> [calls, total seconds, max seconds, errors]
+        self._stats = {}
+        self.started = time.time()
+
+    def span(self, name: str):
+        """Context manager timing a block as a child of the current span"""
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name)
+
+    def wrap(self, name: str, callback):
+        """Wrap a coroutine function so that every call is a span"""
+        if getattr(callback, '_traced', False):
+            return callback
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return await callback(*args, **kwargs)
+            with _Span(self, name):
+                return await callback(*args, **kwargs)
+
+        wrapper._traced = True
+        return wrapper
+
+    def record(self, path: str, seconds: float, error: bool = False):
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None:
+                stats = self._stats[path] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+            stats[3] += error
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+        self.started = time.time()
+
+    def stats(self) -> dict:
+        """Span path -> dict of calls, total, max, self and errors (seconds), self excluding child spans"""
+        with self._lock:
+            stats = {path: list(values) for path, values in self._stats.items()}
+
+        children = Counter()
+        for path, (_, total, _, _) in stats.items():
+            parent, separator, _ = path.rpartition(SPAN_SEPARATOR)
+            if separator:
+                children[parent] += total
+
+        return {
+            path: {'calls': calls, 'total': total, 'max': longest, 'self': max(total - children[path], 0.0), 'errors': errors}
+            for path, (calls, total, longest, errors) in stats.items()
+        }
+
+    def report(self, top: int = 20) -> str:
+        """Spans taking the most time, one line each"""
+        stats = self.stats()
+        if not stats:
+            return "No spans recorded"
+
+        rows = sorted(stats.items(), key=lambda item: item[1]['total'], reverse=True)[:top]
+        lines = [f"Spans over {time.time() - self.started:.0f} s (calls, total, avg, max, self ms, errors):"]
+        for path, span in rows:
+            lines.append(
+                f"  {path}: {span['calls']}, {span['total'] * 1000:.0f}, {span['total'] / span['calls'] * 1000:.1f}, "
+                f"{span['max'] * 1000:.1f}, {span['self'] * 1000:.0f}, {span['errors']}"
+            )
+        return '\n'.join(lines)
+
+
+# Tracer of the framework, used by the decorators, handlers and requests
+tracer = Tracer()
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest recording every Bot API call as a span named api:<method>"""
+
+    def __init__(self, *args, tracer: Tracer = tracer, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracer = tracer
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        if not self._tracer.enabled:
+            return await super().do_request(url, method, *args, **kwargs)
+        with _Span(self._tracer, f"api:{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+def handler_span_name(handler) -> str:
+    """/command for command handlers, HandlerType:callback for the others"""
+    if isinstance(handler, CommandHandler):
+        return f"/{min(handler.commands)}"
+    return f"{type(handler).__name__}:{getattr(handler.callback, '__name__', 'callback')}"
+
+
+def trace_handlers(application, tracer: Tracer = tracer) -> int:
+    """Wrap the callback of every handler of the application in a span
+
+    Can be called again after more handlers are added, handlers already
+    wrapped are left as they are.
+
+    Returns:
+        int: number of handlers wrapped
+    """
+    wrapped = 0
+    for _, handler in iter_handlers(application):
+        if not asyncio.iscoroutinefunction(handler.callback) or getattr(handler.callback, '_traced', False):
+            continue
+        handler.callback = tracer.wrap(handler_span_name(handler), handler.callback)
+        wrapped += 1
+    return wrapped
+
+
+# ---- Stack sampler ----------------------
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackProfile:
+    """Stacks sampled over a time window"""
+
+    def __init__(self, stacks: Counter, idle: int, seconds: float, interval: float):
+        """Create the profile
+
+        Args:
+            stacks (Counter): (thread name, code objects from the outermost frame) -> samples
+            idle (int): samples of threads waiting for work
+            seconds (float): length of the window
+            interval (float): seconds between samples
+        """
+        self.stacks = stacks
+        self.idle = idle
+        self.seconds = seconds
+        self.interval = interval
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one 'thread;outer;...;inner samples' line per stack"""
+        lines = []
+        for (thread_name, *codes), count in self.stacks.most_common():
+            frames = [thread_name] + [frame_label(code) for code in codes]
+            lines.append(f"{';'.join(frame.replace(';', ',') for frame in frames)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def top(self, top: int = 20) -> str:
+        """Functions with the most samples, on top of the stack (self) and anywhere on it (total)"""
+        samples = self.samples
+        lines = [f"Samples: {samples} busy, {self.idle} idle, over {self.seconds:.1f} s every {self.interval * 1000:g} ms"]
+        if not samples:
+            return '\n'.join(lines)
+
+        own = Counter()
+        total = Counter()
+        for (_, *codes), count in self.stacks.items():
+            if codes:
+                own[codes[-1]] += count
+            for code in set(codes):
+                total[code] += count
+
+        lines.append("Top functions (self %, total %):")
+        for code, count in own.most_common(top):
+            lines.append(f"  {count / samples:6.1%} {total[code] / samples:6.1%}  {frame_label(code)}")
+        return '\n'.join(lines)
+
+
+class StackSampler:
+    """Samples the Python stacks of all threads from a background thread"""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        """Create the sampler
+
+        Args:
+            interval (float, optional): seconds between samples. Defaults to 0.005.
+            max_depth (int, optional): innermost frames kept of deeper stacks. Defaults to 128.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks = Counter()
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._stopped = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._started = perf_counter()
+        self._stopped = None
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> StackProfile:
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+            self._stopped = perf_counter()
+        return self.profile()
+
+    def profile(self) -> StackProfile:
+        """Samples so far, also while running"""
+        with self._lock:
+            stacks = Counter(self._stacks)
+            idle = self._idle
+        seconds = ((self._stopped or perf_counter()) - self._started) if self._started else 0.0
+        return StackProfile(stacks, idle, seconds, self.interval)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                name = names.get(thread_id)
+                if name is None:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    name = names.get(thread_id, str(thread_id))
+                self._sample(name, frame)
+
+    def _sample(self, thread_name: str, frame):
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            with self._lock:
+                self._idle += 1
+            return
+
+        codes = []
+        while frame is not None and len(codes) < self.max_depth:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        with self._lock:
+            self._stacks[(thread_name, *codes)] += 1
+
+
+class Profiler:
+    """A profiling window: span tracing and stack sampling, started and stopped together"""
+
+    def __init__(self, tracer: Tracer = tracer, interval: float = 0.005, max_seconds: float = 600):
+        """Create the profiler
+
+        Args:
+            tracer (Tracer, optional): tracer enabled during the window. Defaults to the framework tracer.
+            interval (float, optional): seconds between stack samples. Defaults to 0.005.
+            max_seconds (float, optional): longest window. Defaults to 600.
+        """
+        self.tracer = tracer
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.profile = None
+        self._sampler = None
+        self._timer = None
+        self._tracing_before = tracer.enabled
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None
+
+    def start(self, seconds: float = None, on_timeout=None):
+        """Start a window, stopped after seconds (at most max_seconds)
+
+        Args:
+            seconds (float, optional): length of the window. Defaults to max_seconds.
+            on_timeout (coroutine function, optional): awaited when the window ends by itself.
+        """
+        if self.running:
+            raise RuntimeError("A profile is already running")
+
+        self.profile = None
+        self._tracing_before = self.tracer.enabled
+        self.tracer.reset()
+        self.tracer.enabled = True
+        self._sampler = StackSampler(self.interval)
+        self._sampler.start()
+
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        self._timer = asyncio.get_running_loop().create_task(self._stop_after(seconds, on_timeout))
+
+    async def _stop_after(self, seconds: float, on_timeout):
+        await asyncio.sleep(seconds)
+        self._timer = None
+        self.stop()
+        if on_timeout:
+            await on_timeout()
+
+    def stop(self) -> StackProfile:
+        """Stop the window, returns its profile"""
+        if not self.running:
+            return self.profile
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.profile = self._sampler.stop()
+        self._sampler = None
+        self.tracer.enabled = self._tracing_before
+        return self.profile
+
+    def report(self, top: int = 20) -> str:
+        """Spans and top functions of the running or last window"""
+        profile = self._sampler.profile() if self.running else self.profile
+        parts = [self.tracer.report(top)]
+        if profile is not None:
+            parts.append(profile.top(top))
+        return '\n\n'.join(parts)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Chat-ordered concurrent update processor
+
+Update processor for Application.builder().concurrent_updates(...) that
+handles updates of different chats concurrently, up to max_concurrency at a
+time, while the updates of one chat are handled one after the other, in the
+order they arrived. A slow command (git pull, ssh, payments) only delays its
+own chat. Updates without chat or user are handled concurrently.
+
+Commands listed as unordered skip the queue of their chat and the concurrency
+limit: /cancel must not wait behind the command it stops, and commands that
+only wait for work bounded elsewhere (the command runner) must not hold the
+chat, or the next /cancel of the admin waits for them.
+
+Handlers running longer than their timeout are cancelled. Queue depth, wait
+times and timeouts are available from stats().
+
+Usage:
+    processor = ChatOrderedUpdateProcessor(max_concurrency=8, default_timeout=300, timeouts={'git': 900}, unordered={'cancel'})
+    application = Application.builder().token(token).concurrent_updates(processor).build()
+"""
+
+import asyncio
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+__all__ = ['ChatOrderedUpdateProcessor']
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Concurrent across chats, serial within a chat"""
+
+    def __init__(self, max_concurrency: int = 8, max_pending: int = 4096, default_timeout: float = None, timeouts: dict = None,
+                 unordered: set = None):
+        """Create the processor
+
+        Args:
+            max_concurrency (int, optional): updates handled at the same time. Defaults to 8.
+            max_pending (int, optional): updates accepted from the update queue, waiting or running. Defaults to 4096.
+            default_timeout (float, optional): seconds before a handler is cancelled. Defaults to None (no timeout).
+            timeouts (dict, optional): command name -> timeout in seconds (None for no timeout), overriding the default.
+            unordered (set, optional): command names handled at once, without waiting for the chat or a free slot.
+        """
+        # The base class semaphore only bounds the updates taken from the update queue, updates
+        # waiting for their chat must not use the slots of the updates that can run
+        super().__init__(max(max_pending, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.timeouts = {command.lower(): timeout for command, timeout in (timeouts or {}).items()}
+        self.unordered = {command.lower() for command in (unordered or ())}
+
+        self._running = asyncio.BoundedSemaphore(max_concurrency)
+        # chat id -> [lock, updates of the chat not finished yet]
+        self._chats = {}
+
+        self.waiting = 0
+        self.running = 0
+        self.processed = 0
+        self.unordered_processed = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @staticmethod
+    def chat_key(update: object):
+        """Key that serializes the update: chat id, user id, or None"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    @staticmethod
+    def command_of(update: object) -> str:
+        """Lowercase command name of the update, without the bot name, or None"""
+        if isinstance(update, Update) and update.effective_message:
+            text = update.effective_message.text or ''
+            if text.startswith('/'):
+                return text[1:].split(maxsplit=1)[0].split('@', 1)[0].lower() if len(text) > 1 else ''
+        return None
+
+    def timeout_for(self, update: object) -> float:
+        """Timeout of the command of the update, or the default timeout"""
+        if self.timeouts:
+            command = self.command_of(update)
+            if command in self.timeouts:
+                return self.timeouts[command]
+        return self.default_timeout
+
+    async def do_process_update(self, update: object, coroutine):
+        if self.unordered and self.command_of(update) in self.unordered:
+            try:
+                await self._run(update, coroutine)
+            finally:
+                self.unordered_processed += 1
+            return
+
+        key = self.chat_key(update)
+        received = time.monotonic()
+        self.waiting += 1
+
+        chat = None
+        if key is not None:
+            chat = self._chats.get(key)
+            if chat is None:
+                chat = self._chats[key] = [asyncio.Lock(), 0]
+            chat[1] += 1
+
+        started = False
+        try:
+            # asyncio.Lock wakes its waiters first in, first out, keeping the chat order
+            if chat is not None:
+                await chat[0].acquire()
+            try:
+                async with self._running:
+                    wait = time.monotonic() - received
+                    started = True
+                    self.waiting -= 1
+                    self.running += 1
+                    self.total_wait += wait
+                    self.max_wait = max(self.max_wait, wait)
+                    try:
+                        await self._run(update, coroutine)
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+            finally:
+                if chat is not None:
+                    chat[0].release()
+        finally:
+            if not started:
+                # Cancelled while waiting (application stopping)
+                self.waiting -= 1
+                if asyncio.iscoroutine(coroutine):
+                    coroutine.close()
+            if chat is not None:
+                chat[1] -= 1
+                if chat[1] == 0:
+                    del self._chats[key]
+
+    async def _run(self, update: object, coroutine):
+        timeout = self.timeout_for(update)
+        if timeout is None:
+            await coroutine
+            return
+        try:
+            await asyncio.wait_for(coroutine, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.error(f"Update {getattr(update, 'update_id', '')} of chat {self.chat_key(update)} cancelled after {timeout} s")
+
+    def stats(self) -> dict:
+        """Processing metrics"""
+        started = self.processed + self.running
+        return {
+            'max_concurrency': self.max_concurrency,
+            'running': self.running,
+            'waiting': self.waiting,
+            'busy_chats': len(self._chats),
+            'processed': self.processed,
+            'unordered_processed': self.unordered_processed,
+            'timed_out': self.timed_out,
+            'average_wait': self.total_wait / started if started else 0.0,
+            'max_wait': self.max_wait,
+        }
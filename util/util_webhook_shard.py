@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Sharded webhook runner
+
+A front-end process receives Telegram webhook POSTs, checks the secret token
+and hands each update to one of N worker processes, chosen by chat id (user id
+for updates without a chat). Every chat always goes to the same worker, which
+processes its updates in order, so per-chat ordering is kept while all CPU
+cores are used.
+
+Each worker builds its own bot with bot_factory(worker_index). All workers
+must share one persistence, e.g. SQLitePersistence: a user talks to the bot in
+chats handled by different workers and bot_data is global, so data kept per
+worker would diverge.
+
+Every worker runs the per-process setup and teardown of the bot; the one-time
+startup and stop work (admin notifications, ...) runs in the first worker.
+
+Usage:
+    def build_bot(worker_index):
+        persistence = SQLitePersistence('bot.sqlite', migrate_from='bot.pickle')
+        return Application.builder().token('...').persistence(persistence).build()
+
+    if __name__ == '__main__':
+        ShardedWebhookRunner(build_bot, workers=4, port=8443, secret_token='...',
+                             token='...', webhook_url='https://example.com/').run()
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+
+from telegram import Bot, Update
+
+__all__ = ['update_shard_key', 'ShardedWebhookRunner']
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'x-telegram-bot-api-secret-token'
+
+
+def update_shard_key(data: dict) -> int:
+    """Chat id of an update (user id when it has no chat), used to pick its worker"""
+    for key, value in data.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = value.get('from') or value.get('user')
+        if user:
+            return user['id']
+    return data.get('update_id', 0)
+
+
+async def _worker_loop(bot, worker_index: int, update_queue):
+    application = getattr(bot, 'application', bot)
+    loop = asyncio.get_running_loop()
+
+    prepare_run = getattr(bot, 'prepare_run', None)
+    if prepare_run:
+        prepare_run()
+
+    # TlgBotFwk splits post_init/post_stop into per-process and one-time hooks, other
+    # applications run their post_init and post_stop in every worker
+    setup_process = getattr(bot, 'setup_process', None)
+    teardown_process = getattr(bot, 'teardown_process', None)
+
+    async with application:
+        if setup_process:
+            await setup_process(application)
+            if worker_index == 0:
+                await bot.notify_start(application)
+        elif application.post_init:
+            await application.post_init(application)
+        await application.start()
+        logger.info(f"Webhook worker {worker_index} started (pid {os.getpid()})")
+
+        running = True
+        while running:
+            bodies = [await loop.run_in_executor(None, update_queue.get)]
+            try:
+                while len(bodies) < 100:
+                    bodies.append(update_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            for body in bodies:
+                if body is None:
+                    running = False
+                    break
+                try:
+                    update = Update.de_json(json.loads(body), application.bot)
+                except Exception as e:
+                    logger.error(f"Webhook worker {worker_index} discarded an invalid update: {e}")
+                    continue
+                await application.update_queue.put(update)
+
+        await application.stop()
+        if teardown_process:
+            await teardown_process(application)
+            if worker_index == 0:
+                await bot.notify_stop(application)
+        elif application.post_stop:
+            await application.post_stop(application)
+
+
+def _worker_main(bot_factory, worker_index: int, update_queue):
+    """Entry point of a worker process"""
+    bot = bot_factory(worker_index)
+    asyncio.run(_worker_loop(bot, worker_index, update_queue))
+
+
+class ShardedWebhookRunner:
+    """Webhook front-end sharding updates by chat over worker processes"""
+
+    def __init__(
+        self,
+        bot_factory,
+        workers: int = None,
+        listen: str = '127.0.0.1',
+        port: int = 8443,
+        url_path: str = '/',
+        secret_token: str = None,
+        token: str = None,
+        webhook_url: str = None,
+        max_body_size: int = 1024 * 1024
+    ):
+        """Create the runner
+
+        Args:
+            bot_factory (callable): picklable top-level function, bot_factory(worker_index) returns a TlgBotFwk or an Application
+            workers (int, optional): worker processes. Defaults to the number of CPU cores.
+            listen (str, optional): address of the front-end. Defaults to '127.0.0.1' (behind a reverse proxy).
+            port (int, optional): port of the front-end. Defaults to 8443.
+            url_path (str, optional): path Telegram posts to. Defaults to '/'.
+            secret_token (str, optional): required X-Telegram-Bot-Api-Secret-Token header. Defaults to None (not checked).
+            token (str, optional): bot token, to register webhook_url with Telegram. Defaults to None.
+            webhook_url (str, optional): public URL registered with set_webhook when token is given. Defaults to None.
+            max_body_size (int, optional): larger requests are rejected. Defaults to 1 MB.
+        """
+        self.bot_factory = bot_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.listen = listen
+        self.port = port
+        self.url_path = '/' + url_path.lstrip('/')
+        self.secret_token = secret_token
+        self.token = token
+        self.webhook_url = webhook_url
+        self.max_body_size = max_body_size
+
+        self.stats = {'received': 0, 'rejected': 0, 'dispatched': [0] * self.workers}
+
+        self._context = multiprocessing.get_context('spawn')
+        self._queues = []
+        self._processes = []
+        self._server = None
+        self._loop = None
+        self._stop_event = None
+        self.ready = threading.Event()
+
+    # ---------- workers ----------
+
+    def _start_worker(self, worker_index: int):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.bot_factory, worker_index, self._queues[worker_index]),
+            name=f"webhook-worker-{worker_index}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_index] = process
+
+    async def _supervise(self):
+        """Restart crashed workers; their queued updates are kept"""
+        while True:
+            await asyncio.sleep(5)
+            for worker_index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.error(f"Webhook worker {worker_index} exited with code {process.exitcode}, restarting it")
+                    self._start_worker(worker_index)
+
+    # ---------- HTTP front-end ----------
+
+    def _dispatch(self, method: str, path: str, headers: dict, body: bytes) -> str:
+        """Validate a request and queue its update, returning the HTTP status line"""
+        if path.split('?', 1)[0] != self.url_path:
+            return '404 Not Found'
+        if method != 'POST':
+            return '405 Method Not Allowed'
+        if self.secret_token is not None and not hmac.compare_digest(
+            headers.get(SECRET_TOKEN_HEADER, '').encode(), self.secret_token.encode()
+        ):
+            self.stats['rejected'] += 1
+            return '403 Forbidden'
+        try:
+            data = json.loads(body)
+            worker_index = update_shard_key(data) % self.workers
+        except (ValueError, TypeError, KeyError, AttributeError):
+            self.stats['rejected'] += 1
+            return '400 Bad Request'
+
+        self._queues[worker_index].put(body)
+        self.stats['received'] += 1
+        self.stats['dispatched'][worker_index] += 1
+        return '200 OK'
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body_size:
+                    status = '413 Payload Too Large'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status = self._dispatch(method, path, headers, body)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _set_webhook(self):
+        async with Bot(self.token) as bot:
+            await bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=100
+            )
+        logger.info(f"Webhook set to {self.webhook_url}")
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self._loop.add_signal_handler(signum, self._stop_event.set)
+                except NotImplementedError:  # Windows
+                    pass
+
+        self._queues = [self._context.Queue() for _ in range(self.workers)]
+        self._processes = [None] * self.workers
+        for worker_index in range(self.workers):
+            self._start_worker(worker_index)
+
+        if self.token and self.webhook_url:
+            await self._set_webhook()
+
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        supervisor = asyncio.create_task(self._supervise())
+        logger.info(f"Webhook front-end listening on {self.listen}:{self.port}{self.url_path} with {self.workers} workers")
+        self.ready.set()
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            supervisor.cancel()
+            self._server.close()
+            await self._server.wait_closed()
+
+            # Workers drain their queues and stop their applications
+            for update_queue in self._queues:
+                update_queue.put(None)
+            for process in self._processes:
+                await self._loop.run_in_executor(None, process.join, 60)
+            logger.info(f"Webhook front-end stopped: {self.stats}")
+
+    def run(self):
+        """Start the workers and serve until SIGINT/SIGTERM or stop()"""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        """Stop the runner, from any thread"""
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)